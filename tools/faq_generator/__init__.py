@@ -7,11 +7,15 @@ Sistema ultra-premium de generación de FAQs para productos cosméticos
 from .interface import render
 from .processor import process_faqs_streamlit, create_download_files
 from .generator import PremiumCosmeticsFAQGenerator
+from .quality_scorer import BatchFAQQualityScorer
+from .exporter import StreamingFAQExporter
 
 __version__ = "3.0.0"
 __all__ = [
     "render",
     "process_faqs_streamlit", 
     "create_download_files",
-    "PremiumCosmeticsFAQGenerator"
+    "PremiumCosmeticsFAQGenerator",
+    "BatchFAQQualityScorer",
+    "StreamingFAQExporter"
 ]
\ No newline at end of file
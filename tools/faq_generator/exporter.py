@@ -0,0 +1,208 @@
+# tools/faq_generator/exporter.py
+import os
+import csv
+import json
+import shutil
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+COLUMNAS_CSV_SHOPIFY = [
+    "Handle",
+    "Metafield: custom.faq1question [single_line_text_field]",
+    "Metafield: custom.faq1answer [multi_line_text_field]",
+    "Metafield: custom.faq2question [single_line_text_field]",
+    "Metafield: custom.faq2answer [multi_line_text_field]",
+    "Metafield: custom.faq3question [single_line_text_field]",
+    "Metafield: custom.faq3answer [multi_line_text_field]",
+    "Metafield: custom.faq4question [single_line_text_field]",
+    "Metafield: custom.faq4answer [multi_line_text_field]",
+    "Metafield: custom.faq5question [single_line_text_field]",
+    "Metafield: custom.faq5answer [multi_line_text_field]"
+]
+
+NOMBRE_CSV = 'faqs_shopify.csv'
+NOMBRE_REPORTE = 'reporte_calidad.txt'
+NOMBRE_JSON = 'faqs_completo.json'
+NOMBRE_ZIP = 'faqs_completo.zip'
+
+# Jobs exportados que se conservan en disco (los más recientes)
+MAX_EXPORTACIONES = 20
+
+
+def generar_reporte_calidad(estadisticas: dict, errores: list) -> str:
+    """Genera el texto del reporte de calidad de una ejecución"""
+    tasa_exito = (estadisticas['exitosos'] / estadisticas['total_productos'] * 100) if estadisticas['total_productos'] > 0 else 0
+
+    reporte = f"""REPORTE DE GENERACIÓN DE FAQs
+=============================
+Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+RESUMEN EJECUTIVO
+-----------------
+Total de productos procesados: {estadisticas['total_productos']}
+Productos exitosos: {estadisticas['exitosos']}
+Productos con errores: {estadisticas['errores']}
+Tasa de éxito: {tasa_exito:.1f}%
+
+CALIDAD DE FAQs GENERADAS
+-------------------------
+Puntuación promedio: {estadisticas['calidad_promedio']}/20
+
+Distribución de calidad:
+"""
+
+    for calidad, cantidad in estadisticas['distribucion_calidad'].items():
+        if cantidad > 0:
+            porcentaje = cantidad / estadisticas['exitosos'] * 100 if estadisticas['exitosos'] > 0 else 0
+            reporte += f"  • {calidad}: {cantidad} productos ({porcentaje:.1f}%)\n"
+
+    reporte += f"\nTiempo total de procesamiento: {estadisticas['tiempo_total']}\n"
+
+    rutas = estadisticas.get('rutas_modelos')
+    if rutas:
+        reporte += "\nCOSTE Y LATENCIA POR ETAPA\n"
+        reporte += "--------------------------\n"
+        for etapa, datos in rutas.items():
+            reporte += (f"  • {etapa} [{datos['modelo']}]: {datos['llamadas']} llamadas, "
+                        f"${datos['coste_usd']:.4f}, {datos['latencia_media_s']}s de media\n")
+        reporte += f"Coste total estimado: ${estadisticas.get('coste_total_usd', 0):.4f}\n"
+
+    if errores:
+        reporte += "\nERRORES ENCONTRADOS\n"
+        reporte += "-------------------\n"
+        for error in errores:
+            reporte += f"• {error['producto']} (Handle: {error['handle']})\n"
+            reporte += f"  Error: {error['error']}\n\n"
+
+    return reporte
+
+
+def serializar_estadisticas(estadisticas: dict) -> str:
+    """Serializa las estadísticas a JSON convirtiendo las fechas a ISO"""
+    def convert_datetime_to_string(obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        elif isinstance(obj, dict):
+            return {k: convert_datetime_to_string(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [convert_datetime_to_string(item) for item in obj]
+        else:
+            return obj
+
+    return json.dumps(convert_datetime_to_string(estadisticas), indent=2, ensure_ascii=False)
+
+
+def limpiar_exportaciones(directorio_base: str = "./faq_exports", conservar: int = MAX_EXPORTACIONES,
+                          excluir: tuple = ()) -> int:
+    """
+    Borra los jobs más antiguos y deja solo los `conservar` más recientes
+
+    Los job id empiezan por la fecha (AAAAMMDD_HHMMSS), así que el orden alfabético es el cronológico.
+
+    Returns:
+        int: jobs eliminados
+    """
+    if not os.path.isdir(directorio_base):
+        return 0
+    jobs = sorted(
+        (nombre for nombre in os.listdir(directorio_base)
+         if os.path.isdir(os.path.join(directorio_base, nombre)) and nombre not in excluir),
+        reverse=True
+    )
+    for nombre in jobs[conservar:]:
+        shutil.rmtree(os.path.join(directorio_base, nombre), ignore_errors=True)
+    return max(0, len(jobs) - conservar)
+
+
+class StreamingFAQExporter:
+    """
+    Exportador incremental de resultados a disco
+
+    Cada producto se escribe en el CSV en cuanto termina, el reporte y el JSON se generan al
+    finalizar y el ZIP se compone leyendo los archivos desde disco. Todo queda en un directorio
+    por job id, de modo que los reruns de Streamlit reutilizan el ZIP ya creado en lugar de
+    reconstruir los archivos en memoria en cada clic.
+    """
+
+    def __init__(self, job_id: str, directorio_base: str = "./faq_exports"):
+        self.job_id = job_id
+        self.directorio = os.path.join(directorio_base, job_id)
+        os.makedirs(self.directorio, exist_ok=True)
+
+        self.ruta_csv = os.path.join(self.directorio, NOMBRE_CSV)
+        self.ruta_reporte = os.path.join(self.directorio, NOMBRE_REPORTE)
+        self.ruta_json = os.path.join(self.directorio, NOMBRE_JSON)
+        self.ruta_zip = os.path.join(self.directorio, NOMBRE_ZIP)
+
+        self.filas_escritas = 0
+        self._archivo_csv = None
+        self._escritor = None
+
+    @classmethod
+    def desde_job(cls, job_id: str, directorio_base: str = "./faq_exports") -> Optional['StreamingFAQExporter']:
+        """Recupera un job ya exportado (None si no existe en disco)"""
+        if not os.path.isdir(os.path.join(directorio_base, job_id)):
+            return None
+        return cls(job_id, directorio_base)
+
+    def _abrir_csv(self):
+        if self._escritor is None:
+            self._archivo_csv = open(self.ruta_csv, 'w', newline='', encoding='utf-8')
+            self._escritor = csv.DictWriter(self._archivo_csv, fieldnames=COLUMNAS_CSV_SHOPIFY, extrasaction='ignore')
+            self._escritor.writeheader()
+
+    def agregar_resultado(self, resultado: Dict):
+        """Escribe la fila Shopify de un producto terminado"""
+        self._abrir_csv()
+        self._escritor.writerow({col: resultado.get(col, '') for col in COLUMNAS_CSV_SHOPIFY})
+        self._archivo_csv.flush()
+        self.filas_escritas += 1
+
+    def finalizar(self, estadisticas: dict, errores: List[Dict]) -> Dict[str, str]:
+        """
+        Cierra el CSV, escribe reporte y JSON y crea el ZIP en disco
+
+        Returns:
+            dict: nombre de archivo -> ruta en disco
+        """
+        if self._archivo_csv is not None:
+            self._archivo_csv.close()
+            self._archivo_csv = None
+            self._escritor = None
+
+        with open(self.ruta_reporte, 'w', encoding='utf-8') as f:
+            f.write(generar_reporte_calidad(estadisticas, errores))
+
+        if self.filas_escritas > 0:
+            with open(self.ruta_json, 'w', encoding='utf-8') as f:
+                f.write(serializar_estadisticas(estadisticas))
+
+        # Invalida un ZIP previo del mismo job y lo reconstruye desde disco
+        if os.path.exists(self.ruta_zip):
+            os.remove(self.ruta_zip)
+        self.obtener_zip()
+
+        return self.archivos_disponibles()
+
+    def archivos_disponibles(self) -> Dict[str, str]:
+        """Archivos ya escritos del job"""
+        return {
+            nombre: ruta
+            for nombre, ruta in [(NOMBRE_CSV, self.ruta_csv), (NOMBRE_REPORTE, self.ruta_reporte), (NOMBRE_JSON, self.ruta_json)]
+            if os.path.exists(ruta)
+        }
+
+    def obtener_zip(self) -> str:
+        """Ruta del ZIP del job, creándolo solo si aún no existe"""
+        if not os.path.exists(self.ruta_zip):
+            ruta_temporal = self.ruta_zip + ".tmp"
+            with zipfile.ZipFile(ruta_temporal, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                for nombre_archivo, ruta in self.archivos_disponibles().items():
+                    zip_file.write(ruta, arcname=nombre_archivo)
+            os.replace(ruta_temporal, self.ruta_zip)
+        return self.ruta_zip
+
+    def eliminar(self):
+        """Borra los archivos del job"""
+        shutil.rmtree(self.directorio, ignore_errors=True)
@@ -2,18 +2,25 @@
 import pandas as pd
 from openai import OpenAI # type: ignore
 from typing import Dict, List, Tuple, Optional, Set
-import json
 import time
 from datetime import datetime
 import re
 import random
-import hashlib
 from collections import defaultdict
 import numpy as np # type: ignore
 from dataclasses import dataclass, field
 import pickle
 import os
 
+from .question_bank import CompiledQuestionBank, hash_pregunta
+from .semantic_index import SemanticQuestionIndex
+from utils.structured_output import parsear_json_modelo
+from utils.model_routing import ModelRouter
+from .quality_scorer import (
+    PATRON_DATOS_NUMERICOS, PATRON_INSTRUCCIONES, PATRON_COMPARACION,
+    PATRON_TERMINOS_TECNICOS, PATRON_PALABRAS_GENERICAS, PATRONES_TEMA
+)
+
 @dataclass
 class ProductProfile:
     """Perfil completo del producto con análisis profundo"""
@@ -47,6 +54,7 @@ class PremiumCosmeticsFAQGenerator:
     
     def __init__(self, api_key: str, cache_dir: str = "./faq_cache"):
         self.client = OpenAI(api_key=api_key)
+        self.router = ModelRouter()
         self.cache_dir = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
         
@@ -226,6 +234,13 @@ class PremiumCosmeticsFAQGenerator:
             }
         }
         
+        # Índice precompilado de expansiones del banco (muestreo O(1) de preguntas no usadas)
+        self.indice_preguntas = CompiledQuestionBank(self.banco_preguntas_premium)
+        
+        # Índice semántico local para detectar paráfrasis que el hash exacto no captura
+        self.indice_semantico = SemanticQuestionIndex(cache_dir)
+        self.max_rechazos_semanticos = 5
+        
         # Sistema de respuestas contextuales
         self.plantillas_respuestas = {
             "datos_clinicos": [
@@ -267,11 +282,11 @@ class PremiumCosmeticsFAQGenerator:
         historico_path = os.path.join(self.cache_dir, "preguntas_historicas.pkl")
         with open(historico_path, 'wb') as f:
             pickle.dump(self.preguntas_historicas, f)
+        self.indice_semantico.guardar()
     
     def _generar_hash_pregunta(self, pregunta: str) -> str:
         """Genera hash único para cada pregunta"""
-        pregunta_normalizada = re.sub(r'[^\w\s]', '', pregunta.lower())
-        return hashlib.md5(pregunta_normalizada.encode()).hexdigest()
+        return hash_pregunta(pregunta)
     
     def analizar_producto_ultra_profundo(self, producto: Dict) -> ProductProfile:
         """Análisis ultra-profundo del producto con IA"""
@@ -312,16 +327,16 @@ class PremiumCosmeticsFAQGenerator:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "analizar_producto_ultra_profundo",
                 messages=[
                     {"role": "system", "content": "Eres un experto en análisis de productos cosméticos."},
                     {"role": "user", "content": prompt_analisis}
                 ],
-                temperature=0.3
+                formato_json=True
             )
             
-            perfil_dict = json.loads(response.choices[0].message.content)
+            perfil_dict = parsear_json_modelo(response.choices[0].message.content, "analizar_producto_ultra_profundo")
             
             # Completar campos faltantes con valores por defecto
             return ProductProfile(
@@ -393,29 +408,24 @@ class PremiumCosmeticsFAQGenerator:
     def generar_preguntas_ultra_contextuales(self, producto: Dict, perfil: ProductProfile, perfil_comprador: str) -> List[Dict]:
         """Genera preguntas ultra-específicas basadas en el contexto completo"""
         preguntas_generadas = []
-        categorias_seleccionadas = random.sample(list(self.banco_preguntas_premium.keys()), 5)
+        titulo = producto.get('Title', 'este producto')
+        
+        # Solo categorías con preguntas sin usar para este producto
+        categorias_disponibles = self.indice_preguntas.categorias_disponibles(titulo, self.preguntas_historicas)
+        categorias_seleccionadas = random.sample(categorias_disponibles, min(5, len(categorias_disponibles)))
         
         for categoria in categorias_seleccionadas:
-            plantillas = self.banco_preguntas_premium[categoria]["plantillas"]
-            variables = self.banco_preguntas_premium[categoria].get("variables", {})
-            
-            # Seleccionar plantilla no usada
+            # Muestreo O(1) de una expansión no usada (el hash ya queda registrado en el histórico)
             plantilla_base = None
-            for plantilla in random.sample(plantillas, len(plantillas)):
-                # Sustituir variables básicas
-                pregunta = plantilla.replace("{producto}", producto.get('Title', 'este producto'))
-                
-                # Sustituir variables contextuales
-                for var, opciones in variables.items():
-                    if f"{{{var}}}" in pregunta:
-                        opcion = random.choice(opciones)
-                        pregunta = pregunta.replace(f"{{{var}}}", opcion)
+            for _ in range(self.max_rechazos_semanticos):
+                seleccion = self.indice_preguntas.muestrear(categoria, titulo, self.preguntas_historicas)
+                if not seleccion:
+                    break
                 
-                # Verificar que no se haya usado antes
-                hash_pregunta = self._generar_hash_pregunta(pregunta)
-                if hash_pregunta not in self.preguntas_historicas:
-                    plantilla_base = pregunta
-                    self.preguntas_historicas.add(hash_pregunta)
+                # Rechazar paráfrasis de preguntas ya generadas para este producto
+                if not self.indice_semantico.es_duplicado(titulo, seleccion[0]):
+                    plantilla_base = seleccion[0]
+                    self.indice_semantico.agregar(titulo, plantilla_base)
                     break
             
             if plantilla_base:
@@ -482,14 +492,12 @@ class PremiumCosmeticsFAQGenerator:
         Responde SOLO con el texto de la respuesta, sin comillas ni formato.
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
+        response = self.router.completar(
+            self.client, "generar_respuesta_ultra_contextual",
             messages=[
                 {"role": "system", "content": "Experto dermatólogo con 20 años de experiencia. Respuestas precisas y específicas."},
                 {"role": "user", "content": prompt_respuesta}
-            ],
-            temperature=0.8,
-            max_tokens=150
+            ]
         )
         
         return response.choices[0].message.content.strip()
@@ -507,12 +515,12 @@ class PremiumCosmeticsFAQGenerator:
             metricas_faq = {
                 'longitud_pregunta': len(pregunta.split()),
                 'longitud_respuesta': len(respuesta),
-                'datos_numericos': len(re.findall(r'\d+[%\s]*(mg|ml|%|días?|semanas?|meses?|€)', respuesta)),
-                'terminos_tecnicos': sum(1 for term in ['dermatológicamente', 'clínicamente', 'activos', 'penetración', 'biodisponible', 'encapsulado'] if term in respuesta.lower()),
-                'instrucciones': bool(re.search(r'(aplica|usa|masajea|espera|evita|combina)', respuesta.lower())),
-                'especificidad': 1 - (sum(1 for palabra in ['cosa', 'algo', 'producto', 'esto'] if palabra in respuesta.lower()) / len(respuesta.split())),
+                'datos_numericos': len(PATRON_DATOS_NUMERICOS.findall(respuesta)),
+                'terminos_tecnicos': len(PATRON_TERMINOS_TECNICOS.findall(respuesta.lower())),
+                'instrucciones': bool(PATRON_INSTRUCCIONES.search(respuesta.lower())),
+                'especificidad': 1 - (len(PATRON_PALABRAS_GENERICAS.findall(respuesta.lower())) / len(respuesta.split())),
                 'diversidad_lexica': len(set(respuesta.lower().split())) / len(respuesta.split()) if respuesta else 0,
-                'tiene_comparacion': bool(re.search(r'(mejor que|a diferencia de|mientras que|frente a)', respuesta.lower())),
+                'tiene_comparacion': bool(PATRON_COMPARACION.search(respuesta.lower())),
                 'formato_pregunta': pregunta.startswith('¿') and pregunta.endswith('?')
             }
             
@@ -606,20 +614,13 @@ class PremiumCosmeticsFAQGenerator:
     def _calcular_diversidad_tematica(self, faqs: Dict) -> float:
         """Calcula la diversidad temática de las preguntas"""
         temas = []
-        palabras_clave_por_tema = {
-            'aplicacion': ['aplicar', 'usar', 'cantidad', 'técnica', 'masaje'],
-            'ingredientes': ['ingrediente', 'activo', 'concentración', 'fórmula', 'contiene'],
-            'resultados': ['resultado', 'tiempo', 'mejora', 'cambio', 'efecto'],
-            'compatibilidad': ['combinar', 'mezclar', 'compatible', 'interferir', 'junto'],
-            'seguridad': ['seguro', 'irritación', 'alergia', 'sensible', 'reacción']
-        }
         
         for i in range(1, 6):
             pregunta = faqs[f'faq{i}']['pregunta'].lower()
             tema_detectado = 'otro'
             
-            for tema, palabras in palabras_clave_por_tema.items():
-                if any(palabra in pregunta for palabra in palabras):
+            for tema, patron in PATRONES_TEMA.items():
+                if patron.search(pregunta):
                     tema_detectado = tema
                     break
             
@@ -627,9 +628,13 @@ class PremiumCosmeticsFAQGenerator:
         
         return len(set(temas)) / 5
     
-    def generar_faqs_ultra_premium(self, producto: Dict, progress_callback=None, max_intentos: int = 3, modelo: str = "gpt-4") -> Dict:
+    def generar_faqs_ultra_premium(self, producto: Dict, progress_callback=None, max_intentos: int = 3, modelo: Optional[str] = None) -> Dict:
         """Generación ultra-premium con sistema completo de optimización"""
         
+        # El modelo elegido se aplica a las etapas premium (redacción de respuestas); el análisis sigue en el nivel rápido
+        if modelo:
+            self.router.modelo_preferido = modelo
+        
         # Análisis ultra-profundo
         if progress_callback:
             progress_callback("🔍 Analizando producto en profundidad...")
@@ -651,6 +656,10 @@ class PremiumCosmeticsFAQGenerator:
                 # Generar preguntas contextuales
                 preguntas = self.generar_preguntas_ultra_contextuales(producto, perfil, perfil_comprador)
                 
+                if progress_callback:
+                    for aviso in self.indice_preguntas.consumir_avisos():
+                        progress_callback(aviso)
+                
                 # Ensure we have at least 5 questions
                 if len(preguntas) < 5:
                     if progress_callback:
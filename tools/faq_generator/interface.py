@@ -4,10 +4,11 @@ import pandas as pd
 import os
 from datetime import datetime
 import json
+import uuid
+from utils.shopify_csv import ShopifyCSVStream
+from .exporter import StreamingFAQExporter, limpiar_exportaciones
 from .processor import (
     process_faqs_streamlit, 
-    create_download_files,
-    create_zip_download,
     validar_csv_productos,
     obtener_muestra_productos,
     estimar_tiempo_procesamiento
@@ -85,33 +86,34 @@ def render_upload_tab():
     
     if uploaded_file is not None:
         try:
-            # Leer CSV
-            df = pd.read_csv(uploaded_file, encoding='utf-8')
+            # Leer CSV por bloques: las variantes se agrupan por Handle y no se carga el archivo completo
+            df = ShopifyCSVStream(uploaded_file, encoding='utf-8')
             
-            # Validar formato
+            # Validar formato antes de agrupar por Handle
             es_valido, mensaje = validar_csv_productos(df)
             
             if es_valido:
+                resumen = df.resumen()
                 st.success(mensaje)
                 
-                # Guardar en session state
+                # Guardar en session state (el stream admite len() y head() como un DataFrame)
                 st.session_state['productos_df'] = df
                 st.session_state['archivo_nombre'] = uploaded_file.name
                 
                 # Mostrar resumen
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Total de productos", len(df))
+                    st.metric("Total de productos", resumen['total_productos'])
                 with col2:
-                    marcas_unicas = df['Vendor'].nunique() if 'Vendor' in df.columns else 'N/A'
+                    marcas_unicas = resumen['marcas_unicas'] if resumen['marcas_unicas'] is not None else 'N/A'
                     st.metric("Marcas únicas", marcas_unicas)
                 with col3:
-                    precio_promedio = f"${df['Variant Price'].mean():.2f}" if 'Variant Price' in df.columns else 'N/A'
+                    precio_promedio = f"${resumen['precio_promedio']:.2f}" if resumen['precio_promedio'] is not None else 'N/A'
                     st.metric("Precio promedio", precio_promedio)
                 
                 # Mostrar muestra
                 st.markdown("### 👀 Vista previa de productos")
-                muestra_df = obtener_muestra_productos(df, n=5)
+                muestra_df = obtener_muestra_productos(df.muestra(5), n=5)
                 st.dataframe(muestra_df)
                 
                 # Análisis de calidad de datos
@@ -120,11 +122,7 @@ def render_upload_tab():
                     
                     with col1:
                         st.markdown("**Productos sin descripción:**")
-                        sin_descripcion = 0
-                        for col in ['Body HTML', 'Body (HTML)', 'body_html']:
-                            if col in df.columns:
-                                sin_descripcion = df[col].isna().sum()
-                                break
+                        sin_descripcion = resumen['sin_descripcion'] or 0
                         
                         if sin_descripcion > 0:
                             st.warning(f"{sin_descripcion} productos sin descripción")
@@ -133,8 +131,8 @@ def render_upload_tab():
                     
                     with col2:
                         st.markdown("**Productos sin precio:**")
-                        if 'Variant Price' in df.columns:
-                            sin_precio = df['Variant Price'].isna().sum()
+                        if resumen['sin_precio'] is not None:
+                            sin_precio = resumen['sin_precio']
                             if sin_precio > 0:
                                 st.warning(f"{sin_precio} productos sin precio")
                             else:
@@ -332,6 +330,11 @@ def render_generation_tab():
                 # Get current model from sidebar config
                 current_model = st.session_state.get('sidebar_config', {}).get('modelo_gpt', 'gpt-3.5-turbo')
                 
+                # Los resultados se escriben a disco según se completan
+                job_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+                exportador = StreamingFAQExporter(job_id)
+                limpiar_exportaciones(excluir=(job_id,))
+                
                 df_results, stats, errores = process_faqs_streamlit(
                     df=df_procesar,
                     limite_productos=max_productos,
@@ -339,7 +342,8 @@ def render_generation_tab():
                     api_key=st.session_state['openai_api_key'],
                     modelo_gpt=current_model,
                     progress_bar=progress_bar,
-                    status_text=status_text
+                    status_text=status_text,
+                    exportador=exportador
                 )
                 
                 # Guardar resultados en session state
@@ -347,7 +351,8 @@ def render_generation_tab():
                     'df': df_results,
                     'stats': stats,
                     'errores': errores,
-                    'timestamp': datetime.now()
+                    'timestamp': datetime.now(),
+                    'job_id': job_id
                 }
                 
                 # Mostrar resultados
@@ -403,51 +408,10 @@ def render_generation_tab():
                         for error in errores:
                             st.error(f"**{error['producto']}**: {error['error']}")
                 
-                # Opciones de descarga
-                st.markdown("### 💾 Descargar resultados")
-                
-                try:
-                    archivos = create_download_files(df_results, stats, errores)
-                    
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        if 'faqs_shopify.csv' in archivos:
-                            st.download_button(
-                                label="📄 Descargar CSV para Shopify",
-                                data=archivos['faqs_shopify.csv'],
-                                file_name=f"faqs_shopify_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                                mime="text/csv"
-                            )
-                        else:
-                            st.info("CSV no disponible")
-                    
-                    with col2:
-                        if 'reporte_calidad.txt' in archivos:
-                            st.download_button(
-                                label="📊 Descargar reporte de calidad",
-                                data=archivos['reporte_calidad.txt'],
-                                file_name=f"reporte_calidad_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                                mime="text/plain"
-                            )
-                        else:
-                            st.info("Reporte no disponible")
-                    
-                    with col3:
-                        try:
-                            zip_data = create_zip_download(archivos)
-                            st.download_button(
-                                label="🗂️ Descargar todo (ZIP)",
-                                data=zip_data,
-                                file_name=f"faqs_completo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                                mime="application/zip"
-                            )
-                        except Exception as zip_error:
-                            st.error(f"Error creando ZIP: {str(zip_error)}")
-                
-                except Exception as download_error:
-                    st.error(f"Error creando archivos de descarga: {str(download_error)}")
-                    st.markdown("Los resultados están disponibles pero hay un problema con los archivos de descarga.")
+                # Coste y latencia por etapa
+                if stats.get('rutas_modelos'):
+                    with st.expander(f"💵 Coste por etapa (total estimado ${stats['coste_total_usd']:.4f})"):
+                        st.dataframe(pd.DataFrame.from_dict(stats['rutas_modelos'], orient='index'), use_container_width=True)
                 
                 # Vista previa de resultados
                 if not df_results.empty:
@@ -473,6 +437,68 @@ def render_generation_tab():
                 # Log detallado en expander
                 with st.expander("Ver detalles del error"):
                     st.code(str(e))
+    
+    # Fuera del botón: las descargas siguen disponibles en los reruns (p. ej. tras pulsar otra descarga)
+    job_id = st.session_state.get('ultimos_resultados', {}).get('job_id')
+    if job_id:
+        render_descargas(job_id)
+
+def _leer_bytes(ruta: str) -> bytes:
+    with open(ruta, 'rb') as f:
+        return f.read()
+
+def render_descargas(job_id: str):
+    """Botones de descarga de un job ya exportado, leídos desde disco"""
+    
+    exportador = StreamingFAQExporter.desde_job(job_id)
+    if exportador is None:
+        return
+    
+    st.markdown("### 💾 Descargar resultados")
+    
+    try:
+        # Archivos servidos desde disco; el ZIP se cachea por job id
+        archivos = exportador.archivos_disponibles()
+        sufijo = job_id.rsplit('_', 1)[0]
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            if 'faqs_shopify.csv' in archivos:
+                st.download_button(
+                    label="📄 Descargar CSV para Shopify",
+                    data=_leer_bytes(archivos['faqs_shopify.csv']),
+                    file_name=f"faqs_shopify_{sufijo}.csv",
+                    mime="text/csv"
+                )
+            else:
+                st.info("CSV no disponible")
+        
+        with col2:
+            if 'reporte_calidad.txt' in archivos:
+                st.download_button(
+                    label="📊 Descargar reporte de calidad",
+                    data=_leer_bytes(archivos['reporte_calidad.txt']),
+                    file_name=f"reporte_calidad_{sufijo}.txt",
+                    mime="text/plain"
+                )
+            else:
+                st.info("Reporte no disponible")
+        
+        with col3:
+            try:
+                st.download_button(
+                    label="🗂️ Descargar todo (ZIP)",
+                    data=_leer_bytes(exportador.obtener_zip()),
+                    file_name=f"faqs_completo_{sufijo}.zip",
+                    mime="application/zip"
+                )
+            except Exception as zip_error:
+                st.error(f"Error creando ZIP: {str(zip_error)}")
+    
+    except Exception as download_error:
+        st.error(f"Error creando archivos de descarga: {str(download_error)}")
+        st.markdown("Los resultados están disponibles pero hay un problema con los archivos de descarga.")
 
 def render_history_tab():
     """Tab de historial y estadísticas"""
@@ -2,24 +2,26 @@
 import pandas as pd
 import streamlit as st # type: ignore
 from typing import Dict, List, Optional
-import json
 from datetime import datetime
 import io
 import zipfile
 from .generator import PremiumCosmeticsFAQGenerator
+from .exporter import StreamingFAQExporter, COLUMNAS_CSV_SHOPIFY, generar_reporte_calidad, serializar_estadisticas
+from utils.shopify_csv import validar_columnas_shopify, obtener_muestra_productos
 
-def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos=3, api_key=None, modelo_gpt="gpt-3.5-turbo", progress_bar=None, status_text=None) -> tuple:
+def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos=3, api_key=None, modelo_gpt="gpt-3.5-turbo", progress_bar=None, status_text=None, exportador: Optional[StreamingFAQExporter] = None) -> tuple:
     """
     Procesa un DataFrame de productos y genera FAQs usando el generador premium v3.0
     
     Args:
-        df: DataFrame con los productos
+        df: DataFrame con los productos o ShopifyCSVStream (lectura por bloques)
         limite_productos: Límite de productos a procesar (opcional)
         max_intentos: Número máximo de intentos por producto
         api_key: API key de OpenAI
         modelo_gpt: Modelo GPT a utilizar
         progress_bar: Barra de progreso de Streamlit (opcional)
         status_text: Texto de estado de Streamlit (opcional)
+        exportador: StreamingFAQExporter que escribe cada resultado a disco al completarse (opcional)
     
     Returns:
         tuple: (df_results, stats_dict, errores_list)
@@ -33,13 +35,21 @@ def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos
     if limite_productos is not None and limite_productos > 0:
         df = df.head(limite_productos)
     
+    total_productos = len(df)
+    
+    # Los streams generan diccionarios sin cargar el CSV completo en memoria
+    if hasattr(df, 'iterar_productos'):
+        productos_iter = df.iterar_productos()
+    else:
+        productos_iter = (fila.to_dict() for _, fila in df.iterrows())
+    
     # Inicializar generador
     generator = PremiumCosmeticsFAQGenerator(api_key=api_key)
     
     # Preparar estructuras de resultados
     resultados = []
     estadisticas = {
-        'total_productos': len(df),
+        'total_productos': total_productos,
         'procesados': 0,
         'exitosos': 0,
         'errores': 0,
@@ -57,11 +67,11 @@ def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos
     errores = []
     
     # Procesar cada producto
-    for i, (idx, producto) in enumerate(df.iterrows()):
+    for i, producto in enumerate(productos_iter):
         try:
             # Actualizar progreso
             if progress_bar:
-                progress = (i + 1) / len(df)
+                progress = min((i + 1) / max(total_productos, 1), 1.0)
                 progress_bar.progress(progress)
             
             # Safe title extraction
@@ -71,10 +81,10 @@ def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos
             title_display = str(title)[:50]
             
             if status_text:
-                status_text.text(f"Procesando {i + 1}/{len(df)}: {title_display}...")
+                status_text.text(f"Procesando {i + 1}/{total_productos}: {title_display}...")
             
-            # Convertir fila a diccionario y limpiar valores NaN
-            producto_dict = producto.to_dict()
+            # Copiar el producto y limpiar valores NaN
+            producto_dict = dict(producto)
             
             # Clean NaN values from the product dictionary
             for key, value in producto_dict.items():
@@ -84,7 +94,7 @@ def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos
             # Callback para mostrar progreso del generador
             def progress_callback(mensaje):
                 if status_text:
-                    status_text.text(f"Producto {i + 1}/{len(df)}: {mensaje}")
+                    status_text.text(f"Producto {i + 1}/{total_productos}: {mensaje}")
             
             # Generar FAQs con el sistema premium
             resultado = generator.generar_faqs_ultra_premium(
@@ -96,6 +106,8 @@ def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos
             
             if resultado:
                 resultados.append(resultado)
+                if exportador:
+                    exportador.agregar_resultado(resultado)
                 estadisticas['exitosos'] += 1
                 estadisticas['distribucion_calidad'][resultado['_calidad']] += 1
                 estadisticas['calidad_promedio'] += resultado['_puntuacion']
@@ -144,22 +156,17 @@ def process_faqs_streamlit(df: pd.DataFrame, limite_productos=None, max_intentos
     
     estadisticas['tiempo_total'] = str(datetime.now() - estadisticas['tiempo_inicio'])
     
+    # Coste y latencia por etapa del enrutado de modelos
+    estadisticas['rutas_modelos'] = generator.router.informe()
+    estadisticas['coste_total_usd'] = generator.router.coste_total()
+    
+    if exportador:
+        exportador.finalizar(estadisticas, errores)
+    
     # Crear DataFrame de resultados
     if resultados:
         # Extraer solo las columnas necesarias para el CSV
-        columnas_csv = [
-            "Handle",
-            "Metafield: custom.faq1question [single_line_text_field]",
-            "Metafield: custom.faq1answer [multi_line_text_field]",
-            "Metafield: custom.faq2question [single_line_text_field]",
-            "Metafield: custom.faq2answer [multi_line_text_field]",
-            "Metafield: custom.faq3question [single_line_text_field]",
-            "Metafield: custom.faq3answer [multi_line_text_field]",
-            "Metafield: custom.faq4question [single_line_text_field]",
-            "Metafield: custom.faq4answer [multi_line_text_field]",
-            "Metafield: custom.faq5question [single_line_text_field]",
-            "Metafield: custom.faq5answer [multi_line_text_field]"
-        ]
+        columnas_csv = COLUMNAS_CSV_SHOPIFY
         
         try:
             # Create DataFrame and safely select columns that exist
@@ -196,68 +203,11 @@ def create_download_files(df_results: pd.DataFrame, estadisticas: dict, errores:
         archivos['faqs_shopify.csv'] = csv_buffer.getvalue().encode('utf-8')
     
     # 2. Reporte de calidad
-    reporte = f"""REPORTE DE GENERACIÓN DE FAQs
-=============================
-Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-RESUMEN EJECUTIVO
------------------
-Total de productos procesados: {estadisticas['total_productos']}
-Productos exitosos: {estadisticas['exitosos']}
-Productos con errores: {estadisticas['errores']}
-Tasa de éxito: {(estadisticas['exitosos'] / estadisticas['total_productos'] * 100):.1f}%
-
-CALIDAD DE FAQs GENERADAS
--------------------------
-Puntuación promedio: {estadisticas['calidad_promedio']}/20
-
-Distribución de calidad:
-"""
-    
-    for calidad, cantidad in estadisticas['distribucion_calidad'].items():
-        if cantidad > 0:
-            porcentaje = cantidad / estadisticas['exitosos'] * 100 if estadisticas['exitosos'] > 0 else 0
-            reporte += f"  • {calidad}: {cantidad} productos ({porcentaje:.1f}%)\n"
-    
-    reporte += f"\nTiempo total de procesamiento: {estadisticas['tiempo_total']}\n"
-    
-    if errores:
-        reporte += "\nERRORES ENCONTRADOS\n"
-        reporte += "-------------------\n"
-        for error in errores:
-            reporte += f"• {error['producto']} (Handle: {error['handle']})\n"
-            reporte += f"  Error: {error['error']}\n\n"
-    
-    archivos['reporte_calidad.txt'] = reporte.encode('utf-8')
+    archivos['reporte_calidad.txt'] = generar_reporte_calidad(estadisticas, errores).encode('utf-8')
     
     # 3. JSON con datos completos (incluyendo métricas)
     if not df_results.empty:
-        # Create JSON-serializable version of estadisticas
-        estadisticas_json = estadisticas.copy()
-        
-        # Convert datetime objects to strings
-        if 'tiempo_inicio' in estadisticas_json:
-            if isinstance(estadisticas_json['tiempo_inicio'], datetime):
-                estadisticas_json['tiempo_inicio'] = estadisticas_json['tiempo_inicio'].isoformat()
-        
-        # Convert any other datetime objects that might be nested
-        def convert_datetime_to_string(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            elif isinstance(obj, dict):
-                return {k: convert_datetime_to_string(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_datetime_to_string(item) for item in obj]
-            else:
-                return obj
-        
-        estadisticas_json = convert_datetime_to_string(estadisticas_json)
-        
-        archivos['faqs_completo.json'] = json.dumps(
-            estadisticas_json, 
-            indent=2, 
-            ensure_ascii=False
-        ).encode('utf-8')
+        archivos['faqs_completo.json'] = serializar_estadisticas(estadisticas).encode('utf-8')
     
     return archivos
 
@@ -277,49 +227,12 @@ def create_zip_download(archivos: dict) -> bytes:
 
 def validar_csv_productos(df: pd.DataFrame) -> tuple:
     """
-    Valida que el CSV tenga las columnas necesarias
+    Valida que el CSV tenga las columnas necesarias (acepta DataFrame o ShopifyCSVStream)
     
     Returns:
         tuple: (es_valido, mensaje_error)
     """
-    columnas_requeridas = ['Handle', 'Title']
-    columnas_recomendadas_base = ['Variant Price', 'Vendor', 'Tags']
-    
-    # Verificar columnas requeridas
-    columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
-    if columnas_faltantes:
-        return False, f"❌ Columnas requeridas faltantes: {', '.join(columnas_faltantes)}"
-    
-    # Verificar que haya al menos una columna de descripción
-    columnas_descripcion = ['Body HTML', 'Body (HTML)', 'body_html', 'description', 'Description']
-    tiene_descripcion = any(col in df.columns for col in columnas_descripcion)
-    
-    if not tiene_descripcion:
-        return False, "❌ No se encontró ninguna columna de descripción del producto"
-    
-    # Verificar columnas recomendadas (excluyendo descripción ya que la verificamos arriba)
-    columnas_faltantes_rec = [col for col in columnas_recomendadas_base if col not in df.columns]
-    
-    if columnas_faltantes_rec:
-        mensaje = f"✅ CSV válido. ⚠️ Columnas recomendadas faltantes: {', '.join(columnas_faltantes_rec)}"
-        return True, mensaje
-    
-    return True, "✅ CSV válido con todas las columnas recomendadas"
-
-def obtener_muestra_productos(df: pd.DataFrame, n: int = 5) -> pd.DataFrame:
-    """
-    Obtiene una muestra de productos para preview
-    """
-    columnas_mostrar = ['Handle', 'Title', 'Vendor', 'Variant Price']
-    columnas_disponibles = [col for col in columnas_mostrar if col in df.columns]
-    
-    muestra = df[columnas_disponibles].head(n).copy()
-    
-    # Truncar títulos largos
-    if 'Title' in muestra.columns:
-        muestra['Title'] = muestra['Title'].apply(lambda x: x[:50] + '...' if len(str(x)) > 50 else x)
-    
-    return muestra
+    return validar_columnas_shopify(df.columns)
 
 def estimar_tiempo_procesamiento(n_productos: int, modelo: str = "gpt-3.5-turbo") -> str:
     """
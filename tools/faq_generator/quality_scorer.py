@@ -0,0 +1,275 @@
+# tools/faq_generator/quality_scorer.py
+import re
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import numpy as np # type: ignore
+import pandas as pd
+
+# Patrones precompilados compartidos con PremiumCosmeticsFAQGenerator.validar_calidad_ultra
+PATRON_DATOS_NUMERICOS = re.compile(r'\d+[%\s]*(mg|ml|%|días?|semanas?|meses?|€)')
+PATRON_INSTRUCCIONES = re.compile(r'(?:aplica|usa|masajea|espera|evita|combina)')
+PATRON_COMPARACION = re.compile(r'(?:mejor que|a diferencia de|mientras que|frente a)')
+
+TERMINOS_TECNICOS = ['dermatológicamente', 'clínicamente', 'activos', 'penetración', 'biodisponible', 'encapsulado']
+PALABRAS_GENERICAS = ['cosa', 'algo', 'producto', 'esto']
+
+# Una alternancia por lista: una sola pasada por respuesta en lugar de una por término
+PATRON_TERMINOS_TECNICOS = re.compile('|'.join(map(re.escape, TERMINOS_TECNICOS)))
+PATRON_PALABRAS_GENERICAS = re.compile('|'.join(map(re.escape, PALABRAS_GENERICAS)))
+
+PALABRAS_CLAVE_POR_TEMA = {
+    'aplicacion': ['aplicar', 'usar', 'cantidad', 'técnica', 'masaje'],
+    'ingredientes': ['ingrediente', 'activo', 'concentración', 'fórmula', 'contiene'],
+    'resultados': ['resultado', 'tiempo', 'mejora', 'cambio', 'efecto'],
+    'compatibilidad': ['combinar', 'mezclar', 'compatible', 'interferir', 'junto'],
+    'seguridad': ['seguro', 'irritación', 'alergia', 'sensible', 'reacción']
+}
+
+# Un único patrón por tema: sustituye el any(palabra in pregunta ...) por tema
+PATRONES_TEMA = {
+    tema: re.compile('|'.join(re.escape(palabra) for palabra in palabras))
+    for tema, palabras in PALABRAS_CLAVE_POR_TEMA.items()
+}
+
+NIVELES_CALIDAD = [
+    ("LEGENDARIA", 18),
+    ("EXCEPCIONAL", 15),
+    ("EXCELENTE", 12),
+    ("BUENA", 9),
+    ("ACEPTABLE", 6),
+    ("INSUFICIENTE", float('-inf'))
+]
+
+# Reglas de puntuación actuales de validar_calidad_ultra. Se pueden sobrescribir
+# parcialmente para comparar variantes (A/B) sobre el catálogo completo.
+REGLAS_PUNTUACION_DEFECTO = {
+    'longitud_ideal': (220, 320),
+    'longitud_tolerada': (200, 350),
+    'puntos_longitud': (3, 2, 1),
+    'puntos_por_dato_numerico': 2,
+    'max_datos_numericos': 6,
+    'puntos_por_termino_tecnico': 1.5,
+    'max_terminos_tecnicos': 4,
+    'puntos_instrucciones': 2,
+    'umbral_especificidad': 0.95,
+    'puntos_especificidad': 3,
+    'umbral_diversidad_lexica': 0.6,
+    'puntos_diversidad_lexica': 2,
+    'puntos_comparacion': 2,
+    'puntos_formato_pregunta': 1,
+    'min_puntuacion_valida': 9,
+    'max_patrones_repetitivos': 0.15,
+    'min_diversidad_tematica': 0.7
+}
+
+N_FAQS = 5
+
+
+def clasificar_calidad(puntuacion_promedio: float) -> str:
+    """Devuelve el nivel de calidad para una puntuación promedio"""
+    for nivel, umbral in NIVELES_CALIDAD:
+        if puntuacion_promedio >= umbral:
+            return nivel
+    return "INSUFICIENTE"
+
+
+class BatchFAQQualityScorer:
+    """
+    Puntuador vectorizado de calidad de FAQs
+    Evalúa miles de conjuntos de 5 FAQs a la vez con las mismas métricas que validar_calidad_ultra
+    """
+
+    def __init__(self, reglas: Optional[Dict] = None):
+        self.reglas = {**REGLAS_PUNTUACION_DEFECTO, **(reglas or {})}
+
+    def puntuar_lote(self, conjuntos_faqs: Iterable[Dict]) -> List[Tuple[bool, Dict]]:
+        """
+        Puntúa una colección de conjuntos de FAQs ({'faq1': {'pregunta', 'respuesta'}, ...})
+
+        Returns:
+            list: Una tupla (es_valido, metricas_globales) por conjunto, igual que validar_calidad_ultra
+        """
+        conjuntos = list(conjuntos_faqs)
+        if not conjuntos:
+            return []
+
+        filas = []
+        for idx_conjunto, faqs in enumerate(conjuntos):
+            for i in range(1, N_FAQS + 1):
+                faq = faqs.get(f'faq{i}', {}) or {}
+                filas.append((idx_conjunto, i, faq.get('pregunta', '') or '', faq.get('respuesta', '') or ''))
+
+        df = pd.DataFrame(filas, columns=['conjunto', 'posicion', 'pregunta', 'respuesta'])
+        metricas = self.calcular_metricas(df)
+        globales = self._calcular_metricas_globales(df, metricas)
+
+        return self._construir_resultados(metricas, globales, len(conjuntos))
+
+    def puntuar_dataframe_shopify(self, df_resultados: pd.DataFrame) -> pd.DataFrame:
+        """
+        Re-puntúa un CSV histórico exportado (columnas Metafield: custom.faqNquestion/answer)
+
+        Returns:
+            DataFrame: Una fila por producto con Handle, calidad, puntuación y validez
+        """
+        conjuntos = []
+        for i in range(1, N_FAQS + 1):
+            col_pregunta = f"Metafield: custom.faq{i}question [single_line_text_field]"
+            col_respuesta = f"Metafield: custom.faq{i}answer [multi_line_text_field]"
+            for col in (col_pregunta, col_respuesta):
+                if col not in df_resultados.columns:
+                    raise ValueError(f"Columna requerida faltante: {col}")
+
+        preguntas = {
+            i: df_resultados[f"Metafield: custom.faq{i}question [single_line_text_field]"].fillna('').astype(str).tolist()
+            for i in range(1, N_FAQS + 1)
+        }
+        respuestas = {
+            i: df_resultados[f"Metafield: custom.faq{i}answer [multi_line_text_field]"].fillna('').astype(str).tolist()
+            for i in range(1, N_FAQS + 1)
+        }
+
+        for fila in range(len(df_resultados)):
+            conjuntos.append({
+                f'faq{i}': {'pregunta': preguntas[i][fila], 'respuesta': respuestas[i][fila]}
+                for i in range(1, N_FAQS + 1)
+            })
+
+        resultados = self.puntuar_lote(conjuntos)
+
+        return pd.DataFrame({
+            'Handle': df_resultados['Handle'].tolist() if 'Handle' in df_resultados.columns else list(range(len(df_resultados))),
+            '_calidad': [m['calidad'] for _, m in resultados],
+            '_puntuacion': [round(m['puntuacion_promedio'], 2) for _, m in resultados],
+            '_patrones_repetitivos': [round(m['patrones_repetitivos'], 2) for _, m in resultados],
+            '_diversidad_tematica': [round(m['diversidad_tematica'], 2) for _, m in resultados],
+            '_es_valido': [valido for valido, _ in resultados]
+        })
+
+    def calcular_metricas(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Calcula las métricas por FAQ con operaciones vectorizadas de pandas"""
+        reglas = self.reglas
+        pregunta = df['pregunta']
+        respuesta = df['respuesta']
+        respuesta_lower = respuesta.str.lower()
+
+        palabras = respuesta.str.split()
+        n_palabras = palabras.str.len().to_numpy()
+
+        # Palabras únicas (en minúsculas) sin bucles Python por respuesta
+        palabras_lower = respuesta_lower.str.split().explode()
+        unicas = palabras_lower.dropna().groupby(level=0).nunique().reindex(df.index, fill_value=0).to_numpy()
+
+        terminos = respuesta_lower.str.count(PATRON_TERMINOS_TECNICOS).to_numpy()
+        genericas = respuesta_lower.str.count(PATRON_PALABRAS_GENERICAS).to_numpy()
+
+        con_palabras = n_palabras > 0
+        divisor = np.where(con_palabras, n_palabras, 1)
+        # Una respuesta vacía hacía fallar la versión escalar (división por cero); aquí puntúa 0
+        especificidad = np.where(con_palabras, 1 - genericas / divisor, 0.0)
+        diversidad = np.where(con_palabras, unicas / divisor, 0.0)
+
+        metricas = pd.DataFrame({
+            'longitud_pregunta': pregunta.str.split().str.len().to_numpy(),
+            'longitud_respuesta': respuesta.str.len().to_numpy(),
+            'datos_numericos': respuesta.str.count(PATRON_DATOS_NUMERICOS).to_numpy(),
+            'terminos_tecnicos': terminos,
+            'instrucciones': respuesta_lower.str.contains(PATRON_INSTRUCCIONES).to_numpy(),
+            'especificidad': especificidad,
+            'diversidad_lexica': diversidad,
+            'tiene_comparacion': respuesta_lower.str.contains(PATRON_COMPARACION).to_numpy(),
+            'formato_pregunta': (pregunta.str.startswith('¿') & pregunta.str.endswith('?')).to_numpy()
+        }, index=df.index)
+
+        longitud = metricas['longitud_respuesta'].to_numpy()
+        min_ideal, max_ideal = reglas['longitud_ideal']
+        min_tol, max_tol = reglas['longitud_tolerada']
+        pts_ideal, pts_tol, pts_otro = reglas['puntos_longitud']
+
+        puntuacion = np.select(
+            [(longitud >= min_ideal) & (longitud <= max_ideal), (longitud >= min_tol) & (longitud <= max_tol)],
+            [pts_ideal, pts_tol],
+            default=pts_otro
+        ).astype(float)
+        puntuacion += np.minimum(metricas['datos_numericos'].to_numpy() * reglas['puntos_por_dato_numerico'], reglas['max_datos_numericos'])
+        puntuacion += np.minimum(terminos * reglas['puntos_por_termino_tecnico'], reglas['max_terminos_tecnicos'])
+        puntuacion += np.where(metricas['instrucciones'].to_numpy(), reglas['puntos_instrucciones'], 0)
+        puntuacion += np.where(especificidad > reglas['umbral_especificidad'], reglas['puntos_especificidad'], 0)
+        puntuacion += np.where(diversidad > reglas['umbral_diversidad_lexica'], reglas['puntos_diversidad_lexica'], 0)
+        puntuacion += np.where(metricas['tiene_comparacion'].to_numpy(), reglas['puntos_comparacion'], 0)
+        puntuacion += np.where(metricas['formato_pregunta'].to_numpy(), reglas['puntos_formato_pregunta'], 0)
+
+        metricas['puntuacion'] = puntuacion
+        return metricas
+
+    def _calcular_metricas_globales(self, df: pd.DataFrame, metricas: pd.DataFrame) -> pd.DataFrame:
+        """Calcula puntuación, repetición y diversidad temática por conjunto de FAQs"""
+        reglas = self.reglas
+        conjunto = df['conjunto']
+
+        puntuacion_total = metricas['puntuacion'].groupby(conjunto).sum()
+        puntuacion_promedio = puntuacion_total / N_FAQS
+
+        # Patrones repetitivos: frases separadas por '.' sobre las 5 respuestas unidas
+        textos = df.groupby('conjunto', sort=True)['respuesta'].agg(' '.join)
+        frases = textos.str.split('.', regex=False).explode()
+        n_frases = frases.groupby(level=0).size()
+        n_unicas = frases.groupby(level=0).nunique()
+        patrones = 1 - (n_unicas / n_frases)
+
+        # Diversidad temática: primer tema cuyas palabras clave aparecen en la pregunta
+        pregunta_lower = df['pregunta'].str.lower()
+        condiciones = [pregunta_lower.str.contains(patron).to_numpy() for patron in PATRONES_TEMA.values()]
+        temas = pd.Series(np.select(condiciones, list(PATRONES_TEMA.keys()), default='otro'), index=df.index)
+        diversidad_tematica = temas.groupby(conjunto).nunique() / N_FAQS
+
+        globales = pd.DataFrame({
+            'puntuacion_total': puntuacion_total,
+            'puntuacion_promedio': puntuacion_promedio,
+            'patrones_repetitivos': patrones,
+            'diversidad_tematica': diversidad_tematica
+        })
+        globales['es_valido'] = (
+            (globales['puntuacion_promedio'] >= reglas['min_puntuacion_valida']) &
+            (globales['patrones_repetitivos'] < reglas['max_patrones_repetitivos']) &
+            (globales['diversidad_tematica'] > reglas['min_diversidad_tematica'])
+        )
+        return globales
+
+    def _construir_resultados(self, metricas: pd.DataFrame, globales: pd.DataFrame, n_conjuntos: int) -> List[Tuple[bool, Dict]]:
+        """Convierte los resultados vectorizados al formato de diccionarios de validar_calidad_ultra"""
+        registros = metricas.to_dict('records')
+        resultados = []
+
+        for idx_conjunto in range(n_conjuntos):
+            detalle = {}
+            for i in range(N_FAQS):
+                registro = registros[idx_conjunto * N_FAQS + i]
+                detalle[f'faq{i + 1}'] = {
+                    'longitud_pregunta': int(registro['longitud_pregunta']),
+                    'longitud_respuesta': int(registro['longitud_respuesta']),
+                    'datos_numericos': int(registro['datos_numericos']),
+                    'terminos_tecnicos': int(registro['terminos_tecnicos']),
+                    'instrucciones': bool(registro['instrucciones']),
+                    'especificidad': float(registro['especificidad']),
+                    'diversidad_lexica': float(registro['diversidad_lexica']),
+                    'tiene_comparacion': bool(registro['tiene_comparacion']),
+                    'formato_pregunta': bool(registro['formato_pregunta']),
+                    'puntuacion': float(registro['puntuacion'])
+                }
+
+            fila = globales.loc[idx_conjunto]
+            es_valido = bool(fila['es_valido'])
+            puntuacion_promedio = float(fila['puntuacion_promedio'])
+
+            resultados.append((es_valido, {
+                'puntuacion_total': float(fila['puntuacion_total']),
+                'puntuacion_promedio': puntuacion_promedio,
+                'calidad': clasificar_calidad(puntuacion_promedio),
+                'patrones_repetitivos': float(fila['patrones_repetitivos']),
+                'diversidad_tematica': float(fila['diversidad_tematica']),
+                'detalle_faqs': detalle,
+                'es_valido': es_valido
+            }))
+
+        return resultados
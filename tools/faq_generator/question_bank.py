@@ -0,0 +1,123 @@
+# tools/faq_generator/question_bank.py
+import re
+import random
+import hashlib
+import itertools
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+PATRON_VARIABLE = re.compile(r'\{(\w+)\}')
+PATRON_PUNTUACION = re.compile(r'[^\w\s]')
+
+
+def hash_pregunta(pregunta: str) -> str:
+    """Hash normalizado de una pregunta (mismo criterio que el histórico en disco)"""
+    pregunta_normalizada = PATRON_PUNTUACION.sub('', pregunta.lower())
+    return hashlib.md5(pregunta_normalizada.encode()).hexdigest()
+
+
+class CompiledQuestionBank:
+    """
+    Índice precompilado de todas las expansiones de banco_preguntas_premium
+
+    Las plantillas se expanden una sola vez (producto cartesiano de sus variables) dejando
+    {producto} como único hueco. Por cada producto se construye un pool de preguntas no usadas
+    con su hash precalculado, del que se muestrea en O(1) por intercambio con el último elemento.
+    """
+
+    def __init__(self, banco: Dict, umbral_aviso: int = 3, max_productos_en_cache: int = 256):
+        self.umbral_aviso = umbral_aviso
+        self.max_productos_en_cache = max_productos_en_cache
+        self.expansiones = self._compilar(banco)
+        self._pools: "OrderedDict[str, Dict[str, List[Tuple[str, str]]]]" = OrderedDict()
+        self.avisos: List[str] = []
+
+    def _compilar(self, banco: Dict) -> Dict[str, Tuple[str, ...]]:
+        """Expande cada plantilla con todas las combinaciones de sus variables contextuales"""
+        expansiones = {}
+
+        for categoria, datos in banco.items():
+            variables = datos.get("variables", {})
+            resultado = []
+
+            for plantilla in datos["plantillas"]:
+                # Orden estable y sin repetir: str.replace sustituye todas las apariciones con la misma opción
+                nombres = [n for n in dict.fromkeys(PATRON_VARIABLE.findall(plantilla)) if n in variables]
+
+                for combinacion in itertools.product(*(variables[n] for n in nombres)):
+                    pregunta = plantilla
+                    for nombre, opcion in zip(nombres, combinacion):
+                        pregunta = pregunta.replace(f"{{{nombre}}}", opcion)
+                    resultado.append(pregunta)
+
+            expansiones[categoria] = tuple(dict.fromkeys(resultado))
+
+        return expansiones
+
+    def _pool_producto(self, titulo: str, historicas: Set[str]) -> Dict[str, List[Tuple[str, str]]]:
+        """Devuelve (construyendo si hace falta) el pool de preguntas no usadas de un producto"""
+        pool = self._pools.get(titulo)
+        if pool is not None:
+            self._pools.move_to_end(titulo)
+            return pool
+
+        pool = {}
+        for categoria, plantillas in self.expansiones.items():
+            candidatas = []
+            for plantilla in plantillas:
+                pregunta = plantilla.replace("{producto}", titulo)
+                hash_candidata = hash_pregunta(pregunta)
+                if hash_candidata not in historicas:
+                    candidatas.append((pregunta, hash_candidata))
+            pool[categoria] = candidatas
+
+        self._pools[titulo] = pool
+        while len(self._pools) > self.max_productos_en_cache:
+            self._pools.popitem(last=False)
+
+        return pool
+
+    def capacidad_restante(self, titulo: str, historicas: Set[str]) -> Dict[str, int]:
+        """Número de preguntas aún disponibles por categoría para un producto"""
+        pool = self._pool_producto(titulo, historicas)
+        return {categoria: len(candidatas) for categoria, candidatas in pool.items()}
+
+    def categorias_disponibles(self, titulo: str, historicas: Set[str]) -> List[str]:
+        """Categorías con al menos una pregunta sin usar para el producto"""
+        return [categoria for categoria, restantes in self.capacidad_restante(titulo, historicas).items() if restantes > 0]
+
+    def muestrear(self, categoria: str, titulo: str, historicas: Set[str]) -> Optional[Tuple[str, str]]:
+        """
+        Extrae una pregunta no usada de la categoría y registra su hash en el histórico
+
+        Returns:
+            tuple: (pregunta, hash) o None si la categoría está agotada para el producto
+        """
+        candidatas = self._pool_producto(titulo, historicas).get(categoria, [])
+
+        while candidatas:
+            idx = random.randrange(len(candidatas))
+            candidatas[idx], candidatas[-1] = candidatas[-1], candidatas[idx]
+            pregunta, hash_candidata = candidatas.pop()
+
+            # El histórico puede haber cambiado desde que se construyó el pool
+            if hash_candidata in historicas:
+                continue
+
+            historicas.add(hash_candidata)
+            self._comprobar_capacidad(categoria, titulo, len(candidatas))
+            return pregunta, hash_candidata
+
+        return None
+
+    def _comprobar_capacidad(self, categoria: str, titulo: str, restantes: int):
+        """Registra un aviso cuando una categoría está a punto de agotarse"""
+        if restantes == 0:
+            self.avisos.append(f"⚠️ Categoría '{categoria}' agotada para '{titulo}'")
+        elif restantes <= self.umbral_aviso:
+            self.avisos.append(f"⚠️ Categoría '{categoria}' casi agotada para '{titulo}' ({restantes} preguntas restantes)")
+
+    def consumir_avisos(self) -> List[str]:
+        """Devuelve y limpia los avisos acumulados"""
+        avisos, self.avisos = self.avisos, []
+        return avisos
@@ -0,0 +1,183 @@
+# tools/faq_generator/semantic_index.py
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np # type: ignore
+
+PATRON_NO_PALABRA = re.compile(r'[^\w\s]')
+PATRON_ESPACIOS = re.compile(r'\s+')
+
+
+class SemanticQuestionIndex:
+    """
+    Índice local de preguntas históricas para detectar paráfrasis
+
+    Cada pregunta se representa con TF-IDF sobre n-gramas de caracteres y palabras proyectados
+    por hashing a un espacio fijo (sin vocabulario ni modelos externos). El índice se particiona
+    por producto: repetir una pregunta en otro producto es legítimo, así que cada búsqueda es un
+    producto matriz-vector con NumPy sobre las pocas decenas de preguntas de ese producto,
+    aunque el histórico total alcance cientos de miles.
+    """
+
+    def __init__(self, cache_dir: str, dimensiones: int = 4096, umbral_similitud: float = 0.85,
+                 ngramas: Tuple[int, int] = (3, 5)):
+        self.ruta = os.path.join(cache_dir, "indice_semantico.npz")
+        self.dimensiones = dimensiones
+        self.umbral_similitud = umbral_similitud
+        self.ngramas = ngramas
+
+        # Frecuencia documental global por característica (IDF incremental exacto)
+        self.frecuencia_documental = np.zeros(dimensiones, dtype=np.float32)
+        self.total_documentos = 0
+
+        # Por producto: filas dispersas (índices, tf) y matriz densa cacheada para búsquedas
+        self._filas: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+        self._cargar()
+
+    @staticmethod
+    def _clave_producto(titulo: str) -> str:
+        return PATRON_ESPACIOS.sub(' ', titulo.lower()).strip()
+
+    def _normalizar(self, pregunta: str, titulo: str) -> str:
+        """Elimina el nombre del producto y la puntuación para comparar solo la intención"""
+        texto = pregunta.lower()
+        if titulo:
+            texto = texto.replace(titulo.lower(), ' ')
+        texto = PATRON_NO_PALABRA.sub(' ', texto)
+        return PATRON_ESPACIOS.sub(' ', texto).strip()
+
+    def _vectorizar_tf(self, pregunta: str, titulo: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Devuelve el vector disperso de frecuencias (sublineal) de n-gramas hasheados"""
+        texto = self._normalizar(pregunta, titulo)
+        caracteristicas = texto.split()
+
+        relleno = f" {texto} "
+        minimo, maximo = self.ngramas
+        for n in range(minimo, maximo + 1):
+            caracteristicas.extend(relleno[i:i + n] for i in range(len(relleno) - n + 1))
+
+        if not caracteristicas:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        # crc32 es estable entre ejecuciones (hash() de Python no lo es)
+        indices = np.fromiter(
+            (zlib.crc32(c.encode('utf-8')) % self.dimensiones for c in caracteristicas),
+            dtype=np.int32, count=len(caracteristicas)
+        )
+        unicos, cuentas = np.unique(indices, return_counts=True)
+        return unicos.astype(np.int32), (1 + np.log(cuentas)).astype(np.float32)
+
+    def _idf(self) -> np.ndarray:
+        return np.log((1 + self.total_documentos) / (1 + self.frecuencia_documental)) + 1
+
+    def _vector_ponderado(self, indices: np.ndarray, tf: np.ndarray, idf: np.ndarray) -> np.ndarray:
+        vector = np.zeros(self.dimensiones, dtype=np.float32)
+        vector[indices] = tf * idf[indices]
+        norma = np.linalg.norm(vector)
+        return vector / norma if norma > 0 else vector
+
+    def _matriz_producto(self, clave: str, idf: np.ndarray) -> Optional[np.ndarray]:
+        """Matriz TF-IDF normalizada de un producto, reconstruida solo si cambió"""
+        filas = self._filas.get(clave)
+        if not filas:
+            return None
+
+        matriz = self._matrices.get(clave)
+        if matriz is None:
+            matriz = np.zeros((len(filas), self.dimensiones), dtype=np.float32)
+            for i, (indices, tf) in enumerate(filas):
+                matriz[i, indices] = tf
+            self._matrices[clave] = matriz
+
+        ponderada = matriz * idf
+        normas = np.linalg.norm(ponderada, axis=1, keepdims=True)
+        normas[normas == 0] = 1
+        return ponderada / normas
+
+    def similitud_maxima(self, titulo: str, pregunta: str) -> float:
+        """Similitud coseno máxima entre la pregunta y las ya usadas para el producto"""
+        idf = self._idf()
+        matriz = self._matriz_producto(self._clave_producto(titulo), idf)
+        if matriz is None:
+            return 0.0
+
+        indices, tf = self._vectorizar_tf(pregunta, titulo)
+        if len(indices) == 0:
+            return 0.0
+
+        consulta = self._vector_ponderado(indices, tf, idf)
+        return float(np.max(matriz @ consulta))
+
+    def es_duplicado(self, titulo: str, pregunta: str) -> bool:
+        """Indica si la pregunta es una paráfrasis de otra ya generada para el producto"""
+        return self.similitud_maxima(titulo, pregunta) >= self.umbral_similitud
+
+    def agregar(self, titulo: str, pregunta: str):
+        """Añade una pregunta aceptada al índice (actualización incremental)"""
+        indices, tf = self._vectorizar_tf(pregunta, titulo)
+        if len(indices) == 0:
+            return
+
+        clave = self._clave_producto(titulo)
+        self._filas.setdefault(clave, []).append((indices, tf))
+        self._matrices.pop(clave, None)
+
+        self.frecuencia_documental[indices] += 1
+        self.total_documentos += 1
+
+    def _cargar(self):
+        """Carga el índice persistido en formato disperso (CSR)"""
+        if not os.path.exists(self.ruta):
+            return
+
+        try:
+            datos = np.load(self.ruta, allow_pickle=False)
+            if int(datos['dimensiones']) != self.dimensiones:
+                return
+
+            claves = datos['claves']
+            punteros = datos['punteros']
+            indices = datos['indices']
+            valores = datos['valores']
+
+            for fila, clave in enumerate(claves):
+                inicio, fin = punteros[fila], punteros[fila + 1]
+                self._filas.setdefault(str(clave), []).append((indices[inicio:fin], valores[inicio:fin]))
+
+            self.frecuencia_documental = datos['frecuencia_documental'].astype(np.float32)
+            self.total_documentos = int(datos['total_documentos'])
+        except Exception:
+            # Un índice corrupto no debe bloquear la generación: se reconstruye desde cero
+            self._filas = {}
+            self.frecuencia_documental = np.zeros(self.dimensiones, dtype=np.float32)
+            self.total_documentos = 0
+
+    def guardar(self):
+        """Persiste el índice en disco en formato disperso"""
+        claves, punteros, indices, valores = [], [0], [], []
+        for clave, filas in self._filas.items():
+            for idx, tf in filas:
+                claves.append(clave)
+                indices.append(idx)
+                valores.append(tf)
+                punteros.append(punteros[-1] + len(idx))
+
+        ruta_temporal = self.ruta + ".tmp.npz"
+        np.savez_compressed(
+            ruta_temporal,
+            dimensiones=np.array(self.dimensiones),
+            claves=np.array(claves, dtype=str),
+            punteros=np.array(punteros, dtype=np.int64),
+            indices=np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+            valores=np.concatenate(valores) if valores else np.empty(0, dtype=np.float32),
+            frecuencia_documental=self.frecuencia_documental,
+            total_documentos=np.array(self.total_documentos)
+        )
+        os.replace(ruta_temporal, self.ruta)
+
+    def __len__(self) -> int:
+        return self.total_documentos
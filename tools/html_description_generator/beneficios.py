@@ -0,0 +1,25 @@
+# tools/html_description_generator/beneficios.py
+import re
+from typing import List
+
+# Verbos que delatan un beneficio en una frase de la ficha
+PALABRAS_BENEFICIO = [
+    'reduces', 'improves', 'enhances', 'brightens', 'moisturizes',
+    'hydrates', 'firms', 'smooths', 'protects', 'nourishes'
+]
+
+# Una sola búsqueda por frase o párrafo en lugar de un "in" por palabra
+PATRON_BENEFICIO = re.compile('|'.join(map(re.escape, PALABRAS_BENEFICIO)), re.IGNORECASE)
+
+_PATRON_FRASES = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def beneficios_en_texto(texto: str, maximo: int = 8) -> List[str]:
+    """Frases de un texto plano (p. ej. la descripción de los datos estructurados) que describen beneficios"""
+    beneficios = []
+    for frase in _PATRON_FRASES.split(texto or ''):
+        frase = frase.strip()
+        if 20 < len(frase) < 150 and PATRON_BENEFICIO.search(frase):
+            if frase not in beneficios:
+                beneficios.append(frase)
+    return beneficios[:maximo]
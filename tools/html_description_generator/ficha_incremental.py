@@ -0,0 +1,18 @@
+# tools/html_description_generator/ficha_incremental.py
+from utils.html_stream import ExtractorHTMLIncremental
+
+from .beneficios import PATRON_BENEFICIO
+from .inci_parser import PATRON_ETIQUETA_INCI, es_nodo_lista_inci
+
+# Campos que necesita una ficha para la síntesis; con todos ellos se deja de leer la página
+CAMPOS_FICHA = ('titulo', 'descripcion', 'precio', 'ingredientes')
+
+
+def nuevo_extractor_ficha() -> ExtractorHTMLIncremental:
+    """Extractor incremental configurado para las fichas de cosmética (generador y spider de Scrapy)"""
+    return ExtractorHTMLIncremental(
+        requeridos=CAMPOS_FICHA,
+        validadores={'ingredientes': es_nodo_lista_inci},
+        etiquetas={'ingredientes': PATRON_ETIQUETA_INCI},
+        patron_beneficio=PATRON_BENEFICIO
+    )
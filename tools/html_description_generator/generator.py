@@ -1,14 +1,34 @@
 from openai import OpenAI
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import json
 import time
 import re
-import requests
 from bs4 import BeautifulSoup
 from dataclasses import dataclass, field
 import urllib.parse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 import streamlit as st
+import os
+from .product_cache import ProductDataCache, VERSION_GENERADOR
+from .knowledge_base import obtener_base_conocimiento, normalizar_gtin
+from .inci_dictionary import obtener_diccionario_inci
+from .inci_parser import parsear_lista_inci, es_lista_inci, fusionar_listas_inci, formatear_lista_inci, buscar_lista_inci_en_html
+from .prompt_budget import PromptBudgetBuilder, estimar_tokens_mensajes, presupuesto_contexto
+from .near_duplicates import colapsar_casi_duplicados
+from .html_stream_validator import ValidadorHTMLIncremental, limpiar_html_generado, validar_estructura_html, titulos_secciones, normalizar_idioma
+from .html_renderer import renderizar_descripcion_html
+from .beneficios import beneficios_en_texto
+from .ficha_incremental import nuevo_extractor_ficha
+from utils.structured_output import parsear_json_modelo
+from utils.model_routing import ModelRouter
+from utils.http_fetch import obtener_fetcher
+from utils.browser_pool import obtener_pool_navegadores, parece_shell_js
+from utils.html_stream import ExtractorHTMLIncremental
+
+# Plazo global para las URLs específicas del usuario: lo que no haya llegado se descarta
+PLAZO_URLS_ESPECIFICAS_S = 30.0
+MAX_DESCARGAS_PARALELAS = 8
 
 @dataclass
 class ProductData:
@@ -57,15 +77,38 @@ class ScrapedInfo:
     brand: str = ""
     product_type: str = ""
     confidence_score: float = 0.0
+    multiplicidad: int = 1  # Fuentes casi idénticas que esta representa
+
+@dataclass
+class EstadoURL:
+    """Resultado de procesar una URL específica"""
+    url: str
+    estado: str = "pendiente"  # ok, sin_datos, error, plazo_agotado
+    segundos: float = 0.0
+    detalle: str = ""
 
 class SimpleHTMLDescriptionGenerator:
     """
     Generador AVANZADO de descripciones HTML con sistema de recopilación inteligente
     """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache_dir: str = "./product_cache",
+                 modelo_gpt: Optional[str] = None, overrides_modelos: Optional[Dict[str, Dict]] = None):
         self.client = OpenAI(api_key=api_key)
         self.progress_logs = []  # Lista para almacenar logs de progreso
+        self.estado_urls: List[EstadoURL] = []  # Estado por URL de la última tanda de URLs específicas
+        
+        # Modelo, max_tokens y temperatura por etapa; el modelo del sidebar sustituye al nivel premium
+        self.router = ModelRouter(modelo_preferido=modelo_gpt, overrides=overrides_modelos)
+        
+        # Caché persistente de investigación por producto
+        self.product_cache = ProductDataCache(cache_dir, version=VERSION_GENERADOR)
+        
+        # Diccionario INCI local (compartido entre instancias)
+        self.inci_dictionary = obtener_diccionario_inci()
+        
+        # Base de conocimiento por GTIN: un código de barras conocido evita toda la investigación
+        self.knowledge_base = obtener_base_conocimiento(os.path.join(cache_dir, "knowledge_base.sqlite"), VERSION_GENERADOR)
         
         # Headers realistas para evitar detección de bots
         self.headers = {
@@ -78,6 +121,12 @@ class SimpleHTMLDescriptionGenerator:
             'Upgrade-Insecure-Requests': '1'
         }
         
+        # Cliente HTTP compartido: pools keep-alive por host, HTTP/2 si está disponible
+        self.fetcher = obtener_fetcher()
+        
+        # Navegadores headless compartidos: solo para dominios que necesitan JavaScript
+        self.browser_pool = obtener_pool_navegadores()
+        
         # Configuración de búsqueda avanzada
         self.search_engines = [
             "https://www.google.com/search?q=",
@@ -189,16 +238,50 @@ class SimpleHTMLDescriptionGenerator:
         Limpia los logs de progreso
         """
         self.progress_logs = []
+        self.estado_urls = []
+    
+    def get_estado_urls(self) -> List[EstadoURL]:
+        """
+        Retorna el estado de cada URL específica procesada en la última búsqueda
+        """
+        return self.estado_urls
     
     def buscar_producto_simple(self, nombre_producto: str, codigo_barras: str = "", 
-                              urls_especificas: Optional[List[str]] = None) -> ProductData:
+                              urls_especificas: Optional[List[str]] = None,
+                              usar_cache: bool = True) -> ProductData:
         """
         Búsqueda AVANZADA con múltiples fuentes y validación cruzada
+        
+        Si el producto ya se investigó con esta versión del generador y sus campos esenciales
+        siguen frescos, se devuelve desde caché sin llamadas a la IA. Las URLs específicas
+        fuerzan una nueva investigación.
         """
         
         # Limpiar logs anteriores
         self.clear_progress_logs()
         
+        if usar_cache and not urls_especificas and codigo_barras:
+            kb_data = self.knowledge_base.buscar_por_gtin(codigo_barras, ProductData)
+            if kb_data is not None:
+                self._log_progress(f"📚 Producto encontrado en la base de conocimiento (GTIN {normalizar_gtin(codigo_barras)})", "success")
+                return kb_data
+        
+        if usar_cache and not urls_especificas:
+            cached_data, caducados = self.product_cache.obtener(nombre_producto, codigo_barras, ProductData)
+            if cached_data is not None:
+                self._log_progress(f"💾 Investigación recuperada de caché para: {nombre_producto}", "success")
+                if caducados:
+                    self._log_progress(f"🕒 Campos caducados descartados: {', '.join(caducados)}", "info")
+                return cached_data
+            
+            # El mismo producto investigado con otro nombre de tienda o idioma (misma marca+nombre normalizado)
+            kb_data = self.knowledge_base.buscar_por_marca_nombre(
+                self._extract_brand_from_name(nombre_producto), nombre_producto, ProductData
+            )
+            if kb_data is not None:
+                self._log_progress("📚 Producto encontrado en la base de conocimiento por marca y nombre", "success")
+                return kb_data
+        
         product_data = ProductData(nombre=nombre_producto)
         
         try:
@@ -229,6 +312,13 @@ class SimpleHTMLDescriptionGenerator:
             
             self._log_progress(f"✅ Búsqueda completada. {len(scraped_sources)} fuentes procesadas", "success")
             
+            # Solo se cachea la investigación completa (no el método de respaldo)
+            try:
+                self.product_cache.guardar(nombre_producto, codigo_barras, product_data)
+                self.knowledge_base.guardar(product_data, codigo_barras, scraped_sources, version=VERSION_GENERADOR)
+            except (OSError, sqlite3.Error) as cache_error:
+                self._log_progress(f"⚠️ No se pudo guardar en caché: {cache_error}", "warning")
+            
             return product_data
             
         except Exception as e:
@@ -266,8 +356,8 @@ class SimpleHTMLDescriptionGenerator:
             self._log_progress(f"⚠️ Scrapy avanzado no disponible: {str(e)[:100]}", "warning")
         
         # ESTRATEGIA 3: APIs especializadas y bases de datos
-        self._log_progress("📊 Estrategia 3: Consultando APIs especializadas...", "search")
-        api_results = self._query_specialized_databases(product_name, barcode)
+        self._log_progress("📊 Estrategia 3: Consultando diccionario INCI local...", "search")
+        api_results = self._query_specialized_databases(product_name, barcode, scraped_data)
         scraped_data.extend(api_results)
         self._log_progress(f"✅ APIs especializadas aportaron {len(api_results)} fuentes", "success")
         
@@ -407,21 +497,20 @@ class SimpleHTMLDescriptionGenerator:
             - Beneficios basados en la ciencia cosmética
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "generate_technical_product_info",
                 messages=[
                     {"role": "system", "content": "Eres un formulador cosmético con doctorado en química cosmética. Proporciona solo información técnicamente precisa."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2,
-                max_tokens=700
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            tech_data = json.loads(content)
+            tech_data = parsear_json_modelo(content, "generate_technical_product_info")
             
             # Crear ScrapedInfo con información técnica
             info = ScrapedInfo()
@@ -539,32 +628,10 @@ class SimpleHTMLDescriptionGenerator:
     
     def _detect_common_ingredients(self, product_name: str) -> List[str]:
         """
-        Detecta ingredientes comunes en el nombre
+        Detecta ingredientes conocidos en el nombre usando el diccionario INCI local
         """
         
-        ingredients_map = {
-            "vitamina c": ["vitamin c", "vitamina c", "ascorbic acid"],
-            "ácido hialurónico": ["hyaluronic acid", "hialurónico", "hyaluronic"],
-            "retinol": ["retinol", "retinoid", "vitamin a"],
-            "niacinamida": ["niacinamide", "niacinamida", "vitamin b3"],
-            "ácido salicílico": ["salicylic acid", "salicílico", "bha"],
-            "ácido glicólico": ["glycolic acid", "glicólico", "aha"],
-            "ceramidas": ["ceramides", "ceramidas"],
-            "colágeno": ["collagen", "colágeno"],
-            "péptidos": ["peptides", "péptidos"],
-            "antioxidantes": ["antioxidant", "antioxidantes"]
-        }
-        
-        detected = []
-        product_lower = product_name.lower()
-        
-        for ingredient, keywords in ingredients_map.items():
-            for keyword in keywords:
-                if keyword in product_lower:
-                    detected.append(ingredient)
-                    break
-        
-        return detected
+        return [ingrediente.nombre_comun or ingrediente.inci for ingrediente in self.inci_dictionary.detectar(product_name)]
     
     def _scrape_search_results(self, search_url: str, query: str) -> List[ScrapedInfo]:
         """
@@ -572,33 +639,20 @@ class SimpleHTMLDescriptionGenerator:
         """
         
         try:
-            # Usar requests-html para JavaScript rendering si está disponible
-            try:
-                from requests_html import HTMLSession
-                session = HTMLSession()
-                response = session.get(search_url, timeout=15)
-                response.html.render(timeout=10)  # Renderizar JavaScript
-                soup = BeautifulSoup(response.html.html, 'html.parser')
-                self._log_progress(f"✅ Usando requests-html para {search_url[:50]}...", "info")
-            except ImportError:
-                # Fallback a requests normal con headers mejorados
-                enhanced_headers = {
-                    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                    'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Cache-Control': 'no-cache',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Upgrade-Insecure-Requests': '1'
-                }
-                
-                session = requests.Session()
-                session.headers.update(enhanced_headers)
-                response = session.get(search_url, timeout=15)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'lxml')
+            enhanced_headers = {
+                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+                'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+                'Cache-Control': 'no-cache',
+                'Sec-Fetch-Dest': 'document',
+                'Sec-Fetch-Mode': 'navigate',
+                'Sec-Fetch-Site': 'none',
+                'Upgrade-Insecure-Requests': '1'
+            }
+            html, con_navegador = self._descargar_html(search_url, enhanced_headers)
+            if con_navegador:
+                self._log_renderizado(search_url)
+            soup = BeautifulSoup(html, 'lxml')
             
             # En lugar de hacer scraping directo (que está bloqueado), 
             # usar búsqueda de APIs públicas o métodos alternativos
@@ -668,19 +722,18 @@ class SimpleHTMLDescriptionGenerator:
             - No inventar marcas específicas
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "generate_realistic_product_info",
                 messages=[
                     {"role": "system", "content": "Eres un formulador cosmético experto. Proporciona solo información técnicamente correcta sobre productos cosméticos."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,
-                max_tokens=600
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if content:
-                return json.loads(content)
+                return parsear_json_modelo(content, "generate_realistic_product_info")
             else:
                 return {}
             
@@ -705,62 +758,99 @@ class SimpleHTMLDescriptionGenerator:
         
         return any(domain in url.lower() for domain in relevant_domains)
     
+    def _descargar_html(self, url: str, headers: Optional[Dict[str, str]] = None,
+                        extractor: Optional[ExtractorHTMLIncremental] = None) -> Tuple[str, bool]:
+        """
+        HTML de una página: ruta HTTP rápida y navegador headless solo si el dominio lo necesita
+        
+        Si la respuesta HTTP resulta ser un shell que se monta con JavaScript, el dominio queda
+        marcado y sus siguientes páginas se renderizan directamente. Con un extractor incremental
+        el HTML se parsea mientras llega y la descarga se corta al tener todos sus campos (el
+        HTML devuelto es entonces solo el principio de la página).
+        
+        No escribe en el log (se llama desde hilos del pool): el llamador registra el renderizado.
+        
+        Returns:
+            (html, con_navegador): con_navegador si la página se renderizó con el navegador headless
+        """
+        
+        al_recibir = extractor.alimentar if extractor is not None else None
+        html = None
+        if not self.browser_pool.necesita_js(url):
+            response = self.fetcher.get(url, headers=headers or self.headers, timeout=15, al_recibir=al_recibir)
+            response.raise_for_status()
+            html = response.text
+            if response.cortada or not (self.browser_pool.disponible and parece_shell_js(html)):
+                return html, False
+            self.browser_pool.marcar_necesita_js(url)
+        
+        renderizado = self.browser_pool.renderizar(url)
+        if renderizado:
+            archivo = self.fetcher.archivo
+            if archivo is not None and archivo.activo:
+                archivo.guardar(url, 200, {'content-type': 'text/html; charset=utf-8'}, renderizado.encode('utf-8'),
+                                origen='navegador')
+            if extractor is not None:
+                extractor.reiniciar()
+                extractor.alimentar(renderizado)
+            return renderizado, True
+        
+        if html is None:
+            response = self.fetcher.get(url, headers=headers or self.headers, timeout=15, al_recibir=al_recibir)
+            response.raise_for_status()
+            html = response.text
+        return html, False
+    
+    def _log_renderizado(self, url: str):
+        self._log_progress(f"✅ Renderizado con navegador headless: {url[:50]}...", "info")
+    
     def _scrape_product_page(self, url: str, query: str) -> Optional[ScrapedInfo]:
         """
         Extrae información específica de una página de producto
         """
         
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            info = ScrapedInfo()
-            info.source_url = url
-            info.source_type = self._identify_site_type(url)
-            
-            # Extraer título
-            title_selectors = [
-                'h1', '.product-title', '.product-name', 
-                '[data-testid="product-name"]', '.pdp-product-name'
-            ]
-            info.title = self._extract_by_selectors(soup, title_selectors)
-            
-            # Extraer descripción
-            desc_selectors = [
-                '.product-description', '.product-details', '.product-summary',
-                '[data-testid="product-description"]', '.description', '.overview'
-            ]
-            info.description = self._extract_by_selectors(soup, desc_selectors)
-            
-            # Extraer ingredientes
-            ingredient_selectors = [
-                '.ingredients', '.ingredient-list', '[data-testid="ingredients"]',
-                '.product-ingredients', '.formula', '.composition'
-            ]
-            info.ingredients = self._extract_by_selectors(soup, ingredient_selectors)
-            
-            # Extraer precio
-            price_selectors = [
-                '.price', '.product-price', '[data-testid="price"]',
-                '.price-current', '.sale-price', '.cost'
-            ]
-            info.price = self._extract_by_selectors(soup, price_selectors)
-            
-            # Extraer beneficios (buscar en listas y puntos)
-            benefits = self._extract_benefits(soup)
-            info.benefits = benefits[:5]  # Máximo 5 beneficios
-            
-            # Calcular score de confianza
-            info.confidence_score = self._calculate_confidence_score(info, query)
-            
-            return info if info.confidence_score > 0.1 else None
-            
+            info, con_navegador = self._extraer_ficha(url, query)
+            if con_navegador:
+                self._log_renderizado(url)
+            return info
         except Exception as e:
             print(f"Error scraping página {url}: {e}")
             return None
     
+    def _extraer_ficha(self, url: str, query: str) -> Tuple[Optional[ScrapedInfo], bool]:
+        """
+        Descarga y extrae una ficha de producto (propaga los errores de red)
+        
+        Returns:
+            (ficha o None si no es relevante, con_navegador)
+        """
+        
+        # Parseo en streaming: JSON-LD y selectores de la ficha en una sola pasada, sin árbol
+        # DOM; la lectura se corta en cuanto están título, descripción, precio e ingredientes
+        extractor = nuevo_extractor_ficha()
+        html, con_navegador = self._descargar_html(url, extractor=extractor)
+        extractor.finalizar()
+        
+        info = ScrapedInfo()
+        info.source_url = url
+        info.source_type = self._identify_site_type(url)
+        
+        datos = extractor.datos_estructurados
+        info.title = extractor.campos['titulo']
+        info.description = extractor.campos['descripcion']
+        info.price = extractor.campos['precio']
+        info.ingredients = extractor.campos['ingredientes'] or buscar_lista_inci_en_html(html)
+        info.brand = extractor.campos['marca']
+        info.rating = datos.valoracion
+        info.reviews_count = datos.num_valoraciones
+        info.benefits = (extractor.beneficios or beneficios_en_texto(info.description))[:5]
+        
+        # Calcular score de confianza
+        info.confidence_score = self._calculate_confidence_score(info, query)
+        
+        return (info if info.confidence_score > 0.1 else None), con_navegador
+    
     def _identify_site_type(self, url: str) -> str:
         """
         Identifica el tipo de sitio web
@@ -777,64 +867,6 @@ class SimpleHTMLDescriptionGenerator:
         else:
             return 'brand_website'
     
-    def _extract_by_selectors(self, soup: BeautifulSoup, selectors: List[str]) -> str:
-        """
-        Extrae texto usando múltiples selectores CSS
-        """
-        
-        for selector in selectors:
-            try:
-                element = soup.select_one(selector)
-                if element:
-                    text = element.get_text(strip=True)
-                    if text and len(text) > 10:  # Mínimo 10 caracteres
-                        return text[:500]  # Máximo 500 caracteres
-            except:
-                continue
-        
-        return ""
-    
-    def _extract_benefits(self, soup: BeautifulSoup) -> List[str]:
-        """
-        Extrae beneficios del producto de la página
-        """
-        
-        benefits = []
-        
-        # Buscar en listas
-        benefit_selectors = [
-            '.benefits li', '.features li', '.key-benefits li',
-            '.product-benefits li', '.highlights li'
-        ]
-        
-        for selector in benefit_selectors:
-            try:
-                elements = soup.select(selector)
-                for elem in elements[:5]:
-                    text = elem.get_text(strip=True)
-                    if text and len(text) > 5 and len(text) < 100:
-                        benefits.append(text)
-            except:
-                continue
-        
-        # Buscar en párrafos con palabras clave
-        benefit_keywords = [
-            'reduces', 'improves', 'enhances', 'brightens', 'moisturizes',
-            'hydrates', 'firms', 'smooths', 'protects', 'nourishes'
-        ]
-        
-        paragraphs = soup.find_all('p')
-        for p in paragraphs:
-            text = p.get_text(strip=True).lower()
-            for keyword in benefit_keywords:
-                if keyword in text and len(text) > 20 and len(text) < 150:
-                    clean_text = p.get_text(strip=True)
-                    if clean_text not in benefits:
-                        benefits.append(clean_text)
-                    break
-        
-        return benefits[:8]  # Máximo 8 beneficios
-    
     def _calculate_confidence_score(self, info: ScrapedInfo, query: str) -> float:
         """
         Calcula score de confianza basado en la información extraída
@@ -885,7 +917,10 @@ class SimpleHTMLDescriptionGenerator:
         # Ordenar por score de confianza
         filtered.sort(key=lambda x: x.confidence_score, reverse=True)
         
-        # Remover duplicados basados en contenido similar
+        # Colapsar texto sindicado (casi idéntico) en la fuente de más confianza
+        filtered = colapsar_casi_duplicados(filtered)
+        
+        # Remover duplicados por título
         unique_results = []
         seen_titles = set()
         
@@ -903,24 +938,83 @@ class SimpleHTMLDescriptionGenerator:
         """
         
         results = []
-        
-        for url in urls:
-            if not url.strip():
-                continue
-            
-            try:
-                scraped_info = self._scrape_product_page(url.strip(), product_name)
-                if scraped_info:
-                    # Bonus de confianza para URLs manuales
-                    scraped_info.confidence_score = min(scraped_info.confidence_score + 0.2, 1.0)
-                    scraped_info.source_type = "user_provided"
-                    results.append(scraped_info)
-            except Exception as e:
-                print(f"Error procesando URL {url}: {e}")
-                continue
+        for scraped_info in self._scrape_urls_concurrentes(urls, product_name):
+            # Bonus de confianza para URLs manuales
+            scraped_info.confidence_score = min(scraped_info.confidence_score + 0.2, 1.0)
+            scraped_info.source_type = "user_provided"
+            results.append(scraped_info)
         
         return results
     
+    def _scrape_url_cronometrada(self, url: str, query: str) -> Tuple[Optional[ScrapedInfo], str, float, bool]:
+        """
+        Extrae una URL en un hilo del pool: devuelve (ficha, error, segundos, con_navegador) sin
+        lanzar excepciones ni escribir en el log
+        """
+        
+        inicio = time.perf_counter()
+        try:
+            info, con_navegador = self._extraer_ficha(url, query)
+            return info, "", time.perf_counter() - inicio, con_navegador
+        except Exception as e:
+            return None, str(e)[:200], time.perf_counter() - inicio, False
+    
+    def _scrape_urls_concurrentes(self, urls: List[str], query: str,
+                                  plazo: float = PLAZO_URLS_ESPECIFICAS_S) -> List[ScrapedInfo]:
+        """
+        Descarga y extrae varias URLs en paralelo con un plazo global
+        
+        Todas las descargas van por el fetcher compartido (pools keep-alive por host). Al agotarse
+        el plazo se devuelven las fichas ya extraídas y las URLs pendientes quedan marcadas como
+        plazo_agotado; sus descargas terminan en segundo plano (con su propio timeout) y solo
+        alimentan la caché HTTP. El estado de cada URL queda en self.estado_urls.
+        
+        Returns:
+            List[ScrapedInfo]: fichas válidas en el orden de las URLs
+        """
+        
+        urls = list(dict.fromkeys(url.strip() for url in urls if url and url.strip()))
+        self.estado_urls = [EstadoURL(url) for url in urls]
+        if not urls:
+            return []
+        
+        fichas: Dict[str, ScrapedInfo] = {}
+        executor = ThreadPoolExecutor(max_workers=min(MAX_DESCARGAS_PARALELAS, len(urls)),
+                                      thread_name_prefix="urls-especificas")
+        futuros = {executor.submit(self._scrape_url_cronometrada, estado.url, query): estado
+                   for estado in self.estado_urls}
+        
+        try:
+            # Los logs y el estado se actualizan solo desde este hilo (Streamlit no admite otros)
+            for futuro in as_completed(futuros, timeout=plazo):
+                estado = futuros[futuro]
+                info, error, segundos, con_navegador = futuro.result()
+                estado.segundos = round(segundos, 2)
+                if con_navegador:
+                    self._log_renderizado(estado.url)
+                if error:
+                    estado.estado, estado.detalle = "error", error
+                    self._log_progress(f"❌ {estado.url[:60]}: {error[:80]}", "error")
+                elif info is None:
+                    estado.estado, estado.detalle = "sin_datos", "Sin información útil del producto"
+                    self._log_progress(f"⚠️ {estado.url[:60]}: sin información útil ({estado.segundos} s)", "warning")
+                else:
+                    estado.estado = "ok"
+                    fichas[estado.url] = info
+                    self._log_progress(f"✅ {estado.url[:60]} procesada en {estado.segundos} s", "success")
+        except FuturesTimeoutError:
+            for futuro, estado in futuros.items():
+                if not futuro.done():
+                    estado.estado, estado.detalle = "plazo_agotado", f"Sin respuesta en {plazo:.0f} s"
+                    estado.segundos = round(plazo, 2)
+                    self._log_progress(f"⏱️ {estado.url[:60]}: plazo global agotado, se continúa sin ella", "warning")
+            self._log_progress(f"⏱️ Plazo de {plazo:.0f} s agotado: {len(fichas)}/{len(urls)} URLs con datos", "warning")
+        finally:
+            # No se espera a las descargas en curso: el plazo es para toda la tanda
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return [fichas[url] for url in urls if url in fichas]
+    
     def _synthesize_product_info(self, scraped_sources: List[ScrapedInfo], product_data: ProductData) -> ProductData:
         """
         Síntesis SÚPER AVANZADA de información con múltiples niveles de procesamiento
@@ -998,10 +1092,12 @@ class SimpleHTMLDescriptionGenerator:
         """
         
         try:
-            # Preparar contexto especializado para cada categoría
-            expert_contexts = self._prepare_expert_contexts(categorized_sources)
+            ruta = self.router.ruta("multi_expert_synthesis")
+            modelo = ruta['model']
+            max_tokens_respuesta = ruta.get('max_tokens', 2000)
+            system_prompt = "Eres el DIRECTOR CIENTÍFICO líder mundial en I+D cosmético con 30 años de experiencia. Tu equipo incluye formuladores PhD, dermatólogos, químicos y analistas de mercado. Tu misión es crear la descripción MÁS COMPLETA Y TÉCNICA posible."
             
-            synthesis_prompt = f"""
+            synthesis_template = """
             Como DIRECTOR CIENTÍFICO de I+D cosmético con acceso a un equipo de expertos especializados, realiza una síntesis COMPLETA y PROFUNDA del producto:
             
             PRODUCTO: {product_name}
@@ -1082,53 +1178,52 @@ class SimpleHTMLDescriptionGenerator:
             - Información técnica de nivel profesional
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            # Presupuesto de contexto: ventana del modelo menos prompt fijo y respuesta reservada
+            tokens_fijos = estimar_tokens_mensajes([
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": synthesis_template.format(product_name=product_name, expert_contexts="")}
+            ], modelo)
+            presupuesto = presupuesto_contexto(modelo, tokens_fijos, max_tokens_respuesta)
+            
+            # Preparar contexto especializado para cada categoría
+            expert_contexts = self._prepare_expert_contexts(categorized_sources, modelo, presupuesto)
+            synthesis_prompt = synthesis_template.format(product_name=product_name, expert_contexts=expert_contexts)
+            
+            response = self.router.completar(
+                self.client, "multi_expert_synthesis",
                 messages=[
-                    {"role": "system", "content": "Eres el DIRECTOR CIENTÍFICO líder mundial en I+D cosmético con 30 años de experiencia. Tu equipo incluye formuladores PhD, dermatólogos, químicos y analistas de mercado. Tu misión es crear la descripción MÁS COMPLETA Y TÉCNICA posible."},
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": synthesis_prompt}
                 ],
-                temperature=0.1,  # Muy baja para máxima precisión
-                max_tokens=2000   # Aumentado para contenido más rico
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 raise ValueError("No se recibió contenido de la IA")
             
-            return json.loads(content)
+            return parsear_json_modelo(content, "multi_expert_synthesis")
             
         except Exception as e:
             self._log_progress(f"❌ Error en síntesis multi-experto: {e}", "error")
             return {}
     
-    def _prepare_expert_contexts(self, categorized_sources: Dict[str, List[ScrapedInfo]]) -> str:
+    def _prepare_expert_contexts(self, categorized_sources: Dict[str, List[ScrapedInfo]],
+                                 modelo: str = "gpt-4", presupuesto_tokens: int = 4000) -> str:
         """
-        Prepara contextos especializados para cada tipo de experto
+        Prepara contextos especializados para cada tipo de experto dentro de un presupuesto de tokens
         """
         
-        contexts = []
+        builder = PromptBudgetBuilder(modelo=modelo, presupuesto=presupuesto_tokens, max_por_categoria=3)
+        contexts = builder.construir(categorized_sources)
         
-        for category, sources in categorized_sources.items():
-            if not sources:
-                continue
-            
-            category_name = category.replace("_", " ").title()
-            context = f"\n=== CONTEXTO {category_name.upper()} ===\n"
-            
-            for i, source in enumerate(sources[:3], 1):  # Top 3 por categoría
-                source_info = f"""
-                Fuente {i} ({source.confidence_score:.2f}):
-                Título: {source.title}
-                Info: {source.description}
-                Ingredientes: {source.ingredients}
-                Beneficios: {', '.join(source.benefits)}
-                """
-                context += source_info
-            
-            contexts.append(context)
+        self._log_progress(
+            f"📏 Contexto de síntesis: {builder.tokens_usados}/{presupuesto_tokens} tokens "
+            f"({builder.fragmentos_descartados} fragmentos redundantes o sin hueco descartados)",
+            "info"
+        )
         
-        return '\n'.join(contexts)
+        return contexts
     
     def _cross_validate_and_enrich(self, synthesis_data: Dict, all_sources: List[ScrapedInfo]) -> Dict:
         """
@@ -1141,7 +1236,7 @@ class SimpleHTMLDescriptionGenerator:
         try:
             # Enriquecer con información adicional de todas las fuentes
             additional_benefits = []
-            additional_ingredients = []
+            listas_inci_fuentes = []
             
             for source in all_sources:
                 # Agregar beneficios únicos no contemplados
@@ -1149,9 +1244,9 @@ class SimpleHTMLDescriptionGenerator:
                     if benefit not in str(synthesis_data) and len(benefit) > 10:
                         additional_benefits.append(benefit)
                 
-                # Extraer ingredientes adicionales mencionados
-                if source.ingredients and len(source.ingredients) > 20:
-                    additional_ingredients.append(source.ingredients[:150])
+                # Listas INCI de las fuentes (se descarta la prosa)
+                if es_lista_inci(source.ingredients):
+                    listas_inci_fuentes.append((source.confidence_score, parsear_lista_inci(source.ingredients)))
             
             # Agregar información adicional a la síntesis
             if 'beneficios_validados_completos' in synthesis_data and additional_benefits:
@@ -1163,12 +1258,19 @@ class SimpleHTMLDescriptionGenerator:
                         "mecanismo": "según información de fuentes especializadas"
                     })
             
-            # Enriquecer lista INCI
-            if 'ingredientes_inci_completos' in synthesis_data and additional_ingredients:
-                current_inci = synthesis_data['ingredientes_inci_completos']
-                for additional in additional_ingredients[:2]:
-                    if additional not in current_inci:
-                        synthesis_data['ingredientes_inci_completos'] += f" • {additional}"
+            # Enriquecer lista INCI: fusión estructural respetando el orden de concentración;
+            # un ingrediente ajeno a la lista base solo entra si lo confirman al menos dos fuentes.
+            # Si la síntesis no trae una lista INCI (vacía o prosa), la base es la de la fuente
+            # más fiable
+            if listas_inci_fuentes:
+                inci_sintesis = synthesis_data.get('ingredientes_inci_completos') or ''
+                lista_sintesis = parsear_lista_inci(inci_sintesis) if es_lista_inci(inci_sintesis) else []
+                listas = [lista for _, lista in sorted(listas_inci_fuentes, key=lambda par: par[0], reverse=True)]
+                if lista_sintesis:
+                    listas.insert(0, lista_sintesis)
+                lista_fusionada = fusionar_listas_inci(listas, min_apariciones=2)
+                if lista_fusionada:
+                    synthesis_data['ingredientes_inci_completos'] = formatear_lista_inci(lista_fusionada)
             
             return synthesis_data
             
@@ -1273,7 +1375,8 @@ class SimpleHTMLDescriptionGenerator:
             
             # Lista INCI completa
             if synthesis_data.get('ingredientes_inci_completos'):
-                product_data.ingredientes_completos = synthesis_data['ingredientes_inci_completos']
+                lista_inci = parsear_lista_inci(synthesis_data['ingredientes_inci_completos'])
+                product_data.ingredientes_completos = formatear_lista_inci(lista_inci) or synthesis_data['ingredientes_inci_completos']
             
             # Información adicional específica
             if sintesis_tecnica.get('tecnologia_formulacion'):
@@ -1403,21 +1506,20 @@ class SimpleHTMLDescriptionGenerator:
             - No duplicar información existente
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "enrich_with_advanced_ai",
                 messages=[
                     {"role": "system", "content": "Eres un formulador cosmético experto con 15 años de experiencia. Conoces ingredientes, formulaciones típicas y estándares de la industria."},
                     {"role": "user", "content": enrichment_prompt}
                 ],
-                temperature=0.3,
-                max_tokens=800
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return product_data
             
-            enrichment_data = json.loads(content)
+            enrichment_data = parsear_json_modelo(content, "enrich_with_advanced_ai")
             
             # Aplicar enriquecimiento
             new_ingredients = enrichment_data.get('ingredientes_adicionales', [])
@@ -1507,7 +1609,7 @@ class SimpleHTMLDescriptionGenerator:
         
         return product_data
 
-    def buscar_informacion_web_real(self, nombre_producto: str, codigo_barras: str = "") -> ProductData:
+    def buscar_informacion_web_real(self, nombre_producto: str, codigo_barras: str = "", usar_cache: bool = True) -> ProductData:
         """
         Búsqueda web real integrada con el sistema avanzado
         """
@@ -1515,38 +1617,40 @@ class SimpleHTMLDescriptionGenerator:
         print(f"🚀 Iniciando búsqueda web real avanzada para: {nombre_producto}")
         
         # Usar el nuevo sistema avanzado
-        return self.buscar_producto_simple(nombre_producto, codigo_barras, None)
+        return self.buscar_producto_simple(nombre_producto, codigo_barras, None, usar_cache=usar_cache)
     
     def _procesar_urls_especificas(self, product_data: ProductData, urls: List[str]) -> ProductData:
         """Procesa URLs específicas proporcionadas"""
         
         fuentes_procesadas = 0
-        
-        for url in urls:
-            if not url.strip():
-                continue
-                
-            try:
-                # Simular extracción de información de URL
-                info_extraida = self._simular_extraccion_url(url, product_data.nombre)
-                
-                # Combinar información
-                if info_extraida.get('descripcion'):
-                    product_data.descripcion_corta = info_extraida['descripcion']
-                
-                if info_extraida.get('ingredientes_activos'):
-                    product_data.ingredientes_activos.extend(info_extraida['ingredientes_activos'])
-                
-                if info_extraida.get('beneficios'):
-                    product_data.beneficios.extend(info_extraida['beneficios'])
-                
-                if info_extraida.get('modo_aplicacion'):
-                    product_data.modo_aplicacion = info_extraida['modo_aplicacion']
-                
-                fuentes_procesadas += 1
-                
-            except Exception:
-                continue
+        fichas = {info.source_url: info for info in self._scrape_urls_concurrentes(urls, product_data.nombre)}
+        
+        for estado in self.estado_urls:
+            info = fichas.get(estado.url)
+            if info is not None:
+                info_extraida = {
+                    'descripcion': info.description,
+                    'beneficios': info.benefits,
+                    'modo_aplicacion': info.application_method,
+                }
+            else:
+                # Sin datos reales (error, página vacía o plazo agotado): información orientativa
+                info_extraida = self._simular_extraccion_url(estado.url, product_data.nombre)
+            
+            # Combinar información
+            if info_extraida.get('descripcion'):
+                product_data.descripcion_corta = info_extraida['descripcion']
+            
+            if info_extraida.get('ingredientes_activos'):
+                product_data.ingredientes_activos.extend(info_extraida['ingredientes_activos'])
+            
+            if info_extraida.get('beneficios'):
+                product_data.beneficios.extend(info_extraida['beneficios'])
+            
+            if info_extraida.get('modo_aplicacion'):
+                product_data.modo_aplicacion = info_extraida['modo_aplicacion']
+            
+            fuentes_procesadas += 1
         
         product_data.fuentes_encontradas = fuentes_procesadas
         
@@ -1704,21 +1808,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self.router.completar(
+                self.client, "enriquecer_con_ia",
                 messages=[
                     {"role": "system", "content": "Eres un experto en productos cosméticos. Responde solo con JSON válido."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
-                max_tokens=300
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return product_data
             
-            enriquecimiento = json.loads(content)
+            enriquecimiento = parsear_json_modelo(content, "enriquecer_con_ia")
             
             # Aplicar enriquecimiento
             if enriquecimiento.get('beneficios_adicionales'):
@@ -1737,9 +1840,119 @@ class SimpleHTMLDescriptionGenerator:
         
         return product_data
     
-    def generar_html_limpio(self, product_data: ProductData, idioma: str = "es") -> str:
+    def generar_html_limpio(self, product_data: ProductData, idioma: str = "es",
+                            on_fragmento: Optional[Callable[[str], None]] = None,
+                            usar_plantilla: bool = True) -> str:
         """
         Genera HTML limpio en el formato específico solicitado
+        
+        Por defecto la estructura la pone la plantilla Jinja2 (siempre válida, con los títulos en el
+        idioma de salida) y la IA solo redacta la prosa. Con usar_plantilla=False la IA genera el
+        HTML completo en streaming.
+        
+        Args:
+            on_fragmento: callback opcional con el HTML parcial acumulado (vista previa en vivo)
+        """
+        
+        if not usar_plantilla:
+            return self._generar_html_llm(product_data, idioma, on_fragmento)
+        
+        textos = self.redactar_textos_html([product_data], idioma)[0]
+        html = renderizar_descripcion_html(product_data, textos, idioma)
+        if on_fragmento:
+            on_fragmento(html)
+        return html
+    
+    def generar_html_lote(self, productos: List[ProductData], idioma: str = "es") -> List[str]:
+        """Genera el HTML de varios productos con una llamada de redacción por lote"""
+        textos = self.redactar_textos_html(productos, idioma)
+        return [renderizar_descripcion_html(producto, texto, idioma) for producto, texto in zip(productos, textos)]
+    
+    def redactar_textos_html(self, productos: List[ProductData], idioma: str = "es", tamano_lote: int = 8) -> List[Dict]:
+        """
+        Redacta con IA solo los campos de prosa de la plantilla, varios productos por llamada
+        
+        Fuera del español también se redactan modo_aplicacion y formato, porque los del ProductData
+        vienen de la investigación en español y no se pueden copiar tal cual.
+        
+        Returns:
+            list: por producto, dict con descripcion_corta, descripcion_detallada, ingredientes
+            {NOMBRE: descripción} y, si idioma no es "es", modo_aplicacion y formato; vacío si la
+            IA falla (la plantilla usa los textos por defecto del idioma)
+        """
+        
+        traducir_campos = normalizar_idioma(idioma) != "es"
+        campos_extra = (
+            ',\n"modo_aplicacion": "instrucciones de aplicación, separadas por salto de línea",'
+            '\n"formato": "información sobre el envase/formato"'
+        ) if traducir_campos else ""
+        
+        textos: List[Dict] = []
+        for inicio in range(0, len(productos), tamano_lote):
+            lote = productos[inicio:inicio + tamano_lote]
+            datos_lote = [
+                {
+                    "id": indice,
+                    "nombre": producto.nombre,
+                    "descripcion": producto.descripcion_corta,
+                    "beneficios": producto.beneficios[:5],
+                    "mecanismo_accion": producto.mecanismo_accion,
+                    "ingredientes_activos": [ing.get('nombre', '').upper() for ing in producto.ingredientes_activos[:4]],
+                    **({"modo_aplicacion": producto.modo_aplicacion, "formato": producto.formato} if traducir_campos else {})
+                }
+                for indice, producto in enumerate(lote)
+            ]
+            
+            prompt = f"""
+            Redacta en {idioma} los textos de la ficha de estos productos cosméticos.
+            
+            PRODUCTOS:
+            {json.dumps(datos_lote, ensure_ascii=False)}
+            
+            Responde SOLO con JSON:
+            {{
+                "productos": [
+                    {{
+                        "id": 0,
+                        "descripcion_corta": "1-2 frases atractivas",
+                        "descripcion_detallada": "3 frases con beneficios y características, separadas por salto de línea",
+                        "ingredientes": {{"NOMBRE INGREDIENTE": "descripción del ingrediente y sus beneficios"}}{campos_extra}
+                    }}
+                ]
+            }}
+            
+            Sin HTML ni markdown. Solo información coherente con los datos dados.
+            """
+            
+            por_id: Dict[int, Dict] = {}
+            try:
+                response = self.router.completar(
+                    self.client, "redactar_textos_html",
+                    messages=[
+                        {"role": "system", "content": "Eres un redactor experto en fichas de productos cosméticos. Respondes solo con JSON válido."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    formato_json=True,
+                    max_tokens=min(4000, (450 if traducir_campos else 350) * len(lote))
+                )
+                data = parsear_json_modelo(response.choices[0].message.content, "redactar_textos_html")
+                for item in data.get('productos', []):
+                    if isinstance(item, dict) and isinstance(item.get('id'), int):
+                        por_id[item['id']] = item
+            except Exception as e:
+                self._log_progress(f"⚠️ Redacción de textos fallida, se usan los textos base: {e}", "warning")
+            
+            textos.extend(por_id.get(indice, {}) for indice in range(len(lote)))
+        
+        return textos
+    
+    def _generar_html_llm(self, product_data: ProductData, idioma: str = "es",
+                          on_fragmento: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Genera el HTML completo con la IA
+        
+        La respuesta se recibe en streaming y se valida por secciones según llega; si falta una
+        sección obligatoria se corta la generación y se usa el HTML de respaldo.
         """
         
         # Preparar el contexto para la IA
@@ -1753,6 +1966,9 @@ class SimpleHTMLDescriptionGenerator:
         FUENTES CONSULTADAS: {product_data.fuentes_encontradas}
         """
         
+        # Los títulos de sección van en el idioma de salida y el validador espera esos mismos
+        titulos = titulos_secciones(idioma)
+        
         prompt = f"""
         Genera una descripción HTML para este producto cosmético siguiendo EXACTAMENTE este formato:
         
@@ -1760,7 +1976,7 @@ class SimpleHTMLDescriptionGenerator:
         <p><span>[Descripción corta atractiva]</span></p>
         <p><span>[Descripción detallada con beneficios y características. Usar <br> para saltos de línea cuando sea necesario]</span></p>
         
-        <h2><span>Ingredientes activos</span></h2>
+        <h2><span>{titulos['ingredientes_activos']}</span></h2>
         <ul>
         <li>
         <h3>[NOMBRE INGREDIENTE EN MAYÚSCULAS]</h3>
@@ -1769,13 +1985,13 @@ class SimpleHTMLDescriptionGenerator:
         [más ingredientes...]
         </ul>
         
-        <h2>Lista de Ingredientes</h2>
+        <h2>{titulos['lista_ingredientes']}</h2>
         <p><span>[Lista completa de ingredientes separados por • ]</span></p>
         
-        <h2>Método de aplicación</h2>
+        <h2>{titulos['modo_aplicacion']}</h2>
         <p>[Instrucciones claras de aplicación.<br>Información adicional si es necesaria.]</p>
         
-        <h2>Formato</h2>
+        <h2>{titulos['formato']}</h2>
         <p>[Información sobre el envase/formato]</p>
         <p> </p>
         
@@ -1784,12 +2000,12 @@ class SimpleHTMLDescriptionGenerator:
         
         INSTRUCCIONES IMPORTANTES:
         1. NO incluir CSS ni estilos inline
-        2. Usar EXACTAMENTE la estructura mostrada
+        2. Usar EXACTAMENTE la estructura mostrada, con los títulos <h2> tal cual
         3. Los ingredientes activos en MAYÚSCULAS en los h3
         4. Usar <br> solo donde sea necesario para legibilidad
         5. Mantener las clases class="m-0" solo en el primer párrafo
         6. Usar <span> en párrafos donde se indica
-        7. Generar en {idioma}
+        7. Generar todo el texto en {idioma}
         8. Incluir al menos 3-4 ingredientes activos
         9. La lista de ingredientes debe ser realista y extensa
         10. Terminar con <p> </p>
@@ -1797,104 +2013,51 @@ class SimpleHTMLDescriptionGenerator:
         Responde SOLO con el HTML, sin explicaciones.
         """
         
+        validador = ValidadorHTMLIncremental(idioma)
+        stream = None
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            stream = self.router.completar_stream(
+                self.client, "generar_html_limpio",
                 messages=[
                     {"role": "system", "content": "Eres un experto en crear descripciones HTML para productos cosméticos. Sigues las instrucciones al pie de la letra."},
                     {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1500
+                ]
             )
             
-            content = response.choices[0].message.content
-            if not content:
-                return self._generar_html_fallback(product_data)
+            for fragmento in stream:
+                if not validador.alimentar(fragmento):
+                    self._log_progress(f"⚠️ Generación HTML abortada: {validador.motivo_aborto}", "warning")
+                    return self._generar_html_fallback(product_data, idioma)
+                if on_fragmento:
+                    on_fragmento(validador.html)
             
-            html_generado = content.strip()
+            html_generado = limpiar_html_generado(validador.html)
+            if not html_generado:
+                return self._generar_html_fallback(product_data, idioma)
             
-            # Validar que tenga la estructura básica
-            if not all(tag in html_generado for tag in ['<p class="m-0">', '<h2>', '<ul>', '<li>']):
+            es_valido, errores = validador.finalizar()
+            if not es_valido and any(error.startswith("Falta elemento") for error in errores):
                 raise ValueError("HTML generado no tiene la estructura correcta")
             
             return html_generado
             
         except Exception as e:
             # Fallback con estructura básica
-            return self._generar_html_fallback(product_data)
+            return self._generar_html_fallback(product_data, idioma)
+        finally:
+            # Cierra la conexión si se abortó a mitad de respuesta
+            if stream is not None:
+                stream.close()
     
-    def _generar_html_fallback(self, product_data: ProductData) -> str:
+    def _generar_html_fallback(self, product_data: ProductData, idioma: str = "es") -> str:
         """Genera HTML básico cuando falla la IA"""
         
-        # Ingredientes activos HTML
-        ingredientes_html = ""
-        if product_data.ingredientes_activos:
-            for ing in product_data.ingredientes_activos[:4]:
-                ingredientes_html += f"""<li>
-<h3>{ing['nombre'].upper()}</h3>
-<p>{ing['descripcion']}</p>
-</li>
-"""
-        else:
-            ingredientes_html = """<li>
-<h3>INGREDIENTE ACTIVO PRINCIPAL</h3>
-<p>Componente clave que proporciona los beneficios específicos de este producto.</p>
-</li>"""
-        
-        # Lista de ingredientes simulada
-        ingredientes_lista = "AQUA (WATER) • GLYCERIN • CETEARYL ALCOHOL • PARFUM (FRAGRANCE) • PHENOXYETHANOL • TOCOPHEROL • LECITHIN • SODIUM BENZOATE • POTASSIUM SORBATE"
-        
-        html = f"""<p class="m-0"><strong>{product_data.nombre}</strong></p>
-<p><span>{product_data.descripcion_corta}</span></p>
-<p><span>Formulado con ingredientes selectos para ofrecer una experiencia de cuidado excepcional.<br>Su textura se adapta perfectamente a las necesidades de la piel, proporcionando los nutrientes esenciales.<br>Ideal para uso diario, garantiza resultados visibles y duraderos.</span></p>
-
-<h2><span>Ingredientes activos</span></h2>
-<ul>
-{ingredientes_html}</ul>
-
-<h2>Lista de Ingredientes</h2>
-<p><span>{ingredientes_lista}</span></p>
-
-<h2>Método de aplicación</h2>
-<p>{product_data.modo_aplicacion or 'Aplicar según las necesidades específicas del producto.'}<br>Para obtener mejores resultados, usar regularmente.</p>
-
-<h2>Formato</h2>
-<p>{product_data.formato or 'Envase diseñado para preservar la calidad del producto.'}</p>
-<p> </p>"""
-        
-        return html
+        return renderizar_descripcion_html(product_data, idioma=idioma)
     
-    def validar_html_formato(self, html: str) -> tuple[bool, List[str]]:
+    def validar_html_formato(self, html: str, idioma: str = "es") -> tuple[bool, List[str]]:
         """Valida que el HTML tenga el formato correcto"""
         
-        errores = []
-        
-        # Verificar elementos requeridos
-        elementos_requeridos = [
-            '<p class="m-0">',
-            '<h2><span>Ingredientes activos</span></h2>',
-            '<h2>Lista de Ingredientes</h2>',
-            '<h2>Método de aplicación</h2>',
-            '<h2>Formato</h2>',
-            '<ul>',
-            '<li>'
-        ]
-        
-        for elemento in elementos_requeridos:
-            if elemento not in html:
-                errores.append(f"Falta elemento requerido: {elemento}")
-        
-        # Verificar que no tenga CSS inline
-        if 'style=' in html or '<style>' in html:
-            errores.append("Contiene CSS inline no permitido")
-        
-        # Verificar estructura básica
-        if not html.endswith('<p> </p>'):
-            errores.append("No termina con <p> </p>")
-        
-        es_valido = len(errores) == 0
-        return es_valido, errores
+        return validar_estructura_html(html, idioma)
     
     def _generate_comprehensive_search_strategies(self, product_name: str, barcode: str = "") -> List[Dict]:
         """
@@ -2031,21 +2194,20 @@ class SimpleHTMLDescriptionGenerator:
             IMPORTANTE: Información técnicamente precisa, basada en ciencia real de formulación.
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "ai_formulator_analysis",
                 messages=[
                     {"role": "system", "content": "Eres un formulador cosmético senior con doctorado en química y 20 años en laboratorios de marcas premium."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
-                max_tokens=1000
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "ai_formulator_analysis")
             
             info = ScrapedInfo()
             info.source_type = "expert_formulator_analysis"
@@ -2101,21 +2263,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "ai_dermatologist_analysis",
                 messages=[
                     {"role": "system", "content": "Eres dermatólogo certificado especialista en cosmética médica con 15 años de experiencia clínica."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
-                max_tokens=900
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "ai_dermatologist_analysis")
             
             info = ScrapedInfo()
             info.source_type = "dermatologist_clinical_analysis"
@@ -2173,21 +2334,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "ai_marketing_analysis",
                 messages=[
                     {"role": "system", "content": "Eres director de marketing de marca cosmética premium con expertise en posicionamiento global."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,
-                max_tokens=800
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "ai_marketing_analysis")
             
             info = ScrapedInfo()
             info.source_type = "marketing_positioning_analysis"
@@ -2245,21 +2405,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "ai_chemistry_analysis",
                 messages=[
                     {"role": "system", "content": "Eres químico PhD especialista en química cosmética con 25 años en investigación y desarrollo."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
-                max_tokens=900
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "ai_chemistry_analysis")
             
             info = ScrapedInfo()
             info.source_type = "chemical_molecular_analysis"
@@ -2312,21 +2471,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "ai_trends_analysis",
                 messages=[
                     {"role": "system", "content": "Eres consultor senior de tendencias beauty global con acceso a data de mercado premium."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.4,
-                max_tokens=800
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "ai_trends_analysis")
             
             info = ScrapedInfo()
             info.source_type = "trends_market_analysis"
@@ -2372,9 +2530,9 @@ class SimpleHTMLDescriptionGenerator:
             # Múltiples estrategias de scrapy
             all_results = []
             
-            # Spider básico mejorado
+            # Spider básico mejorado (con un GTIN válido, la búsqueda exacta por código va primero)
             self._log_progress("🕷️ Ejecutando Scrapy con búsqueda mejorada...", "search")
-            basic_results = searcher.search_product_async(product_name, brand)
+            basic_results = searcher.search_product_async(product_name, brand, barcode)
             all_results.extend(basic_results)
             
             # Convertir resultados
@@ -2401,126 +2559,47 @@ class SimpleHTMLDescriptionGenerator:
             self._log_progress(f"❌ Error en Scrapy avanzado: {e}", "error")
             return []
     
-    def _query_specialized_databases(self, product_name: str, barcode: str = "") -> List[ScrapedInfo]:
+    def _query_specialized_databases(self, product_name: str, barcode: str = "",
+                                     previous_sources: Optional[List[ScrapedInfo]] = None) -> List[ScrapedInfo]:
         """
-        Consulta APIs especializadas y bases de datos de cosmética
+        Consulta el diccionario INCI local (funciones, comedogenicidad y seguridad)
+        
+        Sustituye a las cuatro consultas simuladas con GPT-4: los datos salen del diccionario
+        local sin coste de API y la redacción final queda en manos de la síntesis multi-experto.
         """
         
-        results = []
+        texto_ingredientes = " , ".join(
+            [product_name] + [source.ingredients for source in (previous_sources or []) if source.ingredients]
+        )
         
-        # Simular consulta a bases de datos especializadas
-        databases = [
-            {
-                "name": "CosDNA Ingredient Analysis", 
-                "focus": "análisis de ingredientes",
-                "confidence": 0.85
-            },
-            {
-                "name": "Skincarisma Database",
-                "focus": "compatibilidad y análisis",
-                "confidence": 0.82
-            },
-            {
-                "name": "INCI Decoder Database",
-                "focus": "información técnica INCI",
-                "confidence": 0.88
-            },
-            {
-                "name": "EWG Cosmetics Database",
-                "focus": "seguridad y toxicología",
-                "confidence": 0.79
-            }
+        analisis = self.inci_dictionary.analizar(texto_ingredientes)
+        ingredientes = analisis['ingredientes']
+        
+        if not ingredientes:
+            self._log_progress("📊 Diccionario INCI: sin ingredientes reconocidos", "info")
+            return []
+        
+        info = ScrapedInfo()
+        info.source_type = "specialized_database_inci_local"
+        info.source_url = f"INCI_LOCAL_{product_name.replace(' ', '_')}"
+        info.title = "Análisis INCI local"
+        info.ingredients = " • ".join(ingrediente.inci for ingrediente in ingredientes)
+        
+        partes = [
+            "Funciones: " + "; ".join(f"{funcion} ({', '.join(incis)})" for funcion, incis in analisis['funciones'].items()),
+            f"Comedogenicidad máxima: {analisis['comedogenicidad_maxima']}/5"
         ]
+        if analisis['comedogenicos']:
+            partes.append("Ingredientes comedogénicos: " + ", ".join(analisis['comedogenicos']))
+        partes.append("Apto para piel sensible" if analisis['apto_piel_sensible'] else "Precaución en piel sensible")
+        info.description = " | ".join(partes)
         
-        for db in databases:
-            try:
-                self._log_progress(f"📊 Consultando {db['name']}...", "search")
-                
-                # Simular información específica de cada base de datos
-                info = self._simulate_database_query(product_name, db)
-                if info:
-                    info.confidence_score = db['confidence']
-                    results.append(info)
-                    self._log_progress(f"✅ {db['name']}: datos obtenidos", "success")
-                
-            except Exception as e:
-                self._log_progress(f"⚠️ Error consultando {db['name']}: {e}", "warning")
-                continue
+        info.benefits = analisis['alertas']
+        info.confidence_score = 0.9
         
-        return results
-    
-    def _simulate_database_query(self, product_name: str, database: Dict) -> Optional[ScrapedInfo]:
-        """
-        Simula consulta a base de datos especializada usando IA
-        """
+        self._log_progress(f"✅ Diccionario INCI: {len(ingredientes)} ingredientes analizados sin llamadas a la IA", "success")
         
-        try:
-            db_name = database['name']
-            focus = database['focus']
-            
-            prompt = f"""
-            Simula una consulta a la base de datos "{db_name}" especializada en {focus}.
-            
-            PRODUCTO: {product_name}
-            BASE DE DATOS: {db_name}
-            ESPECIALIZACIÓN: {focus}
-            
-            Genera información específica que esta base de datos proporcionaría en JSON:
-            {{
-                "database_title": "título específico de la base de datos",
-                "specialized_info": "información especializada según el foco",
-                "technical_data": "datos técnicos específicos",
-                "safety_profile": "perfil de seguridad si aplica",
-                "ingredient_analysis": "análisis específico de ingredientes",
-                "compatibility_notes": "notas de compatibilidad",
-                "scientific_references": "referencias típicas de esta DB",
-                "rating_score": "puntuación típica de esta base",
-                "special_alerts": ["alerta especial 1", "alerta 2"]
-            }}
-            
-            IMPORTANTE: La información debe ser específica del tipo de base de datos consultada.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": f"Eres un sistema de base de datos especializado en {focus} con acceso a información técnica cosmética."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.2,
-                max_tokens=700
-            )
-            
-            content = response.choices[0].message.content
-            if not content:
-                return None
-            
-            data = json.loads(content)
-            
-            info = ScrapedInfo()
-            info.source_type = f"specialized_database_{db_name.lower().replace(' ', '_')}"
-            info.source_url = f"DB_{db_name.replace(' ', '_')}_{product_name.replace(' ', '_')}"
-            info.title = data.get('database_title', '')
-            
-            # Compilar información especializada
-            specialized_parts = [
-                data.get('specialized_info', ''),
-                data.get('technical_data', ''),
-                data.get('safety_profile', ''),
-                data.get('compatibility_notes', '')
-            ]
-            info.description = " | ".join(filter(None, specialized_parts))
-            
-            info.ingredients = data.get('ingredient_analysis', '')
-            info.benefits = data.get('special_alerts', [])
-            info.rating = data.get('rating_score', '')
-            
-            return info
-            
-        except Exception as e:
-            db_name = database.get('name', 'Unknown DB')
-            self._log_progress(f"❌ Error simulando DB {db_name}: {e}", "error")
-            return None
+        return [info]
     
     def _deep_formulation_analysis(self, product_name: str) -> List[ScrapedInfo]:
         """
@@ -2585,21 +2664,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "formulation_technology_analysis",
                 messages=[
                     {"role": "system", "content": "Eres especialista en tecnologías de formulación cosmética con expertise en sistemas avanzados."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2,
-                max_tokens=800
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "formulation_technology_analysis")
             
             info = ScrapedInfo()
             info.source_type = "formulation_technology_analysis"
@@ -2650,21 +2728,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "delivery_systems_analysis",
                 messages=[
                     {"role": "system", "content": "Eres PhD en sistemas de delivery dérmico con especialización en penetración cutánea."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2,
-                max_tokens=700
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "delivery_systems_analysis")
             
             info = ScrapedInfo()
             info.source_type = "delivery_systems_analysis"
@@ -2713,21 +2790,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "stability_analysis",
                 messages=[
                     {"role": "system", "content": "Eres especialista en estabilidad cosmética con expertise en sistemas conservantes."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2,
-                max_tokens=700
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "stability_analysis")
             
             info = ScrapedInfo()
             info.source_type = "stability_conservation_analysis"
@@ -2778,21 +2854,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "ingredient_synergy_analysis",
                 messages=[
                     {"role": "system", "content": "Eres químico especialista en interacciones y sinergias entre ingredientes cosméticos."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.2,
-                max_tokens=600
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "ingredient_synergy_analysis")
             
             info = ScrapedInfo()
             info.source_type = "ingredient_synergy_analysis"
@@ -2874,21 +2949,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "analyze_direct_competitors",
                 messages=[
                     {"role": "system", "content": "Eres analista senior de mercado cosmético con acceso a data competitiva global."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,
-                max_tokens=700
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "analyze_direct_competitors")
             
             info = ScrapedInfo()
             info.source_type = "competitive_analysis_direct"
@@ -2938,21 +3012,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "analyze_premium_alternatives",
                 messages=[
                     {"role": "system", "content": "Eres consultor especialista en marcas de lujo y posicionamiento premium en cosmética."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,
-                max_tokens=600
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "analyze_premium_alternatives")
             
             info = ScrapedInfo()
             info.source_type = "premium_alternatives_analysis"
@@ -3004,21 +3077,20 @@ class SimpleHTMLDescriptionGenerator:
             }}
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4",
+            response = self.router.completar(
+                self.client, "analyze_substitute_products",
                 messages=[
                     {"role": "system", "content": "Eres estratega de productos con expertise en análisis de sustitutos y alternativas."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,
-                max_tokens=600
+                formato_json=True
             )
             
             content = response.choices[0].message.content
             if not content:
                 return None
             
-            data = json.loads(content)
+            data = parsear_json_modelo(content, "analyze_substitute_products")
             
             info = ScrapedInfo()
             info.source_type = "substitute_products_analysis"
@@ -3046,6 +3118,16 @@ class SimpleHTMLDescriptionGenerator:
         Filtrado avanzado y enriquecimiento de resultados
         """
         
+        # Colapsar casi duplicados antes de nada: la copia de más confianza representa al grupo y
+        # las copias sindicadas no cuentan como confirmaciones independientes en el enriquecimiento
+        total = len(scraped_data)
+        scraped_data = colapsar_casi_duplicados(sorted(scraped_data, key=lambda x: x.confidence_score, reverse=True))
+        if len(scraped_data) < total:
+            self._log_progress(
+                f"🧬 {total - len(scraped_data)} fuentes casi duplicadas colapsadas ({len(scraped_data)} distintas)",
+                "info"
+            )
+        
         # Filtrar por score mínimo más exigente
         filtered = [info for info in scraped_data if info.confidence_score > 0.5]
         
@@ -3084,7 +3166,7 @@ class SimpleHTMLDescriptionGenerator:
         
         # Buscar información complementaria
         complementary_benefits = []
-        complementary_ingredients = []
+        listas_inci = [parsear_lista_inci(main_info.ingredients)] if es_lista_inci(main_info.ingredients) else [[]]
         
         for other_info in all_data:
             if other_info.source_url != main_info.source_url:
@@ -3093,16 +3175,18 @@ class SimpleHTMLDescriptionGenerator:
                     if benefit not in main_info.benefits and benefit not in complementary_benefits:
                         complementary_benefits.append(benefit)
                 
-                # Agregar ingredientes únicos
-                if other_info.ingredients and other_info.ingredients not in main_info.ingredients:
-                    complementary_ingredients.append(other_info.ingredients[:100])
+                # Listas INCI de las demás fuentes para la fusión estructural
+                if es_lista_inci(other_info.ingredients):
+                    listas_inci.append(parsear_lista_inci(other_info.ingredients))
         
         # Enriquecer con información complementaria (máximo 3 adicionales)
         if complementary_benefits:
             main_info.benefits.extend(complementary_benefits[:3])
         
-        # Mejorar descripción con insights cruzados
-        if complementary_ingredients:
-            main_info.description += f" | Insights adicionales: {' • '.join(complementary_ingredients[:2])}"
+        # Completar la lista INCI con los ingredientes confirmados por al menos dos fuentes
+        if len(listas_inci) > 1:
+            lista_fusionada = fusionar_listas_inci(listas_inci, min_apariciones=2)
+            if lista_fusionada:
+                main_info.ingredients = formatear_lista_inci(lista_fusionada)
         
         return main_info
\ No newline at end of file
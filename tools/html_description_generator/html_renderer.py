@@ -0,0 +1,163 @@
+# tools/html_description_generator/html_renderer.py
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from jinja2 import Environment
+from markupsafe import Markup, escape
+
+from .inci_parser import parsear_lista_inci, formatear_lista_inci
+from .html_stream_validator import IDIOMA_POR_DEFECTO, normalizar_idioma, titulos_secciones
+
+# Formato Shopify exacto que comprueba validar_html_formato
+PLANTILLA_SHOPIFY = """<p class="m-0"><strong>{{ nombre|texto }}</strong></p>
+<p><span>{{ descripcion_corta|texto }}</span></p>
+<p><span>{{ descripcion_detallada|texto }}</span></p>
+
+<h2><span>{{ titulos.ingredientes_activos }}</span></h2>
+<ul>
+{% for ingrediente in ingredientes_activos %}
+<li>
+<h3>{{ ingrediente.nombre|texto }}</h3>
+<p>{{ ingrediente.descripcion|texto }}</p>
+</li>
+{% endfor %}
+</ul>
+
+<h2>{{ titulos.lista_ingredientes }}</h2>
+<p><span>{{ lista_ingredientes|texto }}</span></p>
+
+<h2>{{ titulos.modo_aplicacion }}</h2>
+<p>{{ modo_aplicacion|texto }}</p>
+
+<h2>{{ titulos.formato }}</h2>
+<p>{{ formato|texto }}</p>
+<p> </p>"""
+
+# Textos por defecto por idioma (los mismos del HTML de respaldo) para que el resultado siempre sea válido
+LISTA_INGREDIENTES_POR_DEFECTO = "AQUA (WATER) • GLYCERIN • CETEARYL ALCOHOL • PARFUM (FRAGRANCE) • PHENOXYETHANOL • TOCOPHEROL • LECITHIN • SODIUM BENZOATE • POTASSIUM SORBATE"
+
+TEXTOS_POR_DEFECTO = {
+    'es': {
+        'descripcion_detallada': (
+            "Formulado con ingredientes selectos para ofrecer una experiencia de cuidado excepcional.\n"
+            "Su textura se adapta perfectamente a las necesidades de la piel, proporcionando los nutrientes esenciales.\n"
+            "Ideal para uso diario, garantiza resultados visibles y duraderos."
+        ),
+        'ingrediente_nombre': "INGREDIENTE ACTIVO PRINCIPAL",
+        'ingrediente_descripcion': "Componente clave que proporciona los beneficios específicos de este producto.",
+        'lista_ingredientes': LISTA_INGREDIENTES_POR_DEFECTO,
+        'modo_aplicacion': "Aplicar según las necesidades específicas del producto.\nPara obtener mejores resultados, usar regularmente.",
+        'formato': "Envase diseñado para preservar la calidad del producto.",
+    },
+    'en': {
+        'descripcion_detallada': (
+            "Formulated with carefully selected ingredients for an exceptional care experience.\n"
+            "Its texture adapts to the needs of the skin, delivering the essential nutrients.\n"
+            "Ideal for daily use, it provides visible and long-lasting results."
+        ),
+        'ingrediente_nombre': "KEY ACTIVE INGREDIENT",
+        'ingrediente_descripcion': "Key component that provides the specific benefits of this product.",
+        'lista_ingredientes': LISTA_INGREDIENTES_POR_DEFECTO,
+        'modo_aplicacion': "Apply according to the specific needs of the product.\nFor best results, use regularly.",
+        'formato': "Packaging designed to preserve the quality of the product.",
+    },
+    'ca': {
+        'descripcion_detallada': (
+            "Formulat amb ingredients seleccionats per oferir una experiència de cura excepcional.\n"
+            "La seva textura s’adapta a les necessitats de la pell i aporta els nutrients essencials.\n"
+            "Ideal per a l’ús diari, garanteix resultats visibles i duradors."
+        ),
+        'ingrediente_nombre': "INGREDIENT ACTIU PRINCIPAL",
+        'ingrediente_descripcion': "Component clau que aporta els beneficis específics d’aquest producte.",
+        'lista_ingredientes': LISTA_INGREDIENTES_POR_DEFECTO,
+        'modo_aplicacion': "Aplicar segons les necessitats específiques del producte.\nPer obtenir millors resultats, utilitzar regularment.",
+        'formato': "Envàs dissenyat per preservar la qualitat del producte.",
+    },
+}
+
+
+def textos_por_defecto(idioma: str = IDIOMA_POR_DEFECTO) -> Dict[str, str]:
+    return TEXTOS_POR_DEFECTO[normalizar_idioma(idioma)]
+
+
+MAX_INGREDIENTES_ACTIVOS = 4
+
+
+def _filtro_texto(valor) -> Markup:
+    """Escapa el texto, convierte saltos de línea en <br> y neutraliza 'style=' (prohibido en el formato)"""
+    texto = str(valor or "").strip().replace('style=', 'style =')
+    return Markup('<br>').join(escape(linea.strip()) for linea in texto.splitlines() if linea.strip())
+
+
+# Entorno y plantilla compilados una sola vez por proceso
+_ENTORNO = Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+_ENTORNO.filters['texto'] = _filtro_texto
+_PLANTILLA = _ENTORNO.from_string(PLANTILLA_SHOPIFY)
+
+
+def construir_contexto(product_data, textos: Optional[Dict] = None, idioma: str = IDIOMA_POR_DEFECTO) -> Dict:
+    """
+    Contexto de la plantilla a partir de ProductData
+
+    La investigación guarda la prosa del ProductData en español, así que en otro idioma solo se
+    usan los textos redactados por la IA y, si faltan, los textos por defecto de ese idioma.
+
+    Args:
+        textos: prosa redactada por la IA (descripcion_corta, descripcion_detallada, modo_aplicacion,
+            formato e ingredientes {nombre: descripción}); tiene prioridad sobre los campos del ProductData
+        idioma: idioma de los títulos de sección y de los textos por defecto
+    """
+    idioma = normalizar_idioma(idioma)
+    por_defecto = textos_por_defecto(idioma)
+    # Campos del ProductData utilizables tal cual (solo si coinciden con el idioma de salida)
+    en_espanol = idioma == 'es'
+    textos = textos or {}
+    descripciones_ia = {k.upper(): v for k, v in (textos.get('ingredientes') or {}).items()}
+
+    ingredientes = []
+    for ingrediente in product_data.ingredientes_activos[:MAX_INGREDIENTES_ACTIVOS]:
+        nombre = str(ingrediente.get('nombre', '')).strip().upper()
+        if not nombre:
+            continue
+        descripcion = (descripciones_ia.get(nombre)
+                       or (en_espanol and ingrediente.get('descripcion'))
+                       or por_defecto['ingrediente_descripcion'])
+        ingredientes.append({'nombre': nombre, 'descripcion': descripcion})
+    if not ingredientes:
+        ingredientes.append({
+            'nombre': por_defecto['ingrediente_nombre'],
+            'descripcion': por_defecto['ingrediente_descripcion']
+        })
+
+    # Nombres INCI en mayúsculas, como en el resto del catálogo
+    lista_inci = formatear_lista_inci(parsear_lista_inci(product_data.ingredientes_completos)).upper()
+
+    return {
+        'titulos': titulos_secciones(idioma),
+        'nombre': product_data.nombre or "Producto",
+        'descripcion_corta': (textos.get('descripcion_corta')
+                              or (en_espanol and product_data.descripcion_corta)
+                              or product_data.nombre),
+        'descripcion_detallada': textos.get('descripcion_detallada') or por_defecto['descripcion_detallada'],
+        'ingredientes_activos': ingredientes,
+        'lista_ingredientes': lista_inci or por_defecto['lista_ingredientes'],
+        'modo_aplicacion': (textos.get('modo_aplicacion')
+                            or (en_espanol and product_data.modo_aplicacion)
+                            or por_defecto['modo_aplicacion']),
+        'formato': (textos.get('formato')
+                    or (en_espanol and product_data.formato)
+                    or por_defecto['formato']),
+    }
+
+
+def renderizar_descripcion_html(product_data, textos: Optional[Dict] = None, idioma: str = IDIOMA_POR_DEFECTO) -> str:
+    """Renderiza la descripción Shopify de un producto sin llamar a la IA"""
+    return _PLANTILLA.render(construir_contexto(product_data, textos, idioma))
+
+
+def renderizar_lote(productos: Iterable, textos_por_producto: Optional[List[Optional[Dict]]] = None,
+                    idioma: str = IDIOMA_POR_DEFECTO) -> Iterator[str]:
+    """Renderiza una lista de productos con la plantilla ya compilada"""
+    textos_por_producto = textos_por_producto or []
+    for indice, product_data in enumerate(productos):
+        textos = textos_por_producto[indice] if indice < len(textos_por_producto) else None
+        yield renderizar_descripcion_html(product_data, textos, idioma)
@@ -0,0 +1,140 @@
+# tools/html_description_generator/html_stream_validator.py
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Títulos de sección del formato Shopify por idioma (la estructura es la misma en todos)
+TITULOS_SECCIONES = {
+    'es': {
+        'ingredientes_activos': 'Ingredientes activos',
+        'lista_ingredientes': 'Lista de Ingredientes',
+        'modo_aplicacion': 'Método de aplicación',
+        'formato': 'Formato',
+    },
+    'en': {
+        'ingredientes_activos': 'Active ingredients',
+        'lista_ingredientes': 'Ingredient List',
+        'modo_aplicacion': 'How to use',
+        'formato': 'Format',
+    },
+    'ca': {
+        'ingredientes_activos': 'Ingredients actius',
+        'lista_ingredientes': 'Llista d’ingredients',
+        'modo_aplicacion': 'Mètode d’aplicació',
+        'formato': 'Format',
+    },
+}
+IDIOMA_POR_DEFECTO = 'es'
+
+
+def normalizar_idioma(idioma: str) -> str:
+    """Código de idioma con títulos definidos ('en-GB' -> 'en'); el español si no hay traducción"""
+    codigo = (idioma or '').lower()[:2]
+    return codigo if codigo in TITULOS_SECCIONES else IDIOMA_POR_DEFECTO
+
+
+def titulos_secciones(idioma: str = IDIOMA_POR_DEFECTO) -> Dict[str, str]:
+    return TITULOS_SECCIONES[normalizar_idioma(idioma)]
+
+
+def elementos_requeridos(idioma: str = IDIOMA_POR_DEFECTO) -> List[str]:
+    """Elementos obligatorios del formato Shopify, en el orden en que deben aparecer"""
+    titulos = titulos_secciones(idioma)
+    return [
+        '<p class="m-0">',
+        f'<h2><span>{titulos["ingredientes_activos"]}</span></h2>',
+        '<ul>',
+        '<li>',
+        f'<h2>{titulos["lista_ingredientes"]}</h2>',
+        f'<h2>{titulos["modo_aplicacion"]}</h2>',
+        f'<h2>{titulos["formato"]}</h2>',
+    ]
+
+CIERRE_REQUERIDO = '<p> </p>'
+
+# Si tras estos caracteres no ha aparecido el párrafo inicial, la respuesta no sigue el formato
+MAX_CARACTERES_SIN_INICIO = 400
+
+_PATRON_CSS = re.compile(r'style=|<style', re.IGNORECASE)
+_PATRON_BLOQUE_MARKDOWN = re.compile(r'^```(?:html)?\s*|\s*```$')
+
+
+def limpiar_html_generado(html: str) -> str:
+    """Quita el bloque markdown que algunos modelos añaden alrededor del HTML"""
+    return _PATRON_BLOQUE_MARKDOWN.sub('', html.strip()).strip()
+
+
+def validar_estructura_html(html: str, idioma: str = IDIOMA_POR_DEFECTO) -> Tuple[bool, List[str]]:
+    """Valida que el HTML completo tenga el formato correcto (títulos en el idioma indicado)"""
+    errores = [f"Falta elemento requerido: {elemento}" for elemento in elementos_requeridos(idioma) if elemento not in html]
+
+    if _PATRON_CSS.search(html):
+        errores.append("Contiene CSS inline no permitido")
+
+    if not html.endswith(CIERRE_REQUERIDO):
+        errores.append(f"No termina con {CIERRE_REQUERIDO}")
+
+    return len(errores) == 0, errores
+
+
+class ValidadorHTMLIncremental:
+    """
+    Valida el HTML a medida que llega en streaming
+
+    Los elementos requeridos deben aparecer en orden; en cuanto aparece un <h2> posterior sin
+    que se haya visto un elemento anterior, ese elemento falta con seguridad y se aborta sin
+    esperar al resto de la respuesta. También se aborta ante CSS inline o si la respuesta no
+    arranca con el párrafo inicial.
+    """
+
+    def __init__(self, idioma: str = IDIOMA_POR_DEFECTO):
+        self.idioma = idioma
+        self.elementos = elementos_requeridos(idioma)
+        self.html = ""
+        self.secciones_completadas: List[str] = []
+        self.motivo_aborto: Optional[str] = None
+        self._siguiente = 0
+        self._revisado_hasta = 0
+
+    def alimentar(self, fragmento: str) -> bool:
+        """
+        Añade un fragmento y revisa la parte nueva
+
+        Returns:
+            bool: False si la respuesta ya no puede cumplir el formato
+        """
+        if self.motivo_aborto:
+            return False
+        self.html += fragmento
+
+        # Solo se revisa la zona nueva más un margen para marcadores partidos entre fragmentos
+        inicio = max(0, self._revisado_hasta - 64)
+        ventana = self.html[inicio:]
+        self._revisado_hasta = len(self.html)
+
+        if _PATRON_CSS.search(ventana):
+            self.motivo_aborto = "Contiene CSS inline no permitido"
+            return False
+
+        while self._siguiente < len(self.elementos):
+            elemento = self.elementos[self._siguiente]
+            if elemento in self.html:
+                self.secciones_completadas.append(elemento)
+                self._siguiente += 1
+                continue
+            # Un <h2> posterior ya emitido implica que el elemento esperado no va a llegar
+            if any(e.startswith('<h2') and e in self.html for e in self.elementos[self._siguiente + 1:]):
+                self.motivo_aborto = f"Falta elemento requerido: {elemento}"
+                return False
+            break
+
+        if self._siguiente == 0 and len(limpiar_html_generado(self.html)) > MAX_CARACTERES_SIN_INICIO:
+            self.motivo_aborto = f"Falta elemento requerido: {self.elementos[0]}"
+            return False
+
+        return True
+
+    def finalizar(self) -> Tuple[bool, List[str]]:
+        """Validación completa del HTML recibido"""
+        if self.motivo_aborto:
+            return False, [self.motivo_aborto]
+        return validar_estructura_html(limpiar_html_generado(self.html), self.idioma)
@@ -0,0 +1,163 @@
+# tools/html_description_generator/inci_dictionary.py
+import os
+import json
+import unicodedata
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+RUTA_DATOS_INCI = os.path.join(os.path.dirname(__file__), "data", "inci_ingredientes.json")
+
+
+def normalizar_texto_inci(texto: str) -> str:
+    """Minúsculas y sin acentos para comparar nombres INCI y comunes"""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+@dataclass
+class IngredienteINCI:
+    """Entrada del diccionario INCI local"""
+    inci: str
+    nombre_comun: str = ""
+    alias: List[str] = field(default_factory=list)
+    funciones: List[str] = field(default_factory=list)
+    comedogenicidad: int = 0
+    seguridad: str = "alta"  # alta, media, precaución
+    notas: str = ""
+
+
+class AhoCorasickMatcher:
+    """
+    Autómata Aho–Corasick para localizar todos los patrones en un texto en una sola pasada
+
+    Solo acepta coincidencias en límites de palabra y resuelve solapamientos quedándose con
+    la coincidencia más larga más a la izquierda.
+    """
+
+    def __init__(self, patrones: Dict[str, str]):
+        # Nodo: transiciones, enlace de fallo y patrones (longitud, clave) que terminan en él
+        self._transiciones: List[Dict[str, int]] = [{}]
+        self._fallo: List[int] = [0]
+        self._salidas: List[List[Tuple[int, str]]] = [[]]
+
+        for patron, clave in patrones.items():
+            self._insertar(patron, clave)
+        self._construir_enlaces()
+
+    def _insertar(self, patron: str, clave: str):
+        nodo = 0
+        for caracter in patron:
+            siguiente = self._transiciones[nodo].get(caracter)
+            if siguiente is None:
+                siguiente = len(self._transiciones)
+                self._transiciones.append({})
+                self._fallo.append(0)
+                self._salidas.append([])
+                self._transiciones[nodo][caracter] = siguiente
+            nodo = siguiente
+        self._salidas[nodo].append((len(patron), clave))
+
+    def _construir_enlaces(self):
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for caracter, hijo in self._transiciones[nodo].items():
+                cola.append(hijo)
+                fallo = self._fallo[nodo]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[hijo] = destino if destino != hijo else 0
+                self._salidas[hijo].extend(self._salidas[self._fallo[hijo]])
+
+    def buscar(self, texto: str) -> List[Tuple[int, int, str]]:
+        """Devuelve (inicio, fin, clave) de las coincidencias no solapadas"""
+        candidatos = []
+        nodo = 0
+        transiciones, fallo, salidas = self._transiciones, self._fallo, self._salidas
+
+        for posicion, caracter in enumerate(texto):
+            while nodo and caracter not in transiciones[nodo]:
+                nodo = fallo[nodo]
+            nodo = transiciones[nodo].get(caracter, 0)
+
+            for longitud, clave in salidas[nodo]:
+                inicio, fin = posicion - longitud + 1, posicion + 1
+                if (inicio == 0 or not texto[inicio - 1].isalnum()) and (fin == len(texto) or not texto[fin].isalnum()):
+                    candidatos.append((inicio, fin, clave))
+
+        candidatos.sort(key=lambda c: (c[0], -(c[1] - c[0])))
+        resultado = []
+        ultimo_fin = -1
+        for inicio, fin, clave in candidatos:
+            if inicio >= ultimo_fin:
+                resultado.append((inicio, fin, clave))
+                ultimo_fin = fin
+        return resultado
+
+
+class INCIDictionary:
+    """
+    Diccionario INCI local con función, comedogenicidad y notas de seguridad
+
+    Sustituye a las consultas simuladas con IA: toda búsqueda se resuelve en memoria.
+    """
+
+    def __init__(self, ruta_datos: str = RUTA_DATOS_INCI):
+        with open(ruta_datos, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+
+        self.ingredientes: Dict[str, IngredienteINCI] = {}
+        patrones: Dict[str, str] = {}
+
+        for entrada in datos.get('ingredientes', []):
+            ingrediente = IngredienteINCI(**entrada)
+            self.ingredientes[ingrediente.inci] = ingrediente
+            for nombre in [ingrediente.inci, ingrediente.nombre_comun] + ingrediente.alias:
+                if nombre:
+                    patrones.setdefault(normalizar_texto_inci(nombre), ingrediente.inci)
+
+        self._indice_nombres = patrones
+        self._matcher = AhoCorasickMatcher(patrones)
+
+    def buscar(self, nombre: str) -> Optional[IngredienteINCI]:
+        """Busca un ingrediente por nombre INCI, nombre común o alias exacto"""
+        inci = self._indice_nombres.get(normalizar_texto_inci(nombre.strip()))
+        return self.ingredientes.get(inci) if inci else None
+
+    def detectar(self, texto: str) -> List[IngredienteINCI]:
+        """Ingredientes conocidos presentes en un texto libre, sin repetir y en orden de aparición"""
+        vistos = []
+        for _, _, inci in self._matcher.buscar(normalizar_texto_inci(texto)):
+            if inci not in vistos:
+                vistos.append(inci)
+        return [self.ingredientes[inci] for inci in vistos]
+
+    def analizar(self, texto: str) -> Dict:
+        """Perfil agregado de un texto de ingredientes: funciones, comedogenicidad y alertas"""
+        detectados = self.detectar(texto)
+
+        funciones: Dict[str, List[str]] = {}
+        for ingrediente in detectados:
+            for funcion in ingrediente.funciones:
+                funciones.setdefault(funcion, []).append(ingrediente.inci)
+
+        comedogenicos = [i for i in detectados if i.comedogenicidad >= 3]
+        alertas = [f"{i.inci}: {i.notas}" for i in detectados if i.seguridad != "alta" and i.notas]
+
+        return {
+            'ingredientes': detectados,
+            'funciones': funciones,
+            'comedogenicidad_maxima': max((i.comedogenicidad for i in detectados), default=0),
+            'comedogenicos': [i.inci for i in comedogenicos],
+            'alertas': alertas,
+            'apto_piel_sensible': not any(i.seguridad == "precaución" for i in detectados)
+        }
+
+
+@lru_cache(maxsize=1)
+def obtener_diccionario_inci() -> INCIDictionary:
+    """Instancia compartida del diccionario (se carga una sola vez por proceso)"""
+    return INCIDictionary()
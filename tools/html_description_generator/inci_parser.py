@@ -0,0 +1,207 @@
+# tools/html_description_generator/inci_parser.py
+import re
+from functools import lru_cache
+from html import unescape
+from typing import Dict, Iterable, Iterator, List
+
+# Todos los separadores habituales se sustituyen por coma para dividir con un único str.split
+_SEPARADORES = ('•', '·', ';', '|', '\n', '\r')
+
+_PATRON_PARENTESIS = re.compile(r'\([^()]*\)|\[[^\[\]]*\]')
+_PATRON_PREFIJO = re.compile(r'^\s*(ingredients?|ingredientes?|inci|composici[oó]n|composition)\s*[:.\-]\s*', re.IGNORECASE)
+_PATRON_PUEDE_CONTENER = re.compile(r'\+/-|may contain|puede contener|peut contenir', re.IGNORECASE)
+_PATRON_ESPACIOS = re.compile(r'\s+')
+PATRON_ETIQUETA_INCI = re.compile(r'ingredients?|ingredientes?|\binci\b|composici[oó]n|composition', re.IGNORECASE)
+_PATRON_ETIQUETAS_HTML = re.compile(r'<[^>]*>')
+
+# Caracteres tras la etiqueta "Ingredients" en los que se busca la lista, y etiquetas revisadas
+VENTANA_INCI_HTML = 4000
+MAX_ETIQUETAS_INCI_HTML = 25
+
+# Alias frecuentes que no son el nombre INCI canónico
+ALIAS_INCI = {
+    'water': 'Aqua', 'eau': 'Aqua', 'agua': 'Aqua', 'aqua/water': 'Aqua', 'water/aqua': 'Aqua',
+    'aqua/water/eau': 'Aqua', 'purified water': 'Aqua', 'deionized water': 'Aqua',
+    'fragrance': 'Parfum', 'perfume': 'Parfum', 'parfum/fragrance': 'Parfum', 'fragrance/parfum': 'Parfum',
+    'glycerine': 'Glycerin', 'glicerina': 'Glycerin',
+    'vitamin e': 'Tocopherol', 'vitamina e': 'Tocopherol',
+    'hyaluronic acid': 'Sodium Hyaluronate',
+    'shea butter': 'Butyrospermum Parkii Butter',
+    'mineral oil': 'Paraffinum Liquidum',
+    'alcohol denat': 'Alcohol Denat.',
+}
+
+# Siglas que se mantienen en mayúsculas al normalizar el formato
+_SIGLAS = {'peg', 'ppg', 'edta', 'pca', 'bht', 'bha', 'aha', 'ci', 'dna', 'pvp', 'mea', 'dea', 'tea', 'hcl', 'spf', 'uv', 'cbd'}
+
+# Un token más largo que esto no es un ingrediente sino prosa
+_MAX_PALABRAS_INGREDIENTE = 6
+
+
+def canonicalizar_ingrediente(token: str) -> str:
+    """Nombre INCI canónico de un token (alias resueltos y formato Title Case con siglas)"""
+    return _canonicalizar_con_clave(token)[0]
+
+
+@lru_cache(maxsize=32768)
+def _canonicalizar_con_clave(token: str):
+    """(nombre canónico, clave de deduplicación); ('', '') si el token está vacío o es prosa"""
+    limpio = _PATRON_ESPACIOS.sub(' ', token).strip(' .-*:')
+    if not limpio or limpio.count(' ') >= _MAX_PALABRAS_INGREDIENTE:
+        return '', ''
+
+    alias = ALIAS_INCI.get(limpio.lower())
+    if alias:
+        return alias, alias.lower()
+
+    palabras = []
+    for palabra in limpio.split(' '):
+        base = palabra.lower()
+        raiz = base.split('-', 1)[0]
+        if raiz in _SIGLAS or base in _SIGLAS or any(c.isdigit() for c in base) and '-' not in base:
+            palabras.append(palabra.upper())
+        elif '-' in base:
+            # PEG-40, Ceteareth-20, Alpha-Arbutin
+            partes = base.split('-')
+            palabras.append('-'.join(p.upper() if p in _SIGLAS or p.isdigit() else p.capitalize() for p in partes))
+        elif '/' in base:
+            palabras.append('/'.join(p.capitalize() for p in base.split('/')))
+        else:
+            palabras.append(base.capitalize())
+    nombre = ' '.join(palabras)
+    return nombre, nombre.lower()
+
+
+def _dividir(texto: str) -> List[str]:
+    """Tokens crudos sin prefijos, alias entre paréntesis ni marcas 'may contain'"""
+    inicio = texto[:16].lower()
+    if 'ingr' in inicio or 'inci' in inicio or 'compos' in inicio:
+        texto = _PATRON_PREFIJO.sub('', texto)
+    if '(' in texto or '[' in texto:
+        # "AQUA (WATER)": el contenido entre paréntesis es un alias del nombre que lo precede
+        texto = _PATRON_PARENTESIS.sub('', texto)
+    if '+/-' in texto or 'ay contain' in texto or 'ontener' in texto or 'ontenir' in texto:
+        texto = _PATRON_PUEDE_CONTENER.sub(',', texto)
+    # str.replace encadenado es varias veces más rápido que str.translate con tabla unicode
+    for separador in _SEPARADORES:
+        if separador in texto:
+            texto = texto.replace(separador, ',')
+
+    tokens = texto.split(',')
+    # "1,2-Hexanediol": la coma entre dígitos forma parte del nombre
+    i = len(tokens) - 1
+    while i > 0:
+        previo, actual = tokens[i - 1], tokens[i]
+        if previo[-1:].isdigit() and actual[:1].isdigit():
+            tokens[i - 1:i + 1] = [previo + ',' + actual]
+        i -= 1
+    return tokens
+
+
+def tokenizar_inci(texto: str) -> Iterator[str]:
+    """Genera los tokens crudos de una lista INCI (sin paréntesis, prefijos ni marcas 'may contain')"""
+    if not texto:
+        return
+    for token in _dividir(texto):
+        token = token.strip()
+        if token:
+            yield token
+
+
+def parsear_lista_inci(texto: str) -> List[str]:
+    """Lista INCI normalizada, sin duplicados y en el orden original (orden de concentración)"""
+    if not texto:
+        return []
+    vistos = set()
+    resultado = []
+    canonicalizar = _canonicalizar_con_clave
+    for token in _dividir(texto):
+        nombre, clave = canonicalizar(token)
+        if clave and clave not in vistos:
+            vistos.add(clave)
+            resultado.append(nombre)
+    return resultado
+
+
+def es_lista_inci(texto: str, min_ingredientes: int = 3) -> bool:
+    """Indica si un texto parece una lista de ingredientes y no una descripción en prosa"""
+    if not texto:
+        return False
+    tokens = list(tokenizar_inci(texto))
+    if len(tokens) < min_ingredientes:
+        return False
+    cortos = sum(1 for token in tokens if token.count(' ') < _MAX_PALABRAS_INGREDIENTE)
+    return cortos / len(tokens) >= 0.7
+
+
+def buscar_lista_inci_en_html(html: str, min_ingredientes: int = 5) -> str:
+    """
+    Primera lista INCI del HTML en bruto, sin construir el árbol DOM
+
+    Revisa el texto que sigue a cada etiqueta "Ingredients"/"INCI"/"Composición": cada nodo de
+    texto (las etiquetas HTML hacen de separador) se prueba con es_lista_inci.
+    """
+    if not html:
+        return ""
+    for indice, coincidencia in enumerate(PATRON_ETIQUETA_INCI.finditer(html)):
+        if indice >= MAX_ETIQUETAS_INCI_HTML:
+            break
+        fragmento = html[coincidencia.end():coincidencia.end() + VENTANA_INCI_HTML]
+        for nodo in _PATRON_ETIQUETAS_HTML.split(fragmento):
+            nodo = unescape(nodo).strip(' \t\r\n:.-"')
+            if es_nodo_lista_inci(nodo, min_ingredientes):
+                return _PATRON_ESPACIOS.sub(' ', nodo)
+    return ""
+
+
+def es_nodo_lista_inci(texto: str, min_ingredientes: int = 5) -> bool:
+    """Indica si un nodo de texto suelto de una página es una lista INCI completa"""
+    return len(texto) > 40 and ',' in texto and es_lista_inci(texto, min_ingredientes)
+
+
+def parsear_listas_inci(textos: Iterable[str]) -> Iterator[List[str]]:
+    """Versión en streaming para lotes grandes de listas"""
+    for texto in textos:
+        yield parsear_lista_inci(texto)
+
+
+def fusionar_listas_inci(listas: List[List[str]], min_apariciones: int = 1, lista_base: int = 0) -> List[str]:
+    """
+    Fusiona varias listas INCI de forma estructural
+
+    Cada ingrediente se ordena por su posición relativa media en las listas donde aparece, de
+    modo que se respeta el orden de concentración. Los ingredientes de la lista base se conservan
+    siempre; los del resto solo si aparecen en al menos min_apariciones listas (validación cruzada).
+    """
+    posiciones: Dict[str, List[float]] = {}
+    nombres: Dict[str, str] = {}
+    primera_aparicion: Dict[str, int] = {}
+    en_base = set()
+    orden = 0
+
+    for idx_lista, lista in enumerate(listas):
+        if not lista:
+            continue
+        total = len(lista)
+        for posicion, nombre in enumerate(lista):
+            clave = nombre.lower()
+            if clave not in nombres:
+                nombres[clave] = nombre
+                primera_aparicion[clave] = orden
+                posiciones[clave] = []
+            orden += 1
+            posiciones[clave].append(posicion / total)
+            if idx_lista == lista_base:
+                en_base.add(clave)
+
+    seleccionados = [
+        clave for clave in nombres
+        if clave in en_base or len(posiciones[clave]) >= min_apariciones
+    ]
+    seleccionados.sort(key=lambda clave: (sum(posiciones[clave]) / len(posiciones[clave]), primera_aparicion[clave]))
+    return [nombres[clave] for clave in seleccionados]
+
+
+def formatear_lista_inci(ingredientes: List[str], separador: str = " • ") -> str:
+    """Une una lista INCI con el separador usado en las descripciones HTML"""
+    return separador.join(ingredientes)
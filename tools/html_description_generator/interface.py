@@ -2,11 +2,16 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from utils.shopify_csv import ShopifyCSVStream, validar_columnas_shopify
+from utils.structured_output import METRICAS_SALIDA_ESTRUCTURADA
+from utils.http_fetch import METRICAS_HTTP
+from utils.http_cache import obtener_cache_http
+from utils.browser_pool import obtener_pool_navegadores
+from utils.adaptive_concurrency import obtener_controlador_concurrencia
 from .processor import (
     process_descriptions_streamlit,
     create_download_files,
     create_zip_download,
-    validar_csv_productos,
     estimar_tiempo_procesamiento,
     obtener_muestra_productos
 )
@@ -14,6 +19,10 @@ from .processor import (
 def render(config=None):
     """Función principal para renderizar la interfaz de generación HTML"""
     
+    # Guardar la configuración del sidebar (API key y modelo) para las pestañas
+    if config:
+        st.session_state['sidebar_config'] = config
+    
     st.title("🧪 Generador de Descripciones HTML para Cosmética")
     st.markdown("---")
     
@@ -78,33 +87,34 @@ def render_upload_tab():
     
     if uploaded_file is not None:
         try:
-            # Leer CSV
-            df = pd.read_csv(uploaded_file, encoding='utf-8')
+            # Leer CSV por bloques: las variantes se agrupan por Handle y no se carga el archivo completo
+            df = ShopifyCSVStream(uploaded_file, encoding='utf-8')
             
-            # Validar formato
-            es_valido, mensaje = validar_csv_productos(df)
+            # Validar formato antes de agrupar por Handle
+            es_valido, mensaje = validar_columnas_shopify(df.columns)
             
             if es_valido:
+                resumen = df.resumen()
                 st.success(mensaje)
                 
-                # Guardar en session state
+                # Guardar en session state (el stream admite len() y head() como un DataFrame)
                 st.session_state['productos_df'] = df
                 st.session_state['archivo_nombre'] = uploaded_file.name
                 
                 # Mostrar resumen
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Total de productos", len(df))
+                    st.metric("Total de productos", resumen['total_productos'])
                 with col2:
-                    marcas_unicas = df['Vendor'].nunique() if 'Vendor' in df.columns else 'N/A'
+                    marcas_unicas = resumen['marcas_unicas'] if resumen['marcas_unicas'] is not None else 'N/A'
                     st.metric("Marcas únicas", marcas_unicas)
                 with col3:
-                    precio_promedio = f"${df['Variant Price'].mean():.2f}" if 'Variant Price' in df.columns else 'N/A'
+                    precio_promedio = f"${resumen['precio_promedio']:.2f}" if resumen['precio_promedio'] is not None else 'N/A'
                     st.metric("Precio promedio", precio_promedio)
                 
                 # Mostrar muestra
                 st.markdown("### 👀 Vista previa de productos")
-                muestra_df = obtener_muestra_productos(df, n=3)
+                muestra_df = obtener_muestra_productos(df.muestra(3), n=3)
                 st.dataframe(muestra_df, use_container_width=True)
                 
             else:
@@ -501,6 +511,18 @@ def render_test_individual_tab():
                 index=0,
                 help="Idioma para generar la descripción HTML"
             )
+            
+            usar_cache = st.checkbox(
+                "♻️ Reutilizar investigación en caché",
+                value=True,
+                help="Si el producto ya se investigó, genera el HTML directamente desde la caché sin repetir la búsqueda"
+            )
+            
+            html_completo_ia = st.checkbox(
+                "⚡ HTML completo con IA (streaming)",
+                value=False,
+                help="La IA escribe todo el HTML en vivo y se valida por secciones según llega; sin marcar, la plantilla pone la estructura y la IA solo redacta los textos"
+            )
         
         # URLs específicas (si se selecciona ese método)
         urls_especificas = []
@@ -528,7 +550,8 @@ def render_test_individual_tab():
         try:
             # Inicializar generador
             from .generator import SimpleHTMLDescriptionGenerator
-            generator = SimpleHTMLDescriptionGenerator(api_key=st.session_state['openai_api_key'])
+            modelo_gpt = st.session_state.get('sidebar_config', {}).get('modelo_gpt')
+            generator = SimpleHTMLDescriptionGenerator(api_key=st.session_state['openai_api_key'], modelo_gpt=modelo_gpt)
             
             # Mostrar inicio
             with log_container.container():
@@ -542,13 +565,15 @@ def render_test_individual_tab():
             if metodo_busqueda == "auto":
                 product_data = generator.buscar_informacion_web_real(
                     nombre_producto=nombre_producto,
-                    codigo_barras=codigo_barras
+                    codigo_barras=codigo_barras,
+                    usar_cache=usar_cache
                 )
             else:
                 product_data = generator.buscar_producto_simple(
                     nombre_producto=nombre_producto,
                     codigo_barras=codigo_barras,
-                    urls_especificas=urls_especificas
+                    urls_especificas=urls_especificas,
+                    usar_cache=usar_cache
                 )
             
             # Mostrar logs de progreso
@@ -563,12 +588,33 @@ def render_test_individual_tab():
                     emoji = status_emoji.get(log["status"], "📝")
                     st.write(f"{emoji} **[{log['timestamp']}]** {log['message']}")
             
+            # Estado de cada URL específica (ok, sin datos, error o plazo agotado)
+            estado_urls = generator.get_estado_urls()
+            if estado_urls:
+                with st.expander(f"🔗 Estado de las URLs específicas ({sum(e.estado == 'ok' for e in estado_urls)}/{len(estado_urls)} con datos)"):
+                    st.dataframe(pd.DataFrame([vars(e) for e in estado_urls]), use_container_width=True)
+            
             # Generar HTML
             st.write("🎨 **Generando HTML con máxima calidad...**")
-            html_description = generator.generar_html_limpio(product_data, idioma)
+            vista_previa_stream = st.empty()
+            
+            ultimo_render = {'longitud': 0}
+            
+            def mostrar_html_parcial(html_parcial: str):
+                # Repintar solo cada ~80 caracteres para no saturar el websocket de Streamlit
+                if len(html_parcial) - ultimo_render['longitud'] >= 80:
+                    ultimo_render['longitud'] = len(html_parcial)
+                    vista_previa_stream.markdown(html_parcial, unsafe_allow_html=True)
+            
+            html_description = generator.generar_html_limpio(
+                product_data, idioma,
+                on_fragmento=mostrar_html_parcial,
+                usar_plantilla=not html_completo_ia
+            )
+            vista_previa_stream.empty()
             
             # Validar HTML
-            es_valido, errores = generator.validar_html_formato(html_description)
+            es_valido, errores = generator.validar_html_formato(html_description, idioma)
             
             # Mostrar resultados
             st.markdown("### ✅ Resultado")
@@ -589,6 +635,12 @@ def render_test_individual_tab():
             with col4:
                 st.metric("📏 Longitud HTML", len(html_description), help="Caracteres en el HTML generado")
             
+            # Coste y latencia por etapa del enrutado de modelos
+            rutas_modelos = generator.router.informe()
+            if rutas_modelos:
+                with st.expander(f"💵 Coste por etapa (total estimado ${generator.router.coste_total():.4f})"):
+                    st.dataframe(pd.DataFrame.from_dict(rutas_modelos, orient='index'), use_container_width=True)
+            
             # Mostrar HTML generado
             st.markdown("### 📄 HTML Generado")
             
@@ -673,6 +725,43 @@ def render_results_tab():
         for key, value in config.items():
             st.markdown(f"**{key}:** {value}")
     
+    # Respuestas JSON de la IA por etapa (directas, reparadas localmente o perdidas)
+    metricas_json = METRICAS_SALIDA_ESTRUCTURADA.resumen()
+    if metricas_json:
+        with st.expander("🧩 Parseo de respuestas JSON por etapa"):
+            st.dataframe(
+                pd.DataFrame.from_dict(metricas_json, orient='index').sort_values('fallido', ascending=False),
+                use_container_width=True
+            )
+    
+    # Tiempos de red por host (DNS, conexión, TTFB, transferencia) y reutilización de conexiones
+    metricas_http = METRICAS_HTTP.resumen()
+    if metricas_http:
+        with st.expander("🌐 Tiempos HTTP por host"):
+            st.dataframe(
+                pd.DataFrame.from_dict(metricas_http, orient='index').sort_values('peticiones', ascending=False),
+                use_container_width=True
+            )
+            resumen_cache = obtener_cache_http().resumen()
+            st.caption(
+                f"Caché HTTP: {resumen_cache['entradas']} páginas ({resumen_cache['mb_disco']} MB en disco) · "
+                f"{resumen_cache['aciertos']} servidas sin red · {resumen_cache['revalidadas']} revalidadas (304) · "
+                f"{resumen_cache['mb_ahorrados']} MB sin descargar"
+            )
+            resumen_navegador = obtener_pool_navegadores().resumen()
+            if resumen_navegador['renderizados'] or resumen_navegador['errores']:
+                st.caption(
+                    f"Navegador headless: {resumen_navegador['renderizados']} páginas renderizadas "
+                    f"({resumen_navegador['tiempo_medio_s']} s de media) · dominios con JS: "
+                    f"{', '.join(resumen_navegador['dominios_js'])}"
+                )
+    
+    # Límite AIMD vivo de cada dominio (sube con respuestas sanas, se recorta con 429/503 o latencia)
+    estado_concurrencia = obtener_controlador_concurrencia().resumen()
+    if estado_concurrencia:
+        with st.expander("🚦 Concurrencia adaptativa por dominio"):
+            st.dataframe(pd.DataFrame(estado_concurrencia), use_container_width=True, hide_index=True)
+    
     # Vista previa de descripciones
     if not df_results.empty:
         st.markdown("### 👀 Vista previa de descripciones generadas")
@@ -0,0 +1,301 @@
+# tools/html_description_generator/knowledge_base.py
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from dataclasses import asdict, is_dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from .product_cache import normalizar_nombre_producto, normalizar_codigo_barras, campos_frescos, VERSION_GENERADOR
+
+
+def normalizar_gtin(codigo_barras: str) -> Optional[str]:
+    """
+    Normaliza un EAN-8/UPC-A/EAN-13/GTIN-14 a GTIN-14 validando el dígito de control
+
+    Returns:
+        str: GTIN de 14 dígitos o None si el código no es válido
+    """
+    digitos = normalizar_codigo_barras(codigo_barras)
+    if len(digitos) not in (8, 12, 13, 14):
+        return None
+
+    gtin = digitos.zfill(14)
+    cuerpo, control = gtin[:-1], int(gtin[-1])
+    # Pesos 3,1,3,1... empezando por la derecha del cuerpo
+    suma = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(cuerpo)))
+    if (10 - suma % 10) % 10 != control:
+        return None
+    return gtin
+
+
+def clave_marca_nombre(marca: str, nombre: str) -> str:
+    """Clave normalizada marca+nombre (sin repetir la marca si el nombre ya la incluye)"""
+    marca_norm = normalizar_nombre_producto(marca or "")
+    nombre_norm = normalizar_nombre_producto(nombre or "")
+    if marca_norm and nombre_norm.startswith(marca_norm + " "):
+        nombre_norm = nombre_norm[len(marca_norm) + 1:]
+    return f"{marca_norm}|{nombre_norm}"
+
+
+class ProductKnowledgeBase:
+    """
+    Base de conocimiento local de productos indexada por GTIN y por marca+nombre
+
+    Guarda en SQLite el ProductData sintetizado, la lista INCI y una instantánea de las fuentes
+    usadas. Un código de barras conocido se resuelve con una única lectura indexada, sin repetir
+    la investigación aunque el mismo SKU aparezca en otra tienda o idioma.
+
+    Como en ProductDataCache, las búsquedas ignoran los productos de otra versión del generador
+    y descartan los campos caducados; si falta alguno esencial, el producto no se devuelve.
+    """
+
+    def __init__(self, db_path: str = "./product_cache/knowledge_base.sqlite", version: str = VERSION_GENERADOR,
+                 frescura_dias: Optional[Dict[str, int]] = None):
+        directorio = os.path.dirname(db_path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.db_path = db_path
+        self.version = version
+        self.frescura_dias = frescura_dias
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(db_path, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        with self._lock, self._conexion:
+            self._conexion.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS productos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    gtin TEXT UNIQUE,
+                    clave_marca_nombre TEXT NOT NULL,
+                    marca TEXT,
+                    nombre TEXT,
+                    inci TEXT,
+                    product_data TEXT NOT NULL,
+                    version TEXT,
+                    actualizado REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_productos_marca_nombre ON productos (clave_marca_nombre);
+                CREATE TABLE IF NOT EXISTS fuentes (
+                    producto_id INTEGER NOT NULL REFERENCES productos(id) ON DELETE CASCADE,
+                    source_url TEXT,
+                    source_type TEXT,
+                    snapshot TEXT,
+                    capturado REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_fuentes_producto ON fuentes (producto_id);
+            """)
+
+    def _a_product_data(self, fila: Optional[sqlite3.Row], clase_datos) -> Optional[object]:
+        """ProductData de la fila con los campos frescos (None si falta alguno esencial)"""
+        if fila is None:
+            return None
+        valores = json.loads(fila['product_data'])
+        actualizado = fila['actualizado'] or 0
+        product_data, _ = campos_frescos(
+            valores, {campo: actualizado for campo in valores}, clase_datos, self.frescura_dias
+        )
+        return product_data
+
+    def buscar_por_gtin(self, codigo_barras: str, clase_datos) -> Optional[object]:
+        """Devuelve el ProductData de un código de barras conocido"""
+        gtin = normalizar_gtin(codigo_barras)
+        if not gtin:
+            return None
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT product_data, actualizado FROM productos WHERE gtin = ? AND version = ?",
+                (gtin, self.version)
+            ).fetchone()
+        return self._a_product_data(fila, clase_datos)
+
+    def buscar_por_marca_nombre(self, marca: str, nombre: str, clase_datos) -> Optional[object]:
+        """Devuelve el ProductData más reciente para una marca y nombre"""
+        with self._lock:
+            fila = self._conexion.execute(
+                """SELECT product_data, actualizado FROM productos WHERE clave_marca_nombre = ? AND version = ?
+                   ORDER BY actualizado DESC LIMIT 1""",
+                (clave_marca_nombre(marca, nombre), self.version)
+            ).fetchone()
+        return self._a_product_data(fila, clase_datos)
+
+    def obtener_fuentes(self, codigo_barras: str) -> List[Dict]:
+        """Instantáneas de las fuentes usadas para sintetizar un producto"""
+        gtin = normalizar_gtin(codigo_barras)
+        if not gtin:
+            return []
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT f.snapshot FROM fuentes f JOIN productos p ON p.id = f.producto_id WHERE p.gtin = ?",
+                (gtin,)
+            ).fetchall()
+        return [json.loads(fila['snapshot']) for fila in filas]
+
+    def guardar(self, product_data, codigo_barras: str = "", fuentes: Optional[List] = None,
+                version: Optional[str] = None) -> Optional[int]:
+        """Inserta o actualiza un producto (el GTIN manda; sin GTIN se indexa solo por marca+nombre)"""
+        with self._lock, self._conexion:
+            return self._guardar_sin_lock(product_data, codigo_barras, fuentes,
+                                          self.version if version is None else version)
+
+    def _guardar_sin_lock(self, product_data, codigo_barras: str, fuentes: Optional[List], version: str,
+                          actualizado: Optional[float] = None) -> Optional[int]:
+        """actualizado: fecha original de la investigación al importar (None: ahora, guardado en vivo)"""
+        datos = asdict(product_data) if is_dataclass(product_data) else dict(product_data)
+        gtin = normalizar_gtin(codigo_barras)
+        marca = datos.get('marca', '')
+        nombre = datos.get('nombre', '')
+        clave = clave_marca_nombre(marca, nombre)
+        ahora = actualizado if actualizado is not None else time.time()
+
+        existente = None
+        if gtin:
+            existente = self._conexion.execute("SELECT id FROM productos WHERE gtin = ?", (gtin,)).fetchone()
+        else:
+            existente = self._conexion.execute(
+                "SELECT id FROM productos WHERE gtin IS NULL AND clave_marca_nombre = ?", (clave,)
+            ).fetchone()
+
+        valores = (clave, marca, nombre, datos.get('ingredientes_completos', ''),
+                   json.dumps(datos, ensure_ascii=False), version, ahora)
+
+        if existente:
+            producto_id = existente['id']
+            self._conexion.execute(
+                """UPDATE productos SET clave_marca_nombre = ?, marca = ?, nombre = ?, inci = ?,
+                   product_data = ?, version = ?, actualizado = ? WHERE id = ?""",
+                valores + (producto_id,)
+            )
+        else:
+            cursor = self._conexion.execute(
+                """INSERT INTO productos (clave_marca_nombre, marca, nombre, inci, product_data, version, actualizado, gtin)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                valores + (gtin,)
+            )
+            producto_id = cursor.lastrowid
+
+        if fuentes:
+            self._conexion.execute("DELETE FROM fuentes WHERE producto_id = ?", (producto_id,))
+            self._conexion.executemany(
+                "INSERT INTO fuentes (producto_id, source_url, source_type, snapshot, capturado) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (producto_id, f.get('source_url', ''), f.get('source_type', ''), json.dumps(f, ensure_ascii=False), ahora)
+                    for f in (asdict(fuente) if is_dataclass(fuente) else dict(fuente) for fuente in fuentes)
+                ]
+            )
+
+        return producto_id
+
+    def importar_masivo(self, registros: Iterable[Dict], version: Optional[str] = None) -> Dict[str, int]:
+        """
+        Importa resultados de ejecuciones anteriores en una sola transacción
+
+        Cada registro puede traer 'product_data' (dict) o los campos de ProductData en plano,
+        además de 'codigo_barras' o 'gtin' y opcionalmente 'fuentes', 'version' (por defecto la
+        de la base) y 'actualizado' (timestamp de la investigación; sin él se toma la importación
+        como fecha, así que la frescura cuenta desde ahora).
+        """
+        version = self.version if version is None else version
+        resumen = {'importados': 0, 'con_gtin': 0, 'descartados': 0}
+
+        with self._lock, self._conexion:
+            for registro in registros:
+                datos = registro.get('product_data') or {
+                    k: v for k, v in registro.items()
+                    if k not in ('codigo_barras', 'gtin', 'fuentes', 'version', 'actualizado')
+                }
+                if not datos.get('nombre'):
+                    resumen['descartados'] += 1
+                    continue
+
+                codigo = registro.get('gtin') or registro.get('codigo_barras') or ''
+                self._guardar_sin_lock(datos, codigo, registro.get('fuentes'), registro.get('version') or version,
+                                       registro.get('actualizado'))
+                resumen['importados'] += 1
+                if normalizar_gtin(codigo):
+                    resumen['con_gtin'] += 1
+
+        return resumen
+
+    def importar_desde_cache(self, cache_dir: str = "./product_cache") -> Dict[str, int]:
+        """Importa todas las entradas de ProductDataCache (JSON por producto)"""
+        def registros():
+            for archivo in os.listdir(cache_dir):
+                if not archivo.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(cache_dir, archivo), 'r', encoding='utf-8') as f:
+                        entrada = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                campos = entrada.get('campos', {})
+                # La base guarda una sola fecha por producto: la del campo más antiguo, para que
+                # nada parezca más fresco de lo que era en la caché
+                fechas = [datos.get('actualizado') for datos in campos.values() if datos.get('actualizado')]
+                yield {
+                    'product_data': {campo: datos.get('valor') for campo, datos in campos.items()},
+                    'codigo_barras': entrada.get('codigo_barras', ''),
+                    'version': entrada.get('version', ''),
+                    'actualizado': min(fechas) if fechas else 0
+                }
+
+        return self.importar_masivo(registros())
+
+    def importar_jsonl(self, ruta: str) -> Dict[str, int]:
+        """Importa un archivo JSON Lines con un registro por línea"""
+        def registros():
+            with open(ruta, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    if linea.strip():
+                        yield json.loads(linea)
+
+        return self.importar_masivo(registros())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM productos").fetchone()[0]
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+@lru_cache(maxsize=4)
+def obtener_base_conocimiento(db_path: str = "./product_cache/knowledge_base.sqlite",
+                              version: str = VERSION_GENERADOR) -> ProductKnowledgeBase:
+    """Base de conocimiento compartida por ruta y versión (una sola conexión por proceso)"""
+    return ProductKnowledgeBase(db_path, version=version)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa investigaciones anteriores a la base de conocimiento")
+    parser.add_argument('--db', default="./product_cache/knowledge_base.sqlite", help="ruta de la base de conocimiento")
+    parser.add_argument('--desde-cache', help="directorio de ProductDataCache (un JSON por producto)")
+    parser.add_argument('--jsonl', help="archivo JSON Lines con un registro por línea")
+    parser.add_argument('--version', default=VERSION_GENERADOR,
+                        help="versión asignada a los registros que no la traen (por defecto la del generador)")
+    args = parser.parse_args(argv)
+
+    if not (args.desde_cache or args.jsonl):
+        parser.error("indica --desde-cache y/o --jsonl")
+
+    base = ProductKnowledgeBase(args.db, version=args.version)
+    try:
+        for origen, importar in ((args.desde_cache, base.importar_desde_cache), (args.jsonl, base.importar_jsonl)):
+            if origen:
+                resumen = importar(origen)
+                print(f"{origen}: {resumen['importados']} importados ({resumen['con_gtin']} con GTIN), "
+                      f"{resumen['descartados']} descartados", file=sys.stderr)
+        print(f"Base de conocimiento: {len(base)} productos", file=sys.stderr)
+    finally:
+        base.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# tools/html_description_generator/near_duplicates.py
+"""
+Detección de fuentes casi duplicadas con SimHash
+
+El mismo texto de un fabricante aparece sindicado en decenas de tiendas con cambios mínimos
+(cabeceras, precios, un párrafo de envío). Cada fuente se resume en una huella SimHash de 64 bits
+sobre las palabras de su descripción e ingredientes; dos fuentes con huellas a distancia de Hamming
+pequeña se colapsan en una sola que cuenta cuántas copias representa.
+
+Las huellas se indexan por bandas: si la distancia máxima es d y la huella se parte en d + 1 bandas,
+dos huellas a distancia <= d coinciden exactamente en al menos una banda, así que solo se comparan
+las fuentes que comparten cubeta.
+"""
+
+import re
+import hashlib
+from typing import Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from .inci_parser import es_lista_inci, parsear_lista_inci
+
+BITS_HUELLA = 64
+DISTANCIA_MAXIMA = 10
+
+# Palabras por shingle y mínimo de palabras para que la huella sea fiable. Las descripciones de
+# producto son cortas: con shingles de varias palabras, un cambio de una palabra mueve la huella
+# tanto como un texto distinto; con palabras sueltas las copias quedan a <= 10 bits y los textos
+# de otros productos de la misma plantilla a ~20.
+TAMANO_SHINGLE = 1
+MIN_PALABRAS = 12
+
+_PATRON_PALABRAS = re.compile(r'\w+')
+
+T = TypeVar('T')
+
+
+def _hash_shingle(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=BITS_HUELLA // 8).digest(), 'big')
+
+
+def huella_simhash(texto: str, tamano_shingle: int = TAMANO_SHINGLE) -> Optional[int]:
+    """Huella SimHash de 64 bits de un texto, o None si es demasiado corto para compararlo"""
+    palabras = [p for p in _PATRON_PALABRAS.findall((texto or '').lower()) if len(p) > 1]
+    if len(palabras) < MIN_PALABRAS:
+        return None
+
+    pesos: Dict[str, int] = {}
+    for i in range(len(palabras) - tamano_shingle + 1):
+        shingle = ' '.join(palabras[i:i + tamano_shingle])
+        pesos[shingle] = pesos.get(shingle, 0) + 1
+
+    vector = [0] * BITS_HUELLA
+    for shingle, peso in pesos.items():
+        valor = _hash_shingle(shingle)
+        for bit in range(BITS_HUELLA):
+            vector[bit] += peso if (valor >> bit) & 1 else -peso
+
+    return sum(1 << bit for bit, total in enumerate(vector) if total > 0)
+
+
+def distancia_hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def texto_fuente(fuente) -> str:
+    """Texto comparable de una fuente: descripción más ingredientes (las listas INCI ya normalizadas)"""
+    ingredientes = fuente.ingredients or ''
+    if es_lista_inci(ingredientes):
+        ingredientes = ' '.join(parsear_lista_inci(ingredientes))
+    return f"{fuente.description or ''} {ingredientes}"
+
+
+class IndiceSimHash(Generic[T]):
+    """Índice de huellas por bandas para buscar la primera huella a distancia <= distancia_maxima"""
+
+    def __init__(self, distancia_maxima: int = DISTANCIA_MAXIMA, bandas: Optional[int] = None):
+        bandas = bandas or distancia_maxima + 1
+        if bandas <= distancia_maxima:
+            raise ValueError("Se necesitan más bandas que la distancia máxima para no perder candidatos")
+        self.distancia_maxima = distancia_maxima
+        self.bandas = bandas
+        # Bandas de ancho casi igual (las primeras con un bit más si no divide exacto)
+        ancho, resto = divmod(BITS_HUELLA, bandas)
+        self._bandas: List[Tuple[int, int]] = []
+        inicio = 0
+        for banda in range(bandas):
+            bits = ancho + (1 if banda < resto else 0)
+            self._bandas.append((inicio, (1 << bits) - 1))
+            inicio += bits
+        self._cubetas: Dict[Tuple[int, int], List[Tuple[int, T]]] = {}
+
+    def _claves(self, huella: int):
+        for banda, (desplazamiento, mascara) in enumerate(self._bandas):
+            yield banda, (huella >> desplazamiento) & mascara
+
+    def buscar(self, huella: int) -> Optional[T]:
+        for clave in self._claves(huella):
+            for otra, valor in self._cubetas.get(clave, ()):
+                if distancia_hamming(huella, otra) <= self.distancia_maxima:
+                    return valor
+        return None
+
+    def anadir(self, huella: int, valor: T):
+        for clave in self._claves(huella):
+            self._cubetas.setdefault(clave, []).append((huella, valor))
+
+
+def colapsar_casi_duplicados(fuentes: Sequence[T], distancia_maxima: int = DISTANCIA_MAXIMA) -> List[T]:
+    """
+    Fuentes sin casi duplicados, en el orden de entrada
+
+    La primera fuente de cada grupo (la mejor si la lista viene ordenada) lo representa y acumula
+    en su campo multiplicidad las copias absorbidas. Las fuentes con poco texto se conservan tal cual.
+    """
+    indice: IndiceSimHash = IndiceSimHash(distancia_maxima)
+    unicas = []
+
+    for fuente in fuentes:
+        huella = huella_simhash(texto_fuente(fuente))
+        if huella is None:
+            unicas.append(fuente)
+            continue
+
+        representante = indice.buscar(huella)
+        if representante is not None:
+            representante.multiplicidad += fuente.multiplicidad
+            continue
+
+        indice.anadir(huella, fuente)
+        unicas.append(fuente)
+
+    return unicas
@@ -1,12 +1,13 @@
 # tools/html_description_generator/processor.py
 from .generator import SimpleHTMLDescriptionGenerator
+from utils.shopify_csv import obtener_muestra_productos
 
 # Este archivo se mantiene para compatibilidad pero la nueva herramienta
 # no necesita procesamiento masivo, solo generación individual
 
 def process_single_product(nombre_producto: str, codigo_barras: str = "", 
                          urls_especificas: list = None, idioma: str = "es", 
-                         api_key: str = None) -> dict:
+                         api_key: str = None, usar_cache: bool = True, modelo_gpt: str = None) -> dict:
     """
     Procesa un solo producto y genera su descripción HTML
     
@@ -16,6 +17,8 @@ def process_single_product(nombre_producto: str, codigo_barras: str = "",
         urls_especificas: Lista de URLs específicas
         idioma: Idioma de generación
         api_key: API key de OpenAI
+        usar_cache: Reutilizar la investigación cacheada del producto si está fresca
+        modelo_gpt: Modelo para las etapas premium (síntesis y redacción)
     
     Returns:
         dict: Resultado con HTML generado y metadatos
@@ -29,20 +32,21 @@ def process_single_product(nombre_producto: str, codigo_barras: str = "",
     
     try:
         # Inicializar generador
-        generator = SimpleHTMLDescriptionGenerator(api_key=api_key)
+        generator = SimpleHTMLDescriptionGenerator(api_key=api_key, modelo_gpt=modelo_gpt)
         
         # Buscar información del producto
         product_data = generator.buscar_producto_simple(
             nombre_producto=nombre_producto,
             codigo_barras=codigo_barras,
-            urls_especificas=urls_especificas
+            urls_especificas=urls_especificas,
+            usar_cache=usar_cache
         )
         
         # Generar HTML
         html_description = generator.generar_html_limpio(product_data, idioma)
         
         # Validar HTML
-        es_valido, errores = generator.validar_html_formato(html_description)
+        es_valido, errores = generator.validar_html_formato(html_description, idioma)
         
         # Preparar resultado
         resultado = {
@@ -62,7 +66,9 @@ def process_single_product(nombre_producto: str, codigo_barras: str = "",
             "config": {
                 "idioma": idioma,
                 "metodo": "manual" if urls_especificas else "auto"
-            }
+            },
+            "rutas_modelos": generator.router.informe(),
+            "coste_total_usd": generator.router.coste_total()
         }
         
         return resultado
@@ -95,7 +101,3 @@ def validar_csv_productos(*args, **kwargs):
 def estimar_tiempo_procesamiento(*args, **kwargs):
     """Función legacy - La nueva herramienta procesa instantáneamente"""
     return "< 30 segundos por producto"
-
-def obtener_muestra_productos(*args, **kwargs):
-    """Función legacy - La nueva herramienta no usa muestras"""
-    raise NotImplementedError("La nueva herramienta procesa un producto a la vez")
\ No newline at end of file
@@ -0,0 +1,157 @@
+# tools/html_description_generator/product_cache.py
+import os
+import re
+import json
+import time
+import hashlib
+import unicodedata
+from dataclasses import asdict, fields
+from typing import Dict, List, Optional, Tuple
+
+# Versión del pipeline de investigación: cambiarla invalida la caché de ProductData y la base
+# de conocimiento
+VERSION_GENERADOR = "2.0.0"
+
+# Días de validez por campo: los datos comerciales caducan antes que la formulación
+FRESCURA_CAMPOS_DIAS = {
+    'precio_aproximado': 7,
+    'posicionamiento': 30,
+    'target_demografico': 30,
+    'fuentes_encontradas': 30,
+}
+FRESCURA_POR_DEFECTO_DIAS = 180
+
+# Sin estos campos frescos la caché no sirve para generar el HTML
+CAMPOS_ESENCIALES = [
+    'nombre', 'descripcion_corta', 'ingredientes_activos',
+    'ingredientes_completos', 'modo_aplicacion', 'formato'
+]
+
+
+def normalizar_nombre_producto(nombre: str) -> str:
+    """Normaliza un nombre de producto: minúsculas, sin acentos, sin puntuación ni espacios repetidos"""
+    texto = unicodedata.normalize('NFKD', nombre.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    return re.sub(r'\s+', ' ', texto).strip()
+
+
+def normalizar_codigo_barras(codigo_barras: str) -> str:
+    """Deja solo los dígitos del código de barras"""
+    return re.sub(r'\D', '', codigo_barras or '')
+
+
+def campos_frescos(valores: Dict, actualizado: Dict[str, float], clase_datos,
+                   frescura_dias: Optional[Dict[str, int]] = None) -> Tuple[Optional[object], List[str]]:
+    """
+    Construye el ProductData con los campos aún frescos
+
+    Returns:
+        tuple: (ProductData o None si falta algún campo esencial fresco, lista de campos caducados)
+    """
+    frescura = {**FRESCURA_CAMPOS_DIAS, **(frescura_dias or {})}
+    ahora = time.time()
+    nombres_validos = {f.name for f in fields(clase_datos)}
+    vigentes = {}
+    caducados = []
+
+    for campo, valor in valores.items():
+        if campo not in nombres_validos:
+            continue
+        dias = frescura.get(campo, FRESCURA_POR_DEFECTO_DIAS)
+        if (ahora - actualizado.get(campo, 0)) <= dias * 86400:
+            vigentes[campo] = valor
+        else:
+            caducados.append(campo)
+
+    if any(campo in caducados or not vigentes.get(campo) for campo in CAMPOS_ESENCIALES):
+        return None, caducados
+
+    return clase_datos(**vigentes), caducados
+
+
+class ProductDataCache:
+    """
+    Caché persistente de investigación de productos (ProductData)
+
+    Cada entrada se guarda como JSON en disco, indexada por nombre normalizado y código de barras,
+    con marca temporal por campo y la versión del generador que la produjo. Las entradas de otra
+    versión se ignoran; los campos caducados se descartan y, si falta alguno esencial, la entrada
+    se considera un fallo de caché para forzar una nueva investigación.
+    """
+
+    def __init__(self, cache_dir: str = "./product_cache", version: str = "",
+                 frescura_dias: Optional[Dict[str, int]] = None):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.frescura_dias = {**FRESCURA_CAMPOS_DIAS, **(frescura_dias or {})}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _clave(self, nombre_producto: str, codigo_barras: str = "") -> str:
+        base = f"{normalizar_nombre_producto(nombre_producto)}|{normalizar_codigo_barras(codigo_barras)}"
+        return hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.cache_dir, f"{clave}.json")
+
+    def _leer_entrada(self, nombre_producto: str, codigo_barras: str = "") -> Optional[Dict]:
+        ruta = self._ruta(self._clave(nombre_producto, codigo_barras))
+        if not os.path.exists(ruta):
+            return None
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entrada.get('version') != self.version:
+            return None
+        return entrada
+
+    def obtener(self, nombre_producto: str, codigo_barras: str = "", clase_datos=None) -> Tuple[Optional[object], List[str]]:
+        """
+        Recupera la investigación cacheada
+
+        Returns:
+            tuple: (ProductData o None, lista de campos caducados)
+        """
+        entrada = self._leer_entrada(nombre_producto, codigo_barras)
+        if entrada is None or clase_datos is None:
+            return None, []
+
+        campos = entrada.get('campos', {})
+        return campos_frescos(
+            {campo: datos.get('valor') for campo, datos in campos.items()},
+            {campo: datos.get('actualizado', 0) for campo, datos in campos.items()},
+            clase_datos, self.frescura_dias
+        )
+
+    def guardar(self, nombre_producto: str, codigo_barras: str, product_data) -> None:
+        """
+        Guarda una investigación completa
+
+        Todos los campos se marcan con la hora actual aunque su valor no cambie: la frescura mide
+        cuándo se verificó el dato por última vez, no desde cuándo existe.
+        """
+        clave = self._clave(nombre_producto, codigo_barras)
+        ahora = time.time()
+
+        campos = {campo: {'valor': valor, 'actualizado': ahora} for campo, valor in asdict(product_data).items()}
+
+        entrada = {
+            'version': self.version,
+            'nombre': nombre_producto,
+            'codigo_barras': normalizar_codigo_barras(codigo_barras),
+            'campos': campos
+        }
+
+        ruta = self._ruta(clave)
+        ruta_temporal = ruta + ".tmp"
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump(entrada, f, ensure_ascii=False)
+        os.replace(ruta_temporal, ruta)
+
+    def invalidar(self, nombre_producto: str, codigo_barras: str = "") -> None:
+        """Elimina la entrada de un producto"""
+        ruta = self._ruta(self._clave(nombre_producto, codigo_barras))
+        if os.path.exists(ruta):
+            os.remove(ruta)
@@ -0,0 +1,211 @@
+# tools/html_description_generator/prompt_budget.py
+import re
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .inci_parser import es_lista_inci, parsear_lista_inci, formatear_lista_inci
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Ventana de contexto (tokens) por modelo
+CONTEXTO_MODELOS = {
+    'gpt-4': 8192,
+    'gpt-4-32k': 32768,
+    'gpt-4-turbo': 128000,
+    'gpt-4o': 128000,
+    'gpt-4o-mini': 128000,
+    'gpt-3.5-turbo': 16385,
+}
+CONTEXTO_POR_DEFECTO = 8192
+
+# Tokens fijos que añade el formato chat por mensaje
+TOKENS_POR_MENSAJE = 4
+
+# Por debajo de este hueco no merece la pena añadir otro fragmento
+MIN_TOKENS_FRAGMENTO = 40
+
+# Estimador offline: palabras en trozos de hasta 4 caracteres + cada signo de puntuación.
+# Sobrestima ligeramente respecto a cl100k_base en español, que es lo seguro para un presupuesto.
+_PATRON_TOKENS_ESTIMADOS = re.compile(r'\w{1,4}|[^\w\s]')
+_PATRON_FRASES = re.compile(r'(?<=[.!?])\s+|\n+')
+_PATRON_NORMALIZAR = re.compile(r'\W+')
+
+
+@lru_cache(maxsize=8)
+def _codificador(modelo: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(modelo)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def estimar_tokens(texto: str, modelo: str = "gpt-4") -> int:
+    """Número de tokens de un texto (tiktoken si está instalado, estimación local si no)"""
+    if not texto:
+        return 0
+    codificador = _codificador(modelo)
+    if codificador is not None:
+        return len(codificador.encode(texto))
+    return len(_PATRON_TOKENS_ESTIMADOS.findall(texto))
+
+
+def estimar_tokens_mensajes(mensajes: List[Dict[str, str]], modelo: str = "gpt-4") -> int:
+    """Tokens de una lista de mensajes chat, incluido el sobrecoste de formato"""
+    return sum(estimar_tokens(m.get('content', ''), modelo) + TOKENS_POR_MENSAJE for m in mensajes) + 3
+
+
+def presupuesto_contexto(modelo: str, tokens_fijos: int, max_tokens_respuesta: int, margen: float = 0.05) -> int:
+    """Tokens disponibles para contexto variable tras reservar prompt fijo, respuesta y margen"""
+    ventana = CONTEXTO_MODELOS.get(modelo, CONTEXTO_POR_DEFECTO)
+    return max(0, int(ventana * (1 - margen)) - tokens_fijos - max_tokens_respuesta)
+
+
+def _huella(texto: str) -> str:
+    return hashlib.md5(_PATRON_NORMALIZAR.sub(' ', texto.lower()).strip().encode('utf-8')).hexdigest()
+
+
+class PromptBudgetBuilder:
+    """
+    Empaqueta fragmentos de fuentes en un presupuesto de tokens
+
+    Los fragmentos se ordenan por ronda (mejor fuente de cada categoría primero) y dentro de la
+    ronda por confidence_score. El texto redundante se elimina antes de contar: frases ya vistas
+    en otra fuente, listas INCI repetidas y beneficios duplicados. Si un fragmento no cabe entero
+    se recorta por frases hasta el hueco restante. Una fuente que representa varias copias casi
+    idénticas (multiplicidad) se incluye una vez indicando en cuántos sitios aparece.
+    """
+
+    def __init__(self, modelo: str = "gpt-4", presupuesto: int = 4000, max_por_categoria: int = 3):
+        self.modelo = modelo
+        self.presupuesto = presupuesto
+        self.max_por_categoria = max_por_categoria
+
+        self._frases_vistas = set()
+        self._listas_inci_vistas = set()
+        self._beneficios_vistos = set()
+        self.tokens_usados = 0
+        self.fragmentos_descartados = 0
+
+    def _frases_nuevas(self, texto: str) -> List[str]:
+        nuevas = []
+        for frase in _PATRON_FRASES.split(texto or ''):
+            frase = frase.strip()
+            if not frase:
+                continue
+            huella = _huella(frase)
+            if huella not in self._frases_vistas:
+                self._frases_vistas.add(huella)
+                nuevas.append(frase)
+        return nuevas
+
+    def _ingredientes_nuevos(self, ingredientes: str) -> str:
+        if not ingredientes:
+            return ""
+        if es_lista_inci(ingredientes):
+            lista = parsear_lista_inci(ingredientes)
+            huella = _huella(' '.join(lista))
+            if huella in self._listas_inci_vistas:
+                return ""
+            self._listas_inci_vistas.add(huella)
+            return formatear_lista_inci(lista)
+        return ' '.join(self._frases_nuevas(ingredientes))
+
+    def _beneficios_nuevos(self, beneficios: List[str]) -> List[str]:
+        nuevos = []
+        for beneficio in beneficios or []:
+            huella = _huella(beneficio)
+            if beneficio and huella not in self._beneficios_vistos:
+                self._beneficios_vistos.add(huella)
+                nuevos.append(beneficio)
+        return nuevos
+
+    def _formatear_fuente(self, indice: int, fuente, frases: List[str], ingredientes: str, beneficios: List[str]) -> str:
+        copias = getattr(fuente, 'multiplicidad', 1)
+        sitios = f", misma información en {copias} sitios" if copias > 1 else ""
+        lineas = [f"Fuente {indice} ({fuente.confidence_score:.2f}{sitios}):"]
+        if fuente.title:
+            lineas.append(f"Título: {fuente.title}")
+        if frases:
+            lineas.append(f"Info: {' '.join(frases)}")
+        if ingredientes:
+            lineas.append(f"Ingredientes: {ingredientes}")
+        if beneficios:
+            lineas.append(f"Beneficios: {', '.join(beneficios)}")
+        return '\n'.join(lineas)
+
+    def _recortar(self, indice: int, fuente, frases: List[str], ingredientes: str,
+                  beneficios: List[str], disponible: int) -> Optional[str]:
+        """Quita frases y beneficios del final hasta que el fragmento quepa en el hueco"""
+        frases, beneficios = list(frases), list(beneficios)
+        while frases or beneficios:
+            if len(beneficios) > len(frases):
+                beneficios.pop()
+            else:
+                frases.pop()
+            texto = self._formatear_fuente(indice, fuente, frases, "", beneficios)
+            if estimar_tokens(texto, self.modelo) <= disponible:
+                return texto if (frases or beneficios) else None
+        return None
+
+    @staticmethod
+    def _cabecera(categoria: str) -> str:
+        return f"=== CONTEXTO {categoria.replace('_', ' ').upper()} ==="
+
+    def construir(self, fuentes_por_categoria: Dict[str, List]) -> str:
+        """Contextos por categoría dentro del presupuesto, en el orden original de categorías"""
+        candidatos: List[Tuple[int, float, str, object]] = []
+        for categoria, fuentes in fuentes_por_categoria.items():
+            ordenadas = sorted(fuentes or [], key=lambda f: f.confidence_score, reverse=True)
+            for ronda, fuente in enumerate(ordenadas[:self.max_por_categoria]):
+                candidatos.append((ronda, -fuente.confidence_score, categoria, fuente))
+        candidatos.sort(key=lambda c: (c[0], c[1]))
+
+        seleccion: Dict[str, List[str]] = {categoria: [] for categoria in fuentes_por_categoria}
+        urls_usadas = set()
+
+        for _, _, categoria, fuente in candidatos:
+            disponible = self.presupuesto - self.tokens_usados
+            if disponible < MIN_TOKENS_FRAGMENTO:
+                self.fragmentos_descartados += 1
+                continue
+            if fuente.source_url and fuente.source_url in urls_usadas:
+                continue
+
+            frases = self._frases_nuevas(fuente.description)
+            ingredientes = self._ingredientes_nuevos(fuente.ingredients)
+            beneficios = self._beneficios_nuevos(fuente.benefits)
+            if not (frases or ingredientes or beneficios):
+                self.fragmentos_descartados += 1
+                continue
+
+            indice = len(seleccion[categoria]) + 1
+            if indice == 1:
+                # La cabecera de la categoría también consume presupuesto
+                disponible -= estimar_tokens(self._cabecera(categoria), self.modelo)
+            texto = self._formatear_fuente(indice, fuente, frases, ingredientes, beneficios)
+            tokens = estimar_tokens(texto, self.modelo)
+            if tokens > disponible:
+                # Sin la lista INCI (la más larga y la menos prioritaria en la síntesis) y por frases
+                texto = self._recortar(indice, fuente, frases, ingredientes, beneficios, disponible)
+                if texto is None:
+                    self.fragmentos_descartados += 1
+                    continue
+                tokens = estimar_tokens(texto, self.modelo)
+
+            if indice == 1:
+                tokens += estimar_tokens(self._cabecera(categoria), self.modelo)
+            seleccion[categoria].append(texto)
+            self.tokens_usados += tokens
+            if fuente.source_url:
+                urls_usadas.add(fuente.source_url)
+
+        return '\n\n'.join(
+            self._cabecera(categoria) + '\n' + '\n\n'.join(textos)
+            for categoria, textos in seleccion.items() if textos
+        )
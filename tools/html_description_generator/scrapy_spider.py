@@ -4,9 +4,148 @@ Spider de Scrapy para scraping avanzado de productos cosméticos
 
 import scrapy
 import json
+import zlib
 from typing import Dict, List, Optional
 import time
 import logging
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, StopDownload
+from scrapy.utils.httpobj import urlparse_cached
+
+from utils.http_cache import HTTPPageCache, obtener_cache_http, fecha_http, decodificar_cuerpo
+from utils.adaptive_concurrency import obtener_controlador_concurrencia, segundos_retry_after
+from utils.raw_archive import obtener_archivo_raw
+
+from .inci_parser import buscar_lista_inci_en_html
+from .beneficios import beneficios_en_texto
+from .ficha_incremental import nuevo_extractor_ficha
+from .knowledge_base import normalizar_gtin
+
+
+class HTTPPageCacheStorage:
+    """
+    Backend de HTTPCACHE_STORAGE sobre la caché HTTP compartida
+
+    Scrapy (con RFC2616Policy) decide si revalidar a partir de las cabeceras de la respuesta
+    cacheada; para que aplique la misma política por dominio que el resto de fetchers, la
+    respuesta recuperada lleva Date = momento de guardado y Cache-Control: max-age = frescura.
+    El middleware resuelve los 304 sin llamar a store_response, así que una entrada caducada se
+    revalida en cada petición hasta que el servidor devuelve un 200.
+    """
+
+    def __init__(self, settings):
+        ruta_db = settings.get('HTTPCACHE_PAGE_DB')
+        self.cache: HTTPPageCache = obtener_cache_http(ruta_db) if ruta_db else obtener_cache_http()
+
+    def open_spider(self, spider):
+        pass
+
+    def close_spider(self, spider):
+        pass
+
+    def retrieve_response(self, spider, request):
+        entrada = self.cache.obtener(request.url)
+        if entrada is None:
+            return None
+
+        from scrapy.http import Headers
+        from scrapy.responsetypes import responsetypes
+
+        cabeceras = dict(entrada.headers)
+        cabeceras['date'] = fecha_http(entrada.guardado)
+        cabeceras['cache-control'] = f"max-age={int(entrada.frescura)}"
+        headers = Headers(cabeceras)
+        clase_respuesta = responsetypes.from_args(headers=headers, url=entrada.url, body=entrada.cuerpo)
+        if entrada.fresca:
+            self.cache.registrar_acierto(entrada)
+        return clase_respuesta(url=entrada.url, headers=headers, status=entrada.status, body=entrada.cuerpo)
+
+    def store_response(self, spider, request, response):
+        # Una descarga cortada por el parseo incremental solo tiene el principio de la página
+        if 'download_stopped' in response.flags:
+            return
+        cabeceras = {
+            k.decode('latin-1').lower(): b', '.join(v).decode('latin-1')
+            for k, v in response.headers.items()
+        }
+        # El middleware de caché va antes que HttpCompressionMiddleware: el cuerpo llega comprimido
+        cuerpo = decodificar_cuerpo(response.body, cabeceras.get('content-encoding', ''))
+        if cuerpo is None:
+            return
+        encoding = getattr(response, 'encoding', None) or 'utf-8'
+        self.cache.guardar(request.url, response.status, cabeceras, cuerpo, encoding)
+
+
+class ConcurrenciaAdaptativaMiddleware:
+    """
+    Downloader middleware que aplica el controlador AIMD compartido a los slots de Scrapy
+
+    Cada respuesta (o excepción de descarga) se registra en el controlador y el slot del dominio
+    se ajusta a su límite y retardo. Sustituye a AutoThrottle, que también modifica slot.delay.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.controlador = obtener_controlador_concurrencia()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def _slot(self, request):
+        return self.crawler.engine.downloader.slots.get(request.meta.get('download_slot'))
+
+    def _ajustar_slot(self, request, dominio: str):
+        slot = self._slot(request)
+        if slot is not None:
+            slot.concurrency = self.controlador.limite(dominio)
+            slot.delay = self.controlador.retardo(dominio)
+
+    def process_response(self, request, response, spider):
+        # Las respuestas servidas por la caché no dicen nada del servidor
+        if 'cached' not in response.flags:
+            dominio = urlparse_cached(request).hostname or ''
+            reintentar_tras = response.headers.get(b'Retry-After')
+            slot = self._slot(request)
+            self.controlador.registrar(
+                dominio, request.meta.get('download_latency'), response.status,
+                reintentar_tras=segundos_retry_after(reintentar_tras.decode('latin-1') if reintentar_tras else None),
+                # La respuesta ya salió del slot: se cuenta junto a las que siguen activas
+                en_vuelo=len(slot.active) + 1 if slot is not None else None
+            )
+            self._ajustar_slot(request, dominio)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, IgnoreRequest):
+            return None
+        dominio = urlparse_cached(request).hostname or ''
+        self.controlador.registrar(dominio, error=True)
+        self._ajustar_slot(request, dominio)
+        return None
+
+
+class ArchivoRawMiddleware:
+    """
+    Downloader middleware que guarda en el archivo raw las respuestas descargadas
+
+    Va después de HttpCompressionMiddleware (prioridad menor), así que el cuerpo ya llega
+    descomprimido. Las respuestas servidas por la caché no se archivan.
+    """
+
+    def __init__(self):
+        self.archivo = obtener_archivo_raw()
+
+    def process_response(self, request, response, spider):
+        if self.archivo.activo and 'cached' not in response.flags and 'download_stopped' not in response.flags:
+            cabeceras = {
+                k.decode('latin-1').lower(): b', '.join(v).decode('latin-1')
+                for k, v in response.headers.items()
+            }
+            self.archivo.guardar(response.url, response.status, cabeceras, response.body,
+                                 getattr(response, 'encoding', None) or 'utf-8', origen='scrapy')
+        return response
+
 
 class CosmeticProductSpider(scrapy.Spider):
     name = 'cosmetic_product'
@@ -17,13 +156,13 @@ class CosmeticProductSpider(scrapy.Spider):
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
         'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
         'Accept-Encoding': 'gzip, deflate',
-        'Cache-Control': 'no-cache',
     }
     
-    def __init__(self, product_name: str = "", brand: str = "", *args, **kwargs):
+    def __init__(self, product_name: str = "", brand: str = "", barcode: str = "", *args, **kwargs):
         super(CosmeticProductSpider, self).__init__(*args, **kwargs)
         self.product_name = product_name
         self.brand = brand
+        self.barcode = barcode
         self.results = []
         
         # Sitios especializados en cosmética
@@ -38,6 +177,54 @@ class CosmeticProductSpider(scrapy.Spider):
             'primor.eu'
         ]
     
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider._cabeceras_recibidas, signal=signals.headers_received)
+        crawler.signals.connect(spider._bytes_recibidos, signal=signals.bytes_received)
+        return spider
+    
+    def _cabeceras_recibidas(self, headers, body_length, request, spider):
+        """Prepara el parseo en streaming de las fichas de producto"""
+        
+        if not request.meta.get('parseo_incremental'):
+            return
+        # Las señales de descarga ven el cuerpo tal como llega, antes de HttpCompressionMiddleware
+        codificacion = (headers.get(b'Content-Encoding') or b'').strip().lower()
+        if codificacion in (b'', b'identity'):
+            descompresor = None
+        elif codificacion in (b'gzip', b'x-gzip'):
+            descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif codificacion == b'deflate':
+            descompresor = zlib.decompressobj()
+        else:
+            request.meta.pop('extractor_html', None)
+            return
+        request.meta['extractor_html'] = (nuevo_extractor_ficha(), descompresor)
+    
+    def _bytes_recibidos(self, data, request, spider):
+        """Alimenta el extractor y corta la descarga cuando la ficha está completa"""
+        
+        parseo = request.meta.get('extractor_html')
+        if parseo is None:
+            return
+        extractor, descompresor = parseo
+        # Con el archivo raw activo la descarga sigue hasta el final aunque la ficha esté completa
+        if extractor.completo:
+            return
+        try:
+            fragmento = descompresor.decompress(data) if descompresor else data
+        except zlib.error:
+            request.meta.pop('extractor_html', None)
+            return
+        if not extractor.alimentar(fragmento) and not obtener_archivo_raw().activo:
+            raise StopDownload(fail=False)
+    
+    async def start(self):
+        """Punto de entrada de Scrapy >= 2.13 (las versiones anteriores llaman a start_requests)"""
+        for request in self.start_requests():
+            yield request
+    
     def start_requests(self):
         """Genera las solicitudes iniciales"""
         
@@ -63,6 +250,11 @@ class CosmeticProductSpider(scrapy.Spider):
         
         queries = []
         
+        # Búsqueda exacta por código de barras (la más precisa si el GTIN es válido)
+        gtin = normalizar_gtin(self.barcode)
+        if gtin:
+            queries.append(f'"{gtin.lstrip("0")}"')
+        
         # Query principal
         if self.product_name:
             queries.append(f'"{self.product_name}"')
@@ -96,7 +288,8 @@ class CosmeticProductSpider(scrapy.Spider):
                     meta={
                         'source_site': site,
                         'search_query': query,
-                        'download_delay': 3
+                        'download_delay': 3,
+                        'parseo_incremental': True
                     }
                 )
     
@@ -122,56 +315,23 @@ class CosmeticProductSpider(scrapy.Spider):
                 'scraped_at': time.time()
             }
             
-            # Extraer título del producto
-            title_selectors = [
-                'h1::text',
-                '.product-title::text',
-                '.product-name::text',
-                '[data-testid="product-name"]::text',
-                '.pdp-product-name::text'
-            ]
-            product_info['title'] = self._extract_first_text(response, title_selectors)
-            
-            # Extraer descripción
-            desc_selectors = [
-                '.product-description::text',
-                '.product-details::text',
-                '.product-summary::text',
-                '[data-testid="product-description"]::text',
-                '.description p::text',
-                '.overview::text'
-            ]
-            product_info['description'] = self._extract_first_text(response, desc_selectors)
-            
-            # Extraer ingredientes
-            ingredient_selectors = [
-                '.ingredients::text',
-                '.ingredient-list::text',
-                '[data-testid="ingredients"]::text',
-                '.product-ingredients::text',
-                '.formula::text',
-                '.composition::text'
-            ]
-            product_info['ingredients'] = self._extract_first_text(response, ingredient_selectors)
-            
-            # Extraer precio
-            price_selectors = [
-                '.price::text',
-                '.product-price::text',
-                '[data-testid="price"]::text',
-                '.price-current::text',
-                '.sale-price::text'
-            ]
-            product_info['price'] = self._extract_first_text(response, price_selectors)
+            # El extractor ya se alimentó durante la descarga; las respuestas servidas desde la
+            # caché HTTP (frescas o tras un 304) se procesan aquí en una pasada
+            parseo = response.meta.get('extractor_html')
+            if parseo is not None and 'cached' not in response.flags:
+                extractor = parseo[0]
+            else:
+                extractor = nuevo_extractor_ficha()
+                extractor.alimentar(response.body)
+            extractor.finalizar()
             
-            # Extraer beneficios
-            benefits_selectors = [
-                '.benefits li::text',
-                '.features li::text',
-                '.key-benefits li::text',
-                '.product-benefits li::text'
-            ]
-            product_info['benefits'] = response.css(' , '.join(benefits_selectors)).getall()[:5]
+            product_info['title'] = extractor.campos['titulo']
+            product_info['description'] = extractor.campos['descripcion']
+            product_info['price'] = extractor.campos['precio']
+            product_info['brand'] = extractor.campos['marca']
+            product_info['gtin'] = extractor.datos_estructurados.gtin
+            product_info['ingredients'] = extractor.campos['ingredientes'] or buscar_lista_inci_en_html(extractor.html)
+            product_info['benefits'] = (extractor.beneficios or beneficios_en_texto(product_info['description']))[:5]
             
             # Calcular score de relevancia
             product_info['relevance_score'] = self._calculate_relevance(product_info)
@@ -184,19 +344,6 @@ class CosmeticProductSpider(scrapy.Spider):
         except Exception as e:
             self.logger.error(f"Error parsing product page {response.url}: {e}")
     
-    def _extract_first_text(self, response, selectors: List[str]) -> str:
-        """Extrae el primer texto encontrado usando múltiples selectores"""
-        
-        for selector in selectors:
-            try:
-                text = response.css(selector).get()
-                if text and len(text.strip()) > 5:
-                    return text.strip()[:500]  # Máximo 500 caracteres
-            except:
-                continue
-        
-        return ""
-    
     def _calculate_relevance(self, product_info: Dict) -> float:
         """Calcula score de relevancia del producto"""
         
@@ -236,7 +383,7 @@ class ScrapyProductSearcher:
     def __init__(self):
         self.results = []
     
-    def search_product(self, product_name: str, brand: str = "") -> List[Dict]:
+    def search_product(self, product_name: str, brand: str = "", barcode: str = "") -> List[Dict]:
         """
         Busca información del producto usando Scrapy
         """
@@ -245,41 +392,51 @@ class ScrapyProductSearcher:
             from scrapy.crawler import CrawlerProcess
             from scrapy.utils.project import get_project_settings
             
-            # Configuración personalizada para Scrapy
+            # Configuración personalizada para Scrapy: concurrencia, retardo, reintentos y
+            # timeout salen de las cotas del controlador adaptativo compartido
+            limites = obtener_controlador_concurrencia().limites
             settings = get_project_settings()
             settings.update({
                 'USER_AGENT': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
                 'ROBOTSTXT_OBEY': False,  # No respetar robots.txt para este caso
-                'DOWNLOAD_DELAY': 2,
+                'DOWNLOAD_DELAY': limites.retardo_s,
                 'RANDOMIZE_DOWNLOAD_DELAY': True,
-                'CONCURRENT_REQUESTS': 4,
-                'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
-                'AUTOTHROTTLE_ENABLED': True,
-                'AUTOTHROTTLE_START_DELAY': 1,
-                'AUTOTHROTTLE_MAX_DELAY': 5,
-                'AUTOTHROTTLE_TARGET_CONCURRENCY': 2.0,
+                # Tope global (8 sitios de cosmética); el límite efectivo es el de cada slot
+                'CONCURRENT_REQUESTS': limites.maximo * 8,
+                'CONCURRENT_REQUESTS_PER_DOMAIN': limites.inicial,
+                'RETRY_TIMES': limites.reintentos,
+                'DOWNLOAD_TIMEOUT': limites.timeout_s,
+                'AUTOTHROTTLE_ENABLED': False,
+                'DOWNLOADER_MIDDLEWARES': {
+                    'tools.html_description_generator.scrapy_spider.ConcurrenciaAdaptativaMiddleware': 950,
+                    'tools.html_description_generator.scrapy_spider.ArchivoRawMiddleware': 100,
+                },
                 'COOKIES_ENABLED': True,
-                'LOG_LEVEL': 'WARNING'  # Reducir logging
+                # Caché HTTP compartida con el generador: revalidación con ETag/Last-Modified
+                'HTTPCACHE_ENABLED': True,
+                'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.RFC2616Policy',
+                'HTTPCACHE_STORAGE': 'tools.html_description_generator.scrapy_spider.HTTPPageCacheStorage',
+                'LOG_LEVEL': 'WARNING',  # Reducir logging
+                # Usar el reactor ya instalado: al importar Twisted se instala el de la plataforma y el
+                # asyncio que pide Scrapy por defecto no coincide, con lo que el crawl fallaba al arrancar
+                'TWISTED_REACTOR': None
             })
             
             process = CrawlerProcess(settings)
             
-            # Crear y ejecutar spider
-            spider = CosmeticProductSpider(
-                product_name=product_name,
-                brand=brand
-            )
-            
-            process.crawl(spider)
-            process.start(stop_after_crawl=True)
+            # Crear y ejecutar spider (Scrapy instancia la clase; los resultados quedan en crawler.spider)
+            crawler = process.create_crawler(CosmeticProductSpider)
+            process.crawl(crawler, product_name=product_name, brand=brand, barcode=barcode)
+            # Se ejecuta en un hilo secundario: las señales solo pueden instalarse en el principal
+            process.start(stop_after_crawl=True, install_signal_handlers=False)
             
-            return spider.results
+            return crawler.spider.results if crawler.spider else []
             
         except Exception as e:
             logging.error(f"Error en búsqueda con Scrapy: {e}")
             return []
     
-    def search_product_async(self, product_name: str, brand: str = "") -> List[Dict]:
+    def search_product_async(self, product_name: str, brand: str = "", barcode: str = "") -> List[Dict]:
         """
         Versión asíncrona de la búsqueda (para usar en Streamlit)
         """
@@ -294,7 +451,7 @@ class ScrapyProductSearcher:
             
             def run_spider():
                 try:
-                    results = self.search_product(product_name, brand)
+                    results = self.search_product(product_name, brand, barcode)
                     results_queue.put(results)
                 except Exception as e:
                     results_queue.put([])
@@ -0,0 +1,446 @@
+# tools/html_description_generator_ultra/crawl_frontier.py
+"""
+Frontera de rastreo del motor masivo
+
+- Canonicalización: el mismo producto enlazado con parámetros de seguimiento, mayúsculas en el
+  host, puertos por defecto o rutas con ref=... se reduce a una única URL.
+- URLs ya rastreadas: filtro de Bloom escalable persistido en SQLite. Ocupa ~1,8 MB por millón
+  de URLs (0,1 % de falsos positivos) en lugar de guardar cada URL. Una capa solo crece (capa
+  nueva del doble de tamaño) cuando se llena; a diario se abre una capa de tamaño inicial y las
+  que superan MAX_EDAD_URLS_S caducan, así que un producto se vuelve a rastrear pasado ese tiempo.
+- Planificación: prioridad estricta (ScrapingTarget.priority) y, dentro de cada prioridad,
+  turno rotatorio entre dominios para que un sitio con miles de URLs no acapare la cola.
+"""
+
+import os
+import re
+import math
+import time
+import zlib
+import heapq
+import sqlite3
+import hashlib
+import itertools
+import posixpath
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Deque, Dict, Iterator, List, Optional
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+DIRECTORIO_FRONTERA = "./product_cache"
+
+PRIORIDADES = {'high': 0, 'medium': 1, 'low': 2}
+PRIORIDAD_POR_DEFECTO = PRIORIDADES['medium']
+
+# Parámetros que no cambian el contenido de la página
+PARAMETROS_SEGUIMIENTO = {
+    'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'twclid', 'ttclid',
+    '_ga', '_gl', 'ref', 'ref_', 'referrer', 'tag', 'psc', 'qid', 'sr', 'smid', 'th', 'linkcode',
+    'linkid', 'camp', 'creative', 'creativeasin', 'ascsubtag', 'spm', 'scm', 'algo_pvid',
+    'algo_exp_id', 'btsid', 'ws_ab_test', 'gatewayadapt', 'sk', 'terminal_id', 'hash',
+    '_trksid', '_trkparms', 'hash_item', 'sessionid', 'sid', 'jsessionid', 'phpsessid',
+}
+PREFIJOS_SEGUIMIENTO = ('utm_', 'pd_rd_', 'pf_rd_', 'aff_', 'mc_', 'trk_')
+
+_PUERTOS_POR_DEFECTO = {'http': 80, 'https': 443}
+_NO_RESERVADOS = set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~')
+
+_PATRON_ASIN = re.compile(r'/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})(?:[/?]|$)', re.IGNORECASE)
+_PATRON_ESCAPE = re.compile(r'%([0-9A-Fa-f]{2})')
+_PATRON_BARRAS = re.compile(r'/{2,}')
+
+# Filtro de Bloom escalable (Almeida et al.): al llenarse una capa, la siguiente duplica su
+# capacidad y ajusta el error
+CAPACIDAD_INICIAL = 100_000
+ERROR_OBJETIVO = 0.001
+CRECIMIENTO_CAPACIDAD = 2
+FACTOR_AJUSTE_ERROR = 0.85
+# Una capa deja de recibir URLs al día de crearse y caduca cuando su última URL supera la edad máxima;
+# la rotación diaria vuelve a la capacidad inicial (solo crece la capa que se llena)
+DURACION_CAPA_S = 24 * 3600
+MAX_EDAD_URLS_S = 7 * 24 * 3600
+
+
+def _escape_normalizado(coincidencia) -> str:
+    caracter = chr(int(coincidencia.group(1), 16))
+    return caracter if caracter in _NO_RESERVADOS else '%' + coincidencia.group(1).upper()
+
+
+def _parametro_de_seguimiento(nombre: str) -> bool:
+    nombre = nombre.lower()
+    return nombre in PARAMETROS_SEGUIMIENTO or nombre.startswith(PREFIJOS_SEGUIMIENTO)
+
+
+def canonicalizar_url(url: str) -> str:
+    """
+    Forma canónica de una URL para deduplicar
+
+    Esquema y host en minúsculas (IDNA), sin puerto por defecto ni fragmento, escapes %XX
+    normalizados, ruta sin segmentos . / .. ni barras repetidas, sin parámetros de seguimiento
+    y con el resto de parámetros ordenados. Las fichas de Amazon se reducen a /dp/<ASIN>.
+    """
+    partes = urlsplit(url.strip())
+    esquema = partes.scheme.lower() or 'https'
+
+    host = (partes.hostname or '').rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    try:
+        puerto = partes.port
+    except ValueError:
+        puerto = None
+    if puerto and puerto != _PUERTOS_POR_DEFECTO.get(esquema):
+        host = f"{host}:{puerto}"
+
+    asin = _PATRON_ASIN.search(partes.path) if 'amazon.' in host else None
+    if asin:
+        return urlunsplit((esquema, host, f"/dp/{asin.group(1).upper()}", '', ''))
+
+    ruta = _PATRON_ESCAPE.sub(_escape_normalizado, partes.path or '/')
+    ruta = quote(ruta, safe="/:@!$&'()*+,;=%-._~")
+    barra_final = ruta.endswith('/')
+    ruta = posixpath.normpath(_PATRON_BARRAS.sub('/', ruta))
+    # Segmentos de seguimiento en la ruta (…/ref=sr_1_3)
+    ruta = '/'.join(segmento for segmento in ruta.split('/') if not segmento.lower().startswith('ref='))
+    if not ruta.startswith('/'):
+        ruta = '/' + ruta
+    if barra_final and ruta != '/':
+        ruta += '/'
+
+    parametros = sorted(
+        (nombre, valor) for nombre, valor in parse_qsl(partes.query, keep_blank_values=True)
+        if not _parametro_de_seguimiento(nombre)
+    )
+    consulta = urlencode(parametros, quote_via=quote)
+
+    return urlunsplit((esquema, host, ruta, consulta, ''))
+
+
+def dominio_url(url: str) -> str:
+    """Host sin www. (clave de turno en la planificación por dominio)"""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+@dataclass
+class _CapaBloom:
+    capacidad: int
+    error: float
+    num_bits: int
+    num_hashes: int
+    bits: bytearray
+    elementos: int = 0
+    creada: float = field(default_factory=time.time)
+    actualizada: float = field(default_factory=time.time)
+    indice: Optional[int] = None  # Fila en SQLite (None si aún no se ha guardado)
+
+    @classmethod
+    def nueva(cls, capacidad: int, error: float) -> '_CapaBloom':
+        num_bits = max(8, math.ceil(-capacidad * math.log(error) / (math.log(2) ** 2)))
+        num_hashes = max(1, round(num_bits / capacidad * math.log(2)))
+        return cls(capacidad, error, num_bits, num_hashes, bytearray((num_bits + 7) // 8))
+
+    def posiciones(self, h1: int, h2: int) -> Iterator[int]:
+        # Doble hash (Kirsch-Mitzenmacher): k posiciones a partir de dos valores de 64 bits
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def contiene(self, h1: int, h2: int) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self.posiciones(h1, h2))
+
+    def anadir(self, h1: int, h2: int):
+        for p in self.posiciones(h1, h2):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.elementos += 1
+        self.actualizada = time.time()
+
+
+@dataclass
+class EstadisticasFiltro:
+    capas: int
+    elementos: int
+    mb_memoria: float
+    error_estimado: float
+
+
+class FiltroBloomEscalable:
+    """
+    Conjunto aproximado de URLs con memoria acotada (sin falsos negativos)
+
+    Args:
+        ruta_db: SQLite donde se persisten las capas (None: solo en memoria)
+        capacidad_inicial / error: dimensionado de la primera capa
+        max_edad_s: edad a partir de la cual una capa se descarta (None: nunca)
+    """
+
+    def __init__(self, ruta_db: Optional[str] = None, capacidad_inicial: int = CAPACIDAD_INICIAL,
+                 error: float = ERROR_OBJETIVO, max_edad_s: Optional[float] = MAX_EDAD_URLS_S):
+        self.capacidad_inicial = capacidad_inicial
+        self.error = error
+        self.max_edad_s = max_edad_s
+        self._lock = threading.Lock()
+        self._capas: List[_CapaBloom] = []
+        self._modificadas = set()
+        self._conexion = None
+
+        if ruta_db:
+            self._conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+            with self._lock, self._conexion:
+                self._conexion.executescript("""
+                    PRAGMA journal_mode=WAL;
+                    CREATE TABLE IF NOT EXISTS capas_bloom (
+                        indice INTEGER PRIMARY KEY AUTOINCREMENT,
+                        capacidad INTEGER NOT NULL,
+                        error REAL NOT NULL,
+                        num_bits INTEGER NOT NULL,
+                        num_hashes INTEGER NOT NULL,
+                        elementos INTEGER NOT NULL,
+                        creada REAL NOT NULL,
+                        actualizada REAL NOT NULL,
+                        bits BLOB NOT NULL
+                    );
+                """)
+            self._cargar()
+
+    @staticmethod
+    def _hashes(clave: str):
+        digest = hashlib.blake2b(clave.encode('utf-8'), digest_size=16).digest()
+        return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+    def _cargar(self):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT indice, capacidad, error, num_bits, num_hashes, elementos, creada, actualizada, bits "
+                "FROM capas_bloom ORDER BY indice"
+            ).fetchall()
+            for indice, capacidad, error, num_bits, num_hashes, elementos, creada, actualizada, bits in filas:
+                self._capas.append(_CapaBloom(capacidad, error, num_bits, num_hashes, bytearray(zlib.decompress(bits)),
+                                              elementos, creada, actualizada, indice))
+            self._expirar()
+
+    def _expirar(self):
+        if self.max_edad_s is None:
+            return
+        limite = time.time() - self.max_edad_s
+        caducadas = [capa for capa in self._capas if capa.actualizada < limite]
+        if not caducadas:
+            return
+        self._capas = [capa for capa in self._capas if capa.actualizada >= limite]
+        if self._conexion is not None:
+            with self._conexion:
+                self._conexion.executemany("DELETE FROM capas_bloom WHERE indice = ?",
+                                           [(capa.indice,) for capa in caducadas if capa.indice is not None])
+
+    def _capa_activa(self) -> _CapaBloom:
+        capa = self._capas[-1] if self._capas else None
+        if capa is not None and capa.elementos >= capa.capacidad:
+            # Llena: crecimiento escalable a partir de la capa que se ha llenado
+            capa = _CapaBloom.nueva(capa.capacidad * CRECIMIENTO_CAPACIDAD, capa.error * FACTOR_AJUSTE_ERROR)
+        elif capa is None or time.time() - capa.creada > DURACION_CAPA_S:
+            # Rotación diaria para la caducidad: capas de tamaño fijo
+            capa = _CapaBloom.nueva(self.capacidad_inicial, self.error)
+        else:
+            return capa
+        self._capas.append(capa)
+        self._expirar()
+        return capa
+
+    def __contains__(self, clave: str) -> bool:
+        h1, h2 = self._hashes(clave)
+        with self._lock:
+            return any(capa.contiene(h1, h2) for capa in self._capas)
+
+    def anadir(self, clave: str) -> bool:
+        """Añade la clave; False si ya estaba (o es un falso positivo)"""
+        h1, h2 = self._hashes(clave)
+        with self._lock:
+            if any(capa.contiene(h1, h2) for capa in self._capas):
+                return False
+            capa = self._capa_activa()
+            capa.anadir(h1, h2)
+            self._modificadas.add(id(capa))
+            return True
+
+    def guardar(self):
+        """Persiste las capas modificadas desde el último guardado"""
+        if self._conexion is None:
+            return
+        with self._lock, self._conexion:
+            for capa in self._capas:
+                if id(capa) not in self._modificadas:
+                    continue
+                fila = (capa.capacidad, capa.error, capa.num_bits, capa.num_hashes, capa.elementos,
+                        capa.creada, capa.actualizada, zlib.compress(bytes(capa.bits), 1))
+                if capa.indice is None:
+                    cursor = self._conexion.execute(
+                        "INSERT INTO capas_bloom (capacidad, error, num_bits, num_hashes, elementos, creada, actualizada, bits) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", fila
+                    )
+                    capa.indice = cursor.lastrowid
+                else:
+                    self._conexion.execute(
+                        "UPDATE capas_bloom SET capacidad = ?, error = ?, num_bits = ?, num_hashes = ?, elementos = ?, "
+                        "creada = ?, actualizada = ?, bits = ? WHERE indice = ?", fila + (capa.indice,)
+                    )
+            self._modificadas.clear()
+
+    def vaciar(self):
+        """Olvida todas las URLs (memoria y disco)"""
+        with self._lock:
+            self._capas = []
+            self._modificadas.clear()
+            if self._conexion is not None:
+                with self._conexion:
+                    self._conexion.execute("DELETE FROM capas_bloom")
+
+    def resumen(self) -> EstadisticasFiltro:
+        with self._lock:
+            return EstadisticasFiltro(
+                capas=len(self._capas),
+                elementos=sum(capa.elementos for capa in self._capas),
+                mb_memoria=round(sum(len(capa.bits) for capa in self._capas) / (1024 * 1024), 2),
+                # Cota superior: suma de los errores de cada capa
+                error_estimado=round(sum(capa.error for capa in self._capas), 5)
+            )
+
+
+@dataclass(order=True)
+class EntradaFrontera:
+    """URL pendiente; se ordena por prioridad y orden de llegada"""
+    prioridad: int
+    secuencia: int
+    url: str = field(compare=False)
+    dominio: str = field(compare=False)
+    datos: Any = field(default=None, compare=False)
+    recordar: bool = field(default=True, compare=False)
+    ignorar_historial: bool = field(default=False, compare=False)
+
+
+class FronteraRastreo:
+    """
+    Cola de URLs pendientes de una ejecución con deduplicación y reparto por dominio
+
+    Las URLs se canonicalizan al entrar. Se descartan las repetidas dentro de la ejecución y,
+    si recordar=True, las ya rastreadas en ejecuciones anteriores (filtro persistente). Una URL
+    solo pasa al filtro persistente cuando el spider la rastrea con éxito (marcar_rastreada):
+    las que fallan (timeout, 429/503, sin datos) se vuelven a intentar en la siguiente ejecución.
+
+    Args:
+        urls_rastreadas: filtro persistente compartido entre ejecuciones (None para no recordar)
+    """
+
+    def __init__(self, urls_rastreadas: Optional[FiltroBloomEscalable] = None):
+        self.urls_rastreadas = urls_rastreadas
+        self._en_ejecucion = FiltroBloomEscalable(max_edad_s=None)
+        self._colas: Dict[str, List[EntradaFrontera]] = {}
+        # Un turno rotatorio de dominios por nivel de prioridad
+        self._turnos: Dict[int, Deque[str]] = {}
+        self._nivel_dominio: Dict[str, int] = {}
+        self._en_turno = set()  # (nivel, dominio) presentes en algún turno, vigentes u obsoletos
+        self._secuencia = itertools.count()
+        self._pendientes = 0
+        # URLs servidas que pasarán al filtro persistente si se rastrean con éxito
+        self._por_recordar = set()
+        self.estadisticas = {'agregadas': 0, 'duplicadas': 0, 'ya_rastreadas': 0, 'servidas': 0, 'rastreadas': 0}
+
+    def agregar(self, url: str, prioridad: int = PRIORIDAD_POR_DEFECTO, datos: Any = None,
+                recordar: bool = True, ignorar_historial: bool = False) -> bool:
+        """
+        Encola una URL
+
+        Args:
+            recordar: consultar y actualizar el filtro persistente (False para páginas que
+                cambian a menudo, como las de resultados de búsqueda)
+            ignorar_historial: encolarla aunque ya se rastreara en otra ejecución (URLs pedidas
+                explícitamente); con recordar=True se sigue registrando al rastrearse
+
+        Returns:
+            bool: False si se descartó por repetida o ya rastreada
+        """
+        canonica = canonicalizar_url(url)
+        if (recordar and not ignorar_historial and self.urls_rastreadas is not None
+                and canonica in self.urls_rastreadas):
+            self.estadisticas['ya_rastreadas'] += 1
+            return False
+        if not self._en_ejecucion.anadir(canonica):
+            self.estadisticas['duplicadas'] += 1
+            return False
+
+        dominio = dominio_url(canonica)
+        entrada = EntradaFrontera(prioridad, next(self._secuencia), canonica, dominio, datos, recordar, ignorar_historial)
+        heapq.heappush(self._colas.setdefault(dominio, []), entrada)
+        self._pendientes += 1
+        self.estadisticas['agregadas'] += 1
+
+        # El dominio pasa al turno de su URL más prioritaria
+        nivel = self._nivel_dominio.get(dominio)
+        if nivel is None or prioridad < nivel:
+            self._nivel_dominio[dominio] = prioridad
+            self._dar_turno(prioridad, dominio)
+        return True
+
+    def _dar_turno(self, nivel: int, dominio: str):
+        # Si el dominio conserva un hueco obsoleto en este nivel, vuelve a ser válido
+        if (nivel, dominio) not in self._en_turno:
+            self._en_turno.add((nivel, dominio))
+            self._turnos.setdefault(nivel, deque()).append(dominio)
+
+    def siguiente(self) -> Optional[EntradaFrontera]:
+        """URL más prioritaria, rotando entre dominios con el mismo nivel (None si no quedan)"""
+        for nivel in sorted(self._turnos):
+            turno = self._turnos[nivel]
+            while turno:
+                dominio = turno.popleft()
+                self._en_turno.discard((nivel, dominio))
+                # Huecos obsoletos: el dominio subió de nivel después de encolarse aquí
+                if self._nivel_dominio.get(dominio) != nivel:
+                    continue
+                cola = self._colas[dominio]
+                entrada = heapq.heappop(cola)
+                if cola:
+                    nuevo_nivel = cola[0].prioridad
+                    self._nivel_dominio[dominio] = nuevo_nivel
+                    self._dar_turno(nuevo_nivel, dominio)
+                else:
+                    del self._colas[dominio]
+                    del self._nivel_dominio[dominio]
+                self._pendientes -= 1
+                self.estadisticas['servidas'] += 1
+                if entrada.recordar and self.urls_rastreadas is not None:
+                    self._por_recordar.add(entrada.url)
+                return entrada
+        return None
+
+    def marcar_rastreada(self, url: str):
+        """Registra en el filtro persistente una URL servida que se rastreó con éxito"""
+        canonica = canonicalizar_url(url)
+        if canonica in self._por_recordar:
+            self._por_recordar.discard(canonica)
+            self.urls_rastreadas.anadir(canonica)
+            self.estadisticas['rastreadas'] += 1
+
+    def __len__(self) -> int:
+        return self._pendientes
+
+    def __iter__(self) -> Iterator[EntradaFrontera]:
+        """Vacía la frontera en orden de planificación"""
+        while True:
+            entrada = self.siguiente()
+            if entrada is None:
+                return
+            yield entrada
+
+    def resumen(self) -> Dict[str, Any]:
+        return {**self.estadisticas, 'pendientes': self._pendientes, 'dominios': len(self._colas)}
+
+
+@lru_cache(maxsize=4)
+def obtener_urls_rastreadas(ruta_db: str = os.path.join(DIRECTORIO_FRONTERA, "urls_rastreadas.sqlite")) -> FiltroBloomEscalable:
+    """Filtro persistente compartido por todos los motores del proceso"""
+    os.makedirs(os.path.dirname(ruta_db) or '.', exist_ok=True)
+    return FiltroBloomEscalable(ruta_db)
@@ -13,6 +13,8 @@ from openai import OpenAI
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from utils.structured_output import completar_json
+
 @dataclass
 class ProcessedProduct:
     """Producto procesado con IA"""
@@ -286,18 +288,15 @@ class UltraDataProcessor:
                 product_data=product_data_str[:3000]  # Limitar tamaño
             )
             
-            response = self.openai_client.chat.completions.create(
-                model=self.ai_models['gpt4_turbo']['model'],
-                messages=[
+            return completar_json(
+                self.openai_client, "unify_product_data", self.ai_models['gpt4_turbo']['model'],
+                [
                     {"role": "system", "content": "Eres un experto en análisis y unificación de datos de productos de e-commerce."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=self.ai_models['gpt4_turbo']['max_tokens'],
                 temperature=self.ai_models['gpt4_turbo']['temperature']
             )
-            
-            result = json.loads(response.choices[0].message.content)
-            return result
         
         except Exception as e:
             print(f"Error unifying product data: {e}")
@@ -354,17 +353,15 @@ class UltraDataProcessor:
                 product_data=json.dumps(all_specs, indent=2)[:2000]
             )
             
-            response = self.openai_client.chat.completions.create(
-                model=self.ai_models['gpt35_turbo']['model'],
-                messages=[
+            result = completar_json(
+                self.openai_client, "extract_key_features", self.ai_models['gpt35_turbo']['model'],
+                [
                     {"role": "system", "content": "Eres un experto en análisis de características de productos."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=800,
                 temperature=0.3
             )
-            
-            result = json.loads(response.choices[0].message.content)
             features = [f"{item['feature']}: {item['value']}" for item in result.get('key_features', [])]
         
         except Exception as e:
@@ -388,17 +385,15 @@ class UltraDataProcessor:
                 price=unified_data.get('unified_price', 0)
             )
             
-            response = self.openai_client.chat.completions.create(
-                model=self.ai_models['gpt4_turbo']['model'],
-                messages=[
+            return completar_json(
+                self.openai_client, "analyze_competition", self.ai_models['gpt4_turbo']['model'],
+                [
                     {"role": "system", "content": "Eres un analista de mercado especializado en e-commerce y productos de consumo."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=1000,
                 temperature=0.3
             )
-            
-            return json.loads(response.choices[0].message.content)
         
         except Exception as e:
             print(f"Error in competitive analysis: {e}")
@@ -3,11 +3,13 @@
 Generador Ultra de HTML con Templates Avanzados
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from dataclasses import dataclass
-import json
+from functools import lru_cache
+import os
 import re
-from jinja2 import Template
+import tempfile
+from jinja2 import Environment, DictLoader, FileSystemBytecodeCache
 from datetime import datetime
 
 @dataclass
@@ -20,6 +22,135 @@ class HTMLTemplate:
     seo_optimized: bool = True
     mobile_responsive: bool = True
 
+def _definir_templates() -> Dict[str, HTMLTemplate]:
+    """Templates HTML predefinidos"""
+    
+    templates = {}
+    
+    # Template Modern Minimalist
+    templates['modern_minimalist'] = HTMLTemplate(
+        name="Modern Minimalist",
+        template_html="""
+        <div class="product-container modern-minimal">
+            <div class="product-header">
+                <h1 class="product-title">{{ product.unified_name }}</h1>
+                <div class="product-brand">{{ product.unified_brand }}</div>
+                {% if product.unified_price > 0 %}
+                <div class="product-price">${{ "%.2f"|format(product.unified_price) }}</div>
+                {% endif %}
+            </div>
+            
+            <div class="product-description">
+                {{ product.ai_description|safe }}
+            </div>
+        </div>
+        """,
+        css_styles="""
+        .product-container.modern-minimal {
+            font-family: 'Segoe UI', Arial, sans-serif;
+            background: #fff;
+            border-radius: 8px;
+            box-shadow: 0 2px 8px rgba(0,0,0,0.07);
+            padding: 2rem;
+            margin: 2rem auto;
+            max-width: 600px;
+        }
+        .product-header {
+            border-bottom: 1px solid #eee;
+            margin-bottom: 1.5rem;
+            padding-bottom: 1rem;
+        }
+        .product-title {
+            font-size: 2rem;
+            margin: 0;
+            color: #222;
+        }
+        .product-brand {
+            color: #888;
+            font-size: 1rem;
+            margin-top: 0.25rem;
+        }
+        .product-price {
+            color: #1a8917;
+            font-weight: bold;
+            font-size: 1.25rem;
+            margin-top: 0.5rem;
+        }
+        .product-description {
+            font-size: 1.1rem;
+            color: #444;
+            margin-top: 1.5rem;
+        }
+        """
+    )
+    
+    return templates
+
+# Templates compartidos por todas las instancias (se definen una sola vez por proceso)
+TEMPLATES: Dict[str, HTMLTemplate] = _definir_templates()
+
+# Bytecode de Jinja2 en disco: los procesos nuevos no recompilan los templates
+DIRECTORIO_CACHE_JINJA = os.path.join(tempfile.gettempdir(), "ultra_html_jinja_cache")
+os.makedirs(DIRECTORIO_CACHE_JINJA, exist_ok=True)
+
+_ENTORNO = Environment(
+    loader=DictLoader({nombre: template.template_html.strip() for nombre, template in TEMPLATES.items()}),
+    bytecode_cache=FileSystemBytecodeCache(DIRECTORIO_CACHE_JINJA),
+    autoescape=True,
+    trim_blocks=True,
+    lstrip_blocks=True
+)
+
+# Precompilación: get_template guarda el template compilado en la caché del Environment
+_TEMPLATES_COMPILADOS = {nombre: _ENTORNO.get_template(nombre) for nombre in TEMPLATES}
+
+_PATRON_COMENTARIOS_CSS = re.compile(r'/\*.*?\*/', re.DOTALL)
+_PATRON_ESPACIOS_CSS = re.compile(r'\s+')
+# Sin ':' (en un selector el espacio de ".a :hover" es un combinador descendiente)
+_PATRON_SIMBOLOS_CSS = re.compile(r'\s*([{};,>])\s*')
+# Bloques de declaraciones (sin llaves dentro): ahí sí se quitan los espacios de "propiedad : valor"
+_PATRON_DECLARACIONES_CSS = re.compile(r'\{[^{}]*\}')
+_PATRON_DOS_PUNTOS_CSS = re.compile(r'\s*:\s*')
+
+@lru_cache(maxsize=64)
+def minificar_css(css: str) -> str:
+    """Quita comentarios y espacios innecesarios de una hoja de estilos"""
+    css = _PATRON_COMENTARIOS_CSS.sub('', css)
+    css = _PATRON_ESPACIOS_CSS.sub(' ', css)
+    css = _PATRON_SIMBOLOS_CSS.sub(r'\1', css)
+    css = _PATRON_DECLARACIONES_CSS.sub(lambda bloque: _PATRON_DOS_PUNTOS_CSS.sub(':', bloque.group()), css)
+    return css.replace(';}', '}').strip()
+
+def _bloques_css(css: str) -> Iterator[str]:
+    """
+    Bloques de primer nivel de una hoja minificada, por profundidad de llaves
+
+    Una regla at con bloque (@media, @supports, @keyframes...) sale entera con sus reglas
+    anidadas; las sentencias at sin bloque (@import, @charset) terminan en ';'.
+    """
+    profundidad = 0
+    inicio = 0
+    for posicion, caracter in enumerate(css):
+        if caracter == '{':
+            profundidad += 1
+        elif caracter == '}':
+            profundidad -= 1
+            if profundidad == 0:
+                yield css[inicio:posicion + 1].strip()
+                inicio = posicion + 1
+        elif caracter == ';' and profundidad == 0:
+            yield css[inicio:posicion + 1].strip()
+            inicio = posicion + 1
+
+def combinar_css(hojas: Iterable[str]) -> str:
+    """Minifica y une varias hojas conservando cada bloque de primer nivel (regla o regla at) una sola vez"""
+    bloques = {}
+    for hoja in hojas:
+        for bloque in _bloques_css(minificar_css(hoja)):
+            if bloque:
+                bloques.setdefault(bloque, None)
+    return ''.join(bloques)
+
 class UltraHTMLGenerator:
     """
     Generador Ultra de HTML con Templates Profesionales
@@ -35,64 +166,45 @@ class UltraHTMLGenerator:
         }
     
     def _load_templates(self) -> Dict[str, HTMLTemplate]:
-        """Carga templates HTML predefinidos"""
-        
-        templates = {}
+        """Templates HTML predefinidos (compartidos a nivel de módulo, no se reconstruyen)"""
+        return TEMPLATES
+    
+    def _template_compilado(self, template: str):
+        if template not in _TEMPLATES_COMPILADOS:
+            raise ValueError(f"Template desconocido: {template}. Disponibles: {', '.join(TEMPLATES)}")
+        return _TEMPLATES_COMPILADOS[template]
+    
+    def hoja_estilos(self, templates: Optional[List[str]] = None) -> str:
+        """CSS minificado y sin reglas duplicadas de los templates indicados"""
+        nombres = templates or list(TEMPLATES)
+        return combinar_css(TEMPLATES[nombre].css_styles for nombre in nombres)
+    
+    def render(self, product: Any, template: str = 'modern_minimalist', incluir_css: bool = True) -> str:
+        """Renderiza un producto (ProcessedProduct o dict); con incluir_css añade su <style> minificado"""
+        html = self._template_compilado(template).render(product=product)
+        if incluir_css:
+            html = f"<style>{self.hoja_estilos([template])}</style>\n{html}"
+        return html
+    
+    def render_many(self, products: Iterable[Any], template: str = 'modern_minimalist') -> Dict[str, Any]:
+        """
+        Renderiza un lote de productos con el template ya compilado
         
-        # Template Modern Minimalist
-        templates['modern_minimalist'] = HTMLTemplate(
-            name="Modern Minimalist",
-            template_html="""
-            <div class="product-container modern-minimal">
-                <div class="product-header">
-                    <h1 class="product-title">{{ product.unified_name }}</h1>
-                    <div class="product-brand">{{ product.unified_brand }}</div>
-                    {% if product.unified_price > 0 %}
-                    <div class="product-price">${{ "%.2f"|format(product.unified_price) }}</div>
-                    {% endif %}
-                </div>
-                
-                <div class="product-description">
-                    {{ product.ai_description|safe }}
-                </div>
-            </div>
-            """,
-            css_styles="""
-            .product-container.modern-minimal {
-                font-family: 'Segoe UI', Arial, sans-serif;
-                background: #fff;
-                border-radius: 8px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.07);
-                padding: 2rem;
-                margin: 2rem auto;
-                max-width: 600px;
-            }
-            .product-header {
-                border-bottom: 1px solid #eee;
-                margin-bottom: 1.5rem;
-                padding-bottom: 1rem;
-            }
-            .product-title {
-                font-size: 2rem;
-                margin: 0;
-                color: #222;
-            }
-            .product-brand {
-                color: #888;
-                font-size: 1rem;
-                margin-top: 0.25rem;
-            }
-            .product-price {
-                color: #1a8917;
-                font-weight: bold;
-                font-size: 1.25rem;
-                margin-top: 0.5rem;
-            }
-            .product-description {
-                font-size: 1.1rem;
-                color: #444;
-                margin-top: 1.5rem;
-            }
-            """
+        Returns:
+            dict: 'stylesheet' (una sola hoja compartida por todo el lote) y 'html' (fragmento por producto)
+        """
+        compilado = self._template_compilado(template)
+        return {
+            'stylesheet': self.hoja_estilos([template]),
+            'html': [compilado.render(product=product) for product in products]
+        }
+    
+    def render_bundle(self, products: Iterable[Any], template: str = 'modern_minimalist') -> str:
+        """Documento HTML único con una hoja de estilos para todo el lote"""
+        lote = self.render_many(products, template)
+        cuerpo = '\n'.join(lote['html'])
+        return (
+            f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<meta name=\"generator\" content=\"UltraHTMLGenerator {datetime.now():%Y-%m-%d}\">\n"
+            f"<style>{lote['stylesheet']}</style>\n</head>\n<body>\n{cuerpo}\n</body>\n</html>"
         )
-                
\ No newline at end of file
@@ -8,8 +8,14 @@ import pandas as pd
 from datetime import datetime
 import asyncio
 import json
-from .scraper_engine import MassiveScrapingEngine
-from .data_processor import UltraDataProcessor
+import re
+from contextlib import nullcontext
+from dataclasses import asdict
+from markupsafe import escape
+from utils.adaptive_concurrency import LimitesConcurrencia, obtener_controlador_concurrencia
+from utils.raw_archive import obtener_archivo_raw
+from .scraper_engine import MassiveScrapingEngine, ScrapingTarget
+from .data_processor import UltraDataProcessor, ProcessedProduct
 from .html_generator import UltraHTMLGenerator
 
 def render(config=None):
@@ -249,7 +255,7 @@ def render_scraping_config_tab():
             min_value=1,
             max_value=100,
             value=20,
-            help="Más = más rápido pero más recursos"
+            help="Máximo por dominio: el límite real se adapta a la latencia y a los 429/503 de cada sitio"
         )
         
         download_delay = st.slider(
@@ -301,6 +307,7 @@ def render_scraping_config_tab():
         }
     }
     
+    maximos_por_dominio = {}
     for category, sites in sites_config.items():
         with st.expander(f"🏷️ {category}"):
             for site, config in sites.items():
@@ -322,6 +329,26 @@ def render_scraping_config_tab():
                         value=config["parallel"],
                         key=f"parallel_{site}"
                     )
+                if '.' in site:
+                    maximos_por_dominio[site] = int(parallel)
+    
+    # Los sliders acotan el controlador adaptativo que comparten todos los scrapers
+    controlador = obtener_controlador_concurrencia()
+    controlador.configurar(LimitesConcurrencia(
+        maximo=concurrent_requests,
+        retardo_s=download_delay,
+        reintentos=retry_attempts,
+        timeout_s=timeout_seconds,
+        maximo_por_dominio=maximos_por_dominio
+    ))
+    
+    st.markdown("#### 🚦 Concurrencia adaptativa por dominio")
+    estado_concurrencia = controlador.resumen()
+    if estado_concurrencia:
+        st.dataframe(pd.DataFrame(estado_concurrencia), use_container_width=True, hide_index=True)
+    else:
+        st.caption("Sin peticiones todavía: cada dominio empieza con "
+                   f"{controlador.limites.inicial} peticiones simultáneas y sube hasta su máximo.")
 
 def render_launch_scraping_tab():
     """Tab para lanzar el scraping"""
@@ -375,7 +402,10 @@ def render_launch_scraping_tab():
         )
     
     with col2:
-        save_raw_data = st.checkbox("Guardar datos raw", value=True)
+        save_raw_data = st.checkbox(
+            "Guardar datos raw", value=True,
+            help="Archiva cada página descargada (comprimida) para re-extraer después sin volver a rastrear"
+        )
         save_images = st.checkbox("Descargar imágenes", value=False)
         real_time_processing = st.checkbox("Procesamiento en tiempo real", value=True)
     
@@ -390,8 +420,37 @@ def render_launch_scraping_tab():
             real_time_processing=real_time_processing
         )
 
+# Conexiones simultáneas del motor según el modo elegido
+CONCURRENCIA_POR_MODO = {
+    "🔥 Ultra Agresivo (máxima velocidad)": 50,
+    "⚡ Agresivo (rápido pero estable)": 25,
+    "🛡️ Conservador (lento pero seguro)": 10,
+    "🕊️ Gentil (muy lento, sitios sensibles)": 3,
+}
+
+def _objetivos_desde_config(products_config: dict, sitios: list) -> list:
+    """Un ScrapingTarget por fila del CSV: búsqueda por nombre (y marca) en los sitios del motor"""
+    df = products_config['data']
+    mapeo = products_config['mapping']
+    objetivos = []
+    for _, fila in df.iterrows():
+        nombre = fila[mapeo['name']]
+        if pd.isna(nombre) or not str(nombre).strip():
+            continue
+        nombre = str(nombre).strip()
+        marca = str(fila[mapeo['brand']]).strip() if mapeo.get('brand') and pd.notna(fila[mapeo['brand']]) else ''
+        consulta = f"{marca} {nombre}" if marca and marca.lower() not in nombre.lower() else nombre
+        categoria = fila[mapeo['category']] if mapeo.get('category') else ''
+        objetivos.append(ScrapingTarget(
+            product_name=nombre,
+            keywords=[consulta],
+            category=str(categoria) if pd.notna(categoria) else '',
+            expected_sites=list(sitios)
+        ))
+    return objetivos
+
 def launch_massive_scraping(**config):
-    """Lanza el scraping masivo"""
+    """Lanza el scraping masivo con MassiveScrapingEngine"""
     
     st.markdown("### 🔥 SCRAPING EN PROGRESO")
     
@@ -403,42 +462,67 @@ def launch_massive_scraping(**config):
     with progress_container:
         overall_progress = st.progress(0)
         current_task = st.empty()
-        
+    
+    engine = MassiveScrapingEngine(max_concurrent=CONCURRENCIA_POR_MODO.get(config.get('scraping_mode'), 25))
+    objetivos = _objetivos_desde_config(config['products_config'], engine.spider_configs)
+    if not objetivos:
+        st.warning("⚠️ La configuración no tiene productos con nombre")
+        return
+    
+    spiders_terminados = []
+    
+    def al_progresar(mensaje: str):
+        spiders_terminados.append(mensaje)
+        overall_progress.progress(min(len(spiders_terminados) / len(engine.spider_configs), 1.0))
+        with logs_container:
+            st.write(mensaje)
+    
+    current_task.text(f"Scraping de {len(objetivos)} productos en {', '.join(engine.spider_configs)}...")
+    # El archivo raw solo está activo durante esta ejecución: fuera de ella los scrapers
+    # siguen cortando las descargas en cuanto tienen los datos
+    archivo = obtener_archivo_raw()
+    try:
+        with archivo.archivando() if config.get('save_raw_data') else nullcontext():
+            resultados = asyncio.run(engine.scrape_massive(objetivos, progress_callback=al_progresar))
+    except Exception as e:
+        st.error(f"❌ Error en el scraping masivo: {e}")
+        return
+    
+    overall_progress.progress(1.0)
+    current_task.empty()
+    st.session_state['scraped_data'] = [asdict(producto) for producto in resultados]
+    
+    stats = engine.stats
+    duracion = max((stats['end_time'] or 0) - (stats['start_time'] or 0), 0.001)
+    with stats_container:
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            scraped_metric = st.empty()
+            st.metric("📊 Scrapeados", stats['total_scraped'])
         with col2:
-            success_metric = st.empty()
+            st.metric("✅ Exitosos", stats['successful'])
         with col3:
-            errors_metric = st.empty()
+            st.metric("❌ Baja confianza", stats['failed'])
         with col4:
-            speed_metric = st.empty()
-    
-    # Simular scraping (aquí iría la lógica real)
-    import time
-    total_products = len(config['products_config']['data'])
-    
-    for i in range(total_products):
-        # Actualizar progreso
-        progress = (i + 1) / total_products
-        overall_progress.progress(progress)
-        current_task.text(f"Scraping producto {i+1}/{total_products}")
+            st.metric("⚡ Velocidad", f"{stats['total_scraped'] / duracion:.1f}/s")
         
-        # Actualizar métricas
-        scraped_metric.metric("📊 Scrapeados", i+1)
-        success_metric.metric("✅ Exitosos", int((i+1) * 0.85))
-        errors_metric.metric("❌ Errores", int((i+1) * 0.15))
-        speed_metric.metric("⚡ Velocidad", f"{(i+1)/((time.time() % 100) + 1):.1f}/s")
-        
-        time.sleep(0.1)  # Simular trabajo
+        frontera = stats.get('frontier') or {}
+        st.caption(
+            f"Frontera: {frontera.get('servidas', 0)} URLs servidas, {frontera.get('duplicadas', 0)} duplicadas, "
+            f"{frontera.get('rastreadas', 0)} registradas como rastreadas"
+        )
+        if config.get('save_raw_data'):
+            resumen_archivo = archivo.resumen()
+            st.caption(f"Archivo raw: {resumen_archivo['registros']} versiones de {resumen_archivo['urls']} URLs")
     
-    st.success("🎉 ¡Scraping masivo completado!")
+    st.success(f"🎉 ¡Scraping masivo completado! {len(resultados)} productos listos para procesar")
 
 def render_data_processing_tab():
     """Tab para procesamiento de datos"""
     
     st.markdown("### 📊 Ultra Data Processing")
     
+    render_reextraction_section()
+    
     # Verificar si hay datos scrapeados
     if 'scraped_data' not in st.session_state:
         st.info("🔍 No hay datos scrapeados aún. Ejecuta el scraping primero.")
@@ -489,6 +573,34 @@ def render_data_processing_tab():
             value=0.8
         )
 
+def render_reextraction_section():
+    """Re-extracción de productos desde el archivo raw (sin red)"""
+    
+    archivo = obtener_archivo_raw()
+    resumen = archivo.resumen()
+    if not resumen['registros']:
+        return
+    
+    with st.expander("♻️ Re-extraer desde el archivo raw"):
+        st.caption(
+            f"{resumen['urls']} URLs de {resumen['dominios']} dominios · {resumen['registros']} versiones · "
+            f"{resumen['mb_disco']} MB en disco ({resumen['mb_original']} MB sin comprimir, {resumen['compresion']})"
+        )
+        dominio = st.text_input("Solo el dominio (opcional):", placeholder="amazon.com", key="reextract_domain")
+        
+        if st.button("♻️ Re-extraer productos", key="reextract_button"):
+            # Import diferido: reextract también se ejecuta como módulo (python -m)
+            from .reextract import reextraer
+            with st.spinner("Re-extrayendo desde el archivo..."):
+                productos = [asdict(p) for p in reextraer(archivo, dominio=dominio.strip() or None)]
+            st.session_state['scraped_data'] = productos
+            st.success(f"✅ {len(productos)} productos re-extraídos sin tocar la red")
+            if productos:
+                st.dataframe(
+                    pd.DataFrame(productos)[['name', 'brand', 'price', 'source_url', 'confidence_score', 'scraped_at']],
+                    use_container_width=True, hide_index=True
+                )
+
 def render_html_generation_tab():
     """Tab para generación HTML"""
     
@@ -553,6 +665,74 @@ def render_html_generation_tab():
         "Audiencia objetivo:",
         ["General", "Técnica", "Profesional", "Jóvenes", "Familias", "B2B", "Luxury"]
     )
+    
+    render_batch_html_section()
+
+def _precio_numerico(precio) -> float:
+    """Primer importe de un precio scrapeado ('12,99 €', '$1,299.00') como float; 0.0 si no hay"""
+    coincidencia = re.search(r'\d[\d.,]*', str(precio or ''))
+    if not coincidencia:
+        return 0.0
+    numero = coincidencia.group().rstrip('.,')
+    # El último separador con 1-2 decimales detrás es el decimal; el resto son miles
+    entero, separador, decimales = re.match(r'(.*?)(?:([.,])(\d{1,2}))?$', numero).groups()
+    entero = re.sub(r'[.,]', '', entero)
+    try:
+        return float(f"{entero}.{decimales}" if separador else entero)
+    except ValueError:
+        return 0.0
+
+def _producto_para_template(datos: dict) -> ProcessedProduct:
+    """Adapta un producto scrapeado (dict de ScrapedProduct) a los campos que usan los templates"""
+    return ProcessedProduct(
+        raw_data=datos,
+        unified_name=datos.get('name', ''),
+        unified_brand=datos.get('brand', ''),
+        unified_price=_precio_numerico(datos.get('price')),
+        # El template marca la descripción como segura: el texto scrapeado se escapa aquí
+        ai_description=str(escape(datos.get('description', ''))),
+        confidence_score=datos.get('confidence_score', 0.0)
+    )
+
+def render_batch_html_section():
+    """Renderizado por lotes de los productos scrapeados con una sola hoja de estilos"""
+    
+    st.markdown("#### 🏭 Generación por Lotes")
+    
+    productos = st.session_state.get('scraped_data') or []
+    if not productos:
+        st.info("🔍 No hay productos scrapeados aún. Ejecuta el scraping o re-extrae desde el archivo raw.")
+        return
+    
+    generator = UltraHTMLGenerator()
+    template = st.selectbox(
+        "Template del lote:",
+        list(generator.templates),
+        format_func=lambda nombre: generator.templates[nombre].name,
+        key="batch_html_template"
+    )
+    
+    if st.button(f"🎨 Generar HTML de {len(productos)} productos", type="primary", key="batch_html_button"):
+        with st.spinner("Renderizando lote..."):
+            st.session_state['html_bundle'] = {
+                'template': template,
+                'productos': len(productos),
+                'html': generator.render_bundle([_producto_para_template(p) for p in productos], template)
+            }
+    
+    # Se guarda en sesión para que la descarga sobreviva a los reruns de Streamlit
+    bundle = st.session_state.get('html_bundle')
+    if bundle:
+        st.success(f"✅ {bundle['productos']} descripciones con una hoja de estilos compartida ({len(bundle['html']) / 1024:.1f} KB)")
+        st.download_button(
+            "📥 Descargar HTML Bundle",
+            data=bundle['html'].encode('utf-8'),
+            file_name=f"ultra_html_{bundle['template']}_{datetime.now():%Y%m%d_%H%M%S}.html",
+            mime="text/html",
+            key="batch_html_download"
+        )
+        with st.expander("👁️ Vista previa"):
+            st.components.v1.html(bundle['html'], height=600, scrolling=True)
 
 def render_analytics_export_tab():
     """Tab para analytics y export"""
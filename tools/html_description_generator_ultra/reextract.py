@@ -0,0 +1,113 @@
+# tools/html_description_generator_ultra/reextract.py
+"""
+Re-extracción de productos desde el archivo raw, sin red
+
+Vuelve a pasar la extracción (JSON-LD/microdata y selectores de cada spider) sobre las páginas
+archivadas, de modo que un arreglo en un extractor no obliga a rastrear de nuevo. El archivo se
+lee en orden de disco y el parseo se reparte entre procesos.
+
+Uso:
+    python -m tools.html_description_generator_ultra.reextract --dominio amazon.com --salida productos.jsonl
+"""
+
+import sys
+import json
+import time
+import argparse
+from dataclasses import asdict
+from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple
+
+from utils.raw_archive import ArchivoRaw, obtener_archivo_raw
+
+from .scraper_engine import BaseSpider, MassiveScrapingEngine, ScrapedProduct
+
+# Registros por tarea enviada a cada proceso
+REGISTROS_POR_TAREA = 16
+
+
+@lru_cache(maxsize=1)
+def _spiders() -> Tuple[MassiveScrapingEngine, Dict[str, BaseSpider], BaseSpider]:
+    """Spiders del motor (uno por proceso): selectores de cada sitio y uno genérico solo con JSON-LD"""
+    motor = MassiveScrapingEngine()
+    spiders = {
+        nombre: config['class'](urls=[], selectors=config['selectors'])
+        for nombre, config in motor.spider_configs.items()
+    }
+    return motor, spiders, BaseSpider(urls=[], selectors={})
+
+
+def extraer_registro(url: str, html: str, fecha: float = 0.0) -> Optional[ScrapedProduct]:
+    """Producto de una página archivada con el spider que corresponde a su dominio"""
+    motor, spiders, generico = _spiders()
+    spider = spiders.get(motor._identify_spider_for_url(url), generico)
+    producto = spider._parse_html(html, url)
+    if producto is not None and fecha:
+        producto.scraped_at = datetime.fromtimestamp(fecha).isoformat(timespec='seconds')
+    return producto
+
+
+def _extraer_tupla(argumentos: Tuple[str, str, float]) -> Optional[ScrapedProduct]:
+    return extraer_registro(*argumentos)
+
+
+def reextraer(archivo: Optional[ArchivoRaw] = None, dominio: Optional[str] = None, desde: Optional[float] = None,
+              procesos: int = 1) -> Iterator[ScrapedProduct]:
+    """
+    Productos extraídos de la última versión archivada de cada URL
+
+    Args:
+        dominio: solo ese dominio y sus subdominios
+        desde: solo páginas archivadas después de este timestamp
+        procesos: procesos de parseo (1: en el proceso actual)
+    """
+    archivo = archivo or obtener_archivo_raw()
+    tareas = ((registro.url, registro.texto, registro.fecha)
+              for registro in archivo.registros(dominio=dominio, desde=desde))
+
+    if procesos <= 1:
+        productos = map(_extraer_tupla, tareas)
+        yield from (producto for producto in productos if producto is not None)
+        return
+
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        for producto in executor.map(_extraer_tupla, tareas, chunksize=REGISTROS_POR_TAREA):
+            if producto is not None:
+                yield producto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-extrae productos del archivo raw sin tocar la red")
+    parser.add_argument('--dominio', help="solo este dominio (incluye subdominios)")
+    parser.add_argument('--desde', help="solo páginas archivadas desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument('--procesos', type=int, default=1, help="procesos de parseo")
+    parser.add_argument('--salida', help="fichero JSONL de salida (por defecto, la salida estándar)")
+    args = parser.parse_args(argv)
+
+    desde = datetime.fromisoformat(args.desde).timestamp() if args.desde else None
+    archivo = obtener_archivo_raw()
+    salida = open(args.salida, 'w', encoding='utf-8') if args.salida else sys.stdout
+
+    inicio = time.perf_counter()
+    total = 0
+    try:
+        for producto in reextraer(archivo, args.dominio, desde, args.procesos):
+            salida.write(json.dumps(asdict(producto), ensure_ascii=False) + '\n')
+            total += 1
+    finally:
+        if args.salida:
+            salida.close()
+
+    segundos = time.perf_counter() - inicio
+    resumen = archivo.resumen()
+    print(
+        f"{total} productos de {archivo.estadisticas.leidos} páginas archivadas en {segundos:.1f} s "
+        f"(archivo: {resumen['mb_disco']} MB en disco, {resumen['compresion']} x{resumen['ratio']})",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
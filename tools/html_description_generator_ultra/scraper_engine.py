@@ -8,13 +8,29 @@ import aiohttp
 from scrapy import Spider, Request
 from scrapy.crawler import CrawlerRunner
 from twisted.internet import reactor, defer
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional
 import pandas as pd
 from dataclasses import dataclass, field
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import time
-import random
 import json
+from urllib.parse import urlsplit
+from bs4 import BeautifulSoup
+
+from utils.http_cache import HTTPPageCache, obtener_cache_http
+from utils.http_fetch import detectar_encoding
+from utils.structured_data import DatosEstructurados, extraer_datos_estructurados
+from utils.html_stream import ExtractorHTMLIncremental
+from utils.raw_archive import obtener_archivo_raw
+from utils.adaptive_concurrency import (ControladorConcurrencia, ESTADOS_SATURACION,
+                                        obtener_controlador_concurrencia, segundos_retry_after)
+
+from .crawl_frontier import FronteraRastreo, PRIORIDADES, PRIORIDAD_POR_DEFECTO, obtener_urls_rastreadas
+
+# Campos de datos estructurados con los que se deja de leer una ficha (los selectores de cada
+# sitio necesitan el árbol completo, así que sin JSON-LD la página se descarga entera)
+CAMPOS_STREAMING = ('titulo', 'precio', 'descripcion', 'imagenes')
+TAMANO_FRAGMENTO_STREAMING = 16 * 1024
 
 @dataclass
 class ScrapingTarget:
@@ -47,7 +63,9 @@ class MassiveScrapingEngine:
     """
     
     def __init__(self, max_concurrent: int = 50, max_workers: int = 10):
+        # Tope global de conexiones; el límite por dominio lo ajusta el controlador adaptativo
         self.max_concurrent = max_concurrent
+        self.concurrencia = obtener_controlador_concurrencia()
         self.max_workers = max_workers
         self.results = []
         self.stats = {
@@ -56,8 +74,11 @@ class MassiveScrapingEngine:
             'successful': 0,
             'failed': 0,
             'start_time': None,
-            'end_time': None
+            'end_time': None,
+            'frontier': {}
         }
+        # URLs ya rastreadas en ejecuciones anteriores (filtro de Bloom persistente)
+        self.urls_rastreadas = obtener_urls_rastreadas()
         
         # Configuración de spiders especializados
         self.spider_configs = {
@@ -69,8 +90,7 @@ class MassiveScrapingEngine:
                     'description': '#feature-bullets ul li span::text',
                     'specs': '#productDetails_techSpec_section_1 tr',
                     'images': '#landingImage::attr(src)'
-                },
-                'max_concurrent': 20
+                }
             },
             'ebay': {
                 'class': EbaySpider,
@@ -80,8 +100,7 @@ class MassiveScrapingEngine:
                     'description': '#viTabs_0_is .u-flL span::text',
                     'specs': '.specs table tr',
                     'images': '#icImg::attr(src)'
-                },
-                'max_concurrent': 15
+                }
             },
             'aliexpress': {
                 'class': AliExpressSpider,
@@ -91,8 +110,7 @@ class MassiveScrapingEngine:
                     'description': '.product-overview .content::text',
                     'specs': '.product-params .param',
                     'images': '.image-view img::attr(src)'
-                },
-                'max_concurrent': 10
+                }
             }
         }
     
@@ -105,13 +123,14 @@ class MassiveScrapingEngine:
         self.stats['start_time'] = time.time()
         
         # Preparar URLs para cada spider
-        spider_tasks = self._prepare_spider_tasks(targets)
+        frontera = FronteraRastreo(self.urls_rastreadas)
+        spider_tasks = self._prepare_spider_tasks(targets, frontera)
         
         # Ejecutar spiders en paralelo
         tasks = []
         for spider_name, urls in spider_tasks.items():
             if urls:
-                task = self._run_spider_async(spider_name, urls, progress_callback)
+                task = self._run_spider_async(spider_name, urls, progress_callback, frontera.marcar_rastreada)
                 tasks.append(task)
         
         # Esperar todos los spiders
@@ -129,30 +148,47 @@ class MassiveScrapingEngine:
         self.stats['total_scraped'] = len(self.results)
         self.stats['successful'] = len([r for r in self.results if r.confidence_score > 0.5])
         self.stats['failed'] = self.stats['total_scraped'] - self.stats['successful']
+        self.stats['frontier'] = frontera.resumen()
+        self.urls_rastreadas.guardar()
         
         return self.results
     
-    def _prepare_spider_tasks(self, targets: List[ScrapingTarget]) -> Dict[str, List[str]]:
-        """Prepara tareas para cada spider"""
+    def _prepare_spider_tasks(self, targets: List[ScrapingTarget],
+                              frontera: Optional[FronteraRastreo] = None) -> Dict[str, List[str]]:
+        """
+        Prepara tareas para cada spider
+
+        Las URLs pasan por la frontera de rastreo: se canonicalizan, se descartan las repetidas
+        y cada spider recibe las suyas por prioridad del objetivo y alternando dominios. Las URLs
+        explícitas de un objetivo se rastrean aunque ya se rastrearan en otra ejecución.
+        """
         
         spider_tasks = {name: [] for name in self.spider_configs.keys()}
+        if frontera is None:
+            frontera = FronteraRastreo(self.urls_rastreadas)
         
         for target in targets:
+            prioridad = PRIORIDADES.get(target.priority, PRIORIDAD_POR_DEFECTO)
+            
             # Si tiene URLs específicas, usar esas
             if target.urls:
                 for url in target.urls:
                     spider_name = self._identify_spider_for_url(url)
                     if spider_name:
-                        spider_tasks[spider_name].append(url)
+                        frontera.agregar(url, prioridad, datos=spider_name, ignorar_historial=True)
             
-            # Si tiene keywords, generar URLs de búsqueda
+            # Si tiene keywords, generar URLs de búsqueda (sus resultados cambian: no se recuerdan)
             elif target.keywords:
                 search_urls = self._generate_search_urls(target.keywords, target.expected_sites)
                 for url in search_urls:
                     spider_name = self._identify_spider_for_url(url)
                     if spider_name:
-                        spider_tasks[spider_name].append(url)
+                        frontera.agregar(url, prioridad, datos=spider_name, recordar=False)
         
+        for entrada in frontera:
+            spider_tasks[entrada.datos].append(entrada.url)
+        
+        self.stats['frontier'] = frontera.resumen()
         return spider_tasks
     
     def _identify_spider_for_url(self, url: str) -> Optional[str]:
@@ -188,8 +224,9 @@ class MassiveScrapingEngine:
         return urls
     
     async def _run_spider_async(self, spider_name: str, urls: List[str], 
-                               progress_callback=None) -> List[ScrapedProduct]:
-        """Ejecuta un spider de forma asíncrona"""
+                               progress_callback=None,
+                               al_rastrear: Optional[Callable[[str], None]] = None) -> List[ScrapedProduct]:
+        """Ejecuta un spider de forma asíncrona (al_rastrear recibe cada URL rastreada con éxito)"""
         
         spider_config = self.spider_configs[spider_name]
         spider_class = spider_config['class']
@@ -198,7 +235,9 @@ class MassiveScrapingEngine:
         spider = spider_class(
             urls=urls,
             selectors=spider_config['selectors'],
-            max_concurrent=spider_config['max_concurrent']
+            max_concurrent=self.max_concurrent,
+            concurrencia=self.concurrencia,
+            al_rastrear=al_rastrear
         )
         
         # Ejecutar spider
@@ -212,11 +251,18 @@ class MassiveScrapingEngine:
 class BaseSpider:
     """Spider base para todos los sitios"""
     
-    def __init__(self, urls: List[str], selectors: Dict[str, str], max_concurrent: int = 10):
+    def __init__(self, urls: List[str], selectors: Dict[str, str], max_concurrent: int = 10,
+                 concurrencia: Optional[ControladorConcurrencia] = None,
+                 al_rastrear: Optional[Callable[[str], None]] = None):
         self.urls = urls
         self.selectors = selectors
         self.max_concurrent = max_concurrent
+        self.concurrencia = concurrencia or obtener_controlador_concurrencia()
+        # Aviso por cada URL de la que se obtuvo un producto (la frontera la da por rastreada)
+        self.al_rastrear = al_rastrear
         self.session = None
+        self.http_cache = obtener_cache_http()
+        self.archivo_raw = obtener_archivo_raw()
         
         # Headers para evitar detección
         self.headers = {
@@ -229,10 +275,16 @@ class BaseSpider:
         }
     
     async def scrape_urls_async(self) -> List[ScrapedProduct]:
-        """Scraping asíncrono de URLs"""
+        """
+        Scraping asíncrono de URLs
+
+        Cada trabajador toma la siguiente URL y espera ranura en su dominio: el controlador
+        adaptativo decide cuántas peticiones simultáneas y con qué separación admite cada sitio.
+        """
         
-        connector = aiohttp.TCPConnector(limit=self.max_concurrent)
-        timeout = aiohttp.ClientTimeout(total=30)
+        limites = self.concurrencia.limites
+        connector = aiohttp.TCPConnector(limit=self.max_concurrent, limit_per_host=limites.maximo)
+        timeout = aiohttp.ClientTimeout(total=limites.timeout_s)
         
         async with aiohttp.ClientSession(
             connector=connector, 
@@ -242,65 +294,131 @@ class BaseSpider:
             
             self.session = session
             
-            # Crear tareas para todas las URLs
-            tasks = []
-            for url in self.urls:
-                task = self._scrape_single_url(url)
-                tasks.append(task)
-                
-                # Limitar concurrencia
-                if len(tasks) >= self.max_concurrent:
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-                    yield from self._process_results(results)
-                    tasks = []
-                
-                # Delay aleatorio entre requests
-                await asyncio.sleep(random.uniform(0.5, 2.0))
+            # Los trabajadores comparten el iterador: cada URL se procesa una sola vez
+            pendientes = iter(self.urls)
+            results = []
+            
+            async def trabajador():
+                for url in pendientes:
+                    try:
+                        producto = await self._scrape_single_url(url)
+                        if producto is not None and self.al_rastrear is not None:
+                            self.al_rastrear(url)
+                        results.append(producto)
+                    except Exception as e:
+                        results.append(e)
             
-            # Procesar tareas restantes
-            if tasks:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                yield from self._process_results(results)
+            dominios = {urlsplit(url).hostname for url in self.urls}
+            num_trabajadores = min(len(self.urls), self.max_concurrent, limites.maximo * len(dominios))
+            await asyncio.gather(*(trabajador() for _ in range(num_trabajadores)))
+        
+        return self._process_results(results)
     
     async def _scrape_single_url(self, url: str) -> Optional[ScrapedProduct]:
         """Scrapea una URL individual"""
         
-        try:
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    return self._parse_html(html, url)
+        # Caché HTTP compartida: fresca sin red, caducada con revalidación condicional
+        entrada = self.http_cache.obtener(url)
+        if entrada is not None and entrada.fresca:
+            self.http_cache.registrar_acierto(entrada)
+            return self._parse_html(entrada.texto, url)
+        
+        dominio = urlsplit(url).hostname or ''
+        for intento in range(self.concurrencia.limites.reintentos + 1):
+            # Los reintentos esperan ranura de nuevo: tras un 429/503 el controlador pausa el dominio
+            try:
+                return await self._descargar_y_parsear(url, dominio, entrada)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Los errores HTTP ya se registraron con su estado al recibir la respuesta
+                if not isinstance(e, aiohttp.ClientResponseError):
+                    self.concurrencia.registrar(dominio, error=True)
+                print(f"Exception scraping {url} (intento {intento + 1}): {e}")
+            except Exception as e:
+                print(f"Exception scraping {url}: {e}")
+                return None
+        return None
+    
+    async def _descargar_y_parsear(self, url: str, dominio: str, entrada) -> Optional[ScrapedProduct]:
+        """
+        Una petición dentro de una ranura del dominio
+
+        Raises:
+            aiohttp.ClientResponseError: en 429/503/5xx (reintentables)
+        """
+        async with self.concurrencia.ranura_async(dominio):
+            inicio = time.perf_counter()
+            async with self.session.get(url, headers=HTTPPageCache.cabeceras_condicionales(entrada)) as response:
+                self.concurrencia.registrar(dominio, time.perf_counter() - inicio, response.status,
+                                            reintentar_tras=segundos_retry_after(response.headers.get('Retry-After')))
+                if response.status in ESTADOS_SATURACION or response.status >= 500:
+                    response.raise_for_status()
+                if response.status == 304 and entrada is not None:
+                    entrada = self.http_cache.revalidar(url, response.headers) or entrada
+                    return self._parse_html(entrada.texto, url)
+                elif response.status == 200:
+                    # Parseo en streaming: se deja de leer el socket al tener los datos de la ficha
+                    # (salvo con el archivo raw activo, que guarda la página entera)
+                    archivar = self.archivo_raw.activo
+                    # Sin charset en Content-Type el extractor usa el del <meta> o utf-8 (get_encoding()
+                    # no sirve aquí: necesita el cuerpo ya leído)
+                    extractor = ExtractorHTMLIncremental(requeridos=CAMPOS_STREAMING, clases_por_campo={},
+                                                         encoding=response.charset)
+                    cuerpo = bytearray()
+                    cortada = False
+                    async for fragmento in response.content.iter_chunked(TAMANO_FRAGMENTO_STREAMING):
+                        cuerpo += fragmento
+                        if not extractor.completo and not extractor.alimentar(fragmento) and not archivar:
+                            cortada = True
+                            break
+                    encoding = detectar_encoding(response.headers.get('Content-Type', ''), bytes(cuerpo[:2048]))
+                    if not cortada:
+                        self.http_cache.guardar(url, response.status, response.headers, bytes(cuerpo), encoding)
+                    if archivar:
+                        self.archivo_raw.guardar(str(response.url), response.status, response.headers, bytes(cuerpo),
+                                                 encoding, origen='ultra')
+                    extractor.finalizar()
+                    return self._parse_html(extractor.html, url, extractor.datos_estructurados)
                 else:
                     print(f"Error {response.status} scraping {url}")
                     return None
-        
-        except Exception as e:
-            print(f"Exception scraping {url}: {e}")
-            return None
     
-    def _parse_html(self, html: str, url: str) -> Optional[ScrapedProduct]:
-        """Parsea HTML y extrae datos del producto"""
+    def _parse_html(self, html: str, url: str, datos: Optional[DatosEstructurados] = None) -> Optional[ScrapedProduct]:
+        """Parsea HTML y extrae datos del producto (datos: ya extraídos durante la descarga)"""
         
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Extraer datos usando selectores
+        # Ruta rápida: Product schema.org (JSON-LD / microdata) sin construir el árbol DOM
+        if datos is None:
+            datos = extraer_datos_estructurados(html)
         product = ScrapedProduct(
-            name=self._extract_text(soup, self.selectors.get('name', '')),
-            price=self._extract_text(soup, self.selectors.get('price', '')),
-            description=self._extract_text(soup, self.selectors.get('description', '')),
+            name=datos.nombre,
+            brand=datos.marca,
+            price=datos.precio_formateado,
+            description=datos.descripcion,
+            images=list(datos.imagenes),
             source_url=url,
             source_site=self.__class__.__name__.replace('Spider', '').lower(),
             scraped_at=time.strftime('%Y-%m-%d %H:%M:%S')
         )
+        product.specs = {
+            clave: valor for clave, valor in (
+                ('GTIN', datos.gtin), ('SKU', datos.sku), ('Rating', datos.valoracion),
+                ('Reviews', str(datos.num_valoraciones) if datos.num_valoraciones else '')
+            ) if valor
+        }
         
-        # Extraer especificaciones
-        specs = self._extract_specs(soup, self.selectors.get('specs', ''))
-        product.specs = specs
-        
-        # Extraer imágenes
-        images = self._extract_images(soup, self.selectors.get('images', ''))
-        product.images = images
+        # El árbol completo solo si faltan campos
+        if not (product.name and product.price and product.description and product.images):
+            soup = BeautifulSoup(html, 'html.parser')
+            
+            # Extraer datos usando selectores
+            product.name = product.name or self._extract_text(soup, self.selectors.get('name', ''))
+            product.price = product.price or self._extract_text(soup, self.selectors.get('price', ''))
+            product.description = product.description or self._extract_text(soup, self.selectors.get('description', ''))
+            
+            # Extraer especificaciones
+            product.specs = {**self._extract_specs(soup, self.selectors.get('specs', '')), **product.specs}
+            
+            # Extraer imágenes
+            product.images = product.images or self._extract_images(soup, self.selectors.get('images', ''))
         
         # Calcular score de confianza
         product.confidence_score = self._calculate_confidence(product)
@@ -0,0 +1,294 @@
+# utils/adaptive_concurrency.py
+"""
+Concurrencia adaptativa por dominio (AIMD)
+
+Cada dominio tiene un límite de peticiones simultáneas que se ajusta como la ventana de TCP:
+- Aumento aditivo: con latencia y tasa de errores sanas, +1 por cada ventana completa de
+  respuestas (límite += 1 / límite en cada éxito), solo si el dominio está usando todo su
+  límite; si no, subirlo no dice nada de lo que aguanta el servidor.
+- Recorte multiplicativo: un 429/503, una tasa de errores alta o una latencia que supera varias
+  veces la de referencia del dominio dividen el límite a la mitad, como mucho una vez por
+  ventana de latencia para no hundirlo con una ráfaga de errores de las mismas peticiones.
+  Un 429/503 además pausa el dominio (Retry-After o PAUSA_SATURACION_S, que se duplica en cada
+  episodio seguido de saturación).
+Los límites de la interfaz (peticiones concurrentes, retardo, reintentos, timeout) acotan el
+controlador. Lo comparten el fetcher síncrono, el motor aiohttp y el spider de Scrapy.
+"""
+
+import time
+import asyncio
+import random
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+ALFA_EWMA = 0.2
+FACTOR_RECORTE = 0.5
+# Latencia por encima de FACTOR_LATENCIA x la de referencia del dominio = congestión
+FACTOR_LATENCIA = 2.0
+# La referencia (mínimo observado) se acerca despacio a la media para no quedarse con un valor atípico
+DERIVA_REFERENCIA = 0.01
+LATENCIA_MINIMA_S = 0.05
+TASA_ERROR_MAXIMA = 0.2
+# Una respuesta más lenta que esta fracción del timeout cuenta como congestión
+FRACCION_TIMEOUT = 0.5
+ESTADOS_SATURACION = {429, 503}
+PAUSA_SATURACION_S = 2.0
+PAUSA_MAXIMA_S = 120.0
+# Sondeo cuando todas las ranuras del dominio están ocupadas
+ESPERA_SONDEO_S = 0.05
+
+
+class SinRanuraError(TimeoutError):
+    """No se liberó ninguna ranura del dominio dentro del tiempo de espera"""
+
+
+@dataclass
+class LimitesConcurrencia:
+    """Cotas del controlador (sliders de configuración de scraping)"""
+    maximo: int = 16          # Peticiones simultáneas máximas por dominio
+    minimo: int = 1
+    inicial: int = 2
+    retardo_s: float = 0.0    # Separación mínima entre peticiones al mismo dominio
+    reintentos: int = 2
+    timeout_s: float = 15.0
+    # Máximos específicos por sufijo de dominio ('amazon.com', '.myshopify.com')
+    maximo_por_dominio: Dict[str, int] = field(default_factory=dict)
+
+    def maximo_para(self, dominio: str) -> int:
+        for sufijo, maximo in self.maximo_por_dominio.items():
+            sufijo = sufijo.lstrip('*')
+            if dominio == sufijo.lstrip('.') or dominio.endswith(sufijo if sufijo.startswith('.') else '.' + sufijo):
+                return max(self.minimo, min(maximo, self.maximo))
+        return self.maximo
+
+
+@dataclass
+class EstadoDominio:
+    """Estado vivo de un dominio"""
+    dominio: str
+    limite: float
+    en_curso: int = 0
+    latencia_ewma_s: float = 0.0
+    latencia_referencia_s: float = 0.0
+    tasa_error: float = 0.0
+    peticiones: int = 0
+    errores: int = 0
+    saturaciones: int = 0
+    saturaciones_seguidas: int = 0  # Episodios de 429/503 sin una respuesta sana entre medias
+    recortes: int = 0
+    pausa_hasta: float = 0.0
+    proxima_salida: float = 0.0
+    ultimo_recorte: float = 0.0
+
+
+class ControladorConcurrencia:
+    """
+    Límites AIMD por dominio y ranuras para respetarlos
+
+    Uso: `with controlador.ranura(dominio): ...` (hilos) o `async with controlador.ranura_async(dominio)`
+    alrededor de la petición, y `registrar()` con el resultado. Clientes con su propia cola (Scrapy)
+    solo registran y leen `limite()` / `retardo()`.
+    """
+
+    def __init__(self, limites: Optional[LimitesConcurrencia] = None):
+        self.limites = limites or LimitesConcurrencia()
+        self._condicion = threading.Condition()
+        self._dominios: Dict[str, EstadoDominio] = {}
+
+    def configurar(self, limites: LimitesConcurrencia):
+        """Nuevas cotas; los límites actuales se reajustan a ellas"""
+        with self._condicion:
+            self.limites = limites
+            for estado in self._dominios.values():
+                estado.limite = self._acotar(estado.dominio, estado.limite)
+            self._condicion.notify_all()
+
+    def _acotar(self, dominio: str, limite: float) -> float:
+        return max(float(self.limites.minimo), min(limite, float(self.limites.maximo_para(dominio))))
+
+    def _estado(self, dominio: str) -> EstadoDominio:
+        estado = self._dominios.get(dominio)
+        if estado is None:
+            estado = EstadoDominio(dominio, self._acotar(dominio, self.limites.inicial))
+            self._dominios[dominio] = estado
+        return estado
+
+    def limite(self, dominio: str) -> int:
+        with self._condicion:
+            return int(self._estado(dominio).limite)
+
+    def retardo(self, dominio: str) -> float:
+        """Separación entre peticiones al dominio, incluida la pausa por saturación pendiente"""
+        with self._condicion:
+            return max(self.limites.retardo_s, self._estado(dominio).pausa_hasta - time.time())
+
+    def _intentar_adquirir(self, dominio: str) -> float:
+        """Ocupa una ranura (0) o devuelve los segundos que conviene esperar; requiere el lock"""
+        estado = self._estado(dominio)
+        ahora = time.time()
+        espera = max(estado.pausa_hasta, estado.proxima_salida) - ahora
+        if espera > 0:
+            return espera
+        if estado.en_curso >= int(estado.limite):
+            return ESPERA_SONDEO_S
+        estado.en_curso += 1
+        if self.limites.retardo_s:
+            # Retardo aleatorizado (0,5x - 1,5x) como RANDOMIZE_DOWNLOAD_DELAY de Scrapy
+            estado.proxima_salida = ahora + self.limites.retardo_s * random.uniform(0.5, 1.5)
+        return 0.0
+
+    def _liberar(self, dominio: str):
+        with self._condicion:
+            estado = self._estado(dominio)
+            estado.en_curso = max(0, estado.en_curso - 1)
+            self._condicion.notify_all()
+
+    @contextmanager
+    def ranura(self, dominio: str, espera_maxima: Optional[float] = None):
+        """
+        Bloquea el hilo hasta que el dominio admite otra petición
+
+        Raises:
+            SinRanuraError: si pasan espera_maxima segundos sin ranura libre
+        """
+        limite_espera = time.time() + espera_maxima if espera_maxima is not None else None
+        with self._condicion:
+            while True:
+                espera = self._intentar_adquirir(dominio)
+                if espera <= 0:
+                    break
+                if limite_espera is not None:
+                    restante = limite_espera - time.time()
+                    if restante <= 0:
+                        raise SinRanuraError(f"Sin ranura libre para {dominio}")
+                    espera = min(espera, restante)
+                self._condicion.wait(espera)
+        try:
+            yield
+        finally:
+            self._liberar(dominio)
+
+    @asynccontextmanager
+    async def ranura_async(self, dominio: str, espera_maxima: Optional[float] = None):
+        """Versión asyncio de ranura(): espera con asyncio.sleep sin bloquear el bucle"""
+        limite_espera = time.time() + espera_maxima if espera_maxima is not None else None
+        while True:
+            with self._condicion:
+                espera = self._intentar_adquirir(dominio)
+            if espera <= 0:
+                break
+            if limite_espera is not None and time.time() + espera > limite_espera:
+                raise SinRanuraError(f"Sin ranura libre para {dominio}")
+            await asyncio.sleep(espera)
+        try:
+            yield
+        finally:
+            self._liberar(dominio)
+
+    def registrar(self, dominio: str, segundos: Optional[float] = None, estado_http: Optional[int] = None,
+                  error: bool = False, reintentar_tras: Optional[float] = None, en_vuelo: Optional[int] = None):
+        """
+        Ajusta el límite del dominio con el resultado de una petición
+
+        Args:
+            segundos: latencia hasta las cabeceras (None si no hubo respuesta)
+            estado_http: código de estado (None si falló la conexión)
+            error: fallo de red o timeout
+            reintentar_tras: segundos de la cabecera Retry-After, si la había
+            en_vuelo: peticiones en curso al dominio, incluida esta (por defecto, las ranuras
+                ocupadas; los clientes sin ranuras pasan las de su propia cola)
+        """
+        ahora = time.time()
+        saturacion = estado_http in ESTADOS_SATURACION
+        fallo = error or saturacion or (estado_http is not None and estado_http >= 500)
+
+        with self._condicion:
+            estado = self._estado(dominio)
+            estado.peticiones += 1
+            estado.errores += int(fallo)
+            estado.tasa_error += ALFA_EWMA * (float(fallo) - estado.tasa_error)
+
+            lenta = False
+            if segundos is not None and not fallo:
+                if estado.latencia_ewma_s:
+                    estado.latencia_ewma_s += ALFA_EWMA * (segundos - estado.latencia_ewma_s)
+                    estado.latencia_referencia_s = min(
+                        segundos,
+                        estado.latencia_referencia_s + DERIVA_REFERENCIA * (estado.latencia_ewma_s - estado.latencia_referencia_s)
+                    )
+                else:
+                    estado.latencia_ewma_s = estado.latencia_referencia_s = segundos
+                umbral = FACTOR_LATENCIA * max(estado.latencia_referencia_s, LATENCIA_MINIMA_S)
+                lenta = estado.latencia_ewma_s > umbral or segundos > FRACCION_TIMEOUT * self.limites.timeout_s
+
+            if saturacion:
+                estado.saturaciones += 1
+                if reintentar_tras is not None:
+                    estado.pausa_hasta = max(estado.pausa_hasta, ahora + min(reintentar_tras, PAUSA_MAXIMA_S))
+                elif ahora >= estado.pausa_hasta:
+                    # Los 429 de peticiones que ya estaban en vuelo no alargan la pausa en curso
+                    estado.saturaciones_seguidas += 1
+                    pausa = PAUSA_SATURACION_S * 2 ** min(estado.saturaciones_seguidas - 1, 5)
+                    estado.pausa_hasta = ahora + min(pausa, PAUSA_MAXIMA_S)
+            elif not fallo:
+                estado.saturaciones_seguidas = 0
+
+            if saturacion or lenta or estado.tasa_error > TASA_ERROR_MAXIMA:
+                # Un recorte por ventana: las respuestas de las peticiones ya en vuelo no cuentan dos veces
+                if ahora - estado.ultimo_recorte > max(estado.latencia_ewma_s, 1.0):
+                    estado.limite = self._acotar(dominio, estado.limite * FACTOR_RECORTE)
+                    estado.recortes += 1
+                    estado.ultimo_recorte = ahora
+            elif not fallo and (estado.en_curso if en_vuelo is None else en_vuelo) >= int(estado.limite):
+                estado.limite = self._acotar(dominio, estado.limite + 1.0 / estado.limite)
+
+            self._condicion.notify_all()
+
+    def resumen(self) -> List[Dict]:
+        """Estado de cada dominio para la interfaz"""
+        ahora = time.time()
+        with self._condicion:
+            return [
+                {
+                    'dominio': e.dominio,
+                    'limite': round(e.limite, 1),
+                    'maximo': self.limites.maximo_para(e.dominio),
+                    'en_curso': e.en_curso,
+                    'latencia_ms': round(1000 * e.latencia_ewma_s),
+                    'referencia_ms': round(1000 * e.latencia_referencia_s),
+                    'tasa_error_pct': round(100 * e.tasa_error, 1),
+                    'peticiones': e.peticiones,
+                    'saturaciones': e.saturaciones,
+                    'recortes': e.recortes,
+                    'pausa_s': round(max(0.0, e.pausa_hasta - ahora), 1),
+                }
+                for e in sorted(self._dominios.values(), key=lambda e: -e.peticiones)
+            ]
+
+    def reiniciar(self):
+        with self._condicion:
+            self._dominios.clear()
+            self._condicion.notify_all()
+
+
+def segundos_retry_after(valor: Optional[str]) -> Optional[float]:
+    """Segundos de una cabecera Retry-After (número o fecha HTTP)"""
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=1)
+def obtener_controlador_concurrencia() -> ControladorConcurrencia:
+    """Controlador compartido por todos los scrapers del proceso"""
+    return ControladorConcurrencia()
@@ -0,0 +1,314 @@
+# utils/browser_pool.py
+"""
+Pool de navegadores headless para renderizar JavaScript
+
+Un único Chromium por proceso con un número fijo de contextos, cada uno con su página, que se
+reutilizan entre renderizados y se reciclan (contexto nuevo) cada cierto número de usos para
+contener la memoria. Solo se renderiza cuando el dominio está marcado como "necesita JS"; el
+resto de páginas van por la ruta rápida HTTP. Los dominios se marcan por configuración o al
+detectar que el HTML descargado es un shell vacío que se construye con JavaScript.
+
+Playwright (API asíncrona) corre en un hilo propio con su event loop, así que el pool se
+puede usar desde cualquier hilo. Sin Playwright instalado el pool queda desactivado.
+
+`python -m utils.browser_pool` renderiza una página de prueba local (set_content, sin red) y
+termina con error si el navegador no arranca o no ejecuta JavaScript; la imagen Docker lo lanza
+al construirse.
+"""
+
+import re
+import sys
+import time
+import atexit
+import asyncio
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+try:
+    from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+except ImportError:
+    async_playwright = None
+    PlaywrightTimeoutError = TimeoutError
+
+# Dominios cuyas fichas se montan con JavaScript (se aplica también a subdominios)
+DOMINIOS_CON_JS = {'sephora.com', 'ulta.com'}
+
+TAMANO_POOL = 2
+MAX_USOS_POR_CONTEXTO = 25
+# Tipos de recurso que no aportan texto: se bloquean para renderizar más rápido
+RECURSOS_BLOQUEADOS = {'image', 'media', 'font', 'stylesheet'}
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36')
+
+_PATRON_SHELL_JS = re.compile(
+    r'enable javascript|activa javascript|habilita javascript|'
+    r'<div id=["\'](?:root|app|__next)["\']>\s*</div>',
+    re.IGNORECASE
+)
+_PATRON_NO_VISIBLE = re.compile(r'<script.*?</script>|<style.*?</style>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+
+# Por debajo de estas palabras visibles (y con scripts) la página se considera un shell JS
+MIN_PALABRAS_VISIBLES = 60
+
+
+def parece_shell_js(html: str) -> bool:
+    """Indica si el HTML es un contenedor vacío que solo se rellena ejecutando JavaScript"""
+    if not html:
+        return False
+    if _PATRON_SHELL_JS.search(html):
+        return True
+    return '<script' in html.lower() and len(_PATRON_NO_VISIBLE.sub(' ', html).split()) < MIN_PALABRAS_VISIBLES
+
+
+def _coincide_dominio(url: str, dominios: Iterable[str]) -> bool:
+    partes = (urlsplit(url).hostname or '').lower().split('.')
+    return any('.'.join(partes[i:]) in dominios for i in range(len(partes) - 1))
+
+
+@dataclass
+class _Ranura:
+    contexto: Any
+    pagina: Any
+    usos: int = 0
+
+
+class BrowserPool:
+    """
+    Contextos de navegador reutilizables con tamaño fijo
+
+    Args:
+        tamano: contextos simultáneos (renderizados en paralelo)
+        max_usos_por_contexto: renderizados antes de reciclar el contexto
+        dominios_js: dominios adicionales que siempre se renderizan
+        bloquear_recursos: no descargar imágenes, fuentes, CSS ni media
+    """
+
+    def __init__(self, tamano: int = TAMANO_POOL, max_usos_por_contexto: int = MAX_USOS_POR_CONTEXTO,
+                 dominios_js: Optional[Iterable[str]] = None, bloquear_recursos: bool = True):
+        self.tamano = tamano
+        self.max_usos_por_contexto = max_usos_por_contexto
+        self.bloquear_recursos = bloquear_recursos
+        self.disponible = async_playwright is not None
+
+        self._dominios_js = set(DOMINIOS_CON_JS) | set(dominios_js or ())
+        self._lock = threading.Lock()
+        self._lock_arranque = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._playwright = None
+        self._navegador = None
+        self._libres: Optional[asyncio.Queue] = None
+
+        self.estadisticas = {'renderizados': 0, 'errores': 0, 'contextos_reciclados': 0, 'tiempo_total_s': 0.0}
+
+    # Política por dominio
+
+    def necesita_js(self, url: str) -> bool:
+        """True si la URL debe pasar por el navegador"""
+        return self.disponible and _coincide_dominio(url, self._dominios_js)
+
+    def marcar_necesita_js(self, url: str):
+        """Marca el dominio de la URL para renderizar sus páginas a partir de ahora"""
+        host = (urlsplit(url).hostname or '').lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        if host:
+            with self._lock:
+                self._dominios_js.add(host)
+
+    # Ciclo de vida
+
+    def _asegurar_arranque(self):
+        # Los hilos que llegan durante el arranque esperan a que el pool esté listo
+        with self._lock_arranque:
+            if self._libres is not None:
+                return
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._hilo = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+                self._hilo.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._iniciar(), self._loop).result(timeout=60)
+            except Exception:
+                self.disponible = False
+                raise
+
+    async def _iniciar(self):
+        self._playwright = await async_playwright().start()
+        self._navegador = await self._playwright.chromium.launch(headless=True)
+        libres = asyncio.Queue()
+        for _ in range(self.tamano):
+            libres.put_nowait(await self._nueva_ranura())
+        self._libres = libres
+
+    async def _nueva_ranura(self) -> _Ranura:
+        contexto = await self._navegador.new_context(user_agent=USER_AGENT, locale='es-ES')
+        if self.bloquear_recursos:
+            await contexto.route('**/*', self._filtrar_recurso)
+        return _Ranura(contexto, await contexto.new_page())
+
+    @staticmethod
+    async def _filtrar_recurso(route):
+        if route.request.resource_type in RECURSOS_BLOQUEADOS:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _reciclar(self, ranura: _Ranura) -> _Ranura:
+        try:
+            await ranura.contexto.close()
+        except Exception:
+            pass
+        self.estadisticas['contextos_reciclados'] += 1
+        return await self._nueva_ranura()
+
+    # Renderizado
+
+    async def _renderizar(self, url: str, timeout: float, html: Optional[str]) -> str:
+        ranura = await self._libres.get()
+        limite_ms = int(timeout * 1000)
+        try:
+            if html is not None:
+                await ranura.pagina.set_content(html, wait_until='domcontentloaded', timeout=limite_ms)
+            else:
+                await ranura.pagina.goto(url, wait_until='domcontentloaded', timeout=limite_ms)
+            try:
+                # Margen corto para las peticiones XHR que rellenan la ficha
+                await ranura.pagina.wait_for_load_state('networkidle', timeout=min(limite_ms, 3000))
+            except PlaywrightTimeoutError:
+                pass
+            ranura.usos += 1
+            return await ranura.pagina.content()
+        except Exception:
+            # Una página en estado dudoso no vuelve al pool
+            ranura.usos = self.max_usos_por_contexto
+            raise
+        finally:
+            if ranura.usos >= self.max_usos_por_contexto or ranura.pagina.is_closed():
+                try:
+                    ranura = await self._reciclar(ranura)
+                except Exception:
+                    pass
+            self._libres.put_nowait(ranura)
+
+    def renderizar(self, url: str, timeout: float = 15, html: Optional[str] = None) -> Optional[str]:
+        """
+        HTML tras ejecutar JavaScript (None si el pool no está disponible o falla)
+
+        Args:
+            html: renderiza este HTML en lugar de descargar la URL (páginas de prueba locales)
+        """
+        if not self.disponible:
+            return None
+        try:
+            self._asegurar_arranque()
+        except Exception:
+            return None
+
+        inicio = time.perf_counter()
+        futuro = asyncio.run_coroutine_threadsafe(self._renderizar(url, timeout, html), self._loop)
+        try:
+            contenido = futuro.result(timeout=timeout + 10)
+        except Exception:
+            futuro.cancel()
+            with self._lock:
+                self.estadisticas['errores'] += 1
+            return None
+        with self._lock:
+            self.estadisticas['renderizados'] += 1
+            self.estadisticas['tiempo_total_s'] += time.perf_counter() - inicio
+        return contenido
+
+    def resumen(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.estadisticas['renderizados']
+            return {
+                **self.estadisticas,
+                'tiempo_medio_s': round(self.estadisticas['tiempo_total_s'] / n, 2) if n else 0.0,
+                'dominios_js': sorted(self._dominios_js),
+            }
+
+    def cerrar(self):
+        """Cierra el navegador y detiene el hilo del event loop"""
+        if self._loop is None:
+            return
+
+        async def _cerrar():
+            if self._navegador is not None:
+                await self._navegador.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_cerrar(), self._loop).result(timeout=15)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._hilo.join(timeout=5)
+        self._loop = None
+        self._libres = None
+
+
+@lru_cache(maxsize=1)
+def obtener_pool_navegadores() -> BrowserPool:
+    """Pool compartido por todo el proceso (el navegador se lanza en el primer renderizado)"""
+    pool = BrowserPool()
+    atexit.register(pool.cerrar)
+    return pool
+
+
+# Página de prueba: un shell vacío que solo tiene contenido tras ejecutar su JavaScript
+PAGINA_PRUEBA = """<!DOCTYPE html>
+<html lang="es">
+<head><meta charset="utf-8"><title>Ficha de prueba</title></head>
+<body>
+<div id="root"></div>
+<script>
+document.getElementById('root').innerHTML =
+  '<h1>Sérum de prueba</h1><p id="renderizado-js">Contenido generado con JavaScript</p>';
+</script>
+</body>
+</html>"""
+
+MARCA_PRUEBA = 'id="renderizado-js"'
+
+
+def comprobar_pool(pool: Optional[BrowserPool] = None, timeout: float = 30) -> Optional[str]:
+    """
+    Renderiza PAGINA_PRUEBA con el pool y comprueba que se ejecutó su JavaScript
+
+    Returns:
+        None si todo va bien; el motivo del fallo en otro caso
+    """
+    pool = pool or BrowserPool(tamano=1)
+    if not pool.disponible:
+        return "Playwright no está instalado"
+    if not parece_shell_js(PAGINA_PRUEBA):
+        return "la página de prueba no se detecta como shell JS"
+
+    html = pool.renderizar('about:blank', timeout=timeout, html=PAGINA_PRUEBA)
+    if html is None:
+        return "el navegador no arrancó o el renderizado falló (¿falta `playwright install chromium`?)"
+    if MARCA_PRUEBA not in html:
+        return "el HTML renderizado no contiene el contenido generado por JavaScript"
+    return None
+
+
+def main():
+    pool = BrowserPool(tamano=1)
+    try:
+        error = comprobar_pool(pool)
+    finally:
+        pool.cerrar()
+    if error:
+        print(f"Pool de navegadores: ERROR - {error}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Pool de navegadores: OK ({pool.resumen()['tiempo_medio_s']} s por renderizado)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+# utils/html_stream.py
+"""
+Extracción incremental de fichas de producto
+
+El HTML se procesa por fragmentos a medida que llega del socket (parser de lxml en modo feed con
+un target de eventos, o html.parser si lxml no está instalado) y los campos se rellenan en una
+sola pasada sin construir árbol: JSON-LD Product, meta de precio/imagen y los elementos cuyas
+clases coinciden con los selectores habituales de título, descripción, ingredientes y precio.
+En cuanto están todos los campos requeridos, alimentar() devuelve False y quien descarga deja de
+leer la respuesta: el resto de la página (reseñas, recomendaciones, pie) ni se descarga ni se parsea.
+"""
+
+import re
+import codecs
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Set, Union
+
+from .structured_data import DatosEstructurados, extraer_datos_estructurados, producto_json_ld
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Clases CSS (y data-testid) que identifican cada campo en las fichas de los retailers
+CLASES_POR_CAMPO: Dict[str, Set[str]] = {
+    'titulo': {'product-title', 'product-name', 'pdp-product-name'},
+    'descripcion': {'product-description', 'product-details', 'product-summary', 'description', 'overview'},
+    'ingredientes': {'ingredients', 'ingredient-list', 'product-ingredients', 'formula', 'composition'},
+    'precio': {'price', 'product-price', 'price-current', 'sale-price', 'cost'},
+}
+TESTID_POR_CAMPO = {
+    'product-name': 'titulo', 'product-description': 'descripcion', 'ingredients': 'ingredientes', 'price': 'precio'
+}
+ETIQUETA_POR_CAMPO = {'h1': 'titulo'}
+
+# Contenedores cuyos <li> son beneficios
+CLASES_BENEFICIOS = {'benefits', 'features', 'key-benefits', 'product-benefits', 'highlights'}
+
+CAMPOS_REQUERIDOS = ('titulo', 'descripcion', 'precio')
+
+MIN_CARACTERES = {'precio': 1}
+MIN_CARACTERES_POR_DEFECTO = 10
+MAX_CARACTERES_CAMPO = 500
+# Texto que se acumula como máximo por elemento capturado
+MAX_CARACTERES_CAPTURA = 5000
+MAX_BENEFICIOS = 8
+# Nodos de texto, tras una etiqueta ("Ingredients:"), en los que se busca el valor del campo
+NODOS_TRAS_ETIQUETA = 6
+# Bytes que se esperan antes de decidir la codificación (el <meta charset> va al principio)
+BYTES_DETECCION_CHARSET = 1024
+
+_ELEMENTOS_VACIOS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+# Elementos que el HTML cierra implícitamente al abrir otro igual
+_CIERRE_IMPLICITO = {'p', 'li'}
+
+_META_PRECIO = {'product:price:amount', 'og:price:amount'}
+_META_MONEDA = {'product:price:currency', 'og:price:currency'}
+_META_IMAGEN = {'og:image', 'og:image:url', 'twitter:image'}
+
+_PATRON_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+_PATRON_ESPACIOS = re.compile(r'\s+')
+
+
+class _Nodo:
+    __slots__ = ('etiqueta', 'campo', 'texto', 'longitud', 'beneficios', 'contenedor_beneficios')
+
+    def __init__(self, etiqueta: str, campo: Optional[str] = None, beneficios: bool = False,
+                 contenedor_beneficios: bool = False):
+        self.etiqueta = etiqueta
+        self.campo = campo
+        self.beneficios = beneficios  # <li> de un contenedor de beneficios o <p> candidato
+        self.contenedor_beneficios = contenedor_beneficios
+        self.texto: Optional[List[str]] = [] if (campo or beneficios) else None
+        self.longitud = 0
+
+
+class _ParserEstandar(HTMLParser):
+    """Alternativa sin lxml: traduce los callbacks de html.parser a la interfaz target de lxml"""
+
+    def __init__(self, destino: 'ExtractorHTMLIncremental'):
+        super().__init__(convert_charrefs=True)
+        self.destino = destino
+
+    def handle_starttag(self, etiqueta, atributos):
+        self.destino.start(etiqueta, dict(atributos))
+
+    def handle_startendtag(self, etiqueta, atributos):
+        self.destino.start(etiqueta, dict(atributos))
+        self.destino.end(etiqueta)
+
+    def handle_endtag(self, etiqueta):
+        self.destino.end(etiqueta)
+
+    def handle_data(self, datos):
+        self.destino.data(datos)
+
+
+class ExtractorHTMLIncremental:
+    """
+    Parser en streaming que rellena los campos de una ficha y avisa cuando ya están todos
+
+    Recibe los eventos start/end/data del parser (es el target de lxml) y solo guarda el texto
+    de los elementos que le interesan.
+
+    Args:
+        requeridos: campos con los que se considera completa la ficha ('imagenes' incluido)
+        clases_por_campo: clases CSS por campo ({} para usar solo datos estructurados)
+        validadores: función por campo que decide si un texto capturado es válido
+        etiquetas: patrón por campo; los nodos de texto que siguen a una coincidencia se prueban
+            con el validador del campo (listas INCI sin clase propia)
+        patron_beneficio: expresión compilada que marca un <p> como beneficio (None para no buscar)
+        encoding: codificación de los bytes recibidos (por defecto charset del <meta> o utf-8)
+    """
+
+    def __init__(self, requeridos: Iterable[str] = CAMPOS_REQUERIDOS,
+                 clases_por_campo: Optional[Dict[str, Set[str]]] = None,
+                 validadores: Optional[Dict[str, Callable[[str], bool]]] = None,
+                 etiquetas: Optional[Dict[str, Pattern]] = None,
+                 patron_beneficio: Optional[Pattern] = None,
+                 encoding: Optional[str] = None):
+        self.requeridos = tuple(requeridos)
+        self.validadores = validadores or {}
+        self.etiquetas = etiquetas or {}
+        self.patron_beneficio = patron_beneficio
+        self.encoding = encoding
+
+        clases = CLASES_POR_CAMPO if clases_por_campo is None else clases_por_campo
+        self._campo_por_clase = {clase: campo for campo, grupo in clases.items() for clase in grupo}
+        self._usar_selectores = bool(clases)
+        self._inicializar_estado()
+
+    def _inicializar_estado(self):
+        self.campos: Dict[str, str] = {'titulo': '', 'descripcion': '', 'precio': '', 'ingredientes': '', 'marca': ''}
+        self.imagenes: List[str] = []
+        self.beneficios: List[str] = []
+        self.datos_estructurados = DatosEstructurados()
+        self.bytes_procesados = 0
+
+        self._parser = etree.HTMLParser(target=self, recover=True) if etree is not None else _ParserEstandar(self)
+        self._partes: List[str] = []
+        self._pendiente = b''
+        self._pila: List[_Nodo] = []
+        self._capturas = 0
+        self._capturando: Set[str] = set()
+        self._en_beneficios = 0
+        self._script: Optional[List[str]] = None  # Contenido del JSON-LD en curso
+        self._en_script = False
+        self._tras_etiqueta: Dict[str, int] = {}
+        self._moneda_meta = ''
+        self._decodificador = None
+        self._finalizado = False
+
+    def reiniciar(self):
+        """Descarta lo procesado (p. ej. antes de alimentar el HTML renderizado de la misma URL)"""
+        self._inicializar_estado()
+
+    # Estado
+
+    @property
+    def completo(self) -> bool:
+        return all(self.imagenes if campo == 'imagenes' else self.campos.get(campo) for campo in self.requeridos)
+
+    @property
+    def html(self) -> str:
+        """HTML recibido hasta ahora (la página entera si no se cortó la lectura)"""
+        return ''.join(self._partes)
+
+    def alimentar(self, fragmento: Union[bytes, str]) -> bool:
+        """
+        Procesa un fragmento más del documento
+
+        Returns:
+            bool: False cuando ya están todos los campos requeridos (se puede dejar de leer)
+        """
+        if not fragmento:
+            return not self.completo
+        self.bytes_procesados += len(fragmento)
+        if isinstance(fragmento, bytes):
+            if self._decodificador is None:
+                self._pendiente += fragmento
+                if len(self._pendiente) < BYTES_DETECCION_CHARSET:
+                    return True
+                fragmento, self._pendiente = self._pendiente, b''
+                self._decodificador = self._crear_decodificador(fragmento)
+            fragmento = self._decodificador.decode(fragmento)
+
+        self._procesar(fragmento)
+        return not self.completo
+
+    def _procesar(self, texto: str):
+        if texto:
+            self._partes.append(texto)
+            self._parser.feed(texto)
+
+    def _crear_decodificador(self, inicio: bytes):
+        encoding = self.encoding
+        if not encoding:
+            coincidencia = _PATRON_CHARSET.search(inicio[:2048])
+            encoding = coincidencia.group(1).decode('ascii', errors='ignore') if coincidencia else 'utf-8'
+        try:
+            return codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def finalizar(self) -> 'ExtractorHTMLIncremental':
+        """
+        Cierra el parser y completa los huecos con el microdata del HTML recibido
+
+        Si el JSON-LD no trae nombre, precio y descripción se usa extraer_datos_estructurados
+        sobre lo descargado, con el mismo resultado que sobre el documento sin streaming.
+        """
+        if self._finalizado:
+            return self
+        self._finalizado = True
+        if self._pendiente:
+            self._decodificador = self._crear_decodificador(self._pendiente)
+            self._procesar(self._decodificador.decode(self._pendiente))
+        if self._decodificador is not None:
+            self._procesar(self._decodificador.decode(b'', final=True))
+        try:
+            self._parser.close()
+        except Exception:
+            # lxml se queja de documentos vacíos o cortados; lo extraído sigue siendo válido
+            pass
+
+        datos = self.datos_estructurados
+        if not (datos.nombre and datos.precio and datos.descripcion):
+            self._aplicar_datos(extraer_datos_estructurados(self.html))
+        return self
+
+    # Asignación de campos
+
+    def _asignar(self, campo: str, texto: str) -> bool:
+        if not texto or self.campos.get(campo):
+            return False
+        if len(texto) <= MIN_CARACTERES.get(campo, MIN_CARACTERES_POR_DEFECTO):
+            return False
+        validador = self.validadores.get(campo)
+        if validador is not None and not validador(texto):
+            return False
+        self.campos[campo] = texto[:MAX_CARACTERES_CAMPO]
+        return True
+
+    def _aplicar_datos(self, datos: DatosEstructurados):
+        """Los datos estructurados tienen prioridad sobre el texto capturado por clase"""
+        if datos.vacio:
+            return
+        self.datos_estructurados = datos
+        for campo, valor in (('titulo', datos.nombre), ('descripcion', datos.descripcion),
+                             ('precio', datos.precio_formateado), ('marca', datos.marca)):
+            if valor:
+                self.campos[campo] = valor[:MAX_CARACTERES_CAMPO]
+        if datos.imagenes:
+            self.imagenes = list(datos.imagenes)
+
+    def _anadir_beneficio(self, texto: str):
+        if texto not in self.beneficios and len(self.beneficios) < MAX_BENEFICIOS:
+            self.beneficios.append(texto)
+
+    # Eventos del parser (interfaz target de lxml)
+
+    def start(self, etiqueta: str, atributos):
+        if etiqueta in _ELEMENTOS_VACIOS:
+            if etiqueta == 'meta':
+                self._procesar_meta(atributos)
+            return
+
+        if etiqueta in ('script', 'style'):
+            self._en_script = True
+            tipo = (atributos.get('type') or '').lower()
+            self._script = [] if etiqueta == 'script' and tipo == 'application/ld+json' else None
+            return
+
+        if etiqueta in _CIERRE_IMPLICITO and self._pila and self._pila[-1].etiqueta == etiqueta:
+            self._cerrar_nodo(self._pila.pop())
+
+        campo = None
+        contenedor = False
+        if self._usar_selectores:
+            clase = atributos.get('class')
+            testid = atributos.get('data-testid')
+            # La mayoría de elementos no tiene clase ni data-testid: no hay nada que clasificar
+            if clase or testid or etiqueta in ETIQUETA_POR_CAMPO:
+                campo, contenedor = self._clasificar(etiqueta, (clase or '').split(), testid or '')
+
+        beneficio = (etiqueta == 'li' and self._en_beneficios > 0) or \
+                    (etiqueta == 'p' and self.patron_beneficio is not None and len(self.beneficios) < MAX_BENEFICIOS)
+        if contenedor:
+            self._en_beneficios += 1
+
+        nodo = _Nodo(etiqueta, campo, beneficio, contenedor)
+        self._capturas += nodo.texto is not None
+        self._pila.append(nodo)
+
+    def _clasificar(self, etiqueta: str, clases: List[str], testid: str):
+        """Campo que captura el elemento (si aún falta) y si es un contenedor de beneficios"""
+        candidatos = [ETIQUETA_POR_CAMPO.get(etiqueta), TESTID_POR_CAMPO.get(testid)]
+        candidatos.extend(self._campo_por_clase.get(clase) for clase in clases)
+        campo = next((c for c in candidatos if c and c not in self._capturando and not self.campos.get(c)), None)
+        if campo:
+            self._capturando.add(campo)
+        return campo, any(clase in CLASES_BENEFICIOS for clase in clases)
+
+    def end(self, etiqueta: str):
+        if etiqueta in ('script', 'style'):
+            if self._script is not None:
+                datos = producto_json_ld(''.join(self._script))
+                if datos is not None and self.datos_estructurados.vacio:
+                    self._aplicar_datos(datos)
+            self._script = None
+            self._en_script = False
+            return
+
+        # Etiquetas mal anidadas: se cierran los nodos abiertos hasta la que coincide
+        for indice in range(len(self._pila) - 1, -1, -1):
+            if self._pila[indice].etiqueta == etiqueta:
+                while len(self._pila) > indice:
+                    self._cerrar_nodo(self._pila.pop())
+                return
+
+    def data(self, datos: str):
+        if self._en_script:
+            if self._script is not None:
+                self._script.append(datos)
+            return
+
+        if self._capturas:
+            for nodo in self._pila:
+                if nodo.texto is not None and nodo.longitud < MAX_CARACTERES_CAPTURA:
+                    nodo.texto.append(datos)
+                    nodo.longitud += len(datos)
+
+        if self.etiquetas:
+            self._buscar_tras_etiqueta(datos)
+
+    def _buscar_tras_etiqueta(self, datos: str):
+        texto = datos.strip(' \t\r\n:.-"')
+        if not texto:
+            return
+        for campo, restantes in list(self._tras_etiqueta.items()):
+            if self.campos.get(campo):
+                del self._tras_etiqueta[campo]
+            elif self._asignar(campo, _PATRON_ESPACIOS.sub(' ', texto)):
+                del self._tras_etiqueta[campo]
+            elif restantes <= 1:
+                del self._tras_etiqueta[campo]
+            else:
+                self._tras_etiqueta[campo] = restantes - 1
+        for campo, patron in self.etiquetas.items():
+            if not self.campos.get(campo) and len(texto) < 40 and patron.search(texto):
+                self._tras_etiqueta[campo] = NODOS_TRAS_ETIQUETA
+
+    def _cerrar_nodo(self, nodo: _Nodo):
+        if nodo.contenedor_beneficios:
+            self._en_beneficios -= 1
+        if nodo.texto is None:
+            return
+        self._capturas -= 1
+        texto = _PATRON_ESPACIOS.sub(' ', ''.join(nodo.texto)).strip()
+        if nodo.campo:
+            self._capturando.discard(nodo.campo)
+            self._asignar(nodo.campo, texto)
+        if nodo.beneficios:
+            if nodo.etiqueta == 'li':
+                if 5 < len(texto) < 100:
+                    self._anadir_beneficio(texto)
+            elif 20 < len(texto) < 150 and self.patron_beneficio.search(texto):
+                self._anadir_beneficio(texto)
+
+    def _procesar_meta(self, atributos: Dict[str, str]):
+        nombre = (atributos.get('property') or atributos.get('name') or atributos.get('itemprop') or '').lower()
+        contenido = (atributos.get('content') or '').strip()
+        if not nombre or not contenido:
+            return
+        if nombre in _META_MONEDA or nombre == 'pricecurrency':
+            self._moneda_meta = contenido
+        elif nombre in _META_PRECIO or nombre == 'price':
+            if not self.campos['precio']:
+                self.campos['precio'] = f"{contenido} {self._moneda_meta}".strip()
+        elif nombre in _META_IMAGEN and not self.imagenes:
+            self.imagenes = [contenido]
@@ -0,0 +1,369 @@
+# utils/http_cache.py
+"""
+Caché HTTP en disco con revalidación condicional (estilo RFC 7234)
+
+Guarda el cuerpo comprimido y los validadores (ETag / Last-Modified) de cada página. Mientras
+la entrada está fresca se sirve sin tocar la red; cuando caduca se revalida con
+If-None-Match / If-Modified-Since y un 304 renueva la entrada sin volver a descargar el cuerpo.
+La frescura sale de la política por dominio (las fichas de producto cambian poco aunque el
+servidor envíe no-cache) o, si el dominio no tiene política, de Cache-Control/Expires. Al
+superar el tamaño total se expulsan las entradas menos usadas recientemente.
+
+La usan el fetcher síncrono, los spiders asíncronos del motor ULTRA y Scrapy (a través de
+un backend de HTTPCACHE_STORAGE), de modo que una página descargada por cualquiera de ellos
+sirve para los demás.
+"""
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+DIRECTORIO_CACHE_HTTP = "./product_cache"
+MAX_BYTES_CACHE = 200 * 1024 * 1024
+
+# Frescura (segundos) por dominio; se aplica a subdominios. Tiene prioridad sobre las cabeceras.
+MAX_AGE_POR_DOMINIO = {
+    'amazon.com': 6 * 3600,
+    'amazon.es': 6 * 3600,
+    'sephora.com': 24 * 3600,
+    'ulta.com': 24 * 3600,
+    'douglas.es': 24 * 3600,
+    'notino.es': 24 * 3600,
+    'lookfantastic.com': 24 * 3600,
+    'google.com': 0,
+    'bing.com': 0,
+    'duckduckgo.com': 0,
+}
+MAX_AGE_POR_DEFECTO = 3600
+# Heurística RFC 7234 §4.2.2 cuando solo hay Last-Modified: 10% de la antigüedad, con tope
+MAX_AGE_HEURISTICO = 24 * 3600
+
+# Cabeceras que no describen el cuerpo guardado (se guarda ya descomprimido)
+_CABECERAS_EXCLUIDAS = {
+    'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length',
+    'set-cookie', 'proxy-connection', 'upgrade', 'te', 'trailer'
+}
+
+
+def clave_url(url: str) -> str:
+    """Clave de caché: URL sin fragmento, esquema y host en minúsculas"""
+    partes = urlsplit(url.strip())
+    return urlunsplit((partes.scheme.lower(), partes.netloc.lower(), partes.path or '/', partes.query, ''))
+
+
+def _cabeceras_minusculas(headers) -> Dict[str, str]:
+    return {str(k).lower(): str(v) for k, v in dict(headers or {}).items()}
+
+
+def _directivas_cache_control(valor: str) -> Dict[str, Optional[str]]:
+    directivas = {}
+    for parte in (valor or '').split(','):
+        nombre, _, argumento = parte.strip().partition('=')
+        if nombre:
+            directivas[nombre.lower()] = argumento.strip('"') or None
+    return directivas
+
+
+def _fecha_http(valor: Optional[str]) -> Optional[float]:
+    if not valor:
+        return None
+    try:
+        return parsedate_to_datetime(valor).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+@dataclass
+class EntradaCache:
+    """Página cacheada con sus validadores"""
+    url: str
+    status: int
+    headers: Dict[str, str]
+    cuerpo: bytes
+    encoding: str = 'utf-8'
+    guardado: float = 0.0   # Momento de la descarga o de la última revalidación
+    frescura: float = 0.0   # Segundos de validez desde 'guardado'
+    etag: str = ""
+    last_modified: str = ""
+
+    @property
+    def edad(self) -> float:
+        return max(0.0, time.time() - self.guardado)
+
+    @property
+    def fresca(self) -> bool:
+        return self.edad < self.frescura
+
+    @property
+    def texto(self) -> str:
+        return self.cuerpo.decode(self.encoding, errors='replace')
+
+
+@dataclass
+class EstadisticasCacheHTTP:
+    aciertos: int = 0          # Servidas sin red
+    revalidadas: int = 0       # 304: cuerpo reutilizado
+    descargadas: int = 0       # 200 guardadas (fallo o entrada modificada)
+    expulsadas: int = 0
+    bytes_ahorrados: int = 0
+
+
+class HTTPPageCache:
+    """
+    Almacén SQLite de páginas HTTP (cuerpo comprimido con zlib)
+
+    Args:
+        ruta_db: fichero SQLite
+        max_bytes: tamaño total (comprimido) a partir del cual se expulsan entradas LRU
+        max_age_por_dominio: frescura por dominio; se combina con MAX_AGE_POR_DOMINIO
+    """
+
+    def __init__(self, ruta_db: str = os.path.join(DIRECTORIO_CACHE_HTTP, "http_cache.sqlite"),
+                 max_bytes: int = MAX_BYTES_CACHE, max_age_por_dominio: Optional[Dict[str, int]] = None,
+                 max_age_por_defecto: int = MAX_AGE_POR_DEFECTO):
+        directorio = os.path.dirname(ruta_db)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.ruta_db = ruta_db
+        self.max_bytes = max_bytes
+        self.max_age_por_dominio = {**MAX_AGE_POR_DOMINIO, **(max_age_por_dominio or {})}
+        self.max_age_por_defecto = max_age_por_defecto
+        self.estadisticas = EstadisticasCacheHTTP()
+
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._crear_esquema()
+
+    def _crear_esquema(self):
+        with self._lock, self._conexion:
+            self._conexion.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS paginas (
+                    clave TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    cuerpo BLOB NOT NULL,
+                    encoding TEXT NOT NULL,
+                    tamano INTEGER NOT NULL,
+                    tamano_original INTEGER NOT NULL,
+                    guardado REAL NOT NULL,
+                    frescura REAL NOT NULL,
+                    etag TEXT NOT NULL DEFAULT '',
+                    last_modified TEXT NOT NULL DEFAULT '',
+                    ultimo_acceso REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_paginas_acceso ON paginas(ultimo_acceso);
+            """)
+
+    @staticmethod
+    def _clave(url: str) -> str:
+        return hashlib.sha1(clave_url(url).encode('utf-8')).hexdigest()
+
+    def _contar(self, evento: str, bytes_ahorrados: int = 0):
+        with self._lock:
+            setattr(self.estadisticas, evento, getattr(self.estadisticas, evento) + 1)
+            self.estadisticas.bytes_ahorrados += bytes_ahorrados
+
+    def max_age_dominio(self, url: str) -> Optional[int]:
+        """Frescura configurada para el dominio (o un dominio padre) de la URL"""
+        host = (urlsplit(url).hostname or '').lower()
+        partes = host.split('.')
+        for i in range(len(partes) - 1):
+            dominio = '.'.join(partes[i:])
+            if dominio in self.max_age_por_dominio:
+                return self.max_age_por_dominio[dominio]
+        return None
+
+    def calcular_frescura(self, url: str, headers: Dict[str, str]) -> float:
+        """Política por dominio; si no hay, max-age/Expires del servidor o la heurística de Last-Modified"""
+        politica = self.max_age_dominio(url)
+        if politica is not None:
+            return float(politica)
+
+        directivas = _directivas_cache_control(headers.get('cache-control', ''))
+        for nombre in ('s-maxage', 'max-age'):
+            if directivas.get(nombre, '') and directivas[nombre].isdigit():
+                return float(directivas[nombre])
+        if 'no-cache' in directivas:
+            return 0.0
+
+        fecha = _fecha_http(headers.get('date')) or time.time()
+        expira = _fecha_http(headers.get('expires'))
+        if expira is not None:
+            return max(0.0, expira - fecha)
+
+        modificada = _fecha_http(headers.get('last-modified'))
+        if modificada is not None:
+            return min(MAX_AGE_HEURISTICO, max(0.0, (fecha - modificada) * 0.1))
+
+        return float(self.max_age_por_defecto)
+
+    def obtener(self, url: str) -> Optional[EntradaCache]:
+        """Entrada cacheada (fresca o no) de la URL"""
+        clave = self._clave(url)
+        with self._lock:
+            fila = self._conexion.execute("SELECT * FROM paginas WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            with self._conexion:
+                self._conexion.execute("UPDATE paginas SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave))
+        try:
+            cuerpo = zlib.decompress(fila['cuerpo'])
+        except zlib.error:
+            self.eliminar(url)
+            return None
+        return EntradaCache(
+            url=fila['url'], status=fila['status'], headers=json.loads(fila['headers']), cuerpo=cuerpo,
+            encoding=fila['encoding'], guardado=fila['guardado'], frescura=fila['frescura'],
+            etag=fila['etag'], last_modified=fila['last_modified']
+        )
+
+    def registrar_acierto(self, entrada: EntradaCache):
+        """Cuenta una entrada fresca servida sin red"""
+        self._contar('aciertos', len(entrada.cuerpo))
+
+    @staticmethod
+    def cabeceras_condicionales(entrada: Optional[EntradaCache]) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since para revalidar una entrada caducada"""
+        if entrada is None:
+            return {}
+        cabeceras = {}
+        if entrada.etag:
+            cabeceras['If-None-Match'] = entrada.etag
+        if entrada.last_modified:
+            cabeceras['If-Modified-Since'] = entrada.last_modified
+        return cabeceras
+
+    def guardar(self, url: str, status: int, headers, cuerpo: bytes, encoding: str = 'utf-8') -> bool:
+        """Guarda una respuesta 200 cacheable; devuelve False si no se guardó"""
+        cabeceras = _cabeceras_minusculas(headers)
+        if status != 200 or 'no-store' in _directivas_cache_control(cabeceras.get('cache-control', '')):
+            return False
+
+        cabeceras = {k: v for k, v in cabeceras.items() if k not in _CABECERAS_EXCLUIDAS}
+        comprimido = zlib.compress(cuerpo, 6)
+        ahora = time.time()
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                """INSERT OR REPLACE INTO paginas
+                   (clave, url, status, headers, cuerpo, encoding, tamano, tamano_original,
+                    guardado, frescura, etag, last_modified, ultimo_acceso)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (self._clave(url), url, status, json.dumps(cabeceras), comprimido, encoding or 'utf-8',
+                 len(comprimido), len(cuerpo), ahora, self.calcular_frescura(url, cabeceras),
+                 cabeceras.get('etag', ''), cabeceras.get('last-modified', ''), ahora)
+            )
+        self._contar('descargadas')
+        self._expulsar()
+        return True
+
+    def revalidar(self, url: str, headers_304) -> Optional[EntradaCache]:
+        """Aplica un 304: actualiza cabeceras/validadores y reinicia la frescura"""
+        entrada = self.obtener(url)
+        if entrada is None:
+            return None
+
+        nuevas = {k: v for k, v in _cabeceras_minusculas(headers_304).items() if k not in _CABECERAS_EXCLUIDAS}
+        entrada.headers.update(nuevas)
+        entrada.etag = entrada.headers.get('etag', entrada.etag)
+        entrada.last_modified = entrada.headers.get('last-modified', entrada.last_modified)
+        entrada.guardado = time.time()
+        entrada.frescura = self.calcular_frescura(url, entrada.headers)
+
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                """UPDATE paginas SET headers = ?, guardado = ?, frescura = ?, etag = ?, last_modified = ?
+                   WHERE clave = ?""",
+                (json.dumps(entrada.headers), entrada.guardado, entrada.frescura,
+                 entrada.etag, entrada.last_modified, self._clave(url))
+            )
+        self._contar('revalidadas', len(entrada.cuerpo))
+        return entrada
+
+    def eliminar(self, url: str):
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM paginas WHERE clave = ?", (self._clave(url),))
+
+    def tamano_total(self) -> int:
+        with self._lock:
+            return self._conexion.execute("SELECT COALESCE(SUM(tamano), 0) FROM paginas").fetchone()[0]
+
+    def _expulsar(self):
+        """Borra las entradas menos usadas hasta quedar en el 90% del máximo"""
+        total = self.tamano_total()
+        if total <= self.max_bytes:
+            return
+        objetivo = int(self.max_bytes * 0.9)
+        with self._lock, self._conexion:
+            filas = self._conexion.execute("SELECT clave, tamano FROM paginas ORDER BY ultimo_acceso").fetchall()
+            expulsadas = []
+            for fila in filas:
+                if total <= objetivo:
+                    break
+                expulsadas.append((fila['clave'],))
+                total -= fila['tamano']
+            self._conexion.executemany("DELETE FROM paginas WHERE clave = ?", expulsadas)
+            self.estadisticas.expulsadas += len(expulsadas)
+
+    def resumen(self) -> Dict[str, object]:
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamano), 0), COALESCE(SUM(tamano_original), 0) FROM paginas"
+            ).fetchone()
+            e = self.estadisticas
+            return {
+                'entradas': fila[0],
+                'mb_disco': round(fila[1] / 1024 / 1024, 2),
+                'mb_original': round(fila[2] / 1024 / 1024, 2),
+                'aciertos': e.aciertos,
+                'revalidadas': e.revalidadas,
+                'descargadas': e.descargadas,
+                'expulsadas': e.expulsadas,
+                'mb_ahorrados': round(e.bytes_ahorrados / 1024 / 1024, 2),
+            }
+
+
+def decodificar_cuerpo(cuerpo: bytes, content_encoding: str) -> Optional[bytes]:
+    """Descomprime un cuerpo gzip/deflate/br (None si la codificación no está soportada)"""
+    codificacion = (content_encoding or '').strip().lower()
+    try:
+        if codificacion in ('', 'identity'):
+            return cuerpo
+        if codificacion in ('gzip', 'x-gzip'):
+            return zlib.decompress(cuerpo, 16 + zlib.MAX_WBITS)
+        if codificacion == 'deflate':
+            try:
+                return zlib.decompress(cuerpo)
+            except zlib.error:
+                return zlib.decompress(cuerpo, -zlib.MAX_WBITS)
+        if codificacion == 'br':
+            try:
+                import brotli
+            except ImportError:
+                return None
+            return brotli.decompress(cuerpo)
+    except Exception:
+        return None
+    return None
+
+
+def fecha_http(timestamp: float) -> str:
+    """Timestamp en formato de fecha HTTP (cabecera Date)"""
+    return formatdate(timestamp, usegmt=True)
+
+
+@lru_cache(maxsize=4)
+def obtener_cache_http(ruta_db: str = os.path.join(DIRECTORIO_CACHE_HTTP, "http_cache.sqlite")) -> HTTPPageCache:
+    """Caché compartida por proceso para cada fichero"""
+    return HTTPPageCache(ruta_db)
@@ -0,0 +1,541 @@
+# utils/http_fetch.py
+"""
+Capa HTTP compartida para el scraping síncrono
+
+Un único cliente por proceso con pools keep-alive por host, de modo que las peticiones
+sucesivas al mismo dominio reutilizan la conexión TCP/TLS. Usa HTTP/2 (httpx + h2) cuando
+está instalado y requests en caso contrario. La respuesta se descarga en streaming: gzip/brotli
+se descomprimen sobre la marcha y el límite de tamaño se aplica a los bytes ya descomprimidos,
+así que una página enorme o una bomba de compresión se corta sin cargarla entera en memoria.
+Cada petición registra DNS/conexión/TTFB/transferencia en las métricas por host. Con una
+HTTPPageCache las páginas frescas se sirven desde disco y las caducadas se revalidan (304).
+Con al_recibir los fragmentos se entregan a medida que llegan (parseo incremental) y la lectura
+se corta en cuanto el consumidor tiene lo que necesita, salvo que la respuesta traiga validadores
+(ETag / Last-Modified) y haya caché: entonces se lee entera para guardarla, a cambio de descargarla
+completa la primera vez, y las ejecuciones siguientes la revalidan con un 304 sin cuerpo. Las peticiones de red esperan ranura en el
+controlador de concurrencia adaptativa del dominio y le informan de latencia y estado. Con el
+archivo raw activo las respuestas de red se archivan enteras (la lectura ya no se corta).
+"""
+
+import re
+import sys
+import time
+import socket
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family, create_connection
+
+from .http_cache import EntradaCache, HTTPPageCache, obtener_cache_http
+from .raw_archive import ArchivoRaw, obtener_archivo_raw
+from .adaptive_concurrency import ControladorConcurrencia, obtener_controlador_concurrencia, segundos_retry_after
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx lo necesita para http2=True)
+except ImportError:
+    httpx = None
+
+try:
+    import brotli  # noqa: F401  (urllib3/httpx decodifican 'br' si está instalado)
+    _BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _BROTLI = True
+    except ImportError:
+        _BROTLI = False
+
+# Solo se anuncian las codificaciones que se pueden descomprimir
+ACCEPT_ENCODING = 'gzip, deflate, br' if _BROTLI else 'gzip, deflate'
+
+MAX_BYTES_RESPUESTA = 5 * 1024 * 1024
+TAMANO_FRAGMENTO = 64 * 1024
+# Fragmentos más pequeños al parsear en streaming para cortar antes la lectura
+TAMANO_FRAGMENTO_INCREMENTAL = 16 * 1024
+CONEXIONES_POR_HOST = 10
+
+_CABECERAS_HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade'}
+
+_PATRON_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+class HTTPFetchError(IOError):
+    """Error de descarga (estado HTTP de error o respuesta no válida)"""
+
+
+class ResponseTooLargeError(HTTPFetchError):
+    """La respuesta supera el tamaño máximo permitido"""
+
+
+@dataclass
+class TiemposHTTP:
+    """Desglose de tiempos de una petición, en segundos"""
+    dns: float = 0.0
+    conexion: float = 0.0  # TCP + TLS; 0 si se reutilizó una conexión del pool
+    ttfb: float = 0.0      # Desde el envío hasta recibir las cabeceras
+    transferencia: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return self.dns + self.conexion + self.ttfb + self.transferencia
+
+
+@dataclass
+class RespuestaHTTP:
+    """Respuesta ya descargada (misma interfaz básica que requests.Response)"""
+    url: str
+    status_code: int
+    headers: Dict[str, str]
+    content: bytes
+    encoding: str = 'utf-8'
+    http_version: str = 'HTTP/1.1'
+    tiempos: TiemposHTTP = field(default_factory=TiemposHTTP)
+    conexion_reutilizada: bool = True
+    origen: str = 'red'  # 'red', 'cache' (fresca) o 'revalidada' (304)
+    cortada: bool = False  # Lectura interrumpida por al_recibir: content es solo el principio
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors='replace')
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPFetchError(f"HTTP {self.status_code} en {self.url}")
+
+
+def detectar_encoding(content_type: str, inicio: bytes) -> str:
+    """Charset de la cabecera Content-Type, de la etiqueta <meta> o utf-8"""
+    if 'charset=' in content_type:
+        return content_type.split('charset=')[-1].split(';')[0].strip(' "\'') or 'utf-8'
+    coincidencia = _PATRON_CHARSET.search(inicio[:2048])
+    if coincidencia:
+        return coincidencia.group(1).decode('ascii', errors='ignore') or 'utf-8'
+    return 'utf-8'
+
+
+def _cabecera(headers: Dict[str, str], nombre: str) -> Optional[str]:
+    """Cabecera sin distinguir mayúsculas (requests conserva las del servidor, httpx las pasa a minúsculas)"""
+    return next((valor for clave, valor in headers.items() if clave.lower() == nombre), None)
+
+
+def _revalidable(status_code: int, headers: Dict[str, str]) -> bool:
+    """Respuesta que la caché puede guardar y revalidar después con una petición condicional"""
+    if status_code != 200 or 'no-store' in (_cabecera(headers, 'cache-control') or '').lower():
+        return False
+    return bool(_cabecera(headers, 'etag') or _cabecera(headers, 'last-modified'))
+
+
+def _sin_corte(al_recibir: Callable[[bytes], bool]) -> Callable[[bytes], bool]:
+    """Entrega fragmentos hasta que el consumidor tiene bastante, pero nunca pide cortar la lectura"""
+    pendiente = True
+
+    def recibir(fragmento: bytes) -> bool:
+        nonlocal pendiente
+        if pendiente:
+            pendiente = al_recibir(fragmento)
+        return True
+
+    return recibir
+
+
+# Tiempos de conexión del hilo actual: las conexiones nuevas los rellenan al abrirse
+_tiempos_hilo = threading.local()
+
+
+def _reiniciar_tiempos_hilo():
+    _tiempos_hilo.dns = 0.0
+    _tiempos_hilo.conexion = 0.0
+    _tiempos_hilo.nuevas = 0
+
+
+class _ConexionCronometrada:
+    """
+    Mide resolución DNS y conexión (TCP + TLS) de cada conexión nueva del pool
+
+    La resolución se hace una sola vez aquí y el socket se abre contra las direcciones ya
+    resueltas, así urllib3 no repite la búsqueda DNS.
+    """
+
+    def _new_conn(self):
+        inicio = time.perf_counter()
+        try:
+            direcciones = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            direcciones = []
+        _tiempos_hilo.dns = getattr(_tiempos_hilo, 'dns', 0.0) + time.perf_counter() - inicio
+
+        if not direcciones:
+            # urllib3 reintenta la resolución y lanza su propio error (NameResolutionError)
+            return super()._new_conn()
+
+        error = None
+        for *_, direccion in direcciones:
+            try:
+                sock = create_connection(
+                    (direccion[0], self.port), self.timeout,
+                    source_address=self.source_address, socket_options=self.socket_options
+                )
+                sys.audit("http.client.connect", self, self.host, self.port)
+                return sock
+            except socket.timeout as e:
+                error = ConnectTimeoutError(self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})")
+                error.__cause__ = e
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+                error.__cause__ = e
+        raise error
+
+    def connect(self):
+        inicio = time.perf_counter()
+        dns_previo = getattr(_tiempos_hilo, 'dns', 0.0)
+        super().connect()
+        dns = getattr(_tiempos_hilo, 'dns', 0.0) - dns_previo
+        _tiempos_hilo.conexion = getattr(_tiempos_hilo, 'conexion', 0.0) + time.perf_counter() - inicio - dns
+        _tiempos_hilo.nuevas = getattr(_tiempos_hilo, 'nuevas', 0) + 1
+
+
+class _ConexionHTTP(_ConexionCronometrada, HTTPConnection):
+    pass
+
+
+class _ConexionHTTPS(_ConexionCronometrada, HTTPSConnection):
+    pass
+
+
+class _PoolHTTP(HTTPConnectionPool):
+    ConnectionCls = _ConexionHTTP
+
+
+class _PoolHTTPS(HTTPSConnectionPool):
+    ConnectionCls = _ConexionHTTPS
+
+
+class _AdaptadorCronometrado(HTTPAdapter):
+    """HTTPAdapter cuyos pools usan conexiones cronometradas"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _PoolHTTP, 'https': _PoolHTTPS}
+
+
+class MetricasHTTP:
+    """Contadores y tiempos acumulados por host"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Dict[str, float]] = {}
+
+    def registrar(self, host: str, tiempos: Optional[TiemposHTTP] = None, bytes_recibidos: int = 0,
+                  conexion_nueva: bool = False, error: bool = False, http_version: str = '', origen: str = 'red',
+                  cortada: bool = False):
+        with self._lock:
+            m = self._hosts.setdefault(host, {
+                'peticiones': 0, 'errores': 0, 'conexiones_nuevas': 0, 'bytes': 0, 'desde_cache': 0, 'revalidadas': 0,
+                'cortadas': 0,
+                'dns_s': 0.0, 'conexion_s': 0.0, 'ttfb_s': 0.0, 'transferencia_s': 0.0, 'http_version': ''
+            })
+            m['peticiones'] += 1
+            m['errores'] += int(error)
+            m['conexiones_nuevas'] += int(conexion_nueva)
+            m['bytes'] += bytes_recibidos
+            m['desde_cache'] += int(origen == 'cache')
+            m['revalidadas'] += int(origen == 'revalidada')
+            m['cortadas'] += int(cortada)
+            if http_version:
+                m['http_version'] = http_version
+            if tiempos:
+                m['dns_s'] += tiempos.dns
+                m['conexion_s'] += tiempos.conexion
+                m['ttfb_s'] += tiempos.ttfb
+                m['transferencia_s'] += tiempos.transferencia
+
+    def resumen(self) -> Dict[str, Dict[str, float]]:
+        """Medias en milisegundos por host y porcentaje de conexiones reutilizadas"""
+        with self._lock:
+            resultado = {}
+            for host, m in self._hosts.items():
+                n = m['peticiones'] or 1
+                resultado[host] = {
+                    'peticiones': m['peticiones'],
+                    'errores': m['errores'],
+                    'desde_cache': m['desde_cache'],
+                    'revalidadas': m['revalidadas'],
+                    'cortadas': m['cortadas'],
+                    'http_version': m['http_version'],
+                    'reutilizacion_pct': round(100 * (1 - m['conexiones_nuevas'] / n), 1),
+                    'kb': round(m['bytes'] / 1024, 1),
+                    'dns_ms': round(1000 * m['dns_s'] / n, 1),
+                    'conexion_ms': round(1000 * m['conexion_s'] / n, 1),
+                    'ttfb_ms': round(1000 * m['ttfb_s'] / n, 1),
+                    'transferencia_ms': round(1000 * m['transferencia_s'] / n, 1),
+                }
+            return resultado
+
+    def reiniciar(self):
+        with self._lock:
+            self._hosts.clear()
+
+
+METRICAS_HTTP = MetricasHTTP()
+
+
+class HTTPFetcher:
+    """
+    Cliente HTTP con pools keep-alive por host
+
+    Args:
+        http2: usar HTTP/2 si httpx y h2 están instalados
+        max_bytes: tamaño máximo (descomprimido) de una respuesta
+        conexiones_por_host: conexiones keep-alive que se conservan por host
+        cache: caché HTTP en disco (None para no cachear)
+        concurrencia: controlador AIMD por dominio (None para no limitar)
+        archivo: archivo raw donde se guardan las respuestas de red mientras esté activo
+    """
+
+    def __init__(self, http2: bool = True, max_bytes: int = MAX_BYTES_RESPUESTA,
+                 conexiones_por_host: int = CONEXIONES_POR_HOST, cache: Optional[HTTPPageCache] = None,
+                 concurrencia: Optional[ControladorConcurrencia] = None, archivo: Optional[ArchivoRaw] = None):
+        self.max_bytes = max_bytes
+        self.cache = cache
+        self.concurrencia = concurrencia
+        self.archivo = archivo
+        self.usa_http2 = http2 and httpx is not None
+
+        if self.usa_http2:
+            self._cliente = httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=conexiones_por_host * 10)
+            )
+        else:
+            self._sesion = requests.Session()
+            reintentos = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                               allowed_methods=frozenset(['GET', 'HEAD']))
+            adaptador = _AdaptadorCronometrado(pool_connections=conexiones_por_host * 10,
+                                               pool_maxsize=conexiones_por_host, max_retries=reintentos)
+            self._sesion.mount('http://', adaptador)
+            self._sesion.mount('https://', adaptador)
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 15,
+            max_bytes: Optional[int] = None, usar_cache: bool = True,
+            al_recibir: Optional[Callable[[bytes], bool]] = None) -> RespuestaHTTP:
+        """
+        Descarga una URL completa respetando el límite de tamaño
+
+        Con caché: una entrada fresca se devuelve sin red; una caducada se revalida con
+        If-None-Match / If-Modified-Since y, si el servidor responde 304, se reutiliza su cuerpo.
+
+        Args:
+            al_recibir: recibe cada fragmento descomprimido (o el cuerpo cacheado entero); si
+                devuelve False se deja de leer y la respuesta queda cortada (no se cachea). En
+                HTTP/1.1 la conexión se cierra en lugar de volver al pool; en HTTP/2 solo se
+                cancela el stream. Con el archivo raw activo, o con caché y una respuesta con
+                ETag / Last-Modified, se deja de llamar a al_recibir pero la página se lee entera.
+
+        Raises:
+            ResponseTooLargeError: si la respuesta supera max_bytes
+            SinRanuraError: si el dominio no admite la petición antes del timeout
+            HTTPFetchError / excepciones de red del cliente subyacente
+        """
+        # Las cabeceras hop-by-hop las gestiona el pool (y HTTP/2 las prohíbe)
+        cabeceras = {k: v for k, v in (headers or {}).items() if k.lower() not in _CABECERAS_HOP_BY_HOP}
+        cabeceras['Accept-Encoding'] = ACCEPT_ENCODING
+        limite = max_bytes or self.max_bytes
+        host = urlsplit(url).hostname or ''
+
+        cache = self.cache if usar_cache else None
+        entrada = cache.obtener(url) if cache else None
+        if entrada is not None and entrada.fresca:
+            cache.registrar_acierto(entrada)
+            METRICAS_HTTP.registrar(host, origen='cache')
+            return self._respuesta_desde_cache(entrada, 'cache', al_recibir=al_recibir)
+        cabeceras.update(HTTPPageCache.cabeceras_condicionales(entrada))
+
+        archivar = self.archivo is not None and self.archivo.activo
+        if archivar and al_recibir is not None:
+            al_recibir = _sin_corte(al_recibir)
+
+        if self.concurrencia is not None:
+            with self.concurrencia.ranura(host, espera_maxima=timeout):
+                respuesta = self._descargar(url, host, cabeceras, timeout, limite, al_recibir, cache is not None)
+        else:
+            respuesta = self._descargar(url, host, cabeceras, timeout, limite, al_recibir, cache is not None)
+
+        METRICAS_HTTP.registrar(host, respuesta.tiempos, len(respuesta.content),
+                                conexion_nueva=not respuesta.conexion_reutilizada,
+                                error=not respuesta.ok, http_version=respuesta.http_version,
+                                origen='revalidada' if respuesta.status_code == 304 and entrada else 'red',
+                                cortada=respuesta.cortada)
+
+        if cache is not None:
+            if respuesta.status_code == 304 and entrada is not None:
+                revalidada = cache.revalidar(url, respuesta.headers) or entrada
+                respuesta = self._respuesta_desde_cache(revalidada, 'revalidada', respuesta.tiempos, al_recibir)
+            elif not respuesta.cortada:
+                cache.guardar(url, respuesta.status_code, respuesta.headers, respuesta.content, respuesta.encoding)
+
+        if archivar:
+            self.archivo.guardar(respuesta.url, respuesta.status_code, respuesta.headers, respuesta.content,
+                                 respuesta.encoding, origen='fetcher')
+        return respuesta
+
+    def _descargar(self, url: str, host: str, cabeceras: Dict[str, str], timeout: float, limite: int,
+                   al_recibir: Optional[Callable[[bytes], bool]] = None, cachear: bool = False) -> RespuestaHTTP:
+        try:
+            if self.usa_http2:
+                respuesta = self._get_httpx(url, cabeceras, timeout, limite, al_recibir, cachear)
+            else:
+                respuesta = self._get_requests(url, cabeceras, timeout, limite, al_recibir, cachear)
+        except ResponseTooLargeError:
+            METRICAS_HTTP.registrar(host, error=True)
+            raise
+        except Exception:
+            METRICAS_HTTP.registrar(host, error=True)
+            if self.concurrencia is not None:
+                self.concurrencia.registrar(host, error=True)
+            raise
+
+        if self.concurrencia is not None:
+            # Latencia del servidor hasta las cabeceras: la transferencia depende del tamaño de la página
+            self.concurrencia.registrar(host, respuesta.tiempos.ttfb, respuesta.status_code,
+                                        reintentar_tras=segundos_retry_after(_cabecera(respuesta.headers, 'retry-after')))
+        return respuesta
+
+    @staticmethod
+    def _respuesta_desde_cache(entrada: EntradaCache, origen: str, tiempos: Optional[TiemposHTTP] = None,
+                               al_recibir: Optional[Callable[[bytes], bool]] = None) -> RespuestaHTTP:
+        if al_recibir is not None:
+            al_recibir(entrada.cuerpo)
+        return RespuestaHTTP(
+            url=entrada.url,
+            status_code=entrada.status,
+            headers=dict(entrada.headers),
+            content=entrada.cuerpo,
+            encoding=entrada.encoding,
+            tiempos=tiempos or TiemposHTTP(),
+            origen=origen
+        )
+
+    @staticmethod
+    def _leer_limitado(fragmentos, url: str, limite: int,
+                       al_recibir: Optional[Callable[[bytes], bool]] = None) -> Tuple[bytes, bool]:
+        """
+        Acumula los fragmentos ya descomprimidos y corta al superar el límite
+
+        Returns:
+            (contenido, cortada): cortada si al_recibir pidió dejar de leer
+        """
+        buffer = bytearray()
+        for fragmento in fragmentos:
+            buffer += fragmento
+            if len(buffer) > limite:
+                raise ResponseTooLargeError(f"Respuesta de más de {limite} bytes en {url}")
+            if al_recibir is not None and not al_recibir(fragmento):
+                return bytes(buffer), True
+        return bytes(buffer), False
+
+    @staticmethod
+    def _comprobar_longitud(headers, url: str, limite: int):
+        longitud = headers.get('Content-Length')
+        if longitud and longitud.isdigit() and int(longitud) > limite:
+            raise ResponseTooLargeError(f"Content-Length {longitud} supera {limite} bytes en {url}")
+
+    def _get_requests(self, url: str, cabeceras: Dict[str, str], timeout: float, limite: int,
+                      al_recibir: Optional[Callable[[bytes], bool]] = None, cachear: bool = False) -> RespuestaHTTP:
+        _reiniciar_tiempos_hilo()
+        inicio = time.perf_counter()
+        with self._sesion.get(url, headers=cabeceras, timeout=timeout, stream=True) as response:
+            cabeceras_recibidas = time.perf_counter()
+            self._comprobar_longitud(response.headers, url, limite)
+            if al_recibir is not None and cachear and _revalidable(response.status_code, response.headers):
+                al_recibir = _sin_corte(al_recibir)
+            tamano = TAMANO_FRAGMENTO_INCREMENTAL if al_recibir else TAMANO_FRAGMENTO
+            contenido, cortada = self._leer_limitado(
+                response.iter_content(chunk_size=tamano, decode_unicode=False), url, limite, al_recibir
+            )
+            fin = time.perf_counter()
+
+            tiempos = TiemposHTTP(dns=_tiempos_hilo.dns, conexion=_tiempos_hilo.conexion)
+            tiempos.ttfb = max(0.0, cabeceras_recibidas - inicio - tiempos.dns - tiempos.conexion)
+            tiempos.transferencia = fin - cabeceras_recibidas
+            version = getattr(response.raw, 'version', 11)
+
+            return RespuestaHTTP(
+                url=response.url,
+                status_code=response.status_code,
+                headers=dict(response.headers),
+                content=contenido,
+                encoding=detectar_encoding(response.headers.get('Content-Type', ''), contenido),
+                http_version='HTTP/2' if version == 20 else 'HTTP/1.1',
+                tiempos=tiempos,
+                conexion_reutilizada=_tiempos_hilo.nuevas == 0,
+                cortada=cortada
+            )
+
+    def _get_httpx(self, url: str, cabeceras: Dict[str, str], timeout: float, limite: int,
+                   al_recibir: Optional[Callable[[bytes], bool]] = None, cachear: bool = False) -> RespuestaHTTP:
+        marcas: Dict[str, float] = {}
+
+        def traza(evento: str, _info):
+            # Eventos de httpcore: connection.connect_tcp.started, connection.start_tls.complete...
+            marcas[evento] = time.perf_counter()
+
+        inicio = time.perf_counter()
+        with self._cliente.stream('GET', url, headers=cabeceras, timeout=timeout,
+                                  extensions={'trace': traza}) as response:
+            cabeceras_recibidas = time.perf_counter()
+            self._comprobar_longitud(response.headers, url, limite)
+            if al_recibir is not None and cachear and _revalidable(response.status_code, dict(response.headers)):
+                al_recibir = _sin_corte(al_recibir)
+            tamano = TAMANO_FRAGMENTO_INCREMENTAL if al_recibir else TAMANO_FRAGMENTO
+            contenido, cortada = self._leer_limitado(response.iter_bytes(tamano), url, limite, al_recibir)
+            fin = time.perf_counter()
+
+        # httpcore resuelve el DNS dentro de connect_tcp: se contabiliza como conexión
+        inicio_conexion = marcas.get('connection.connect_tcp.started')
+        fin_conexion = marcas.get('connection.start_tls.complete') or marcas.get('connection.connect_tcp.complete')
+        conexion = (fin_conexion - inicio_conexion) if inicio_conexion and fin_conexion else 0.0
+
+        tiempos = TiemposHTTP(
+            conexion=conexion,
+            ttfb=max(0.0, cabeceras_recibidas - inicio - conexion),
+            transferencia=fin - cabeceras_recibidas
+        )
+        return RespuestaHTTP(
+            url=str(response.url),
+            status_code=response.status_code,
+            headers=dict(response.headers),
+            content=contenido,
+            encoding=detectar_encoding(response.headers.get('Content-Type', ''), contenido),
+            http_version=response.http_version,
+            tiempos=tiempos,
+            conexion_reutilizada=inicio_conexion is None,
+            cortada=cortada
+        )
+
+    def close(self):
+        if self.usa_http2:
+            self._cliente.close()
+        else:
+            self._sesion.close()
+
+
+@lru_cache(maxsize=1)
+def obtener_fetcher() -> HTTPFetcher:
+    """Cliente compartido por todo el proceso (los pools y la caché HTTP se reutilizan entre productos)"""
+    return HTTPFetcher(cache=obtener_cache_http(), concurrencia=obtener_controlador_concurrencia(),
+                       archivo=obtener_archivo_raw())
@@ -0,0 +1,198 @@
+# utils/model_routing.py
+"""
+Enrutado de modelos por etapa del pipeline
+
+Cada etapa tiene asignado un nivel de modelo, max_tokens y temperatura: modelos rápidos y
+baratos para extracción y análisis auxiliares, y el modelo fuerte solo para la síntesis final
+y la redacción. El modelo elegido en el sidebar sustituye al nivel premium y cada ejecución
+puede sobrescribir etapas concretas. Se registra coste y latencia por ruta.
+"""
+
+import time
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterator, List, Optional
+
+from .structured_output import opciones_json
+
+# Modelo por nivel
+MODELOS_POR_NIVEL = {
+    'rapido': 'gpt-3.5-turbo',
+    'equilibrado': 'gpt-4-turbo-preview',
+    'premium': 'gpt-4o',
+}
+
+# Precio en USD por 1K tokens (entrada, salida)
+PRECIOS_MODELOS = {
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+    'gpt-3.5-turbo-16k': (0.003, 0.004),
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-turbo-preview': (0.01, 0.03),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4o': (0.005, 0.015),
+    'gpt-4o-mini': (0.00015, 0.0006),
+}
+
+
+@dataclass(frozen=True)
+class RutaModelo:
+    """Configuración de llamada de una etapa"""
+    nivel: str = 'rapido'
+    max_tokens: Optional[int] = None
+    temperature: float = 0.3
+    modelo: Optional[str] = None  # Fija un modelo concreto en lugar del nivel
+
+
+# Tabla de rutas: extracción/analítica auxiliar en 'rapido', síntesis y redacción en 'premium'
+RUTAS_POR_ETAPA: Dict[str, RutaModelo] = {
+    # Generador HTML: investigación
+    'generate_technical_product_info': RutaModelo('rapido', 700, 0.2),
+    'generate_realistic_product_info': RutaModelo('rapido', 600, 0.3),
+    'ai_formulator_analysis': RutaModelo('equilibrado', 1000, 0.1),
+    'ai_dermatologist_analysis': RutaModelo('equilibrado', 900, 0.1),
+    'ai_marketing_analysis': RutaModelo('rapido', 800, 0.3),
+    'ai_chemistry_analysis': RutaModelo('equilibrado', 900, 0.1),
+    'ai_trends_analysis': RutaModelo('rapido', 800, 0.4),
+    'formulation_technology_analysis': RutaModelo('rapido', 800, 0.2),
+    'delivery_systems_analysis': RutaModelo('rapido', 700, 0.2),
+    'stability_analysis': RutaModelo('rapido', 700, 0.2),
+    'ingredient_synergy_analysis': RutaModelo('rapido', 600, 0.2),
+    'analyze_direct_competitors': RutaModelo('rapido', 700, 0.3),
+    'analyze_premium_alternatives': RutaModelo('rapido', 600, 0.3),
+    'analyze_substitute_products': RutaModelo('rapido', 600, 0.3),
+    # Generador HTML: síntesis y redacción
+    'multi_expert_synthesis': RutaModelo('premium', 2000, 0.1),
+    'enrich_with_advanced_ai': RutaModelo('equilibrado', 800, 0.3),
+    'enriquecer_con_ia': RutaModelo('rapido', 300, 0.7),
+    'generar_html_limpio': RutaModelo('premium', 1500, 0.3),
+    'redactar_textos_html': RutaModelo('premium', 1200, 0.4),
+    # Generador de FAQs
+    'analizar_producto_ultra_profundo': RutaModelo('rapido', 800, 0.3),
+    'generar_respuesta_ultra_contextual': RutaModelo('premium', 150, 0.8),
+}
+
+RUTA_POR_DEFECTO = RutaModelo('rapido', 800, 0.3)
+
+
+def estimar_coste(modelo: str, tokens_entrada: int, tokens_salida: int) -> float:
+    """Coste en USD de una llamada (0 si el modelo no tiene precio conocido)"""
+    precio_entrada, precio_salida = PRECIOS_MODELOS.get(modelo, (0.0, 0.0))
+    return tokens_entrada / 1000 * precio_entrada + tokens_salida / 1000 * precio_salida
+
+
+class ModelRouter:
+    """
+    Resuelve modelo y parámetros por etapa y ejecuta las llamadas registrando coste y latencia
+
+    Args:
+        modelo_preferido: modelo del sidebar; sustituye al nivel premium
+        overrides: etapa -> dict con 'modelo', 'nivel', 'max_tokens' y/o 'temperature' para esta ejecución
+    """
+
+    def __init__(self, modelo_preferido: Optional[str] = None, overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+                 rutas: Optional[Dict[str, RutaModelo]] = None):
+        self.modelo_preferido = modelo_preferido
+        self.overrides = overrides or {}
+        self.rutas = {**RUTAS_POR_ETAPA, **(rutas or {})}
+        self._lock = threading.Lock()
+        self._estadisticas: Dict[str, Dict[str, Any]] = {}
+
+    def ruta(self, etapa: str) -> Dict[str, Any]:
+        """Parámetros efectivos (model, max_tokens, temperature) de una etapa"""
+        ruta = self.rutas.get(etapa, RUTA_POR_DEFECTO)
+        override = self.overrides.get(etapa, {})
+        if override:
+            ruta = replace(ruta, **{k: v for k, v in override.items() if k in ('nivel', 'max_tokens', 'temperature', 'modelo')})
+
+        if ruta.modelo:
+            modelo = ruta.modelo
+        elif ruta.nivel == 'premium' and self.modelo_preferido:
+            modelo = self.modelo_preferido
+        else:
+            modelo = MODELOS_POR_NIVEL.get(ruta.nivel, MODELOS_POR_NIVEL['rapido'])
+
+        parametros = {'model': modelo, 'temperature': ruta.temperature}
+        if ruta.max_tokens:
+            parametros['max_tokens'] = ruta.max_tokens
+        return parametros
+
+    def completar(self, cliente, etapa: str, messages: List[Dict[str, str]], formato_json: bool = False, **extra):
+        """chat.completions.create con los parámetros de la etapa; registra uso, coste y latencia"""
+        parametros = {**self.ruta(etapa), **extra}
+        if formato_json:
+            parametros.update(opciones_json(parametros['model'], messages))
+
+        inicio = time.perf_counter()
+        response = cliente.chat.completions.create(messages=messages, **parametros)
+        latencia = time.perf_counter() - inicio
+
+        uso = getattr(response, 'usage', None)
+        tokens_entrada = getattr(uso, 'prompt_tokens', 0) or 0
+        tokens_salida = getattr(uso, 'completion_tokens', 0) or 0
+        self._registrar(etapa, parametros['model'], tokens_entrada, tokens_salida, latencia)
+        return response
+
+    def completar_stream(self, cliente, etapa: str, messages: List[Dict[str, str]], **extra) -> Iterator[str]:
+        """
+        Versión en streaming: genera los fragmentos de texto según llegan
+
+        Cerrar el generador antes de tiempo cierra también la conexión, de modo que se deja de
+        pagar la salida restante. El uso se registra al terminar o al cerrar.
+        """
+        parametros = {**self.ruta(etapa), **extra}
+        inicio = time.perf_counter()
+        stream = cliente.chat.completions.create(
+            messages=messages, stream=True, stream_options={"include_usage": True}, **parametros
+        )
+
+        tokens_entrada = tokens_salida = fragmentos = 0
+        try:
+            for chunk in stream:
+                uso = getattr(chunk, 'usage', None)
+                if uso:
+                    tokens_entrada = uso.prompt_tokens or 0
+                    tokens_salida = uso.completion_tokens or 0
+                if chunk.choices:
+                    texto = chunk.choices[0].delta.content
+                    if texto:
+                        fragmentos += 1
+                        yield texto
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+            # Sin bloque de uso (stream abortado) cada fragmento equivale aproximadamente a un token
+            self._registrar(etapa, parametros['model'], tokens_entrada, tokens_salida or fragmentos,
+                            time.perf_counter() - inicio)
+
+    def _registrar(self, etapa: str, modelo: str, tokens_entrada: int, tokens_salida: int, latencia: float):
+        with self._lock:
+            e = self._estadisticas.setdefault(etapa, {
+                'modelo': modelo, 'llamadas': 0, 'tokens_entrada': 0, 'tokens_salida': 0,
+                'coste_usd': 0.0, 'latencia_total_s': 0.0
+            })
+            e['modelo'] = modelo
+            e['llamadas'] += 1
+            e['tokens_entrada'] += tokens_entrada
+            e['tokens_salida'] += tokens_salida
+            e['coste_usd'] += estimar_coste(modelo, tokens_entrada, tokens_salida)
+            e['latencia_total_s'] += latencia
+
+    def informe(self) -> Dict[str, Dict[str, Any]]:
+        """Coste y latencia acumulados por etapa"""
+        with self._lock:
+            return {
+                etapa: {
+                    **e,
+                    'coste_usd': round(e['coste_usd'], 5),
+                    'latencia_media_s': round(e['latencia_total_s'] / e['llamadas'], 2) if e['llamadas'] else 0.0
+                }
+                for etapa, e in self._estadisticas.items()
+            }
+
+    def coste_total(self) -> float:
+        with self._lock:
+            return round(sum(e['coste_usd'] for e in self._estadisticas.values()), 5)
+
+    def reiniciar(self):
+        with self._lock:
+            self._estadisticas.clear()
@@ -0,0 +1,339 @@
+# utils/raw_archive.py
+"""
+Archivo raw de respuestas descargadas (estilo WARC)
+
+Cada respuesta (URL, estado, cabeceras, fecha y cuerpo) se añade al final de un fichero de
+segmento como un registro independiente: cabecera binaria, metadatos JSON y cuerpo comprimido
+con zstd (zlib si zstandard no está instalado). Un índice SQLite guarda el segmento y el offset
+de cada registro, así que leer uno es un acceso directo sobre el segmento mapeado en memoria y
+recorrer el archivo para re-extraer es una lectura secuencial del disco, sin red.
+Si el cuerpo de una URL no ha cambiado desde su último registro no se vuelve a escribir.
+
+Formato de un registro:
+    MAGIA (4) | compresión (1) | longitud metadatos (4) | longitud cuerpo comprimido (4)
+    | metadatos JSON (utf-8) | cuerpo comprimido
+"""
+
+import os
+import json
+import mmap
+import time
+import zlib
+import struct
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DIRECTORIO_ARCHIVO_RAW = "./product_cache/archivo_raw"
+TAMANO_MAX_SEGMENTO = 256 * 1024 * 1024
+NIVEL_ZSTD = 6
+NIVEL_ZLIB = 6
+
+MAGIA = b'ARW1'
+COMPRESION_ZLIB = 1
+COMPRESION_ZSTD = 2
+_CABECERA = struct.Struct('<4sBII')
+
+# Cabeceras que no describen el cuerpo guardado (se guarda ya descomprimido)
+_CABECERAS_EXCLUIDAS = {
+    'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length',
+    'set-cookie', 'proxy-connection', 'upgrade', 'te', 'trailer'
+}
+
+
+class ArchivoRawError(IOError):
+    """Registro ilegible (segmento truncado o corrupto)"""
+
+
+@dataclass
+class RegistroRaw:
+    """Respuesta archivada"""
+    id: int
+    url: str
+    status: int
+    headers: Dict[str, str]
+    cuerpo: bytes
+    fecha: float
+    encoding: str = 'utf-8'
+    origen: str = ''  # Quién la descargó: 'fetcher', 'ultra', 'scrapy'
+
+    @property
+    def texto(self) -> str:
+        return self.cuerpo.decode(self.encoding, errors='replace')
+
+
+@dataclass
+class EstadisticasArchivoRaw:
+    guardados: int = 0
+    sin_cambios: int = 0       # Cuerpo idéntico al último registro de la URL: no se escribe
+    bytes_originales: int = 0
+    bytes_comprimidos: int = 0
+    leidos: int = 0
+
+
+def _huella(cuerpo: bytes) -> str:
+    return hashlib.blake2b(cuerpo, digest_size=16).hexdigest()
+
+
+class ArchivoRaw:
+    """
+    Segmentos de registros comprimidos con índice de offsets en SQLite
+
+    Args:
+        directorio: carpeta de los segmentos y del índice
+        tamano_segmento: tamaño a partir del cual se abre un segmento nuevo
+        activo: si los scrapers deben archivar siempre (guardar() siempre escribe); lo normal es
+            dejarlo en False y activar el archivo solo durante una ejecución con archivando()
+    """
+
+    def __init__(self, directorio: str = DIRECTORIO_ARCHIVO_RAW, tamano_segmento: int = TAMANO_MAX_SEGMENTO,
+                 activo: bool = False):
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.tamano_segmento = tamano_segmento
+        self._activo = activo
+        self._ejecuciones_archivando = 0
+        self.estadisticas = EstadisticasArchivoRaw()
+        self.compresion = COMPRESION_ZSTD if zstandard is not None else COMPRESION_ZLIB
+
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Compresor y descompresor zstd por hilo (no son thread-safe)
+        self._mapas: Dict[int, mmap.mmap] = {}
+        self._conexion = sqlite3.connect(os.path.join(directorio, "indice.sqlite"), check_same_thread=False)
+        self._conexion.row_factory = sqlite3.Row
+        self._crear_esquema()
+
+        fila = self._conexion.execute("SELECT MAX(segmento) FROM registros").fetchone()
+        self._segmento = fila[0] or 1
+        self._fichero = open(self._ruta_segmento(self._segmento), 'ab')
+
+    @property
+    def activo(self) -> bool:
+        """True si los scrapers deben archivar lo que descargan"""
+        return self._activo or self._ejecuciones_archivando > 0
+
+    @activo.setter
+    def activo(self, valor: bool):
+        self._activo = valor
+
+    @contextmanager
+    def archivando(self):
+        """Activa el archivo mientras dura una ejecución (admite ejecuciones solapadas)"""
+        with self._lock:
+            self._ejecuciones_archivando += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._ejecuciones_archivando -= 1
+
+    def _crear_esquema(self):
+        with self._lock, self._conexion:
+            self._conexion.executescript("""
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS registros (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT NOT NULL,
+                    dominio TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    fecha REAL NOT NULL,
+                    origen TEXT NOT NULL DEFAULT '',
+                    segmento INTEGER NOT NULL,
+                    offset INTEGER NOT NULL,
+                    longitud INTEGER NOT NULL,
+                    tamano_original INTEGER NOT NULL,
+                    huella TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_registros_url ON registros(url);
+                CREATE INDEX IF NOT EXISTS idx_registros_dominio ON registros(dominio);
+            """)
+
+    def _ruta_segmento(self, segmento: int) -> str:
+        return os.path.join(self.directorio, f"segmento-{segmento:05d}.arw")
+
+    def _comprimir(self, cuerpo: bytes) -> bytes:
+        if zstandard is None:
+            return zlib.compress(cuerpo, NIVEL_ZLIB)
+        compresor = getattr(self._local, 'compresor', None)
+        if compresor is None:
+            compresor = self._local.compresor = zstandard.ZstdCompressor(level=NIVEL_ZSTD)
+        return compresor.compress(cuerpo)
+
+    def _descomprimir(self, compresion: int, datos) -> bytes:
+        if compresion == COMPRESION_ZSTD:
+            if zstandard is None:
+                raise ArchivoRawError("Registro zstd y zstandard no está instalado")
+            descompresor = getattr(self._local, 'descompresor', None)
+            if descompresor is None:
+                descompresor = self._local.descompresor = zstandard.ZstdDecompressor()
+            return descompresor.decompress(datos)
+        return zlib.decompress(datos)
+
+    def guardar(self, url: str, status: int, headers, cuerpo: bytes, encoding: str = 'utf-8',
+                origen: str = '', fecha: Optional[float] = None) -> Optional[int]:
+        """
+        Añade una respuesta al archivo
+
+        Returns:
+            id del registro, o None si el cuerpo es idéntico al último archivado para la URL
+        """
+        huella = _huella(cuerpo)
+        with self._lock:
+            ultimo = self._conexion.execute(
+                "SELECT huella, status FROM registros WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+            ).fetchone()
+        if ultimo is not None and ultimo['huella'] == huella and ultimo['status'] == status:
+            with self._lock:
+                self.estadisticas.sin_cambios += 1
+            return None
+
+        fecha = fecha or time.time()
+        cabeceras = {str(k).lower(): str(v) for k, v in dict(headers or {}).items()
+                     if str(k).lower() not in _CABECERAS_EXCLUIDAS}
+        metadatos = json.dumps({
+            'url': url, 'status': status, 'headers': cabeceras, 'encoding': encoding or 'utf-8',
+            'origen': origen, 'fecha': fecha
+        }, ensure_ascii=False).encode('utf-8')
+        comprimido = self._comprimir(cuerpo)
+        registro = _CABECERA.pack(MAGIA, self.compresion, len(metadatos), len(comprimido)) + metadatos + comprimido
+
+        with self._lock:
+            if self._fichero.tell() and self._fichero.tell() + len(registro) > self.tamano_segmento:
+                self._fichero.close()
+                self._segmento += 1
+                self._fichero = open(self._ruta_segmento(self._segmento), 'ab')
+            offset = self._fichero.tell()
+            self._fichero.write(registro)
+            self._fichero.flush()
+
+            # El índice se escribe después del segmento: un corte entre ambos solo deja bytes huérfanos
+            with self._conexion:
+                cursor = self._conexion.execute(
+                    """INSERT INTO registros (url, dominio, status, fecha, origen, segmento, offset, longitud,
+                                              tamano_original, huella)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (url, (urlsplit(url).hostname or '').lower(), status, fecha, origen,
+                     self._segmento, offset, len(registro), len(cuerpo), huella)
+                )
+            self.estadisticas.guardados += 1
+            self.estadisticas.bytes_originales += len(cuerpo)
+            self.estadisticas.bytes_comprimidos += len(comprimido)
+            return cursor.lastrowid
+
+    def _mapa(self, segmento: int, fin: int) -> mmap.mmap:
+        """Segmento mapeado en memoria; se vuelve a mapear si ha crecido desde la última lectura"""
+        with self._lock:
+            mapa = self._mapas.get(segmento)
+            if mapa is None or len(mapa) < fin:
+                # El mapa anterior no se cierra: otro hilo puede estar leyendo de él
+                with open(self._ruta_segmento(segmento), 'rb') as fichero:
+                    mapa = mmap.mmap(fichero.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mapas[segmento] = mapa
+            return mapa
+
+    def _leer_fila(self, fila) -> RegistroRaw:
+        offset = fila['offset']
+        mapa = self._mapa(fila['segmento'], offset + fila['longitud'])
+        magia, compresion, long_meta, long_cuerpo = _CABECERA.unpack_from(mapa, offset)
+        if magia != MAGIA:
+            raise ArchivoRawError(f"Registro {fila['id']} ilegible en el segmento {fila['segmento']}")
+        inicio_meta = offset + _CABECERA.size
+        metadatos = json.loads(mapa[inicio_meta:inicio_meta + long_meta])
+        inicio_cuerpo = inicio_meta + long_meta
+        # memoryview: el cuerpo comprimido se descomprime sin copiarlo fuera del mapa
+        with memoryview(mapa)[inicio_cuerpo:inicio_cuerpo + long_cuerpo] as datos:
+            cuerpo = self._descomprimir(compresion, datos)
+        self.estadisticas.leidos += 1
+        return RegistroRaw(
+            id=fila['id'], url=metadatos['url'], status=metadatos['status'], headers=metadatos['headers'],
+            cuerpo=cuerpo, fecha=metadatos['fecha'], encoding=metadatos.get('encoding', 'utf-8'),
+            origen=metadatos.get('origen', '')
+        )
+
+    def leer(self, id_registro: int) -> Optional[RegistroRaw]:
+        with self._lock:
+            fila = self._conexion.execute("SELECT * FROM registros WHERE id = ?", (id_registro,)).fetchone()
+        return self._leer_fila(fila) if fila is not None else None
+
+    def ultimo(self, url: str) -> Optional[RegistroRaw]:
+        """Versión más reciente archivada de una URL"""
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT * FROM registros WHERE url = ? ORDER BY id DESC LIMIT 1", (url,)
+            ).fetchone()
+        return self._leer_fila(fila) if fila is not None else None
+
+    def registros(self, dominio: Optional[str] = None, desde: Optional[float] = None,
+                  solo_ultimos: bool = True, status: Optional[int] = 200) -> Iterator[RegistroRaw]:
+        """
+        Recorre el archivo en orden de disco (segmento, offset)
+
+        Args:
+            dominio: solo ese dominio y sus subdominios
+            desde: solo registros posteriores a este timestamp
+            solo_ultimos: solo la versión más reciente de cada URL
+            status: solo respuestas con ese estado (None para todas)
+        """
+        condiciones, parametros = [], []
+        if dominio:
+            condiciones.append("(dominio = ? OR dominio LIKE ?)")
+            parametros += [dominio.lower(), f"%.{dominio.lower()}"]
+        if desde is not None:
+            condiciones.append("fecha >= ?")
+            parametros.append(desde)
+        if status is not None:
+            condiciones.append("status = ?")
+            parametros.append(status)
+        if solo_ultimos:
+            condiciones.append("id IN (SELECT MAX(id) FROM registros GROUP BY url)")
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        with self._lock:
+            filas = self._conexion.execute(
+                f"SELECT * FROM registros {where} ORDER BY segmento, offset", parametros
+            ).fetchall()
+        for fila in filas:
+            yield self._leer_fila(fila)
+
+    def resumen(self) -> Dict[str, object]:
+        with self._lock:
+            fila = self._conexion.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT url), COUNT(DISTINCT dominio), "
+                "COALESCE(SUM(longitud), 0), COALESCE(SUM(tamano_original), 0) FROM registros"
+            ).fetchone()
+            return {
+                'registros': fila[0],
+                'urls': fila[1],
+                'dominios': fila[2],
+                'segmentos': self._segmento,
+                'mb_disco': round(fila[3] / 1024 / 1024, 2),
+                'mb_original': round(fila[4] / 1024 / 1024, 2),
+                'ratio': round(fila[4] / fila[3], 1) if fila[3] else 0.0,
+                'compresion': 'zstd' if self.compresion == COMPRESION_ZSTD else 'zlib',
+                'guardados': self.estadisticas.guardados,
+                'sin_cambios': self.estadisticas.sin_cambios,
+            }
+
+    def cerrar(self):
+        with self._lock:
+            for mapa in self._mapas.values():
+                mapa.close()
+            self._mapas.clear()
+            self._fichero.close()
+            self._conexion.close()
+
+
+@lru_cache(maxsize=4)
+def obtener_archivo_raw(directorio: str = DIRECTORIO_ARCHIVO_RAW) -> ArchivoRaw:
+    """Archivo compartido por proceso (inactivo salvo dentro de archivando())"""
+    return ArchivoRaw(directorio)
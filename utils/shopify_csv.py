@@ -0,0 +1,203 @@
+# utils/shopify_csv.py - Lectura por bloques de exportaciones de Shopify
+import pandas as pd
+from typing import Dict, Iterator, List, Optional
+
+# Columnas de nivel producto que usan las herramientas (el resto se descarta al leer)
+COLUMNAS_PRODUCTO = [
+    'Handle', 'Title', 'Body HTML', 'Body (HTML)', 'body_html', 'description', 'Description',
+    'Vendor', 'Type', 'Product Category', 'Tags', 'Variant Price', 'Variant Barcode', 'Variant SKU'
+]
+
+# Tipos compactos: categorías para columnas muy repetidas, float32 para precios
+TIPOS_COMPACTOS = {
+    'Vendor': 'category',
+    'Type': 'category',
+    'Product Category': 'category',
+    'Variant Price': 'float32'
+}
+
+COLUMNAS_DESCRIPCION = ['Body HTML', 'Body (HTML)', 'body_html', 'description', 'Description']
+
+
+def validar_columnas_shopify(columnas) -> tuple:
+    """
+    Valida que el CSV tenga las columnas necesarias
+    
+    Returns:
+        tuple: (es_valido, mensaje_error)
+    """
+    columnas = list(columnas)
+    columnas_requeridas = ['Handle', 'Title']
+    columnas_recomendadas_base = ['Variant Price', 'Vendor', 'Tags']
+
+    columnas_faltantes = [col for col in columnas_requeridas if col not in columnas]
+    if columnas_faltantes:
+        return False, f"❌ Columnas requeridas faltantes: {', '.join(columnas_faltantes)}"
+
+    if not any(col in columnas for col in COLUMNAS_DESCRIPCION):
+        return False, "❌ No se encontró ninguna columna de descripción del producto"
+
+    columnas_faltantes_rec = [col for col in columnas_recomendadas_base if col not in columnas]
+    if columnas_faltantes_rec:
+        return True, f"✅ CSV válido. ⚠️ Columnas recomendadas faltantes: {', '.join(columnas_faltantes_rec)}"
+
+    return True, "✅ CSV válido con todas las columnas recomendadas"
+
+
+def obtener_muestra_productos(df: pd.DataFrame, n: int = 5) -> pd.DataFrame:
+    """
+    Obtiene una muestra de productos para preview
+    """
+    columnas_mostrar = ['Handle', 'Title', 'Vendor', 'Variant Price']
+    columnas_disponibles = [col for col in columnas_mostrar if col in df.columns]
+    
+    muestra = df[columnas_disponibles].head(n).copy()
+    
+    # Truncar títulos largos
+    if 'Title' in muestra.columns:
+        muestra['Title'] = muestra['Title'].apply(lambda x: x[:50] + '...' if len(str(x)) > 50 else x)
+    
+    return muestra
+
+
+class ShopifyCSVStream:
+    """
+    Lector en streaming de CSV exportados de Shopify
+
+    Lee el archivo por bloques, conserva solo las columnas necesarias con tipos compactos y
+    agrupa las filas de variantes en un único producto por Handle. Nunca mantiene el archivo
+    completo en un DataFrame, por lo que la memoria pico no depende del tamaño de la exportación.
+    """
+
+    def __init__(self, fuente, columnas: Optional[List[str]] = None, chunksize: int = 2000,
+                 encoding: str = 'utf-8', limite: Optional[int] = None):
+        self.fuente = fuente
+        self.columnas_deseadas = columnas or COLUMNAS_PRODUCTO
+        self.chunksize = chunksize
+        self.encoding = encoding
+        self.limite = limite
+        self._columnas: Optional[List[str]] = None
+        self._resumen: Optional[Dict] = None
+
+    def _rebobinar(self):
+        if hasattr(self.fuente, 'seek'):
+            self.fuente.seek(0)
+
+    @property
+    def columns(self) -> List[str]:
+        """Columnas útiles presentes en el archivo (compatible con df.columns)"""
+        if self._columnas is None:
+            self._rebobinar()
+            cabecera = pd.read_csv(self.fuente, nrows=0, encoding=self.encoding)
+            self._columnas = [col for col in cabecera.columns if col in self.columnas_deseadas]
+        return self._columnas
+
+    def _leer_bloques(self) -> Iterator[pd.DataFrame]:
+        columnas = self.columns
+        self._rebobinar()
+        return pd.read_csv(
+            self.fuente,
+            usecols=columnas,
+            dtype={col: TIPOS_COMPACTOS.get(col, 'object') for col in columnas},
+            encoding=self.encoding,
+            chunksize=self.chunksize
+        )
+
+    def iterar_lotes(self) -> Iterator[pd.DataFrame]:
+        """
+        Genera DataFrames de productos (una fila por Handle)
+
+        Las variantes de un producto son contiguas en la exportación; las filas del último
+        Handle de cada bloque se arrastran al siguiente por si continúan en él.
+        """
+        if 'Handle' not in self.columns:
+            raise ValueError("El CSV no contiene la columna 'Handle'")
+
+        pendiente = None
+        emitidos = 0
+
+        for bloque in self._leer_bloques():
+            bloque = bloque[bloque['Handle'].notna()]
+            if pendiente is not None:
+                bloque = pd.concat([pendiente, bloque], ignore_index=True)
+            if bloque.empty:
+                continue
+
+            ultimo_handle = bloque['Handle'].iloc[-1]
+            es_ultimo = bloque['Handle'] == ultimo_handle
+            pendiente = bloque[es_ultimo]
+            completos = bloque[~es_ultimo]
+
+            if not completos.empty:
+                productos = completos.groupby('Handle', sort=False, observed=True).first().reset_index()
+                emitidos, productos = self._aplicar_limite(productos, emitidos)
+                if not productos.empty:
+                    yield productos
+                if self.limite is not None and emitidos >= self.limite:
+                    return
+
+        if pendiente is not None and not pendiente.empty:
+            productos = pendiente.groupby('Handle', sort=False, observed=True).first().reset_index()
+            emitidos, productos = self._aplicar_limite(productos, emitidos)
+            if not productos.empty:
+                yield productos
+
+    def _aplicar_limite(self, productos: pd.DataFrame, emitidos: int):
+        if self.limite is not None:
+            productos = productos.head(max(self.limite - emitidos, 0))
+        return emitidos + len(productos), productos
+
+    def iterar_productos(self) -> Iterator[Dict]:
+        """Genera un diccionario por producto con los valores nulos convertidos a cadena vacía"""
+        for lote in self.iterar_lotes():
+            lote = lote.astype(object).where(lote.notna(), "")
+            for producto in lote.to_dict('records'):
+                yield producto
+
+    def resumen(self) -> Dict:
+        """Estadísticas del catálogo calculadas en una sola pasada (se cachean)"""
+        if self._resumen is not None:
+            return self._resumen
+
+        total = 0
+        marcas = set()
+        suma_precios = 0.0
+        con_precio = 0
+        sin_descripcion = 0
+        sin_precio = 0
+        columna_descripcion = next((col for col in COLUMNAS_DESCRIPCION if col in self.columns), None)
+
+        for lote in self.iterar_lotes():
+            total += len(lote)
+            if 'Vendor' in lote.columns:
+                marcas.update(lote['Vendor'].dropna().astype(str).unique())
+            if 'Variant Price' in lote.columns:
+                precios = lote['Variant Price']
+                suma_precios += float(precios.sum())
+                con_precio += int(precios.notna().sum())
+                sin_precio += int(precios.isna().sum())
+            if columna_descripcion:
+                sin_descripcion += int(lote[columna_descripcion].isna().sum())
+
+        self._resumen = {
+            'total_productos': total,
+            'marcas_unicas': len(marcas) if 'Vendor' in self.columns else None,
+            'precio_promedio': suma_precios / con_precio if con_precio else None,
+            'sin_descripcion': sin_descripcion if columna_descripcion else None,
+            'sin_precio': sin_precio if 'Variant Price' in self.columns else None
+        }
+        return self._resumen
+
+    def muestra(self, n: int = 5) -> pd.DataFrame:
+        """Primeros n productos (solo lee los bloques necesarios)"""
+        return pd.concat(list(self.head(n).iterar_lotes()) or [pd.DataFrame(columns=self.columns)], ignore_index=True)
+
+    def head(self, n: int) -> 'ShopifyCSVStream':
+        """Vista limitada a los primeros n productos (compatible con df.head)"""
+        limite = n if self.limite is None else min(n, self.limite)
+        vista = ShopifyCSVStream(self.fuente, self.columnas_deseadas, self.chunksize, self.encoding, limite)
+        vista._columnas = self._columnas
+        return vista
+
+    def __len__(self) -> int:
+        return self.resumen()['total_productos']
@@ -0,0 +1,240 @@
+# utils/structured_data.py
+"""
+Extracción rápida de datos estructurados schema.org (JSON-LD y microdata)
+
+La mayoría de retailers publican un Product en JSON-LD (nombre, marca, GTIN, oferta, valoración).
+Se localiza con expresiones regulares sobre el documento en bruto (bytes o texto) y solo se
+decodifica y parsea el bloque JSON, sin construir el árbol DOM. Si no hay JSON-LD se buscan las
+propiedades itemprop del microdata Product. El árbol completo queda para los campos que falten.
+"""
+
+import re
+import json
+from dataclasses import dataclass, field
+from html import unescape
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from .structured_output import reparar_json, StructuredOutputError
+
+# Tipos schema.org que describen un producto
+TIPOS_PRODUCTO = {'Product', 'ProductGroup', 'IndividualProduct', 'ProductModel'}
+
+# Distancia máxima (caracteres) desde el itemtype Product en la que se buscan sus itemprop
+VENTANA_MICRODATA = 200_000
+
+_FUENTE_JSON_LD = r'<script[^>]+type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script>'
+_FUENTE_ITEMTYPE = r'itemtype\s*=\s*["\']https?://schema\.org/(?:Product|IndividualProduct|ProductGroup)["\']'
+_FUENTE_ITEMPROP = (r'<(\w+)([^>]*?)\bitemprop\s*=\s*["\']'
+                    r'(name|brand|description|price|lowPrice|priceCurrency|gtin13|gtin12|gtin14|gtin8|gtin|sku|'
+                    r'ratingValue|reviewCount|ratingCount|image)["\']([^>]*)>([^<]*)')
+
+_PATRONES = {
+    tipo: {
+        'json_ld': re.compile(_FUENTE_JSON_LD.encode() if tipo is bytes else _FUENTE_JSON_LD, re.IGNORECASE | re.DOTALL),
+        'itemtype': re.compile(_FUENTE_ITEMTYPE.encode() if tipo is bytes else _FUENTE_ITEMTYPE, re.IGNORECASE),
+    }
+    for tipo in (str, bytes)
+}
+_PATRON_ITEMPROP = re.compile(_FUENTE_ITEMPROP, re.IGNORECASE)
+_PATRON_ATRIBUTO = re.compile(r'\b(content|src|href)\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+_PATRON_ETIQUETAS = re.compile(r'<[^>]+>')
+_PATRON_ESPACIOS = re.compile(r'\s+')
+
+
+@dataclass
+class DatosEstructurados:
+    """Campos de un Product schema.org ya normalizados a texto"""
+    nombre: str = ""
+    marca: str = ""
+    descripcion: str = ""
+    gtin: str = ""
+    sku: str = ""
+    precio: str = ""
+    moneda: str = ""
+    valoracion: str = ""
+    num_valoraciones: int = 0
+    imagenes: List[str] = field(default_factory=list)
+    origen: str = ""  # 'json-ld', 'microdata' o 'json-ld+microdata'
+
+    @property
+    def vacio(self) -> bool:
+        return not (self.nombre or self.precio or self.gtin)
+
+    @property
+    def precio_formateado(self) -> str:
+        return f"{self.precio} {self.moneda}".strip() if self.precio else ""
+
+
+def _texto(valor: Any) -> str:
+    """Texto plano de un valor JSON-LD (cadena, número, objeto con name/@value o lista)"""
+    if valor is None:
+        return ""
+    if isinstance(valor, list):
+        return _texto(valor[0]) if valor else ""
+    if isinstance(valor, dict):
+        return _texto(valor.get('name') or valor.get('@value') or valor.get('url') or "")
+    texto = unescape(str(valor))
+    if '<' in texto:
+        texto = _PATRON_ETIQUETAS.sub(' ', texto)
+    return _PATRON_ESPACIOS.sub(' ', texto).strip()
+
+
+def _es_producto(nodo: Dict) -> bool:
+    tipo = nodo.get('@type')
+    tipos = tipo if isinstance(tipo, list) else [tipo]
+    return any(isinstance(t, str) and t.rsplit('/', 1)[-1] in TIPOS_PRODUCTO for t in tipos)
+
+
+def _nodos_producto(datos: Any) -> Iterator[Dict]:
+    """Recorre el JSON-LD (listas, @graph, anidados) y genera los nodos Product"""
+    pendientes = [datos]
+    while pendientes:
+        nodo = pendientes.pop(0)
+        if isinstance(nodo, list):
+            pendientes.extend(nodo)
+        elif isinstance(nodo, dict):
+            if _es_producto(nodo):
+                yield nodo
+            for clave in ('@graph', 'mainEntity', 'itemListElement', 'item'):
+                if clave in nodo:
+                    pendientes.append(nodo[clave])
+
+
+def _primera_oferta(ofertas: Any) -> Dict:
+    if isinstance(ofertas, list):
+        ofertas = next((o for o in ofertas if isinstance(o, dict)), {})
+    return ofertas if isinstance(ofertas, dict) else {}
+
+
+def _imagenes(valor: Any) -> List[str]:
+    valores = valor if isinstance(valor, list) else [valor]
+    urls = (_texto(v.get('url') or v.get('contentUrl')) if isinstance(v, dict) else _texto(v) for v in valores if v)
+    return [url for url in urls if url][:5]
+
+
+def _desde_json_ld(producto: Dict) -> DatosEstructurados:
+    # ProductGroup: GTIN y ofertas suelen estar en la primera variante
+    variante = producto.get('hasVariant')
+    variante = _primera_oferta(variante) if variante else {}
+
+    oferta = _primera_oferta(producto.get('offers') or variante.get('offers'))
+    valoracion = producto.get('aggregateRating') or {}
+    if not isinstance(valoracion, dict):
+        valoracion = {}
+
+    num_valoraciones = _texto(valoracion.get('reviewCount') or valoracion.get('ratingCount'))
+    return DatosEstructurados(
+        nombre=_texto(producto.get('name')),
+        marca=_texto(producto.get('brand') or producto.get('manufacturer')),
+        descripcion=_texto(producto.get('description')),
+        gtin=next((_texto(fuente.get(clave)) for fuente in (producto, variante)
+                   for clave in ('gtin13', 'gtin', 'gtin12', 'gtin14', 'gtin8') if fuente.get(clave)), ""),
+        sku=_texto(producto.get('sku') or variante.get('sku')),
+        precio=_texto(oferta.get('price') or oferta.get('lowPrice')),
+        moneda=_texto(oferta.get('priceCurrency')),
+        valoracion=_texto(valoracion.get('ratingValue')),
+        num_valoraciones=int(float(num_valoraciones)) if num_valoraciones.replace('.', '', 1).isdigit() else 0,
+        imagenes=_imagenes(producto.get('image') or variante.get('image')),
+        origen='json-ld'
+    )
+
+
+def _parsear_bloque(bloque: str) -> Optional[Any]:
+    bloque = bloque.strip()
+    if not bloque:
+        return None
+    try:
+        return json.loads(bloque, strict=False)
+    except ValueError:
+        try:
+            return reparar_json(bloque)
+        except StructuredOutputError:
+            return None
+
+
+def _bloques_json_ld(documento: Union[str, bytes]) -> Iterator[Any]:
+    for coincidencia in _PATRONES[type(documento)]['json_ld'].finditer(documento):
+        bloque = coincidencia.group(1)
+        if isinstance(bloque, bytes):
+            bloque = bloque.decode('utf-8', errors='replace')
+        datos = _parsear_bloque(bloque)
+        if datos is not None:
+            yield datos
+
+
+def producto_json_ld(bloque: str) -> Optional[DatosEstructurados]:
+    """Product del contenido de un único <script type="application/ld+json"> (None si no lo hay)"""
+    producto = next(_nodos_producto(_parsear_bloque(bloque)), None)
+    return _desde_json_ld(producto) if producto is not None else None
+
+
+def _desde_microdata(documento: Union[str, bytes]) -> Optional[DatosEstructurados]:
+    coincidencia = _PATRONES[type(documento)]['itemtype'].search(documento)
+    if coincidencia is None:
+        return None
+
+    ventana = documento[coincidencia.end():coincidencia.end() + VENTANA_MICRODATA]
+    if isinstance(ventana, bytes):
+        ventana = ventana.decode('utf-8', errors='replace')
+
+    propiedades: Dict[str, str] = {}
+    imagenes = []
+    for etiqueta, antes, propiedad, despues, texto in _PATRON_ITEMPROP.findall(ventana):
+        propiedad = propiedad.lower()
+        atributo = _PATRON_ATRIBUTO.search(antes + despues)
+        valor = unescape(atributo.group(2)) if atributo else _PATRON_ESPACIOS.sub(' ', unescape(texto)).strip()
+        if not valor:
+            continue
+        if propiedad == 'image':
+            imagenes.append(valor)
+        else:
+            # La primera aparición es la del producto; las siguientes suelen ser de entidades anidadas
+            propiedades.setdefault(propiedad, valor)
+
+    num_valoraciones = propiedades.get('reviewcount') or propiedades.get('ratingcount') or ''
+    return DatosEstructurados(
+        nombre=propiedades.get('name', ''),
+        marca=propiedades.get('brand', ''),
+        descripcion=propiedades.get('description', ''),
+        gtin=next((propiedades[c] for c in ('gtin13', 'gtin', 'gtin12', 'gtin14', 'gtin8') if c in propiedades), ''),
+        sku=propiedades.get('sku', ''),
+        precio=propiedades.get('price') or propiedades.get('lowprice', ''),
+        moneda=propiedades.get('pricecurrency', ''),
+        valoracion=propiedades.get('ratingvalue', ''),
+        num_valoraciones=int(num_valoraciones) if num_valoraciones.isdigit() else 0,
+        imagenes=imagenes[:5],
+        origen='microdata'
+    )
+
+
+def extraer_datos_estructurados(documento: Union[str, bytes]) -> DatosEstructurados:
+    """
+    Product schema.org del documento (JSON-LD primero, microdata para completar huecos)
+
+    Returns:
+        DatosEstructurados: vacío (vacio == True) si la página no publica datos de producto
+    """
+    if not documento:
+        return DatosEstructurados()
+
+    datos = None
+    for bloque in _bloques_json_ld(documento):
+        producto = next(_nodos_producto(bloque), None)
+        if producto is not None:
+            datos = _desde_json_ld(producto)
+            break
+
+    if datos is not None and datos.nombre and datos.precio and datos.descripcion:
+        return datos
+
+    microdata = _desde_microdata(documento)
+    if datos is None:
+        return microdata or DatosEstructurados()
+    if microdata is not None:
+        for campo in ('nombre', 'marca', 'descripcion', 'gtin', 'sku', 'precio', 'moneda', 'valoracion'):
+            if not getattr(datos, campo):
+                setattr(datos, campo, getattr(microdata, campo))
+        datos.num_valoraciones = datos.num_valoraciones or microdata.num_valoraciones
+        datos.imagenes = datos.imagenes or microdata.imagenes
+        datos.origen = 'json-ld+microdata'
+    return datos
@@ -0,0 +1,193 @@
+# utils/structured_output.py
+"""
+Capa compartida de salida estructurada (JSON) para las llamadas a OpenAI
+
+Activa el modo JSON nativo en los modelos que lo soportan y, para el resto, repara localmente
+las respuestas casi válidas (bloques markdown, comas finales, comillas tipográficas, JSON
+truncado) en lugar de descartar la completion. Lleva métricas de fallos de parseo por etapa.
+"""
+
+import re
+import ast
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+# Prefijos de modelos con response_format={"type": "json_object"}
+_PREFIJOS_JSON_MODE = ('gpt-4o', 'gpt-4-turbo', 'gpt-4-1106', 'gpt-4-0125', 'gpt-4.1', 'gpt-3.5-turbo')
+# Snapshots antiguos de esos prefijos sin modo JSON
+_SUFIJOS_SIN_JSON_MODE = ('-0301', '-0613')
+
+_PATRON_BLOQUE_MARKDOWN = re.compile(r'```(?:json|JSON)?\s*(.*?)```', re.DOTALL)
+_PATRON_COMA_FINAL = re.compile(r',\s*([}\]])')
+_COMILLAS_TIPOGRAFICAS = str.maketrans({'“': '"', '”': '"', '„': '"', '‘': "'", '’': "'"})
+
+
+class StructuredOutputError(ValueError):
+    """La respuesta del modelo no contiene JSON recuperable"""
+
+
+def soporta_json_mode(modelo: str) -> bool:
+    """Indica si el modelo acepta response_format de tipo json_object"""
+    return modelo.startswith(_PREFIJOS_JSON_MODE) and not modelo.endswith(_SUFIJOS_SIN_JSON_MODE)
+
+
+def opciones_json(modelo: str, mensajes: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+    """
+    Argumentos extra para chat.completions.create que activan el modo JSON si está disponible
+
+    La API exige que la palabra "JSON" aparezca en los mensajes; si se pasan y no aparece, no se
+    activa para no provocar un error 400.
+    """
+    if not soporta_json_mode(modelo):
+        return {}
+    if mensajes is not None and not any('json' in (m.get('content') or '').lower() for m in mensajes):
+        return {}
+    return {"response_format": {"type": "json_object"}}
+
+
+def _extraer_bloque(texto: str) -> str:
+    """Desde la primera llave/corchete de apertura hasta su cierre (o el final del texto)"""
+    inicios = [i for i in (texto.find('{'), texto.find('[')) if i != -1]
+    if not inicios:
+        return texto
+    inicio = min(inicios)
+    apertura = texto[inicio]
+    cierre = '}' if apertura == '{' else ']'
+    fin = texto.rfind(cierre)
+    return texto[inicio:fin + 1] if fin > inicio else texto[inicio:]
+
+
+def _cerrar_estructuras(texto: str) -> str:
+    """Completa un JSON truncado cerrando la cadena abierta y las llaves/corchetes pendientes"""
+    pila = []
+    en_cadena = False
+    escapado = False
+    for caracter in texto:
+        if en_cadena:
+            if escapado:
+                escapado = False
+            elif caracter == '\\':
+                escapado = True
+            elif caracter == '"':
+                en_cadena = False
+        elif caracter == '"':
+            en_cadena = True
+        elif caracter in '{[':
+            pila.append('}' if caracter == '{' else ']')
+        elif caracter in '}]' and pila:
+            pila.pop()
+
+    if en_cadena:
+        texto += '"'
+    texto = texto.rstrip()
+    # Un par clave/valor a medias ("clave": o "clave") no se puede completar: se descarta
+    texto = re.sub(r',?\s*"[^"]*"\s*:\s*$', '', texto)
+    texto = texto.rstrip().rstrip(',')
+    return texto + ''.join(reversed(pila))
+
+
+def reparar_json(texto: str) -> Any:
+    """
+    Parsea JSON tolerando los defectos habituales de las respuestas de los modelos
+
+    Raises:
+        StructuredOutputError: si ninguna reparación produce JSON válido
+    """
+    if not texto or not texto.strip():
+        raise StructuredOutputError("Respuesta vacía")
+
+    candidato = texto.strip()
+    bloque = _PATRON_BLOQUE_MARKDOWN.search(candidato)
+    if bloque:
+        candidato = bloque.group(1).strip()
+    candidato = _extraer_bloque(candidato).translate(_COMILLAS_TIPOGRAFICAS)
+
+    intentos = [
+        candidato,
+        _PATRON_COMA_FINAL.sub(r'\1', candidato),
+    ]
+    intentos.append(_PATRON_COMA_FINAL.sub(r'\1', _cerrar_estructuras(intentos[1])))
+
+    for intento in intentos:
+        try:
+            return json.loads(intento, strict=False)
+        except ValueError:
+            continue
+
+    # Último recurso: dict de Python (comillas simples, True/False/None)
+    try:
+        resultado = ast.literal_eval(intentos[1])
+        if isinstance(resultado, (dict, list)):
+            return resultado
+    except (ValueError, SyntaxError):
+        pass
+
+    raise StructuredOutputError(f"JSON irrecuperable: {texto[:80]!r}")
+
+
+class MetricasSalidaEstructurada:
+    """Contadores por etapa: respuestas JSON directas, reparadas y perdidas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._etapas: Dict[str, Dict[str, int]] = {}
+
+    def registrar(self, etapa: str, resultado: str):
+        with self._lock:
+            contadores = self._etapas.setdefault(etapa, {'total': 0, 'directo': 0, 'reparado': 0, 'fallido': 0})
+            contadores['total'] += 1
+            contadores[resultado] += 1
+
+    def resumen(self) -> Dict[str, Dict[str, float]]:
+        """Copia de los contadores con la tasa de fallo de cada etapa"""
+        with self._lock:
+            return {
+                etapa: {**c, 'tasa_fallo': round(c['fallido'] / c['total'], 3) if c['total'] else 0.0}
+                for etapa, c in self._etapas.items()
+            }
+
+    def reiniciar(self):
+        with self._lock:
+            self._etapas.clear()
+
+
+METRICAS_SALIDA_ESTRUCTURADA = MetricasSalidaEstructurada()
+
+
+def parsear_json_modelo(contenido: str, etapa: str = "general") -> Any:
+    """
+    Parsea la respuesta de un modelo registrando si fue JSON directo, reparado o perdido
+
+    Raises:
+        StructuredOutputError: si el contenido no se puede recuperar
+    """
+    try:
+        resultado = json.loads(contenido)
+        METRICAS_SALIDA_ESTRUCTURADA.registrar(etapa, 'directo')
+        return resultado
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        resultado = reparar_json(contenido)
+    except StructuredOutputError:
+        METRICAS_SALIDA_ESTRUCTURADA.registrar(etapa, 'fallido')
+        raise
+    METRICAS_SALIDA_ESTRUCTURADA.registrar(etapa, 'reparado')
+    return resultado
+
+
+def completar_json(cliente, etapa: str, modelo: str, mensajes: List[Dict[str, str]], **parametros) -> Any:
+    """Llama a chat.completions con modo JSON cuando el modelo lo soporta y parsea la respuesta"""
+    response = cliente.chat.completions.create(
+        model=modelo,
+        messages=mensajes,
+        **opciones_json(modelo, mensajes),
+        **parametros
+    )
+    contenido = response.choices[0].message.content
+    if not contenido:
+        METRICAS_SALIDA_ESTRUCTURADA.registrar(etapa, 'fallido')
+        raise StructuredOutputError("No se recibió contenido de la IA")
+    return parsear_json_modelo(contenido, etapa)